@@ -0,0 +1,39 @@
+import argparse
+import json
+from typing import Dict, List, Tuple
+
+from harness import print_table, summarize
+
+
+def load_records(paths: List[str]) -> List[Dict]:
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Число попыток и суммарная задержка на один принятый результат")
+    parser.add_argument("files", nargs="+", help="Файлы data/acceptance_metrics.jsonl клиентов")
+    args = parser.parse_args()
+    groups: Dict[Tuple[int, bool], List[Dict]] = {}
+    for record in load_records(args.files):
+        key = (record.get("num_candidates", 1), bool(record.get("few_shot_examples", 0)))
+        groups.setdefault(key, []).append(record)
+    rows = []
+    for (num_candidates, few_shot), records in sorted(groups.items()):
+        attempts = summarize([float(r["attempts"]) for r in records])
+        latency = summarize([float(r["latency_seconds"]) for r in records])
+        saved_tokens = summarize([float(r.get("partial_saved_output_tokens", 0)) for r in records])
+        saved_latency = summarize([float(r.get("partial_saved_latency_ms", 0)) / 1000 for r in records])
+        rows.append([
+            num_candidates, "yes" if few_shot else "no", attempts["count"], attempts["mean"],
+            latency["mean"], latency["p50"], latency["p95"], saved_tokens["mean"], saved_latency["mean"]
+        ])
+    print_table(
+        "Попытки и задержка на принятый результат",
+        ["candidates", "few_shot", "accepted", "attempts/accept", "latency/accept, s", "p50, s", "p95, s",
+         "saved_tokens/accept", "saved_s/accept"],
+        rows
+    )
\ No newline at end of file
@@ -0,0 +1,193 @@
+import argparse
+import copy
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from fake_openai_server import FakeOpenAIServer
+from harness import DUMMY_CONFIG, ROOT_DIR, add_service_paths, print_table, summarize, timed
+
+add_service_paths()
+
+import event_helper
+import greeting_service
+import task_master
+from stdio_client import ContainerPool
+
+SERVICES = {
+    "event": ("event_helper", "event-helper"),
+    "task": ("task_master", "task-master"),
+    "greeting": ("greeting_service", "greeting-service")
+}
+PROCESS_RUNNER = (
+    "import importlib, json, sys; sys.path.insert(0, sys.argv[1]); "
+    "module = importlib.import_module(sys.argv[2]); "
+    "config = json.load(open(sys.argv[4], encoding='utf-8')); "
+    "sys.exit(0 if module.main(sys.argv[3], config) else 1)"
+)
+STDIO_RUNNER = (
+    "import importlib, json, sys; sys.path.insert(0, sys.argv[1]); "
+    "module = importlib.import_module(sys.argv[2]); module.redirect_logging_to_stderr(); "
+    "config = json.load(open(sys.argv[4], encoding='utf-8')); "
+    "sys.exit(0 if module.run_stdio(config, sys.argv[3]) else 1)"
+)
+
+
+def sample_inputs(service: str, count: int) -> List[Dict[str, Any]]:
+    start = datetime.date(2025, 9, 1)
+    inputs = []
+    if service == "greeting":
+        index = greeting_service.HolidayIndex([os.path.join(ROOT_DIR, "greeting_service", "holidays.json")])
+        day = start
+        while len(inputs) < count:
+            if index.lookup(str(day)) is not None:
+                inputs.append({"date": str(day), "time": "10:00", "greeting": ""})
+            day += datetime.timedelta(days=1)
+        return inputs
+    for i in range(count):
+        day = str(start + datetime.timedelta(days=i))
+        style = {"brief": i % 2 == 0, "formal": i % 3 == 0}
+        prompt = f"Встреча команды номер {i}, обсуждаем итоги спринта и планы"
+        if service == "event":
+            inputs.append({
+                "event_data": {
+                    "date": day, "time": "11:00", "address": "online",
+                    "additional_info": "", "prompt": prompt, "style": style
+                },
+                "weather": None, "messages": [], "final_output": None, "user_feedback": ""
+            })
+        else:
+            inputs.append({
+                "task_data": {
+                    "start_date": day, "start_time": "10:00", "end_date": day, "end_time": "18:00",
+                    "all_day": False, "additional_info": "", "prompt": prompt, "style": style
+                },
+                "messages": [], "final_output": None, "user_feedback": ""
+            })
+    return inputs
+
+
+def run_inprocess(service: str, config: Dict[str, str], inputs: List[Dict[str, Any]]):
+    if service == "event":
+        setup_ms, agent = timed(lambda: event_helper.EventAgent(dict(config)))
+        call = lambda data: agent.process_request(copy.deepcopy(data))
+    elif service == "task":
+        setup_ms, agent = timed(lambda: task_master.TaskAgent(dict(config)))
+        call = lambda data: agent.process_request(copy.deepcopy(data))
+    else:
+        setup_ms, generator = timed(lambda: greeting_service.GreetingGenerator(dict(config)))
+        call = lambda data: generator.parse_greeting(generator.generate_greeting(data["date"], data["time"])["greeting"])
+    return setup_ms, [timed(lambda: call(data))[0] for data in inputs]
+
+
+def run_files(command: List[str], input_file: str, inputs: List[Dict[str, Any]]) -> List[float]:
+    latencies = []
+    for data in inputs:
+        started = time.perf_counter()
+        with open(input_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        subprocess.run(command, capture_output=True, check=True)
+        with open(input_file, "r", encoding="utf-8") as f:
+            json.load(f)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def run_process(service: str, config_file: str, work_dir: str, inputs: List[Dict[str, Any]]) -> List[float]:
+    module = SERVICES[service][0]
+    input_file = os.path.join(work_dir, f"{service}_input.json")
+    command = [sys.executable, "-c", PROCESS_RUNNER, os.path.join(ROOT_DIR, module), module, input_file, config_file]
+    return run_files(command, input_file, inputs)
+
+
+def run_docker(service: str, config_file: str, work_dir: str, inputs: List[Dict[str, Any]]) -> List[float]:
+    command = [
+        "docker", "run", "--rm", "--network", "host",
+        "-v", f"{work_dir}:/data",
+        "-v", f"{config_file}:/app/config.json",
+        SERVICES[service][1],
+        f"/data/{service}_input.json"
+    ]
+    return run_files(command, os.path.join(work_dir, f"{service}_input.json"), inputs)
+
+
+def run_pool(command: List[str], inputs: List[Dict[str, Any]], args) -> Tuple[float, List[float], int]:
+    pool = ContainerPool(command, size=args.pool_size, max_uses=args.pool_max_uses)
+    started = time.perf_counter()
+    while len(pool.idle) < pool.size and time.perf_counter() - started < 300:
+        time.sleep(0.05)
+    warmup_ms = (time.perf_counter() - started) * 1000
+    latencies = []
+    for data in inputs:
+        latencies.append(timed(lambda: pool.request({"op": "generate", **data}))[0])
+        time.sleep(args.think_seconds)
+    warm = pool.stats["warm"]
+    pool.close()
+    return warmup_ms, latencies, warm
+
+
+def pool_commands(service: str, config_file: str, work_dir: str) -> Dict[str, List[str]]:
+    module = SERVICES[service][0]
+    commands = {"process": [sys.executable, "-c", STDIO_RUNNER, os.path.join(ROOT_DIR, module), module, work_dir, config_file]}
+    commands["docker"] = [
+        "docker", "run", "-i", "--rm", "--network", "host",
+        "-v", f"{work_dir}:/data",
+        "-v", f"{config_file}:/app/config.json",
+        SERVICES[service][1],
+        "--stdio", "/data"
+    ]
+    return commands
+
+
+def benchmark(base_url: str, args) -> List[List]:
+    config = {**DUMMY_CONFIG, "LLM_BASE_URL": base_url}
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, "config.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        for service in args.services:
+            inputs = sample_inputs(service, args.requests)
+            setup_ms, latencies = run_inprocess(service, config, inputs)
+            rows.append([service, "inprocess", *summary_cells(latencies), setup_ms])
+            rows.append([service, "process", *summary_cells(run_process(service, config_file, work_dir, inputs)), 0.0])
+            if args.docker:
+                rows.append([service, "docker", *summary_cells(run_docker(service, config_file, work_dir, inputs)), 0.0])
+            commands = pool_commands(service, config_file, work_dir)
+            for kind in ("process", "docker") if args.docker else ("process",):
+                warmup_ms, latencies, warm = run_pool(commands[kind], inputs, args)
+                rows.append([service, f"{kind} pool ({warm}/{len(inputs)} warm)", *summary_cells(latencies), warmup_ms])
+    return rows
+
+
+def summary_cells(latencies: List[float]) -> List[Any]:
+    stats = summarize(latencies)
+    return [stats["count"], stats["mean"], stats["p50"], stats["p95"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение задержки клиента при запуске сервиса в процессе и в отдельном процессе/контейнере")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICES), default=["event", "task", "greeting"])
+    parser.add_argument("--docker", action="store_true", help="дополнительно замерить docker run (образы должны быть собраны)")
+    parser.add_argument("--pool-size", type=int, default=2, help="Число заранее запущенных процессов или контейнеров в пуле")
+    parser.add_argument("--pool-max-uses", type=int, default=1, help="Число запросов, после которого процесс пула заменяется")
+    parser.add_argument("--think-seconds", type=float, default=1.0, help="Пауза между запросами, за которую пул успевает пополниться")
+    parser.add_argument("--base-url", help="OpenAI-совместимый адрес; по умолчанию запускается локальная заглушка")
+    args = parser.parse_args()
+
+    if args.base_url:
+        rows = benchmark(args.base_url, args)
+    else:
+        with FakeOpenAIServer() as server:
+            rows = benchmark(server.base_url, args)
+    print_table(
+        "Задержка одного запроса по способу запуска сервиса, мс",
+        ["service", "backend", "n", "mean", "p50", "p95", "setup"],
+        rows
+    )
\ No newline at end of file
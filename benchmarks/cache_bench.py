@@ -0,0 +1,86 @@
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from fake_redis_server import FakeRedisServer
+from harness import add_service_paths, print_table, summarize
+
+add_service_paths()
+
+from cache_backend import CacheBackend, MemoryLRUBackend, RedisBackend, encode_value
+
+SAMPLE_WEATHER = (
+    "В Москве 1 сентября днем ожидается переменная облачность, температура воздуха +17...+19 °C. "
+    "Во второй половине дня возможен кратковременный дождь, ветер западный 4-6 м/с, порывы до 11 м/с. "
+    "Атмосферное давление 745 мм рт. ст., влажность воздуха около 70%. "
+    "К вечеру облачность уменьшится, температура опустится до +13...+15 °C, осадков не ожидается."
+)
+
+
+def workload(requests: int, keys: int, skew: float, seed: int) -> List[int]:
+    rng = random.Random(seed)
+    weights = [1 / rank ** skew for rank in range(1, keys + 1)]
+    return rng.choices(range(keys), weights, k=requests)
+
+
+def replay(backends: List[CacheBackend], keys: List[int], ttl: float) -> Dict[str, Any]:
+    lookups = []
+    upstream = 0
+    for index, key in enumerate(keys):
+        backend = backends[index % len(backends)]
+        started = time.perf_counter()
+        value = backend.get("weather", f"город {key}|2025-09-01|10")
+        lookups.append((time.perf_counter() - started) * 1000)
+        if value is None:
+            upstream += 1
+            backend.set("weather", f"город {key}|2025-09-01|10", f"{SAMPLE_WEATHER} ({key})", ttl)
+    errors = sum(backend.stats()["namespaces"].get("weather", {}).get("errors", 0) for backend in backends)
+    return {"lookups": summarize(lookups), "upstream": upstream, "errors": errors}
+
+
+def benchmark(args: argparse.Namespace, redis_url: str) -> List[List[Any]]:
+    keys = workload(args.requests, args.keys, args.skew, args.seed)
+    rows = []
+    for replicas in args.replicas:
+        memory = [MemoryLRUBackend(args.max_entries) for _ in range(replicas)]
+        shared = [RedisBackend(redis_url, timeout=1.0) for _ in range(replicas)]
+        shared[0].execute(b"FLUSHDB")
+        for name, backends in (("memory", memory), ("redis", shared)):
+            outcome = replay(backends, keys, args.ttl)
+            lookups = outcome["lookups"]
+            rows.append([
+                name, replicas, args.requests, 100 * (1 - outcome["upstream"] / args.requests),
+                outcome["upstream"], lookups["mean"], lookups["p95"], outcome["errors"]
+            ])
+        for backend in shared:
+            backend.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Доля попаданий в кэш погоды при нескольких репликах: локальный LRU и общий Redis")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=1000, help="Число различных ключей (город, дата, час)")
+    parser.add_argument("--skew", type=float, default=1.0, help="Показатель распределения Ципфа для популярности ключей")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-entries", type=int, default=1024, help="Размер LRU в каждой реплике")
+    parser.add_argument("--ttl", type=float, default=3600)
+    parser.add_argument("--redis-latency", type=float, default=0.0002, help="Задержка заглушки Redis на команду, секунды")
+    parser.add_argument("--redis-url", help="Адрес настоящего Redis; по умолчанию запускается локальная заглушка")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    plain = len(json.dumps({"weather": SAMPLE_WEATHER, "fetched_at": time.time()}, ensure_ascii=False).encode("utf-8"))
+    print(f"Размер значения: {len(encode_value(SAMPLE_WEATHER))} байт вместо {plain} байт в прежнем JSON-формате")
+    if args.redis_url:
+        rows = benchmark(args, args.redis_url)
+    else:
+        with FakeRedisServer(latency=args.redis_latency) as server:
+            rows = benchmark(args, server.url)
+    print_table(
+        f"Кэш погоды: {args.keys} ключей, распределение Ципфа s={args.skew}",
+        ["backend", "replicas", "requests", "hit_%", "upstream_calls", "get_ms", "get_p95_ms", "errors"],
+        rows
+    )
\ No newline at end of file
@@ -0,0 +1,101 @@
+import argparse
+import datetime
+import time
+from typing import Any, Dict, List
+
+from fake_openai_server import FakeOpenAIServer
+from harness import DUMMY_CONFIG, add_service_paths, print_table
+
+add_service_paths()
+
+from task_master import TaskAgent
+
+PROJECT = "Запуск лендинга новой версии мобильного приложения к осенней рекламной кампании"
+ADDITIONAL_INFO = (
+    "Команда: продакт-менеджер Анна Смирнова (согласование), дизайнер Олег Петров (макеты), "
+    "фронтенд-разработчик Мария Иванова (верстка), копирайтер Илья Козлов (тексты), аналитик Дмитрий Орлов (метрики). "
+    "Бриф кампании: https://docs.example.com/brief-autumn, макеты: https://figma.example.com/landing-v2, "
+    "репозиторий: https://git.example.com/web/landing. Бюджет на рекламу согласован, запуск трафика после релиза страницы. "
+    "Требования: адаптивная верстка, загрузка страницы до 2 секунд, A/B-тест двух вариантов первого экрана, "
+    "цели в системе аналитики для кнопок скачивания приложения."
+)
+STEPS = (
+    "Собрать требования к лендингу", "Подготовить структуру страницы", "Написать тексты первого экрана",
+    "Нарисовать макеты для десктопа", "Нарисовать макеты для мобильных", "Согласовать макеты",
+    "Сверстать страницу", "Настроить цели аналитики", "Подготовить варианты A/B-теста",
+    "Провести нагрузочную проверку", "Исправить замечания тестирования", "Выпустить страницу",
+    "Запустить рекламный трафик", "Подвести итоги первой недели", "Подготовить отчет по кампании",
+    "Провести ретроспективу", "Обновить документацию", "Передать страницу на поддержку",
+    "Настроить мониторинг доступности", "Архивировать материалы проекта"
+)
+
+
+def project_dates(tasks: int) -> List[datetime.date]:
+    start = datetime.date.today() + datetime.timedelta(days=7)
+    return [start + datetime.timedelta(days=2 * index) for index in range(tasks)]
+
+
+def run_separate(agent: TaskAgent, tasks: int) -> List[Any]:
+    started = time.perf_counter()
+    first_ms = None
+    input_tokens = output_tokens = 0
+    for step, day in zip(STEPS, project_dates(tasks)):
+        result = agent.process_request({
+            "task_data": {
+                "start_date": str(day), "start_time": "10:00", "end_date": str(day), "end_time": "18:00",
+                "all_day": False, "additional_info": ADDITIONAL_INFO, "prompt": f"{PROJECT}. Шаг: {step}",
+                "style": {"brief": True, "formal": False}
+            },
+            "messages": [], "final_output": None, "user_feedback": ""
+        })
+        if first_ms is None:
+            first_ms = (time.perf_counter() - started) * 1000
+        llm = result["metrics"]["llm"]
+        input_tokens += llm["input_tokens"]
+        output_tokens += llm["output_tokens"]
+    return ["separate", tasks, tasks, first_ms, (time.perf_counter() - started) * 1000, input_tokens, output_tokens]
+
+
+def run_decomposition(agent: TaskAgent, tasks: int) -> List[Any]:
+    dates = project_dates(tasks)
+    started = time.perf_counter()
+    result = agent.process_request({"project_data": {
+        "prompt": f"{PROJECT}. Шаги: {'; '.join(STEPS[:tasks])}",
+        "additional_info": ADDITIONAL_INFO,
+        "start_date": str(dates[0]),
+        "end_date": str(dates[-1]),
+        "style": {"brief": True, "formal": False},
+        "max_tasks": tasks
+    }})
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    llm, decomposition = result["metrics"]["llm"], result["metrics"]["decomposition"]
+    return [
+        "decomposition", 1, decomposition["tasks"], float(decomposition["first_task_ms"]),
+        (time.perf_counter() - started) * 1000, llm["input_tokens"], llm["output_tokens"]
+    ]
+
+
+def benchmark(config: Dict[str, Any], tasks: int) -> List[List[Any]]:
+    agent = TaskAgent({**config, "FEW_SHOT_EXAMPLES": 0, "CACHE_BACKEND": "memory", "DECOMPOSITION_MAX_TASKS": tasks})
+    return [run_separate(agent, tasks), run_decomposition(agent, tasks)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Создание задач проекта отдельными запросами и одним запросом декомпозиции")
+    parser.add_argument("--tasks", type=int, default=12, choices=range(1, len(STEPS) + 1), metavar=f"1..{len(STEPS)}")
+    parser.add_argument("--output-token-latency", type=float, default=0.01, help="Время генерации одного токена заглушкой, секунды")
+    parser.add_argument("--base-url", help="OpenAI-совместимый адрес; по умолчанию запускается локальная заглушка")
+    parser.add_argument("--api-key", default="benchmark")
+    args = parser.parse_args()
+
+    if args.base_url:
+        rows = benchmark({**DUMMY_CONFIG, "GEMINI_API_KEY": args.api_key, "LLM_BASE_URL": args.base_url}, args.tasks)
+    else:
+        with FakeOpenAIServer(base_latency=0.5, output_token_latency=args.output_token_latency) as server:
+            rows = benchmark({**DUMMY_CONFIG, "LLM_BASE_URL": server.base_url}, args.tasks)
+    print_table(
+        "Создание задач проекта",
+        ["mode", "llm_calls", "tasks", "first_task_ms", "total_ms", "input_tokens", "output_tokens"],
+        rows
+    )
\ No newline at end of file
@@ -0,0 +1,350 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from datetime import date, timedelta
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r'\w{1,4}|[^\w\s]')
+STREAM_PIECE = re.compile(r'\s*(?:\w{1,4}|[^\w\s])|\s+$')
+
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+class PrefixCache:
+    def __init__(self, block_tokens: int = 32, min_tokens: int = 128, capacity: int = 100000):
+        self.block_tokens = block_tokens
+        self.min_tokens = min_tokens
+        self.capacity = capacity
+        self.blocks: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup_and_store(self, tokens: List[str]) -> int:
+        digest = hashlib.sha1()
+        cached = 0
+        matching = True
+        with self.lock:
+            for start in range(0, len(tokens) - self.block_tokens + 1, self.block_tokens):
+                digest.update("\x00".join(tokens[start:start + self.block_tokens]).encode("utf-8"))
+                key = digest.hexdigest()
+                if matching and key in self.blocks:
+                    cached = start + self.block_tokens
+                    self.blocks.move_to_end(key)
+                else:
+                    matching = False
+                    self.blocks[key] = True
+            while len(self.blocks) > self.capacity:
+                self.blocks.popitem(last=False)
+        return cached if cached >= self.min_tokens else 0
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+
+
+def default_responder(messages: List[Dict[str, Any]], index: int) -> str:
+    system_text = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    last_text = str(messages[-1].get("content", "")) if messages else ""
+    if "[TASK]" in system_text:
+        period = re.search(r'Период проекта: (\d{4}-\d{2}-\d{2}) - (\d{4}-\d{2}-\d{2})', system_text)
+        limit = re.search(r'не более (\d+)', system_text)
+        start, end = (date.fromisoformat(value) for value in period.groups()) if period else (date.today(),) * 2
+        count = min(int(limit.group(1)) if limit else 5, 20)
+        days = [start + timedelta(days=(end - start).days * i // count) for i in range(count)]
+        return "\n".join(
+            f"[TASK]\n[NAME] Тестовая задача {i}\n[START] {day} 10:00\n[END] {day} 18:00\n"
+            f"[DESCRIPTION] Тестовое описание задачи {i} проекта.\n[/TASK]"
+            for i, day in enumerate(days, 1)
+        )
+    if "[GREETINGS]" in system_text:
+        return "[GREETINGS] Добрый день! Самое время спланировать встречи в Календаре VK WorkSpace!"
+    if '"candidates"' in last_text:
+        match = re.search(r'Верни (\d+)', last_text)
+        count = int(match.group(1)) if match else 1
+        return json.dumps({"candidates": [
+            {"title": f"Тестовое название {i}", "description": f"Тестовое описание варианта {i}."}
+            for i in range(1, count + 1)
+        ]}, ensure_ascii=False)
+    candidates = re.findall(r'\[NAME (\d+)\]', last_text)
+    if candidates:
+        return "\n".join(
+            f"[NAME {i}] Тестовое название {i}\n[DESCRIPTION {i}] Тестовое описание варианта {i}."
+            for i in candidates
+        )
+    return f"[NAME] Тестовое название {index + 1}\n[DESCRIPTION] Тестовое описание события для проверки сервиса."
+
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, bytes]:
+    message = BytesParser(policy=default_policy).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+        for part in message.iter_parts()
+    }
+
+
+class FakeOpenAIServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, base_latency: float = 0.05,
+                 input_token_latency: float = 0.0002, cached_token_latency: float = 0.00002,
+                 output_token_latency: float = 0.002, prefix_cache: Optional[PrefixCache] = None,
+                 responder=default_responder, batch_delay: float = 0.2, expire_batches: int = 0):
+        self.base_latency = base_latency
+        self.input_token_latency = input_token_latency
+        self.cached_token_latency = cached_token_latency
+        self.output_token_latency = output_token_latency
+        self.prefix_cache = prefix_cache or PrefixCache()
+        self.responder = responder
+        self.requests = 0
+        self.batch_requests = 0
+        self.batch_delay = batch_delay
+        self.expire_batches = expire_batches
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, chunks: Iterator[Dict[str, Any]]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _not_found(self):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                path = urllib.parse.urlparse(self.path).path.rstrip("/")
+                if path.endswith("/files"):
+                    fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+                    self._send_json(200, server.create_file(fields["file"], fields.get("purpose", b"batch").decode()))
+                    return
+                payload = json.loads(body or b"{}")
+                if path.endswith("/chat/completions") and payload.get("stream"):
+                    self._send_stream(server.stream_completion(payload))
+                elif path.endswith("/chat/completions"):
+                    self._send_json(200, server.chat_completion(payload))
+                elif path.endswith("/batches"):
+                    if payload.get("input_file_id") not in server.files:
+                        self._send_json(400, {"error": {"message": "Unknown input_file_id"}})
+                        return
+                    self._send_json(200, server.create_batch(payload))
+                else:
+                    self._not_found()
+
+            def do_GET(self):
+                parts = urllib.parse.urlparse(self.path).path.strip("/").split("/")
+                if parts[-1] == "batches":
+                    with server.lock:
+                        data = sorted(server.batches.values(), key=lambda batch: batch["created_at"], reverse=True)
+                    self._send_json(200, {"object": "list", "data": data, "has_more": False})
+                elif len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in server.batches:
+                    self._send_json(200, server.batches[parts[-1]])
+                elif len(parts) >= 2 and parts[-2] == "files" and parts[-1] in server.files:
+                    self._send_json(200, server.files[parts[-1]]["meta"])
+                elif len(parts) >= 3 and parts[-1] == "content" and parts[-3] == "files" and parts[-2] in server.files:
+                    content = server.files[parts[-2]]["content"]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                else:
+                    self._not_found()
+
+        return Handler
+
+    def create_file(self, content: bytes, purpose: str) -> Dict[str, Any]:
+        with self.lock:
+            file_id = f"file-fake-{len(self.files) + 1}"
+            meta = {
+                "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": f"{file_id}.jsonl", "purpose": purpose, "status": "processed"
+            }
+            self.files[file_id] = {"meta": meta, "content": content}
+        return meta
+
+    def create_batch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            batch_id = f"batch-fake-{len(self.batches) + 1}"
+            batch = {
+                "id": batch_id, "object": "batch", "endpoint": payload.get("endpoint"), "errors": None,
+                "input_file_id": payload["input_file_id"], "completion_window": payload.get("completion_window", "24h"),
+                "status": "validating", "output_file_id": None, "error_file_id": None,
+                "created_at": time.time(), "request_counts": {"total": 0, "completed": 0, "failed": 0}
+            }
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._process_batch, args=(batch,), daemon=True).start()
+        return dict(batch)
+
+    def _process_batch(self, batch: Dict[str, Any]):
+        lines = [json.loads(line) for line in self.files[batch["input_file_id"]]["content"].splitlines() if line.strip()]
+        batch["request_counts"]["total"] = len(lines)
+        batch["status"] = "in_progress"
+        time.sleep(self.batch_delay)
+        with self.lock:
+            expire = self.expire_batches > 0
+            self.expire_batches -= 1 if expire else 0
+        if expire:
+            batch["status"] = "expired"
+            return
+        output = []
+        for line in lines:
+            completion = self.chat_completion(line["body"], batch=True)
+            output.append(json.dumps({
+                "id": f"batch-req-{completion['id']}",
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "request_id": completion["id"], "body": completion},
+                "error": None
+            }, ensure_ascii=False))
+            batch["request_counts"]["completed"] += 1
+        batch["output_file_id"] = self.create_file(("\n".join(output) + "\n").encode("utf-8"), "batch_output")["id"]
+        batch["status"] = "completed"
+
+    def _accept(self, payload: Dict[str, Any], batch: bool) -> Tuple[int, List[str], int]:
+        with self.lock:
+            if batch:
+                self.batch_requests += 1
+            else:
+                self.requests += 1
+            request_number = self.requests + self.batch_requests
+        prompt_text = "\n".join(f"{m.get('role')}: {m.get('content')}" for m in payload.get("messages", []))
+        tokens = TOKEN_PATTERN.findall(prompt_text)
+        return request_number, tokens, self.prefix_cache.lookup_and_store(tokens)
+
+    def stream_completion(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        request_number, tokens, cached = self._accept(payload, False)
+        content = self.responder(payload.get("messages", []), 0)
+        base = {
+            "id": f"chatcmpl-fake-{request_number}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake-model")
+        }
+        time.sleep(
+            self.base_latency
+            + (len(tokens) - cached) * self.input_token_latency
+            + cached * self.cached_token_latency
+        )
+        completion_tokens = 0
+        for piece in STREAM_PIECE.findall(content):
+            completion_tokens += count_tokens(piece)
+            time.sleep(count_tokens(piece) * self.output_token_latency)
+            yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield {**base, "choices": [], "usage": {
+                "prompt_tokens": len(tokens),
+                "completion_tokens": completion_tokens,
+                "total_tokens": len(tokens) + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}
+            }}
+
+    def chat_completion(self, payload: Dict[str, Any], batch: bool = False) -> Dict[str, Any]:
+        request_number, tokens, cached = self._accept(payload, batch)
+        messages = payload.get("messages", [])
+        choices = []
+        completion_tokens = 0
+        for index in range(max(1, int(payload.get("n") or 1))):
+            content = self.responder(messages, index)
+            completion_tokens += count_tokens(content)
+            choices.append({
+                "index": index,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            })
+        if not batch:
+            time.sleep(
+                self.base_latency
+                + (len(tokens) - cached) * self.input_token_latency
+                + cached * self.cached_token_latency
+                + completion_tokens * self.output_token_latency
+            )
+        return {
+            "id": f"chatcmpl-fake-{request_number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake-model"),
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": len(tokens),
+                "completion_tokens": completion_tokens,
+                "total_tokens": len(tokens) + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}
+            }
+        }
+
+    def start(self) -> "FakeOpenAIServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная OpenAI-совместимая заглушка с имитацией префиксного кэша")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--base-latency", type=float, default=0.05)
+    parser.add_argument("--block-tokens", type=int, default=32)
+    parser.add_argument("--min-cached-tokens", type=int, default=128)
+    parser.add_argument("--batch-delay", type=float, default=0.2, help="Время обработки пакета, секунды")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(
+        args.host, args.port, base_latency=args.base_latency,
+        prefix_cache=PrefixCache(args.block_tokens, args.min_cached_tokens),
+        batch_delay=args.batch_delay
+    )
+    print(f"Заглушка доступна по адресу {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
\ No newline at end of file
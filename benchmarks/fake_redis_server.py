@@ -0,0 +1,130 @@
+import argparse
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, password: Optional[str] = None):
+        self.latency = latency
+        self.password = password
+        self.databases: Dict[int, Dict[bytes, Tuple[bytes, Optional[float]]]] = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}{host}:{port}/0"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def read_command(self) -> Optional[List[bytes]]:
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                if not line.startswith(b"*"):
+                    return line.split()
+                parts = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    parts.append(self.rfile.read(length + 2)[:-2])
+                return parts
+
+            def handle(self):
+                session = {"db": 0, "authenticated": server.password is None}
+                while True:
+                    command = self.read_command()
+                    if command is None:
+                        return
+                    if not command:
+                        continue
+                    if server.latency:
+                        time.sleep(server.latency)
+                    reply = server.execute(session, command)
+                    self.wfile.write(reply)
+                    if command[0].upper() == b"QUIT":
+                        return
+
+        return Handler
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(self, session: Dict[str, Any], command: List[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        with self.lock:
+            self.commands += 1
+            if name == b"AUTH":
+                session["authenticated"] = self.password is None or args[-1].decode() == self.password
+                return b"+OK\r\n" if session["authenticated"] else b"-WRONGPASS invalid password\r\n"
+            if not session["authenticated"]:
+                return b"-NOAUTH Authentication required.\r\n"
+            data = self.databases.setdefault(session["db"], {})
+            now = time.time()
+            if name in (b"PING", b"QUIT"):
+                return b"+PONG\r\n" if name == b"PING" else b"+OK\r\n"
+            if name == b"SELECT":
+                session["db"] = int(args[0])
+                return b"+OK\r\n"
+            if name == b"GET":
+                entry = data.get(args[0])
+                if entry and entry[1] is not None and entry[1] <= now:
+                    del data[args[0]]
+                    entry = None
+                return self._bulk(entry[0] if entry else None)
+            if name == b"SET":
+                expires_at = None
+                options = [option.upper() for option in args[2:]]
+                for index, option in enumerate(options):
+                    if option in (b"EX", b"PX"):
+                        amount = float(args[3 + index])
+                        expires_at = now + (amount if option == b"EX" else amount / 1000)
+                data[args[0]] = (args[1], expires_at)
+                return b"+OK\r\n"
+            if name == b"DEL":
+                return b":%d\r\n" % sum(data.pop(key, None) is not None for key in args)
+            if name == b"DBSIZE":
+                return b":%d\r\n" % len(data)
+            if name in (b"FLUSHDB", b"FLUSHALL"):
+                data.clear()
+                return b"+OK\r\n"
+            return b"-ERR unknown command '%s'\r\n" % name
+
+    def start(self) -> "FakeRedisServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка Redis (GET/SET с TTL) для проверки общего кэша")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа на команду, секунды")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    server = FakeRedisServer(args.host, args.port, latency=args.latency, password=args.password)
+    print(f"Заглушка Redis доступна по адресу {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
\ No newline at end of file
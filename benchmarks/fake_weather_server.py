@@ -0,0 +1,110 @@
+import argparse
+import json
+import math
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+def synthetic_hourly(lat: float, lon: float, date: str) -> Dict[str, Any]:
+    day = datetime.strptime(date, "%Y-%m-%d")
+    seasonal = -12 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 15) / 365)
+    base = 8 + seasonal - (lat - 50) * 0.6
+    seed = int(abs(lat * 1000 + lon * 100 + day.toordinal())) % 97
+    hourly = {key: [] for key in (
+        "time", "temperature_2m", "precipitation", "precipitation_probability", "weather_code", "wind_speed_10m"
+    )}
+    for hour in range(24):
+        wet = (seed + hour * 7) % 10 < 3
+        hourly["time"].append(f"{date}T{hour:02d}:00")
+        hourly["temperature_2m"].append(round(base + 5 * math.sin(math.pi * (hour - 9) / 12), 1))
+        hourly["precipitation"].append(round(((seed + hour) % 5) * 0.3, 1) if wet else 0.0)
+        hourly["precipitation_probability"].append(60 + (seed + hour) % 30 if wet else (seed + hour) % 25)
+        hourly["weather_code"].append((71 if base < 0 else 61) if wet else (seed + hour) % 4)
+        hourly["wind_speed_10m"].append(round(2 + (seed + hour * 3) % 8 * 0.7, 1))
+    return hourly
+
+
+class FakeWeatherServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/forecast"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any):
+                pass
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                params = dict(urllib.parse.parse_qsl(parsed.query))
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                try:
+                    lat, lon = float(params["latitude"]), float(params["longitude"])
+                    hourly = synthetic_hourly(lat, lon, params["start_date"])
+                except (KeyError, ValueError) as e:
+                    self._send(400, {"error": True, "reason": f"Некорректный запрос: {str(e)}"})
+                    return
+                fields = ["time"] + params.get("hourly", "").split(",")
+                self._send(200, {
+                    "latitude": lat,
+                    "longitude": lon,
+                    "timezone": "Europe/Moscow",
+                    "hourly": {key: value for key, value in hourly.items() if key in fields}
+                })
+
+            def _send(self, status: int, body: Dict[str, Any]):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> "FakeWeatherServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeWeatherServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка API прогнозов Open-Meteo (/v1/forecast, почасовые данные)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, секунды")
+    args = parser.parse_args()
+    server = FakeWeatherServer(args.host, args.port, latency=args.latency)
+    print(f"Заглушка Open-Meteo доступна по адресу {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
\ No newline at end of file
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+from typing import Any, Dict, List
+
+from fake_openai_server import FakeOpenAIServer, default_responder
+from harness import DUMMY_CONFIG, add_service_paths, print_table, summarize
+
+add_service_paths()
+
+import task_master
+from example_store import index_terms
+
+FAMILIES = [
+    ("собрать отдел {} на еженедельную планерку и пройтись по статусам", "Планерка отдела {}: статусы недели",
+     ["продаж", "маркетинга", "поддержки", "закупок", "логистики"], {"brief": True, "formal": False}),
+    ("подготовить отчет по продажам за {}", "Отчет по продажам: {}",
+     ["январь", "февраль", "первый квартал", "апрель", "полугодие"], {"brief": True, "formal": True}),
+    ("провести ретроспективу спринта {} с командой разработки", "Ретро спринта {}",
+     ["12", "13", "14", "15", "16"], {"brief": True, "formal": False}),
+    ("созвониться с клиентом {} по продлению договора", "Продление договора с {}",
+     ["Альфа", "Вектор", "Орбита", "Север", "Ромашка"], {"brief": False, "formal": True}),
+    ("проверить и согласовать макеты лендинга для {}", "Согласование макетов: {}",
+     ["осенней акции", "нового тарифа", "вебинара", "конференции", "мобильного приложения"], {"brief": True, "formal": True}),
+    ("провести онбординг нового сотрудника {} в команде поддержки", "Онбординг: {}",
+     ["Анны", "Игоря", "Марии", "Олега", "Светланы"], {"brief": False, "formal": False})
+]
+FEEDBACK_PREFIX = "Название должно быть ближе к такому: "
+
+
+def synthetic_dataset(seed: int) -> List[Dict[str, Any]]:
+    records = [
+        {"prompt": prompt.format(value), "title": title.format(value), "style": style}
+        for prompt, title, values, style in FAMILIES for value in values
+    ]
+    random.Random(seed).shuffle(records)
+    return records
+
+
+def load_dataset(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [{
+        "prompt": record["prompt"],
+        "title": record["title"],
+        "style": {"brief": record["style"].startswith("brief"), "formal": record["style"].endswith("-formal")}
+    } for record in records]
+
+
+def title_similarity(first: str, second: str) -> float:
+    a, b = set(index_terms(first)), set(index_terms(second))
+    return len(a & b) / max(1, len(a | b))
+
+
+def replay_responder(messages: List[Dict[str, Any]], index: int) -> str:
+    last = messages[-1].get("content") or ""
+    if FEEDBACK_PREFIX in last:
+        title = last.split(FEEDBACK_PREFIX, 1)[1].splitlines()[0].strip()
+        return f"[NAME] {title}\n[DESCRIPTION] Описание задачи по замечаниям пользователя."
+    system = messages[0].get("content") or ""
+    example = re.search(r'^Название: (.+)$', system, re.MULTILINE)
+    if example:
+        return f"[NAME] {example.group(1).strip()}\n[DESCRIPTION] Описание задачи по образцу принятого примера."
+    return default_responder(messages, index)
+
+
+def task_input(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "task_data": {
+            "start_date": "2025-09-01", "start_time": "10:00", "end_date": "2025-09-01", "end_time": "18:00",
+            "all_day": False, "additional_info": "", "prompt": record["prompt"], "style": record["style"]
+        },
+        "messages": [], "final_output": None, "user_feedback": ""
+    }
+
+
+def replay(config: Dict[str, Any], dataset: List[Dict[str, Any]], few_shot: bool, threshold: float,
+           max_attempts: int) -> List[Any]:
+    examples_path = os.path.join(tempfile.mkdtemp(), "accepted_examples.jsonl")
+    agent = task_master.TaskAgent({
+        **config,
+        "EXAMPLES_PATH": examples_path,
+        "FEW_SHOT_EXAMPLES": 2 if few_shot else 0
+    })
+    attempts_per_accept, input_tokens = [], []
+    first_try = 0
+    for record in dataset:
+        state = task_input(record)
+        tokens = 0
+        for attempt in range(1, max_attempts + 1):
+            result = agent.process_request(state)
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            tokens += ((result.get("metrics") or {}).get("llm") or {}).get("input_tokens", 0)
+            output = result["final_output"]
+            if title_similarity(output["title"], record["title"]) >= threshold or attempt == max_attempts:
+                break
+            state = {**result, "user_feedback": f"{FEEDBACK_PREFIX}{record['title']}"}
+        first_try += attempt == 1
+        attempts_per_accept.append(float(attempt))
+        input_tokens.append(float(tokens))
+        if few_shot:
+            agent.example_store.add(record["prompt"], record["style"], output["title"], output["description"],
+                                    attempts=attempt)
+    attempts = summarize(attempts_per_accept)
+    return [
+        "few-shot" if few_shot else "baseline", attempts["count"], attempts["mean"],
+        100 * first_try / max(1, len(dataset)), summarize(input_tokens)["mean"]
+    ]
+
+
+def benchmark(config: Dict[str, Any], args: argparse.Namespace) -> List[List[Any]]:
+    dataset = load_dataset(args.dataset) if args.dataset else synthetic_dataset(args.seed)
+    return [replay(config, dataset, few_shot, args.threshold, args.max_attempts) for few_shot in (False, True)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Число попыток на принятый результат без примеров и с принятыми примерами в промпте")
+    parser.add_argument("--dataset", help="data/accepted_examples.jsonl клиента; по умолчанию встроенный набор запросов")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Сходство названия с эталоном, при котором пользователь принимает результат")
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="OpenAI-совместимый адрес; по умолчанию запускается локальная заглушка")
+    parser.add_argument("--api-key", default="benchmark")
+    args = parser.parse_args()
+
+    if args.base_url:
+        rows = benchmark({**DUMMY_CONFIG, "GEMINI_API_KEY": args.api_key, "LLM_BASE_URL": args.base_url}, args)
+    else:
+        with FakeOpenAIServer(base_latency=0.0, input_token_latency=0.0, cached_token_latency=0.0,
+                              output_token_latency=0.0, responder=replay_responder) as server:
+            rows = benchmark({**DUMMY_CONFIG, "LLM_BASE_URL": server.base_url}, args)
+    print_table(
+        "Попытки на принятый результат при воспроизведении запросов",
+        ["mode", "accepted", "attempts/accept", "first_try_%", "input_tokens/accept"],
+        rows
+    )
\ No newline at end of file
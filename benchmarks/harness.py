@@ -0,0 +1,63 @@
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIRS = ("event_helper", "task_master", "greeting_service")
+DUMMY_CONFIG = {"TAVILY_API_KEY": "benchmark", "GEMINI_API_KEY": "benchmark"}
+
+
+def add_service_paths():
+    for name in SERVICE_DIRS:
+        path = os.path.join(ROOT_DIR, name)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    }
+
+
+def timed(fn: Callable[[], Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def chat_completion(base_url: str, api_key: str, model: str, messages: List[Dict[str, str]],
+                    **params: Any) -> Tuple[float, Dict[str, Any]]:
+    request = urllib.request.Request(
+        base_url.rstrip("/") + "/chat/completions",
+        data=json.dumps({"model": model, "messages": messages, **params}).encode("utf-8"),
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+    )
+
+    def send() -> Dict[str, Any]:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return json.load(response)
+
+    return timed(send)
+
+
+def print_table(title: str, header: Sequence[str], rows: List[Sequence[Any]]):
+    table = [list(map(str, header))] + [
+        [f"{cell:.1f}" if isinstance(cell, float) else str(cell) for cell in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    print(f"\n{title}")
+    for index, row in enumerate(table):
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
\ No newline at end of file
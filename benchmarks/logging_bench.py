@@ -0,0 +1,150 @@
+import argparse
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from fake_openai_server import FakeOpenAIServer
+from harness import DUMMY_CONFIG, add_service_paths, print_table, summarize
+
+add_service_paths()
+
+from structured_logging import configure_logging, log_context, shutdown_logging
+from task_master import TaskAgent
+
+MODES = (
+    ("sync text", {"LOG_ASYNC": False}),
+    ("async text", {}),
+    ("async json", {"LOG_FORMAT": "json"})
+)
+PAYLOAD = {f"field_{index}": {"value": index * 1.5, "items": list(range(index % 5))} for index in range(20)}
+
+logger = logging.getLogger("LoggingBench")
+
+
+class SlowStream:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def write(self, text: str):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.writes += 1
+
+    def flush(self):
+        pass
+
+
+def run_threads(threads: int, calls: int, call: Callable[[int, int], Any]) -> Tuple[List[float], float]:
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        local = []
+        with log_context(request_id=f"bench-{index}"):
+            for number in range(calls):
+                started = time.perf_counter_ns()
+                call(index, number)
+                local.append((time.perf_counter_ns() - started) / 1000)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, (time.perf_counter() - started) * 1000
+
+
+def measure(config: Dict[str, Any], latency: float, threads: int, calls: int,
+            call: Callable[[int, int], Any]) -> Tuple[Dict[str, float], float, float, int]:
+    stream = SlowStream(latency)
+    configure_logging(config, stream=stream)
+    latencies, wall_ms = run_threads(threads, calls, call)
+    started = time.perf_counter()
+    shutdown_logging()
+    return summarize(latencies), wall_ms, (time.perf_counter() - started) * 1000, stream.writes
+
+
+def info_call(index: int, number: int):
+    logger.info("Ответ модели %s за %s мс: входных токенов %s, выходных %s", "gemini", number, 385, 25)
+
+
+def handler_rows(args: argparse.Namespace) -> List[List[Any]]:
+    rows = []
+    for name, config in MODES:
+        stats, wall_ms, drain_ms, writes = measure(config, args.write_latency, args.threads, args.calls, info_call)
+        rows.append([name, args.threads * args.calls, stats["mean"], stats["p50"], stats["p95"], wall_ms, drain_ms, writes])
+    return rows
+
+
+def debug_rows(args: argparse.Namespace) -> List[List[Any]]:
+    cases = (
+        ("debug off, f-string", {"LOG_LEVEL": "INFO"}, lambda index, number: logger.debug(f"Состояние узла {number}: {PAYLOAD}")),
+        ("debug off, lazy", {"LOG_LEVEL": "INFO"}, lambda index, number: logger.debug("Состояние узла %s: %s", number, PAYLOAD)),
+        ("debug on, all", {"LOG_LEVEL": "DEBUG", "LOG_DEBUG_SAMPLE_EVERY": 1},
+         lambda index, number: logger.debug("Состояние узла %s: %s", number, PAYLOAD)),
+        (f"debug on, 1/{args.sample_every}", {"LOG_LEVEL": "DEBUG", "LOG_DEBUG_SAMPLE_EVERY": args.sample_every},
+         lambda index, number: logger.debug("Состояние узла %s: %s", number, PAYLOAD))
+    )
+    rows = []
+    for name, config, call in cases:
+        stats, wall_ms, _, writes = measure(config, args.write_latency, args.threads, args.calls, call)
+        rows.append([name, args.threads * args.calls, stats["mean"], stats["p95"], wall_ms, writes])
+    return rows
+
+
+def agent_rows(args: argparse.Namespace) -> List[List[Any]]:
+    rows = []
+    with FakeOpenAIServer(base_latency=0.0, input_token_latency=0.0, cached_token_latency=0.0,
+                          output_token_latency=0.0) as server:
+        agent = TaskAgent({**DUMMY_CONFIG, "LLM_BASE_URL": server.base_url, "CACHE_BACKEND": "memory", "FEW_SHOT_EXAMPLES": 0})
+
+        def request(index: int, number: int):
+            agent.process_request({
+                "task_data": {
+                    "start_date": "2025-09-01", "start_time": "10:00", "end_date": "2025-09-01", "end_time": "18:00",
+                    "all_day": False, "additional_info": "", "prompt": f"Подготовить отчет {index}-{number}",
+                    "style": {"brief": True, "formal": False}
+                },
+                "messages": [], "final_output": None, "user_feedback": ""
+            })
+
+        for name, config in MODES:
+            stats, wall_ms, _, writes = measure(config, args.write_latency, args.threads, args.agent_requests, request)
+            rows.append([name, args.threads * args.agent_requests, stats["mean"] / 1000, stats["p95"] / 1000, wall_ms, writes])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка вызовов логирования в потоке запроса: синхронный вывод и очередь с фоновой записью")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=2000, help="Вызовов логирования на поток")
+    parser.add_argument("--agent-requests", type=int, default=5, help="Запросов к ассистенту задач на поток")
+    parser.add_argument("--write-latency", type=float, default=0.0002, help="Задержка одной записи в поток вывода, секунды")
+    parser.add_argument("--sample-every", type=int, default=100, help="Записывать каждое N-е отладочное сообщение")
+    args = parser.parse_args()
+
+    handlers = handler_rows(args)
+    debug = debug_rows(args)
+    agent = agent_rows(args)
+    print_table(
+        f"Вызов logger.info из {args.threads} потоков, запись в поток вывода {args.write_latency * 1e6:.0f} мкс",
+        ["mode", "calls", "mean_us", "p50_us", "p95_us", "wall_ms", "drain_ms", "written"],
+        handlers
+    )
+    print_table(
+        "Отладочные сообщения: ленивое форматирование и выборка",
+        ["case", "calls", "mean_us", "p95_us", "wall_ms", "written"],
+        debug
+    )
+    print_table(
+        f"Запросы к ассистенту задач из {args.threads} потоков",
+        ["mode", "requests", "mean_ms", "p95_ms", "wall_ms", "written"],
+        agent
+    )
\ No newline at end of file
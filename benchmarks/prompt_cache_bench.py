@@ -0,0 +1,129 @@
+import argparse
+import datetime
+import random
+from typing import Dict, List, Tuple
+
+from fake_openai_server import FakeOpenAIServer
+from harness import DUMMY_CONFIG, add_service_paths, chat_completion, print_table, summarize
+
+add_service_paths()
+
+import event_helper
+import greeting_service
+import task_master
+
+PROMPTS = [
+    "Ежеквартальная встреча команды разработки, обсуждаем итоги и планы",
+    "Встреча выпускников факультета, неформальное общение",
+    "Презентация нового продукта для партнеров",
+    "Созвон по ретроспективе спринта",
+    "Тренинг по информационной безопасности для новых сотрудников"
+]
+ADDRESSES = ["online", "Москва, Ленинградский пр. 39", "Санкт-Петербург, Невский пр. 28", "https://telemost.yandex.ru/j/1"]
+
+
+def legacy_layout(prompt: str, prefix: str) -> str:
+    suffix = prompt[len(prefix):].strip()
+    intro, rest = prefix.split("\n\n", 1)
+    return f"{intro}\n\n{suffix}\n\n{rest}"
+
+
+def sample_requests(count: int, seed: int) -> List[Tuple[str, Dict]]:
+    rng = random.Random(seed)
+    event_agent = event_helper.EventAgent(dict(DUMMY_CONFIG))
+    task_agent = task_master.TaskAgent(dict(DUMMY_CONFIG))
+    samples = []
+    for i in range(count):
+        day = datetime.date(2025, 9, 1) + datetime.timedelta(days=rng.randint(0, 90))
+        time_str = f"{rng.randint(8, 20):02d}:{rng.choice(['00', '30'])}"
+        style = {"brief": rng.random() < 0.5, "formal": rng.random() < 0.5}
+        prompt = rng.choice(PROMPTS)
+        kind = ("event", "task", "greeting")[i % 3]
+        if kind == "event":
+            state = {"event_data": {
+                "date": str(day), "time": time_str, "address": rng.choice(ADDRESSES),
+                "additional_info": f"Ссылка на документ: https://docs.example/{i}", "prompt": prompt, "style": style
+            }}
+            system = event_agent._build_system_prompt(state)
+            samples.append((kind, {
+                "new": [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                "legacy": [
+                    {"role": "system", "content": legacy_layout(system, event_helper.SYSTEM_PROMPT_PREFIX)},
+                    {"role": "user", "content": prompt}
+                ]
+            }))
+        elif kind == "task":
+            state = {"task_data": {
+                "start_date": str(day), "start_time": time_str, "end_date": str(day), "end_time": "23:00",
+                "all_day": rng.random() < 0.3, "additional_info": f"Ответственный: сотрудник {i}",
+                "prompt": prompt, "style": style
+            }}
+            system = task_agent._build_system_prompt(state)
+            samples.append((kind, {
+                "new": [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                "legacy": [
+                    {"role": "system", "content": legacy_layout(system, task_master.SYSTEM_PROMPT_PREFIX)},
+                    {"role": "user", "content": prompt}
+                ]
+            }))
+        else:
+            generator = greeting_service.GreetingGenerator
+            summary = greeting_service.HolidayIndex.format_summary(
+                [{"name": "День знаний", "kind": "state"}]
+            )
+            user = generator._build_prompt(generator.get_time_greeting(time_str), time_str, str(day), summary)
+            samples.append((kind, {
+                "new": [
+                    {"role": "system", "content": greeting_service.SYSTEM_PROMPT},
+                    {"role": "user", "content": user}
+                ],
+                "legacy": [
+                    {"role": "system", "content": "Ты профессиональный ассистент календаря VK WorkSpace"},
+                    {"role": "user", "content": f"{user}\n\n{greeting_service.SYSTEM_PROMPT}"}
+                ]
+            }))
+    return samples
+
+
+def run_layout(samples, layout: str, base_url: str, api_key: str, model: str) -> List[List]:
+    stats: Dict[str, Dict[str, List[float]]] = {}
+    for kind, messages in samples:
+        latency, response = chat_completion(base_url, api_key, model, messages[layout])
+        usage = response.get("usage", {})
+        bucket = stats.setdefault(kind, {"latency": [], "input": [], "cached": []})
+        bucket["latency"].append(latency)
+        bucket["input"].append(usage.get("prompt_tokens", 0))
+        bucket["cached"].append((usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0))
+    rows = []
+    for kind, bucket in sorted(stats.items()):
+        latency = summarize(bucket["latency"])
+        cached_share = 100 * sum(bucket["cached"]) / max(1, sum(bucket["input"]))
+        rows.append([
+            kind, layout, latency["count"], latency["mean"], latency["p50"], latency["p95"],
+            sum(bucket["input"]) / len(bucket["input"]), cached_share
+        ])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение задержки промптов до и после выноса статического префикса")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="OpenAI-совместимый адрес; по умолчанию запускается локальная заглушка")
+    parser.add_argument("--api-key", default="benchmark")
+    parser.add_argument("--model", default="gemini-2.5-pro")
+    args = parser.parse_args()
+
+    samples = sample_requests(args.requests, args.seed)
+    rows = []
+    for layout in ("legacy", "new"):
+        if args.base_url:
+            rows += run_layout(samples, layout, args.base_url, args.api_key, args.model)
+        else:
+            with FakeOpenAIServer() as server:
+                rows += run_layout(samples, layout, server.base_url, args.api_key, args.model)
+    print_table(
+        "Задержка ответа по раскладке промпта, мс",
+        ["service", "layout", "n", "mean", "p50", "p95", "input_tokens", "cached_%"],
+        rows
+    )
\ No newline at end of file
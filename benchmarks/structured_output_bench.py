@@ -0,0 +1,107 @@
+import argparse
+import random
+import re
+from typing import Any, Dict, List
+
+from fake_openai_server import FakeOpenAIServer, default_responder
+from harness import DUMMY_CONFIG, add_service_paths, print_table
+
+add_service_paths()
+
+import task_master
+
+CORRUPTIONS = {
+    "same_line": lambda text: text.replace("\n[DESCRIPTION", " [DESCRIPTION"),
+    "markdown": lambda text: re.sub(r'(\[(?:NAME|DESCRIPTION)[^\]]*\])', r'**\1**', text),
+    "fence": lambda text: f"```json\n{text}\n```",
+    "preface": lambda text: f"Конечно! Вот результат:\n{text}",
+    "truncate": lambda text: text[:int(len(text) * 0.8)],
+    "prose": lambda text: re.sub(r'\[(?:NAME|DESCRIPTION)[^\]]*\]\s*|[{}\[\]"]|candidates|title|description', "", text)
+}
+
+
+class CorruptingResponder:
+    def __init__(self, rate: float, seed: int):
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.names = sorted(CORRUPTIONS)
+
+    def __call__(self, messages: List[Dict[str, Any]], index: int) -> str:
+        content = default_responder(messages, index)
+        if self.rng.random() < self.rate:
+            content = CORRUPTIONS[self.rng.choice(self.names)](content)
+        return content
+
+
+def legacy_parse_ok(content: str) -> bool:
+    return bool(re.search(r'\[NAME\](.+?)\n', content, re.DOTALL) and re.search(r'\[DESCRIPTION\](.+)', content, re.DOTALL))
+
+
+def sample_input(i: int) -> Dict[str, Any]:
+    return {
+        "task_data": {
+            "start_date": "2025-09-01", "start_time": "10:00", "end_date": "2025-09-01", "end_time": "18:00",
+            "all_day": False, "additional_info": "", "prompt": f"Подготовить отчет номер {i}",
+            "style": {"brief": True, "formal": False}
+        },
+        "messages": [], "final_output": None, "user_feedback": ""
+    }
+
+
+def run_mode(server: FakeOpenAIServer, structured: bool, requests: int) -> Dict[str, Any]:
+    agent = task_master.TaskAgent({
+        **DUMMY_CONFIG,
+        "LLM_BASE_URL": server.base_url,
+        "STRUCTURED_OUTPUT": structured,
+        "STRUCTURED_MAX_REASKS": 1 if structured else 0
+    })
+    statuses: Dict[str, int] = {}
+    legacy_failures = 0
+    calls_before = server.requests
+    for i in range(requests):
+        result = agent.process_request(sample_input(i))
+        status = result["metrics"]["parse"]["status"]
+        statuses[status] = statuses.get(status, 0) + 1
+        if not structured and not legacy_parse_ok(result["messages"][-1]["content"]):
+            legacy_failures += 1
+    return {
+        "statuses": statuses,
+        "legacy_failures": legacy_failures,
+        "calls": server.requests - calls_before
+    }
+
+
+def share(count: int, total: int) -> float:
+    return 100 * count / max(1, total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Доля неразобранных ответов модели в текстовом и JSON-режиме")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--corruption-rate", type=float, default=0.3, help="Доля ответов заглушки с искаженным форматом")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = []
+    for structured in (False, True):
+        with FakeOpenAIServer(base_latency=0.0, input_token_latency=0.0, cached_token_latency=0.0,
+                              output_token_latency=0.0,
+                              responder=CorruptingResponder(args.corruption_rate, args.seed)) as server:
+            outcome = run_mode(server, structured, args.requests)
+        statuses = outcome["statuses"]
+        if not structured:
+            rows.append([
+                "legacy regex", args.requests, share(args.requests - outcome["legacy_failures"], args.requests),
+                0.0, 0.0, share(outcome["legacy_failures"], args.requests), 1.0
+            ])
+        rows.append([
+            "json" if structured else "tags", args.requests,
+            share(statuses.get("ok", 0), args.requests), share(statuses.get("repaired", 0), args.requests),
+            share(statuses.get("reasked", 0), args.requests), share(statuses.get("failed", 0), args.requests),
+            outcome["calls"] / args.requests
+        ])
+    print_table(
+        f"Разбор ответов при доле искаженных ответов {args.corruption_rate:.0%}",
+        ["mode", "n", "ok_%", "repaired_%", "reasked_%", "failed_%", "llm_calls"],
+        rows
+    )
\ No newline at end of file
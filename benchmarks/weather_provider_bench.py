@@ -0,0 +1,109 @@
+import argparse
+import datetime
+import random
+import time
+from typing import Any, Dict, List
+
+from fake_weather_server import FakeWeatherServer, synthetic_hourly
+from harness import DUMMY_CONFIG, add_service_paths, print_table, summarize
+
+add_service_paths()
+
+from event_helper import EventAgent
+from weather_providers import FixtureProvider, OpenMeteoProvider, TavilyProvider, WeatherProviderChain
+
+CITIES = ("Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Самара")
+VENUES = ("Ленинградский проспект 39", "ул. Пушкина 10", "Технопарк", "БЦ Белая площадь", "ул. Ленина 1")
+SAMPLE_PAGES = (
+    "Погода в {city} на {day} — подробный прогноз на каждый час. {day} ожидается переменная облачность, "
+    "температура воздуха днем +14...+16 °C, ночью +8...+10 °C. Во второй половине дня возможен кратковременный "
+    "дождь, ветер западный 4-6 м/с, порывы до 11 м/с. Атмосферное давление 745 мм рт. ст., влажность 70%. "
+    "Главная Новости Прогноз на 10 дней Карта осадков Подписаться на уведомления Скачать приложение. "
+    "Все права защищены. Использование материалов только со ссылкой на источник. Мы используем cookie.",
+    "{city}: прогноз погоды на неделю. Понедельник облачно с прояснениями +15 °C, вторник небольшой дождь +13 °C, "
+    "среда ясно +17 °C, четверг облачно +16 °C, пятница гроза +18 °C, суббота пасмурно +12 °C, воскресенье ясно +14 °C. "
+    "Восход солнца 06:12, закат 19:40, продолжительность дня 13 ч 28 мин. Магнитная буря не ожидается. "
+    "Читать далее о погодных аномалиях этого месяца и климатической норме для {city}. Реклама.",
+    "Синоптики рассказали, какой будет погода в выходные. В {city} {day} потеплеет до +17 градусов, "
+    "ночью возможны заморозки на почве. Осадков в виде дождя в течение дня не ожидается, вечером возможна морось. "
+    "Ветер северо-западный, умеренный. Подробнее в нашем телеграм-канале. Войти Регистрация Политика конфиденциальности."
+)
+
+
+def sample_events(count: int, seed: int) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    return [{
+        "address": f"{rng.choice(CITIES)}, {rng.choice(VENUES)}",
+        "date": str(today + datetime.timedelta(days=rng.randint(0, 10))),
+        "time": f"{rng.randint(8, 20):02d}:{rng.choice(('00', '30'))}"
+    } for _ in range(count)]
+
+
+def fake_search(latency: float):
+    def search(query: str) -> List[Dict[str, str]]:
+        time.sleep(latency)
+        day, city = query.split(", ")[0], query.split(", ")[2]
+        return [
+            {"title": f"Погода {city} {day}", "url": f"https://weather{index}.example/{day}", "content": page.format(city=city, day=day)}
+            for index, page in enumerate(SAMPLE_PAGES)
+        ]
+    return search
+
+
+def fixture_data(agent: EventAgent, events: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    data: Dict[str, Dict[str, Any]] = {}
+    for event in events:
+        city = agent.address_index.canonicalize(event["address"]).city
+        place = agent.address_index.cities[city]
+        hourly = data.setdefault(city, {"hourly": {}})["hourly"]
+        for key, values in synthetic_hourly(place["lat"], place["lon"], event["date"]).items():
+            hourly.setdefault(key, []).extend(values)
+    return data
+
+
+def run_provider(agent: EventAgent, name: str, events: List[Dict[str, str]]) -> List[Any]:
+    latencies, tokens, raw_tokens, providers = [], [], [], set()
+    for event in events:
+        started = time.perf_counter()
+        _, stats = agent.fetch_weather(event["address"], event["date"], event["time"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        tokens.append(stats["context_tokens"])
+        raw_tokens.append(stats.get("raw_tokens", stats["context_tokens"]))
+        providers.add(stats["provider"])
+    latency = summarize(latencies)
+    return [
+        name, "+".join(sorted(providers)), len(events), latency["mean"], latency["p50"], latency["p95"],
+        summarize(raw_tokens)["mean"], summarize(tokens)["mean"]
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка получения погоды и размер фрагмента промпта: веб-поиск Tavily и структурированный прогноз")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--search-latency", type=float, default=1.2, help="Задержка имитируемого веб-поиска, секунды")
+    parser.add_argument("--api-latency", type=float, default=0.15, help="Задержка заглушки Open-Meteo, секунды")
+    parser.add_argument("--open-meteo-url", help="Адрес настоящего API Open-Meteo; по умолчанию запускается локальная заглушка")
+    parser.add_argument("--tavily-key", help="Ключ Tavily для замера настоящего веб-поиска вместо имитации")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    events = sample_events(args.requests, args.seed)
+    agent = EventAgent({**DUMMY_CONFIG, "TAVILY_API_KEY": args.tavily_key or "benchmark", "CACHE_BACKEND": "memory"})
+    search = (lambda query: agent.search_tool.invoke({"query": query})) if args.tavily_key else fake_search(args.search_latency)
+    tavily = TavilyProvider(search, agent.context_builder, agent._weather_keywords)
+    rows = []
+    agent.weather_providers = WeatherProviderChain([tavily])
+    rows.append(run_provider(agent, "web search", events))
+    agent.weather_providers = WeatherProviderChain([FixtureProvider(fixture_data(agent, events)), tavily])
+    rows.append(run_provider(agent, "fixture", events))
+    with FakeWeatherServer(latency=args.api_latency) as server:
+        agent.weather_providers = WeatherProviderChain([OpenMeteoProvider(args.open_meteo_url or server.url), tavily])
+        rows.append(run_provider(agent, "open-meteo", events))
+        sample = agent.fetch_weather(events[0]["address"], events[0]["date"], events[0]["time"])[0]
+    print_table(
+        "Получение прогноза погоды для события",
+        ["path", "provider", "n", "mean_ms", "p50_ms", "p95_ms", "raw_tokens", "prompt_tokens"],
+        rows
+    )
+    print(f"\nПример фрагмента промпта: {sample}")
\ No newline at end of file
@@ -0,0 +1,65 @@
+import argparse
+import os
+import shutil
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SHARED_MODULES: Dict[str, Tuple[str, ...]] = {
+    "batch_jobs.py": ("task_master", "event_helper", "greeting_service"),
+    "cache_backend.py": ("task_master", "event_helper", "greeting_service"),
+    "deadline.py": ("task_master", "event_helper", "greeting_service"),
+    "idempotency.py": ("task_master", "event_helper", "greeting_service"),
+    "llm_backends.py": ("task_master", "event_helper", "greeting_service"),
+    "profiling.py": ("task_master", "event_helper", "greeting_service", "job_queue"),
+    "stdio_client.py": ("task_master", "event_helper", "greeting_service"),
+    "structured_logging.py": ("task_master", "event_helper", "greeting_service", "job_queue"),
+    "example_store.py": ("task_master", "event_helper"),
+    "feedback_scope.py": ("task_master", "event_helper"),
+    "ics_import.py": ("task_master", "event_helper"),
+    "output_parser.py": ("task_master", "event_helper"),
+    "recurrence.py": ("task_master", "event_helper"),
+    "speculation.py": ("task_master", "event_helper"),
+    "search_context.py": ("event_helper", "greeting_service")
+}
+
+
+def read(directory: str, module: str) -> bytes:
+    with open(os.path.join(ROOT_DIR, directory, module), "rb") as f:
+        return f.read()
+
+
+def find_mismatches(source: Optional[str] = None) -> List[Tuple[str, str, str]]:
+    mismatches = []
+    for module, directories in SHARED_MODULES.items():
+        origin = source if source in directories else directories[0]
+        expected = read(origin, module)
+        for directory in directories:
+            if directory != origin and read(directory, module) != expected:
+                mismatches.append((module, origin, directory))
+    return mismatches
+
+
+def sync(mismatches: List[Tuple[str, str, str]]):
+    for module, origin, directory in mismatches:
+        shutil.copyfile(os.path.join(ROOT_DIR, origin, module), os.path.join(ROOT_DIR, directory, module))
+        print(f"{origin}/{module} -> {directory}/{module}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка, что общие модули сервисов совпадают во всех копиях")
+    parser.add_argument("--sync", action="store_true", help="Скопировать эталонную копию во все остальные")
+    parser.add_argument("--source", choices=sorted({d for dirs in SHARED_MODULES.values() for d in dirs}),
+                        help="Каталог с эталонной копией (по умолчанию первый каталог модуля, обычно task_master)")
+    args = parser.parse_args()
+    mismatches = find_mismatches(args.source)
+    if args.sync:
+        sync(mismatches)
+        sys.exit(0)
+    for module, origin, directory in mismatches:
+        print(f"{directory}/{module} отличается от {origin}/{module}")
+    if mismatches:
+        print("Синхронизируйте копии: python check_shared_modules.py --sync [--source <каталог>]")
+        sys.exit(1)
+    print(f"Общие модули совпадают: {len(SHARED_MODULES)}")
\ No newline at end of file
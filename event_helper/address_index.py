@@ -0,0 +1,156 @@
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger("AddressIndex")
+
+URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r'[a-zа-я0-9]+(?:-[a-zа-я0-9]+)*')
+MAX_CITY_TOKENS = 3
+
+
+class CanonicalAddress(NamedTuple):
+    online: bool
+    city: Optional[str]
+    venue: str
+    key: str
+
+    @property
+    def weather_key(self) -> str:
+        return self.city or self.key
+
+
+class AddressIndex:
+    def __init__(self, gazetteer_path: Optional[str] = None, aliases_path: Optional[str] = None,
+                 flush_seconds: float = 30.0):
+        self.gazetteer_path = gazetteer_path or os.path.join(os.path.dirname(__file__), 'gazetteer.json')
+        self.aliases_path = aliases_path
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        self.cities: Dict[str, Dict] = {}
+        self.city_aliases: Dict[Tuple[str, ...], str] = {}
+        self.venues: Dict[str, str] = {}
+        self.street_types: Dict[str, str] = {}
+        self.drop_tokens = set()
+        self.online_domains: List[str] = []
+        self.online_words = set()
+        self.learned: Dict[str, List[str]] = {}
+        self._load_gazetteer()
+        self._load_aliases()
+        if self.aliases_path:
+            atexit.register(self.flush)
+
+    def _load_gazetteer(self):
+        try:
+            with open(self.gazetteer_path, 'r', encoding='utf-8') as f:
+                gazetteer = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Не удалось загрузить справочник адресов: %s", e)
+            return
+        self.street_types = gazetteer.get("street_types", {})
+        self.drop_tokens = set(gazetteer.get("drop_tokens", []))
+        self.online_domains = [domain.lower() for domain in gazetteer.get("online_domains", [])]
+        self.online_words = set(gazetteer.get("online_words", []))
+        for key, city in gazetteer.get("cities", {}).items():
+            self.cities[key] = city
+            for alias in [key, city.get("name", key)] + city.get("aliases", []):
+                self.city_aliases[tuple(self._tokenize(alias))] = key
+        for venue, city in gazetteer.get("venues", {}).items():
+            self.venues[" ".join(self._tokenize(venue))] = city
+
+    def _load_aliases(self):
+        if not self.aliases_path or not os.path.exists(self.aliases_path):
+            return
+        try:
+            with open(self.aliases_path, 'r', encoding='utf-8') as f:
+                self.learned = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Не удалось загрузить выученные псевдонимы адресов: %s", e)
+
+    def _save_aliases(self):
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        if not self.aliases_path:
+            return
+        try:
+            tmp_path = f"{self.aliases_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.learned, f, ensure_ascii=False)
+            os.replace(tmp_path, self.aliases_path)
+        except OSError as e:
+            logger.warning("Не удалось сохранить псевдонимы адресов: %s", e)
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return TOKEN_PATTERN.findall(text.lower().replace('ё', 'е'))
+
+    def is_online(self, address: str) -> bool:
+        lowered = address.strip().lower()
+        if not lowered or lowered == "online":
+            return True
+        urls = URL_PATTERN.findall(lowered)
+        if any(domain in url for url in urls for domain in self.online_domains):
+            return True
+        tokens = self._tokenize(URL_PATTERN.sub(" ", lowered))
+        if any(token in self.online_words for token in tokens):
+            return True
+        return bool(urls) and not tokens
+
+    def _find_city(self, tokens: List[str]) -> Tuple[Optional[str], List[str]]:
+        for size in range(MAX_CITY_TOKENS, 0, -1):
+            for start in range(len(tokens) - size + 1):
+                city = self.city_aliases.get(tuple(tokens[start:start + size]))
+                if city:
+                    return city, tokens[:start] + tokens[start + size:]
+        return None, tokens
+
+    def canonicalize(self, address: str) -> CanonicalAddress:
+        if self.is_online(address):
+            return CanonicalAddress(True, None, "", "online")
+        tokens = [
+            self.street_types.get(token, token)
+            for token in self._tokenize(URL_PATTERN.sub(" ", address))
+            if token not in self.drop_tokens
+        ]
+        city, rest = self._find_city(tokens)
+        venue = " ".join(rest)
+        if city is None:
+            city = self.venues.get(venue)
+            if city is None:
+                learned = self.learned.get(venue, [])
+                city = learned[0] if len(learned) == 1 else None
+        elif len(rest) >= 2:
+            self.learn(venue, city)
+        key = f"{city}|{venue}" if city else venue
+        return CanonicalAddress(False, city, venue, key)
+
+    def learn(self, venue: str, city: str):
+        venue = " ".join(self._tokenize(venue))
+        if not venue or venue in self.venues:
+            return
+        with self.lock:
+            cities = self.learned.setdefault(venue, [])
+            if city in cities:
+                return
+            cities.append(city)
+            self.dirty = True
+            if time.monotonic() - self.saved_at >= self.flush_seconds:
+                self._save_aliases()
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self._save_aliases()
+
+    def coordinates(self, city: Optional[str]) -> Optional[Tuple[float, float]]:
+        info = self.cities.get(city or "")
+        if not info or "lat" not in info:
+            return None
+        return info["lat"], info["lon"]
\ No newline at end of file
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from openai import OpenAI
+
+from llm_backends import DEFAULT_BASE_URL, DEFAULT_MODEL, backend_specs, resolve_api_key
+
+logger = logging.getLogger("BatchJobs")
+
+ENDPOINT = "/v1/chat/completions"
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def chat_messages(lc_messages: List[Any]) -> List[Dict[str, str]]:
+    return [{"role": ROLES.get(message.type, message.type), "content": message.content} for message in lc_messages]
+
+
+def usage_metrics(usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    usage = usage or {}
+    return {
+        "latency_ms": 0,
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "cached_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "backend": "batch"
+    }
+
+
+class BatchRunner:
+    def __init__(self, config: Dict[str, Any], state_path: str, temperature: float):
+        specs = backend_specs(config)
+        spec = next((item for item in specs if item.get("name") == config.get('BATCH_BACKEND')), specs[0])
+        self.client = OpenAI(
+            base_url=spec.get("base_url", DEFAULT_BASE_URL),
+            api_key=resolve_api_key(spec, config) or "not-needed",
+            timeout=spec.get("timeout", 120),
+            max_retries=2
+        )
+        self.model = spec.get("model", DEFAULT_MODEL)
+        self.temperature = spec.get("temperature", temperature)
+        self.poll_seconds = float(config.get('BATCH_POLL_SECONDS', 30))
+        self.max_requests = int(config.get('BATCH_MAX_REQUESTS', 1000))
+        self.max_attempts = int(config.get('BATCH_MAX_ATTEMPTS', 3))
+        self.completion_window = config.get('BATCH_COMPLETION_WINDOW', '24h')
+        self.state_path = state_path
+        self.state = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_path):
+            return {"items": {}, "batches": {}}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        logger.info(
+            "Продолжение пакетной обработки: запросов %s, пакетов %s", len(state['items']), len(state['batches'])
+        )
+        return state
+
+    def _save(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def has(self, custom_id: str) -> bool:
+        return custom_id in self.state["items"]
+
+    def add(self, custom_id: str, lc_messages: List[Any], context: Any, **params: Any):
+        if self.has(custom_id):
+            return
+        self.state["items"][custom_id] = {
+            "status": "pending",
+            "attempts": 0,
+            "context": context,
+            "body": {"model": self.model, "temperature": self.temperature, "messages": chat_messages(lc_messages), **params}
+        }
+
+    def _create_batch(self, file_id: str, record: Dict[str, Any]):
+        batch = self.client.batches.create(
+            input_file_id=file_id, endpoint=ENDPOINT, completion_window=self.completion_window
+        )
+        record["batch_id"], record["status"] = batch.id, batch.status
+        self._save()
+        logger.info("Создан пакет %s: запросов %s", batch.id, len(record['custom_ids']))
+
+    def _recover_uploads(self):
+        orphaned = {file_id: record for file_id, record in self.state["batches"].items() if not record.get("batch_id")}
+        if not orphaned:
+            return
+        for batch in self.client.batches.list(limit=100):
+            if batch.input_file_id in orphaned and not orphaned[batch.input_file_id].get("batch_id"):
+                orphaned[batch.input_file_id].update({"batch_id": batch.id, "status": batch.status})
+                logger.info("Найден ранее созданный пакет %s", batch.id)
+        self._save()
+        for file_id, record in orphaned.items():
+            if not record.get("batch_id"):
+                self._create_batch(file_id, record)
+
+    def submit(self) -> int:
+        self._recover_uploads()
+        items = self.state["items"]
+        pending = [custom_id for custom_id, item in items.items() if item["status"] == "pending"]
+        for start in range(0, len(pending), self.max_requests):
+            chunk = pending[start:start + self.max_requests]
+            lines = [
+                json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": items[custom_id]["body"]},
+                           ensure_ascii=False)
+                for custom_id in chunk
+            ]
+            uploaded = self.client.files.create(
+                file=("batch.jsonl", ("\n".join(lines) + "\n").encode("utf-8")), purpose="batch"
+            )
+            record = {"batch_id": None, "status": "uploaded", "custom_ids": chunk}
+            self.state["batches"][uploaded.id] = record
+            for custom_id in chunk:
+                items[custom_id]["status"] = "submitted"
+                items[custom_id]["attempts"] += 1
+            self._save()
+            self._create_batch(uploaded.id, record)
+        return len(pending)
+
+    def _read_file(self, file_id: Optional[str]) -> List[Dict[str, Any]]:
+        if not file_id:
+            return []
+        content = self.client.files.content(file_id).text
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    def _collect(self, record: Dict[str, Any], batch: Any):
+        items = self.state["items"]
+        for line in self._read_file(batch.output_file_id) + self._read_file(batch.error_file_id):
+            item = items.get(line.get("custom_id"))
+            if item is None or item["status"] != "submitted":
+                continue
+            response = line.get("response") or {}
+            if response.get("status_code") == 200:
+                body = response["body"]
+                item["status"] = "done"
+                item["result"] = {"content": body["choices"][0]["message"]["content"], "usage": body.get("usage")}
+            else:
+                error = line.get("error") or (response.get("body") or {}).get("error") or response
+                item["status"] = "failed"
+                item["error"] = json.dumps(error, ensure_ascii=False)
+        requeued = 0
+        for custom_id in record["custom_ids"]:
+            item = items[custom_id]
+            if item["status"] != "submitted":
+                continue
+            if item["attempts"] < self.max_attempts:
+                item["status"] = "pending"
+                requeued += 1
+            else:
+                item["status"] = "failed"
+                item["error"] = f"Пакет завершился со статусом {batch.status}"
+        if requeued:
+            logger.warning("Пакет %s завершился со статусом %s, запросов к повторной отправке: %s", batch.id, batch.status, requeued)
+        record["status"] = "collected"
+
+    def wait(self):
+        while True:
+            active = [record for record in self.state["batches"].values() if record["status"] != "collected"]
+            for record in active:
+                batch = self.client.batches.retrieve(record["batch_id"])
+                record["status"] = batch.status
+                if batch.status in TERMINAL_STATUSES:
+                    self._collect(record, batch)
+            self._save()
+            if any(item["status"] == "pending" for item in self.state["items"].values()):
+                self.submit()
+                continue
+            active = [record for record in self.state["batches"].values() if record["status"] != "collected"]
+            if not active:
+                return
+            counts = self.counts()
+            logger.info(
+                "Ожидание пакетов: %s, готово запросов %s из %s", len(active), counts['done'], len(self.state['items'])
+            )
+            time.sleep(self.poll_seconds)
+
+    def run(self) -> Dict[str, int]:
+        self.submit()
+        self.wait()
+        counts = self.counts()
+        logger.info("Пакетная обработка завершена: %s", counts)
+        return counts
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"pending": 0, "submitted": 0, "done": 0, "failed": 0}
+        for item in self.state["items"].values():
+            counts[item["status"]] += 1
+        return counts
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        return {custom_id: item for custom_id, item in self.state["items"].items() if item["status"] in ("done", "failed")}
+
+    def clear(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
\ No newline at end of file
@@ -1,13 +1,47 @@
 import streamlit as st
+import atexit
 import json
 import os
 import subprocess
 import datetime
+import time
+import uuid
+import copy
+import sys
 from pathlib import Path
+from speculation import SpeculativeRunner
+from stdio_client import ContainerPool, StdioSession
+from example_store import ExampleStore
+from recurrence import describe, parse_rule
 
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 INPUT_FILE = DATA_DIR / "input.json"
+METRICS_FILE = DATA_DIR / "acceptance_metrics.jsonl"
+EXAMPLES_FILE = DATA_DIR / "accepted_examples.jsonl"
+CONFIG_FILE = Path("config.json")
+
+
+def load_client_config():
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+CLIENT_CONFIG = load_client_config()
+NUM_CANDIDATES = int(CLIENT_CONFIG.get("NUM_CANDIDATES", 1))
+EXECUTION_BACKEND = CLIENT_CONFIG.get("EXECUTION_BACKEND", "docker")
+SPECULATIVE_MODE = EXECUTION_BACKEND == "docker" and bool(CLIENT_CONFIG.get("SPECULATIVE_MODE", False))
+SPECULATION_DEBOUNCE_SECONDS = float(CLIENT_CONFIG.get("SPECULATION_DEBOUNCE_SECONDS", 2.0))
+QUEUE_POLL_SECONDS = float(CLIENT_CONFIG.get("QUEUE_POLL_SECONDS", 0.5))
+REQUEST_BUDGET_SECONDS = float(CLIENT_CONFIG.get("REQUEST_BUDGET_SECONDS") or 0)
+RECURRENCE_OPTIONS = {"": "Не повторяется", "FREQ=DAILY": "Каждый день", "FREQ=WEEKLY": "Каждую неделю", "FREQ=MONTHLY": "Каждый месяц"}
+POOL_SIZE = int(CLIENT_CONFIG.get("POOL_SIZE", 2))
+POOL_MAX_USES = int(CLIENT_CONFIG.get("POOL_MAX_USES", 1))
+POOL_IDLE_SECONDS = float(CLIENT_CONFIG.get("POOL_IDLE_SECONDS", 600))
+STDIO_TIMEOUT_SECONDS = float(CLIENT_CONFIG.get("STDIO_TIMEOUT_SECONDS", 120))
 
 def init_session_state():
     if 'step' not in st.session_state:
@@ -25,6 +59,17 @@ def init_session_state():
         st.session_state.generation_history = []
         st.session_state.final_output = None
         st.session_state.feedback = ""
+        st.session_state.candidates = []
+        st.session_state.selected_candidate = 0
+        st.session_state.total_latency = 0.0
+        st.session_state.job_id = None
+        st.session_state.job_started = 0.0
+        st.session_state.degraded_reasons = []
+        st.session_state.few_shot_examples = 0
+        st.session_state.request_session = uuid.uuid4().hex
+        st.session_state.saved_output_tokens = 0
+        st.session_state.saved_latency_ms = 0
+        st.session_state.occurrences = []
 
 def format_event_data(event_data):
     style_map = {
@@ -44,6 +89,9 @@ def format_event_data(event_data):
     **Стиль описания:** {style_text}  
     """
 
+    if event_data.get("recurrence"):
+        formatted += f"**Повторение:** {describe(parse_rule(event_data['recurrence']))}  \n"
+
     if event_type == "Офлайн":
         formatted += f"**Адрес:** {event_data['address']}  \n"
     if event_data["additional_info"]:
@@ -56,6 +104,8 @@ def format_event_data(event_data):
 
 def main():
     init_session_state()
+    if EXECUTION_BACKEND == "pool":
+        get_container_pool()
     st.markdown(
         "<h1 style='text-align: center;'>ИИ-ассистент для генерации событий в Календаре VK WorkSpace</h1>",
         unsafe_allow_html=True
@@ -74,7 +124,8 @@ def main():
 
 
 def render_input_step():
-    with st.form("event_form"):
+    container = st.container() if SPECULATIVE_MODE else st.form("event_form")
+    with container:
         col1, col2 = st.columns(2)
         with col1:
             date = st.date_input(
@@ -93,6 +144,21 @@ def render_input_step():
             )
             st.session_state.event_data["time"] = time_input.strftime("%H:%M")
 
+        col_repeat1, col_repeat2 = st.columns(2)
+        with col_repeat1:
+            frequency = st.selectbox(
+                "Повторение",
+                options=list(RECURRENCE_OPTIONS),
+                format_func=RECURRENCE_OPTIONS.get,
+                key="recurrence_frequency"
+            )
+        with col_repeat2:
+            count = st.number_input("Число повторений", min_value=2, max_value=52, value=10, key="recurrence_count")
+        if frequency:
+            st.session_state.event_data["recurrence"] = f"{frequency};COUNT={int(count)}"
+        else:
+            st.session_state.event_data.pop("recurrence", None)
+
         is_online = st.checkbox("Онлайн мероприятие", key="is_online")
         address = st.text_input(
             "Адрес мероприятия",
@@ -132,12 +198,153 @@ def render_input_step():
         st.session_state.event_data["style"]["brief"] = brief
         st.session_state.event_data["style"]["formal"] = formal
 
-        if st.form_submit_button("Сгенерировать название и описание", type="primary"):
+        if SPECULATIVE_MODE:
+            watch_speculation()
+        submit_button = st.button if SPECULATIVE_MODE else st.form_submit_button
+        if submit_button("Сгенерировать название и описание", type="primary"):
             st.session_state.step = "generation"
             st.session_state.attempts = 0
+            st.session_state.request_session = uuid.uuid4().hex
             st.rerun()
 
 
+def build_input_data():
+    return {
+        "event_data": st.session_state.event_data,
+        "weather": None,
+        "messages": st.session_state.generation_history,
+        "final_output": None,
+        "user_feedback": st.session_state.feedback,
+        "num_candidates": NUM_CANDIDATES,
+        "candidates": st.session_state.candidates,
+        "selected_candidate": st.session_state.selected_candidate if st.session_state.candidates else None
+    }
+
+
+def docker_command(input_name, container_name=None):
+    command = ["docker", "run", "--rm"]
+    if container_name:
+        command += ["--name", container_name, "--init"]
+    return command + [
+        "-v", f"{os.getcwd()}/data:/data",
+        "-v", f"{os.getcwd()}/config.json:/app/config.json",
+        "event-helper",
+        f"/data/{input_name}"
+    ]
+
+
+@st.cache_resource
+def get_agent():
+    from event_helper import EventAgent
+    config = dict(CLIENT_CONFIG)
+    config.setdefault('WEATHER_CACHE_PATH', str(DATA_DIR.resolve() / 'weather_cache.json'))
+    config.setdefault('ADDRESS_ALIASES_PATH', str(DATA_DIR.resolve() / 'address_aliases.json'))
+    config.setdefault('EXAMPLES_PATH', str(EXAMPLES_FILE.resolve()))
+    config.setdefault('IDEMPOTENCY_DIR', str(DATA_DIR.resolve() / 'idempotency'))
+    return EventAgent(config)
+
+
+def stdio_command():
+    return CLIENT_CONFIG.get("STDIO_COMMAND") or [
+        "docker", "run", "-i", "--rm",
+        "-v", f"{os.getcwd()}/data:/data",
+        "-v", f"{os.getcwd()}/config.json:/app/config.json",
+        "event-helper",
+        "--stdio", "/data"
+    ]
+
+
+def get_stdio_session():
+    if 'stdio_session' not in st.session_state:
+        st.session_state.stdio_session = StdioSession(stdio_command(), STDIO_TIMEOUT_SECONDS)
+    return st.session_state.stdio_session
+
+
+@st.cache_resource
+def get_container_pool():
+    pool = ContainerPool(stdio_command(), size=POOL_SIZE, max_uses=POOL_MAX_USES, idle_seconds=POOL_IDLE_SECONDS,
+                         timeout=STDIO_TIMEOUT_SECONDS)
+    atexit.register(pool.close)
+    return pool
+
+
+def run_stdio(input_data):
+    session = get_stdio_session()
+    if input_data["user_feedback"] and session.alive():
+        return session.request({
+            "op": "feedback",
+            "user_feedback": input_data["user_feedback"],
+            "selected_candidate": input_data["selected_candidate"],
+            "deadline": input_data.get("deadline"),
+            "idempotency_key": input_data.get("idempotency_key")
+        })
+    return session.request({"op": "generate", **input_data})
+
+
+def run_service(input_data):
+    if EXECUTION_BACKEND == "stdio":
+        return run_stdio(input_data)
+    if EXECUTION_BACKEND == "pool":
+        return get_container_pool().request({"op": "generate", **input_data})
+    if EXECUTION_BACKEND == "inprocess":
+        return get_agent().process_request(copy.deepcopy(input_data))
+    with open(INPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(input_data, f, ensure_ascii=False, indent=2)
+    subprocess.run(
+        docker_command(INPUT_FILE.name),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@st.cache_resource
+def get_job_queue():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "job_queue"))
+    from job_queue import DEFAULT_DB_PATH, JobQueue
+    return JobQueue(
+        CLIENT_CONFIG.get("JOB_QUEUE_PATH", DEFAULT_DB_PATH),
+        max_pending=int(CLIENT_CONFIG.get("JOB_QUEUE_MAX_PENDING", 100)),
+        default_timeout=float(CLIENT_CONFIG.get("JOB_TIMEOUT_SECONDS", 120))
+    )
+
+
+def poll_job(input_data):
+    job_queue = get_job_queue()
+    from job_queue import QueueFullError
+    if st.session_state.job_id is None:
+        try:
+            st.session_state.job_id = job_queue.submit("event", input_data)
+        except QueueFullError as e:
+            raise RuntimeError(f"Сервис перегружен, попробуйте позже. {str(e)}")
+        st.session_state.job_started = time.perf_counter()
+    job = job_queue.get(st.session_state.job_id)
+    if job is not None and job["status"] in ("queued", "running"):
+        if job["status"] == "queued":
+            st.info(f"Запрос ожидает в очереди, перед ним задач: {job_queue.position(job['id'])}")
+        time.sleep(QUEUE_POLL_SECONDS)
+        st.rerun()
+    st.session_state.job_id = None
+    if job is None or job["status"] == "failed":
+        raise RuntimeError(job["error"] if job else "Задача не найдена в очереди")
+    return job["result"]
+
+
+def get_speculator():
+    if 'speculator' not in st.session_state:
+        st.session_state.speculator = SpeculativeRunner(docker_command, DATA_DIR, SPECULATION_DEBOUNCE_SECONDS)
+    return st.session_state.speculator
+
+
+@st.fragment(run_every=max(0.5, SPECULATION_DEBOUNCE_SECONDS / 2))
+def watch_speculation():
+    speculator = get_speculator()
+    speculator.observe(build_input_data(), ready=bool(st.session_state.event_data["prompt"].strip()))
+    st.caption(speculator.summary())
+
+
 def render_generation_step():
     st.subheader("Данные события")
     with st.expander("Просмотр введенных данных", expanded=True):
@@ -145,34 +352,21 @@ def render_generation_step():
 
     if st.session_state.attempts == 0 or st.session_state.feedback:
         with st.spinner("Генерирую название и описание события..."):
-            input_data = {
-                "event_data": st.session_state.event_data,
-                "weather": None,
-                "messages": st.session_state.generation_history,
-                "final_output": None,
-                "user_feedback": st.session_state.feedback
-            }
-
-            with open(INPUT_FILE, "w", encoding="utf-8") as f:
-                json.dump(input_data, f, ensure_ascii=False, indent=2)
-
+            input_data = build_input_data()
             try:
-                docker_cmd = [
-                    "docker", "run", "--rm",
-                    "-v", f"{os.getcwd()}/data:/data",
-                    "-v", f"{os.getcwd()}/config.json:/app/config.json",
-                    "event-helper",
-                    "/data/input.json"
-                ]
-                result = subprocess.run(
-                    docker_cmd,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-
-                with open(INPUT_FILE, "r", encoding="utf-8") as f:
-                    result_data = json.load(f)
+                started = time.perf_counter()
+                result_data = None
+                if SPECULATIVE_MODE and st.session_state.attempts == 0:
+                    result_data = get_speculator().take(input_data)
+                if result_data is None:
+                    input_data["idempotency_key"] = f"{st.session_state.request_session}-{st.session_state.attempts}"
+                if result_data is None and REQUEST_BUDGET_SECONDS:
+                    input_data["deadline"] = time.time() + REQUEST_BUDGET_SECONDS
+                if result_data is None and EXECUTION_BACKEND == "queue":
+                    result_data = poll_job(input_data)
+                    started = st.session_state.job_started
+                elif result_data is None:
+                    result_data = run_service(input_data)
 
                 if "error" in result_data:
                     st.error(f"Ошибка генерации: {result_data['error']}")
@@ -181,13 +375,30 @@ def render_generation_step():
 
                 st.session_state.final_output = result_data["final_output"]
                 st.session_state.generation_history = result_data.get("messages", [])
+                st.session_state.candidates = result_data.get("candidates") or []
+                st.session_state.selected_candidate = 0
+                st.session_state.degraded_reasons = result_data.get("degraded_reasons") or []
+                st.session_state.occurrences = result_data.get("occurrences") or []
+                if st.session_state.attempts == 0:
+                    few_shot = (result_data.get("metrics") or {}).get("few_shot") or {}
+                    st.session_state.few_shot_examples = few_shot.get("examples", 0)
+                partial = (result_data.get("metrics") or {}).get("partial") or {}
+                st.session_state.saved_output_tokens += partial.get("saved_output_tokens", 0)
+                st.session_state.saved_latency_ms += partial.get("saved_latency_ms", 0)
                 st.session_state.feedback = ""
                 st.session_state.attempts += 1
+                st.session_state.total_latency += time.perf_counter() - started
+                if EXECUTION_BACKEND == "pool":
+                    st.caption(get_container_pool().summary())
 
             except subprocess.CalledProcessError as e:
                 st.error(f"Ошибка при выполнении микросервиса: {e.stderr}")
                 st.session_state.step = "input"
                 st.rerun()
+            except RuntimeError as e:
+                st.error(f"Ошибка при выполнении микросервиса: {str(e)}")
+                st.session_state.step = "input"
+                st.rerun()
             except Exception as e:
                 st.error(f"Неизвестная ошибка: {str(e)}")
                 st.session_state.step = "input"
@@ -195,16 +406,34 @@ def render_generation_step():
 
     if st.session_state.final_output:
         st.success("Название и описание события успешно сгенерированы!")
+        if "llm_timeout" in st.session_state.degraded_reasons:
+            st.warning("Модель не успела ответить вовремя: название и описание составлены по шаблону из введенных данных")
+        elif "regeneration_timeout" in st.session_state.degraded_reasons:
+            st.warning("Модель не успела доработать результат вовремя: показана предыдущая версия, фидбек можно отправить еще раз")
+        elif st.session_state.degraded_reasons:
+            st.info("Прогноз погоды не успел загрузиться, описание составлено без него")
+        if len(st.session_state.candidates) > 1:
+            selected = st.radio(
+                "Выберите вариант:",
+                options=list(range(len(st.session_state.candidates))),
+                format_func=lambda i: f"Вариант {i + 1}: {st.session_state.candidates[i]['title']}",
+                index=st.session_state.selected_candidate,
+                key=f"candidate_choice_{st.session_state.attempts}"
+            )
+            st.session_state.selected_candidate = selected
+            st.session_state.final_output = st.session_state.candidates[selected]
         st.subheader("Название события:")
         st.write(st.session_state.final_output["title"])
         st.subheader("Описание события:")
         st.write(st.session_state.final_output["description"])
+        render_occurrences()
         st.markdown("---")
         st.write(f"Попытка: {st.session_state.attempts}/{st.session_state.max_attempts}")
 
         col1, col2 = st.columns([1, 2])
         with col1:
             if st.button("Принять результат", type="primary"):
+                record_acceptance()
                 st.session_state.step = "final"
                 st.rerun()
 
@@ -222,15 +451,48 @@ def render_generation_step():
             else:
                 st.warning("Достигнуто максимальное количество попыток")
                 if st.button("Принять текущий результат"):
+                    record_acceptance()
                     st.session_state.step = "final"
                     st.rerun()
 
+def record_acceptance():
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "num_candidates": NUM_CANDIDATES,
+        "attempts": st.session_state.attempts,
+        "latency_seconds": round(st.session_state.total_latency, 3),
+        "few_shot_examples": st.session_state.few_shot_examples,
+        "partial_saved_output_tokens": st.session_state.saved_output_tokens,
+        "partial_saved_latency_ms": st.session_state.saved_latency_ms
+    }
+    with open(METRICS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if "llm_timeout" not in st.session_state.degraded_reasons:
+        data = st.session_state.event_data
+        ExampleStore(str(EXAMPLES_FILE)).add(
+            data["prompt"], data["style"],
+            st.session_state.final_output["title"], st.session_state.final_output["description"],
+            attempts=st.session_state.attempts
+        )
+
+
+def render_occurrences():
+    if not st.session_state.occurrences:
+        return
+    with st.expander(f"Повторения серии: {len(st.session_state.occurrences)}"):
+        for item in st.session_state.occurrences:
+            st.markdown(f"**{item['date']} {item['time']}**")
+            if item.get("weather"):
+                st.caption(item["weather"])
+
+
 def render_final_step():
     st.success("Финальный результат принят!")
     st.subheader("Название события:")
     st.write(st.session_state.final_output["title"])
     st.subheader("Описание события:")
     st.write(st.session_state.final_output["description"])
+    render_occurrences()
     st.markdown("---")
 
     if st.button("Создать новое событие", type="primary"):
@@ -247,6 +509,14 @@ def render_final_step():
         st.session_state.generation_history = []
         st.session_state.final_output = None
         st.session_state.feedback = ""
+        st.session_state.candidates = []
+        st.session_state.selected_candidate = 0
+        st.session_state.occurrences = []
+        st.session_state.total_latency = 0.0
+        st.session_state.saved_output_tokens = 0
+        st.session_state.saved_latency_ms = 0
+        st.session_state.job_id = None
+        st.session_state.job_started = 0.0
         st.rerun()
 
 if __name__ == "__main__":
@@ -1,24 +1,65 @@
+import copy
 import json
 import os
-import re
 import sys
 import logging
-from typing import Dict, List, TypedDict, Any, Optional
-from langchain_openai import ChatOpenAI
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, TypedDict, Any, Optional, Sequence, Tuple
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
+from llm_backends import BackendRegistry, error_details
+from example_store import ExampleStore, format_examples
+from profiling import RequestProfiler
+from cache_backend import CacheBackend, create_backend, fingerprint
+from batch_jobs import usage_metrics
+from idempotency import IdempotencyStore
+from structured_logging import configure_logging, request_context
+from feedback_scope import current_output, estimate_tokens, parse_fields, partial_fields, partial_instruction
+from output_parser import REASK_INSTRUCTION, fallback_candidate, json_instruction, parse_output, response_format
+from deadline import DeadlineExceeded, call_before, has_time, make_deadline
+from address_index import AddressIndex
+from search_context import SearchContextBuilder, date_keywords
+from weather_providers import TavilyProvider, WeatherQuery, create_weather_providers
+from recurrence import describe, occurrences, parse_rule
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+configure_logging(force=False)
 logger = logging.getLogger("EventAgent")
 
+FORECAST_HORIZON_HOURS = 16 * 24
+WEATHER_TOPIC_WORDS = [
+    "погод", "температур", "градус", "°", "осадк", "дожд", "снег", "ветер", "ветр",
+    "облачн", "ясн", "гроз", "влажн", "прогноз"
+]
+
+SYSTEM_PROMPT_PREFIX = """
+Ты профессиональный ассистент для сервиса Календарь VK WorkSpace, который помогает придумать название и описание события для добавления его в календарь. 
+Твоя задача - создать привлекательное и понятное другим людям название, информативное и понятное другим людям описание для события. 
+
+Требования к генерации:
+1. Название:
+   - Максимально отражает суть события
+   - Привлекательное и запоминающееся
+   - Соответствует выбранному стилю
+   - Не длиннее 10 слов
+
+2. Описание:
+   - Начинается с краткого введения
+   - Содержит ключевые детали: цель, задачи, ожидаемые результаты
+   - Включает всю дополнительную информацию
+   - Соответствует выбранному стилю и формату
+   - Заканчивается полезной информацией из 'Дополнительной информации', если ранее в описании она не использовалась (например, ссылки на онлайн-встречу или названия рабочих документов)
+   
+ВАЖНО! Всегда выводи полный ответ в строго заданном формате:
+[NAME] Название события
+[DESCRIPTION] Текст описания
+
+Данные о событии, стиль и прогноз погоды приведены ниже.
+""".strip()
+
 
 class ConfigLoader:
     @staticmethod
@@ -36,15 +77,73 @@ class ConfigLoader:
             logger.error("Ошибка формата в файле конфигурации")
             sys.exit(1)
         except Exception as e:
-            logger.error(f"Ошибка загрузки конфигурации: {str(e)}")
+            logger.error("Ошибка загрузки конфигурации: %s", e)
             sys.exit(1)
 
 
+class WeatherCache:
+    NAMESPACE = "weather"
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    @staticmethod
+    def make_key(location: str, date: str, time_str: str) -> str:
+        hour = time_str.split(':')[0]
+        return f"{' '.join(location.lower().split())}|{date}|{hour}"
+
+    @staticmethod
+    def hours_until(date: str, time_str: str, now: Optional[float] = None) -> Optional[float]:
+        try:
+            event_dt = datetime.strptime(f"{date} {time_str}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            try:
+                event_dt = datetime.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                return None
+        return (event_dt.timestamp() - (now or time.time())) / 3600
+
+    @classmethod
+    def ttl_seconds(cls, date: str, time_str: str, now: Optional[float] = None) -> float:
+        hours = cls.hours_until(date, time_str, now)
+        if hours is None:
+            return 3600.0
+        return min(max(hours / 8, 0.5), 12.0) * 3600
+
+    def get(self, location: str, date: str, time_str: str) -> Optional[str]:
+        return self.backend.get(self.NAMESPACE, self.make_key(location, date, time_str))
+
+    def put(self, location: str, date: str, time_str: str, weather: str):
+        self.backend.set(self.NAMESPACE, self.make_key(location, date, time_str), weather, self.ttl_seconds(date, time_str))
+
+
 class EventAgent:
-    def __init__(self, config: Dict[str, str]):
+    def __init__(self, config: Dict[str, str], profiler: Optional[RequestProfiler] = None):
         self.config = config
+        self.profiler = profiler or RequestProfiler.from_config(config)
+        self.cache = create_backend(config, config.get('WEATHER_CACHE_PATH'))
+        self.weather_cache = WeatherCache(self.cache)
+        self.generation_ttl = float(config.get('GENERATION_CACHE_TTL', 0))
+        self.address_index = AddressIndex(
+            aliases_path=config.get('ADDRESS_ALIASES_PATH'),
+            flush_seconds=float(config.get('ADDRESS_ALIASES_FLUSH_SECONDS', 30))
+        )
+        self.context_builder = SearchContextBuilder(int(config.get('SEARCH_CONTEXT_TOKENS', 250)))
+        self.llm_reserve = float(config.get('LLM_RESERVE_SECONDS', 8))
+        self.enrichment_min = float(config.get('ENRICHMENT_MIN_SECONDS', 1.5))
+        self.example_store = ExampleStore(config.get('EXAMPLES_PATH'))
+        self.few_shot_limit = int(config.get('FEW_SHOT_EXAMPLES', 2))
         self.search_tool = self._init_search_tool()
+        self.weather_providers = create_weather_providers(config, TavilyProvider(
+            lambda query: self.search_tool.invoke({"query": query}), self.context_builder, self._weather_keywords
+        ), horizon_hours=FORECAST_HORIZON_HOURS)
         self.agent = self._init_agent()
+        self.parse_stats: Dict[str, int] = {}
+        self.parse_lock = threading.Lock()
+        self.partial_enabled = bool(config.get('PARTIAL_REGENERATION', True))
+        self.decode_ms_per_token = float(config.get('DECODE_MS_PER_TOKEN', 20))
+        self.idempotency = IdempotencyStore.from_config(config)
+        self.max_occurrences = int(config.get('RECURRENCE_MAX_OCCURRENCES', 52))
         self.workflow = self._build_workflow()
 
     def _init_search_tool(self) -> TavilySearchResults:
@@ -55,15 +154,10 @@ class EventAgent:
             include_raw_content=False
         )
 
-    def _init_agent(self) -> ChatOpenAI:
-        return ChatOpenAI(
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-            api_key=self.config['GEMINI_API_KEY'],
-            model="gemini-2.5-pro",
-            temperature=0.2
-        )
+    def _init_agent(self) -> BackendRegistry:
+        return BackendRegistry.from_config(self.config, temperature=0.2)
 
-    def _build_system_prompt(self, state: Dict[str, Any]) -> str:
+    def _build_system_prompt(self, state: Dict[str, Any], examples: Sequence[Dict[str, Any]] = ()) -> str:
         event = state["event_data"]
         style_description = ""
         if event["style"]["brief"] and event["style"]["formal"]:
@@ -74,68 +168,125 @@ class EventAgent:
             style_description = "Подробное и официальное описание"
         else:
             style_description = "Подробное и неформальное (но вежливое) описание"
-        event_type = "онлайн-мероприятие" if event["address"] == "online" else "очное мероприятие"
+        is_online = self.address_index.is_online(event["address"])
+        event_type = "онлайн-мероприятие" if is_online else "очное мероприятие"
+        date_info = event['date']
+        if event.get("recurrence"):
+            date_info = f"регулярное событие, {describe(parse_rule(event['recurrence']))}, первое повторение {event['date']}"
         prompt = f"""
-Ты профессиональный ассистент для сервиса Календарь VK WorkSpace, который помогает придумать название и описание события для добавления его в календарь. 
-Твоя задача - создать привлекательное и понятное другим людям название, информативное и понятное другим людям описание для события. 
-
 Данные о событии:
-- Дата: {event['date']}
+- Дата: {date_info}
 - Время: {event['time']}
 - Тип: {event_type}
+- Стиль: {style_description}
 - Дополнительная информация: 
 {event['additional_info']}
-- Стиль: {style_description}
-
-Требования к генерации:
-1. Название:
-   - Максимально отражает суть события
-   - Привлекательное и запоминающееся
-   - Соответствует выбранному стилю
-   - Не длиннее 10 слов
-
-2. Описание:
-   - Начинается с краткого введения
-   - Содержит ключевые детали: цель, задачи, ожидаемые результаты
-   - Включает всю дополнительную информацию
-   - Соответствует выбранному стилю и формату
-   - Заканчивается полезной информацией из 'Дополнительной информации', если ранее в описании она не использовалась (например, ссылки на онлайн-встречу или названия рабочих документов)
-   
-ВАЖНО! Всегда выводи полный ответ в строго заданном формате:
-[NAME] Название события
-[DESCRIPTION] Текст описания
 """
-        if state.get("weather") and event["address"] != "online":
-            prompt += f"\nПрогноз погоды на это время, полученный из интернета при помощи Tavily:\n{state['weather']}\n"
+        if state.get("weather") and not is_online:
+            prompt += f"\nПрогноз погоды на это время и место:\n{state['weather']}\n"
             prompt += "Учти прогноз погоды при составлении описания. Погодная информация должна быть краткой и соответствовать времени и месту."
-        return prompt.strip()
+        if event.get("recurrence"):
+            prompt += "\nНазвание и описание будут использоваться для каждого повторения события, поэтому не упоминай в них конкретные даты и погоду."
+        if examples:
+            prompt += f"\n{format_examples(examples)}\n"
+        return f"{SYSTEM_PROMPT_PREFIX}\n\n{prompt.strip()}"
+
+    def _weather_keywords(self, address: str, date: str, time_str: str) -> List[str]:
+        city = self.address_index.cities.get(self.address_index.canonicalize(address).city or "", {})
+        places = [city.get("name", "")] + city.get("aliases", []) if city else []
+        stems = [place.lower()[:-1] if len(place) > 4 else place.lower() for place in places if place]
+        return WEATHER_TOPIC_WORDS + date_keywords(date) + [time_str] + stems
+
+    def fetch_weather(self, address: str, date: str, time_str: str) -> Tuple[str, Dict[str, int]]:
+        canonical = self.address_index.canonicalize(address)
+        place = self.address_index.cities.get(canonical.city or "", {})
+        weather_info, stats = self.weather_providers.fetch(WeatherQuery(address, canonical.city, place, date, time_str))
+        logger.info(
+            "Прогноз погоды получен из источника %s за %s мс "
+            "(%s токенов)",
+            stats['provider'], stats['latency_ms'], stats['context_tokens']
+        )
+        self.weather_cache.put(canonical.weather_key, date, time_str, weather_info)
+        return weather_info, stats
 
     def _get_weather_info(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        if state["event_data"]["address"] == "online" or state.get("weather"):
+        if state.get("weather"):
+            return state
+        address = state["event_data"]["address"]
+        canonical = self.address_index.canonicalize(address)
+        if canonical.online or state["event_data"].get("recurrence"):
+            return state
+        date = state["event_data"]["date"]
+        time_str = state["event_data"]["time"]
+        cached = self.weather_cache.get(canonical.weather_key, date, time_str)
+        self._note_cache(state, "weather", cached is not None)
+        if cached is not None:
+            state["weather"] = cached
+            logger.info("Информация о погоде получена из кэша")
+            return state
+        if not has_time(state.get("deadline"), self.llm_reserve + self.enrichment_min):
+            self._degrade(state, "weather_skipped")
             return state
         try:
             logger.info("Получение информации о погоде...")
-            date = state["event_data"]["date"]
-            time = state["event_data"]["time"]
-            address = state["event_data"]["address"]
-            query = f"{date}, {time}, {address} прогноз погоды"
-            search_results = self.search_tool.invoke({"query": query})
-            weather_info = ""
-            for res in search_results:
-                weather_info += f"Title: {res.get('title', '')}\n"
-                weather_info += f"Content: {res.get('content', '')}\n"
-            state["weather"] = weather_info.strip()
+            with self.profiler.phase("search"):
+                state["weather"], stats = call_before(
+                    state.get("deadline"), self.fetch_weather, address, date, time_str, reserve_seconds=self.llm_reserve
+                )
+            metrics = {**(state.get("metrics") or {}), "weather": {
+                "provider": stats["provider"], "latency_ms": stats["latency_ms"], "tokens": stats["context_tokens"]
+            }}
+            if "raw_tokens" in stats:
+                metrics["search_context"] = {
+                    key: value for key, value in stats.items() if key not in ("provider", "latency_ms")
+                }
+            state["metrics"] = metrics
             logger.info("Информация о погоде успешно получена")
+        except DeadlineExceeded:
+            self._degrade(state, "weather_timeout")
         except Exception as e:
             state["weather"] = f"Не удалось получить прогноз погоды: {str(e)}"
-            logger.error(f"Ошибка получения прогноза погоды: {str(e)}")
+            logger.error("Ошибка получения прогноза погоды: %s", e)
+        return state
+
+    def _note_cache(self, state: Dict[str, Any], namespace: str, hit: bool):
+        metrics = state.get("metrics") or {}
+        state["metrics"] = {
+            **metrics,
+            "cache": {**(metrics.get("cache") or {}), "backend": self.cache.name, namespace: "hit" if hit else "miss"}
+        }
+
+    @staticmethod
+    def _degrade(state: Dict[str, Any], reason: str):
+        state["degraded"] = True
+        state["degraded_reasons"] = (state.get("degraded_reasons") or []) + [reason]
+        logger.warning("Запрос выполняется в упрощенном режиме: %s", reason)
+
+    def _fallback_output(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        event = state["event_data"]
+        state["final_output"] = fallback_candidate(event["prompt"], [
+            f"Дата: {event['date']}, время: {event['time']}",
+            f"Место: {event['address']}" if event["address"].strip() else "",
+            event["additional_info"].strip()
+        ])
+        state["candidates"] = None
+        state["metrics"] = {**(state.get("metrics") or {}), "llm": None, "parse": None}
+        self._degrade(state, "llm_timeout")
         return state
 
     def _initialize_conversation(self, state: Dict[str, Any]) -> Dict[str, Any]:
         if state.get("messages"):
             return state
         logger.info("Инициализация диалога...")
-        system_prompt = self._build_system_prompt(state)
+        data = state["event_data"]
+        examples = self.example_store.similar(data["prompt"], data["style"], self.few_shot_limit) if self.few_shot_limit else []
+        if examples:
+            logger.info("Найдено похожих принятых примеров: %s", len(examples))
+        state["metrics"] = {
+            **(state.get("metrics") or {}),
+            "few_shot": {"examples": len(examples), "similarity": [example["similarity"] for example in examples]}
+        }
+        system_prompt = self._build_system_prompt(state, examples)
         user_prompt = state["event_data"]["prompt"]
         state["messages"] = [
             {"role": "system", "content": system_prompt},
@@ -143,46 +294,242 @@ class EventAgent:
         ]
         return state
 
+    @staticmethod
+    def _usage_metrics(response: Any, started: float) -> Dict[str, Any]:
+        usage = getattr(response, "usage_metadata", None) or {}
+        details = usage.get("input_token_details") or {}
+        metrics = {
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            "input_tokens": usage.get("input_tokens", 0),
+            "cached_tokens": details.get("cache_read", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "backend": (getattr(response, "response_metadata", None) or {}).get("llm_backend")
+        }
+        logger.info(
+            "Ответ модели %s за %s мс: входных токенов %s "
+            "(из кэша %s), выходных %s",
+            metrics['backend'], metrics['latency_ms'], metrics['input_tokens'], metrics['cached_tokens'], metrics['output_tokens']
+        )
+        return metrics
+
+    @staticmethod
+    def _candidates_instruction(count: int) -> str:
+        return (
+            f"Предложи несколько заметно различающихся вариантов названия и описания события "
+            f"(количество вариантов: {count}). Выведи их строго в формате:\n"
+            + "\n".join(f"[NAME {i}] Название события\n[DESCRIPTION {i}] Текст описания" for i in range(1, count + 1))
+        )
+
+    def _prepare_call(self, state: Dict[str, Any]) -> Tuple[List[Any], Dict[str, Any]]:
+        lc_messages = []
+        with self.profiler.phase("convert_messages"):
+            for msg in state["messages"]:
+                if msg["role"] == "system":
+                    lc_messages.append(SystemMessage(content=msg["content"]))
+                elif msg["role"] == "user":
+                    lc_messages.append(HumanMessage(content=msg["content"]))
+                elif msg["role"] == "assistant":
+                    lc_messages.append(AIMessage(content=msg["content"]))
+        num_candidates = max(1, int(state.get("num_candidates") or 1))
+        structured = bool(self.config.get('STRUCTURED_OUTPUT'))
+        invoke_params = {"response_format": response_format()} if structured else {}
+        if structured:
+            lc_messages.append(HumanMessage(content=json_instruction(num_candidates, "события")))
+        elif num_candidates > 1:
+            lc_messages.append(HumanMessage(content=self._candidates_instruction(num_candidates)))
+        return lc_messages, invoke_params
+
+    def _call_partial(self, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = state["regenerate_fields"]
+        current = state["final_output"]
+        logger.info("Частичная перегенерация: %s", ', '.join(fields))
+        lc_messages = [
+            SystemMessage(content=state["messages"][0]["content"]),
+            HumanMessage(content=state["messages"][1]["content"]),
+            HumanMessage(content=partial_instruction(fields, current, state["partial_feedback"], "события"))
+        ]
+        started = time.perf_counter()
+        try:
+            with self.profiler.phase("llm_wait"):
+                response = call_before(state.get("deadline"), self.agent.invoke, lc_messages, timeout_param="timeout")
+        except DeadlineExceeded as e:
+            logger.warning("Модель не успела доработать результат до крайнего срока, история диалога не изменена: %s", e)
+            state["messages"].pop()
+            state["regeneration_failed"] = True
+            self._degrade(state, "regeneration_timeout")
+            state["metrics"] = {**(state.get("metrics") or {}), "llm": None, "parse": None}
+            return state
+        llm_metrics = self._usage_metrics(response, started)
+        with self.profiler.phase("parse"):
+            updated = parse_fields(response.content, fields)
+        if updated is None:
+            logger.warning("Не удалось разобрать ответ частичной перегенерации, выполняется полная")
+            return None
+        output = {**current, **updated}
+        kept_tokens = sum(estimate_tokens(current[field]) for field in current if field not in fields)
+        full_input_tokens = sum(estimate_tokens(message["content"]) for message in state["messages"])
+        previous = (state.get("metrics") or {}).get("llm") or {}
+        ms_per_token = self.decode_ms_per_token
+        if (previous.get("output_tokens") or 0) >= 50:
+            ms_per_token = previous["latency_ms"] / previous["output_tokens"]
+        partial = {
+            "fields": fields,
+            "saved_output_tokens": kept_tokens,
+            "saved_input_tokens": max(0, full_input_tokens - sum(estimate_tokens(msg.content) for msg in lc_messages)),
+            "saved_latency_ms": round(kept_tokens * ms_per_token)
+        }
+        logger.info(
+            "Частичная перегенерация сэкономила около %s выходных и "
+            "%s входных токенов (~%s мс)",
+            partial['saved_output_tokens'], partial['saved_input_tokens'], partial['saved_latency_ms']
+        )
+        self._record_parse("ok")
+        state["metrics"] = {
+            **(state.get("metrics") or {}),
+            "llm": llm_metrics,
+            "parse": {"mode": "tags", "status": "ok", "reasks": 0, "saved_calls": 0},
+            "partial": partial
+        }
+        state["messages"].append({
+            "role": "assistant",
+            "content": f"[NAME] {output['title']}\n[DESCRIPTION] {output['description']}"
+        })
+        state["final_output"] = output
+        state["candidates"] = None
+        return state
+
     def _call_agent(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if state.get("regenerate_fields"):
+            result = self._call_partial(state)
+            state["regenerate_fields"] = None
+            if result is not None:
+                return result
         logger.info("Вызов агента для генерации...")
-        lc_messages = []
-        for msg in state["messages"]:
-            if msg["role"] == "system":
-                lc_messages.append(SystemMessage(content=msg["content"]))
-            elif msg["role"] == "user":
-                lc_messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                lc_messages.append(AIMessage(content=msg["content"]))
-        response = self.agent.invoke(lc_messages)
-        state["messages"].append({"role": "assistant", "content": response.content})
-
-        title_match = re.search(r'\[NAME\](.+?)\n', response.content, re.DOTALL)
-        desc_match = re.search(r'\[DESCRIPTION\](.+)', response.content, re.DOTALL)
-
-        if title_match and desc_match:
-            state["final_output"] = {
-                "title": title_match.group(1).strip(),
-                "description": desc_match.group(1).strip()
+        lc_messages, invoke_params = self._prepare_call(state)
+        structured = bool(self.config.get('STRUCTURED_OUTPUT'))
+        deadline = state.get("deadline")
+        cache_key = fingerprint([(msg.type, msg.content) for msg in lc_messages], invoke_params) if self.generation_ttl > 0 else None
+        cached = self.cache.get("event_generation", cache_key) if cache_key else None
+        if cache_key:
+            self._note_cache(state, "generation", cached is not None)
+        try:
+            if cached is not None:
+                content = cached["content"]
+                llm_metrics = {
+                    "latency_ms": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+                    "backend": f"cache:{self.cache.name}"
+                }
+                logger.info("Ответ модели получен из кэша генераций")
+            else:
+                started = time.perf_counter()
+                with self.profiler.phase("llm_wait"):
+                    response = call_before(
+                        deadline, self.agent.invoke, lc_messages, timeout_param="timeout", **invoke_params
+                    )
+                content = response.content
+                llm_metrics = self._usage_metrics(response, started)
+            with self.profiler.phase("parse"):
+                candidates, status = parse_output(content, structured)
+            reasks = 0
+            while not candidates and reasks < int(self.config.get('STRUCTURED_MAX_REASKS', 1 if structured else 0)):
+                reasks += 1
+                logger.warning("Не удалось разобрать ответ агента, повторный запрос формата")
+                started = time.perf_counter()
+                with self.profiler.phase("llm_wait"):
+                    response = call_before(
+                        deadline, self.agent.invoke,
+                        lc_messages + [AIMessage(content=content), HumanMessage(content=REASK_INSTRUCTION)],
+                        timeout_param="timeout", **invoke_params
+                    )
+                content = response.content
+                llm_metrics = self._usage_metrics(response, started)
+                with self.profiler.phase("parse"):
+                    candidates, status = parse_output(content, structured)
+                status = "reasked" if candidates else "failed"
+        except DeadlineExceeded as e:
+            logger.warning("Модель не успела ответить до крайнего срока: %s", e)
+            return self._fallback_output(state)
+        if cache_key and cached is None and candidates:
+            self.cache.set("event_generation", cache_key, {"content": content}, self.generation_ttl)
+        return self._apply_output(state, content, llm_metrics, candidates, status, reasks)
+
+    def _apply_output(self, state: Dict[str, Any], content: str, llm_metrics: Dict[str, Any],
+                      candidates: List[Dict[str, str]], status: str, reasks: int) -> Dict[str, Any]:
+        num_candidates = max(1, int(state.get("num_candidates") or 1))
+        structured = bool(self.config.get('STRUCTURED_OUTPUT'))
+        self._record_parse(status)
+        state["metrics"] = {
+            **(state.get("metrics") or {}),
+            "llm": llm_metrics,
+            "parse": {
+                "mode": "json" if structured else "tags",
+                "status": status,
+                "reasks": reasks,
+                "saved_calls": 1 if status == "repaired" else 0
             }
+        }
+        state["messages"].append({"role": "assistant", "content": content})
+
+        if candidates:
+            if num_candidates > 1:
+                state["candidates"] = candidates[:num_candidates]
+                logger.info("Сгенерировано вариантов: %s", len(state['candidates']))
+            state["final_output"] = candidates[0]
             logger.info("Название и описание успешно сгенерированы")
         else:
             state["final_output"] = {
                 "title": "Не удалось сгенерировать название",
-                "description": response.content
+                "description": content
             }
             logger.warning("Не удалось распарсить ответ агента")
 
         return state
 
+    def prepare_batch(self, input_data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any], Dict[str, Any]]:
+        state = {**input_data, "degraded": False, "degraded_reasons": None, "deadline": None}
+        for step in (self._get_weather_info, self._initialize_conversation, self._process_feedback):
+            state = step(state)
+        lc_messages, invoke_params = self._prepare_call(state)
+        return state, lc_messages, invoke_params
+
+    def apply_batch_result(self, state: Dict[str, Any], content: str, usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        candidates, status = parse_output(content, bool(self.config.get('STRUCTURED_OUTPUT')))
+        return self._apply_output(copy.deepcopy(state), content, usage_metrics(usage), candidates, status, 0)
+
+    def _record_parse(self, status: str):
+        with self.parse_lock:
+            self.parse_stats[status] = self.parse_stats.get(status, 0) + 1
+            total = sum(self.parse_stats.values())
+            first_failures = total - self.parse_stats.get("ok", 0)
+        logger.info(
+            "Разбор ответа: %s; с первой попытки не разобрано %s из %s "
+            "(%.0f%%), исправлено локально %s",
+            status, first_failures, total, 100 * first_failures / total, self.parse_stats.get('repaired', 0)
+        )
+
     def _process_feedback(self, state: Dict[str, Any]) -> Dict[str, Any]:
         if not state.get("user_feedback"):
             return state
         logger.info("Обработка пользовательского фидбека...")
+        selection = ""
+        selected = state.get("selected_candidate")
+        candidates = state.get("candidates") or []
+        if selected is not None and 0 <= selected < len(candidates):
+            selection = f"Пользователь выбрал вариант {selected + 1}: {candidates[selected]['title']}\n"
+        current = current_output(state)
+        fields = partial_fields(state["user_feedback"], current, len(state["messages"])) if self.partial_enabled else None
+        partial = fields is not None
+        state["regenerate_fields"] = fields
+        state["partial_feedback"] = state["user_feedback"] if partial else None
+        state["candidates"] = None
+        state["selected_candidate"] = None
         state["messages"].append({
             "role": "user",
-            "content": f"Пользовательский фидбек: {state['user_feedback']}\nПожалуйста, учти эти замечания при обновлении названия и описания. Далее твоя задача: заново сгенерировать название и описание события в нужном формате с учетом всех своих предыдущих ответов и фидбека от пользователя"
+            "content": f"{selection}Пользовательский фидбек: {state['user_feedback']}\nПожалуйста, учти эти замечания при обновлении названия и описания. Далее твоя задача: заново сгенерировать название и описание события в нужном формате с учетом всех своих предыдущих ответов и фидбека от пользователя"
         })
-        if "final_output" in state:
+        if partial:
+            state["final_output"] = current
+        elif "final_output" in state:
             del state["final_output"]
         if "user_feedback" in state:
             del state["user_feedback"]
@@ -197,12 +544,22 @@ class EventAgent:
             messages: List[Dict[str, str]]
             final_output: Optional[Dict[str, str]]
             user_feedback: Optional[str]
+            metrics: Optional[Dict[str, Any]]
+            num_candidates: Optional[int]
+            candidates: Optional[List[Dict[str, str]]]
+            selected_candidate: Optional[int]
+            deadline: Optional[float]
+            degraded: Optional[bool]
+            degraded_reasons: Optional[List[str]]
+            regenerate_fields: Optional[List[str]]
+            partial_feedback: Optional[str]
+            regeneration_failed: Optional[bool]
 
         workflow = StateGraph(AgentState)
-        workflow.add_node("get_weather", RunnableLambda(self._get_weather_info))
-        workflow.add_node("init_conversation", RunnableLambda(self._initialize_conversation))
-        workflow.add_node("process_feedback", RunnableLambda(self._process_feedback))
-        workflow.add_node("call_agent", RunnableLambda(self._call_agent))
+        workflow.add_node("get_weather", RunnableLambda(self.profiler.wrap("get_weather", self._get_weather_info)))
+        workflow.add_node("init_conversation", RunnableLambda(self.profiler.wrap("init_conversation", self._initialize_conversation)))
+        workflow.add_node("process_feedback", RunnableLambda(self.profiler.wrap("process_feedback", self._process_feedback)))
+        workflow.add_node("call_agent", RunnableLambda(self.profiler.wrap("call_agent", self._call_agent)))
         workflow.set_entry_point("get_weather")
         workflow.add_edge("get_weather", "init_conversation")
         workflow.add_edge("init_conversation", "process_feedback")
@@ -211,43 +568,202 @@ class EventAgent:
         return workflow.compile()
 
     def process_request(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        key = input_data.get("idempotency_key")
+        request = {name: input_data.get(name) for name in ("event_data", "user_feedback", "selected_candidate", "num_candidates")}
+        with request_context(key):
+            result, replayed = self.idempotency.run(key, lambda: self._process_request(input_data), fingerprint(request))
+        if replayed:
+            result["metrics"] = {**(result.get("metrics") or {}), "idempotency": "replayed"}
+        return result
+
+    def _occurrence_weather(self, event: Dict[str, Any], date: str, deadline: Optional[float]) -> Tuple[Optional[str], bool]:
+        canonical = self.address_index.canonicalize(event["address"])
+        hours = WeatherCache.hours_until(date, event["time"])
+        if canonical.online or hours is None or not 0 <= hours <= FORECAST_HORIZON_HOURS:
+            return None, False
+        cached = self.weather_cache.get(canonical.weather_key, date, event["time"])
+        if cached is not None or not has_time(deadline, self.enrichment_min):
+            return cached, False
+        try:
+            return self.fetch_weather(event["address"], date, event["time"])[0], True
+        except Exception as e:
+            logger.warning("Не удалось получить прогноз погоды для повторения %s: %s", date, e)
+            return None, True
+
+    def _expand_occurrences(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        event = state["event_data"]
+        output = state.get("final_output")
+        if not event.get("recurrence") or not output:
+            return state
+        start = datetime.strptime(event["date"], "%Y-%m-%d").date()
+        items, lookups = [], 0
+        for day in occurrences(parse_rule(event["recurrence"]), start, self.max_occurrences):
+            weather, fetched = self._occurrence_weather(event, str(day), state.get("deadline"))
+            lookups += fetched
+            description = f"{output['description']}\n\nПрогноз погоды:\n{weather}" if weather else output["description"]
+            items.append({
+                "date": str(day), "time": event["time"], "title": output["title"],
+                "description": description, "weather": weather
+            })
+        state["occurrences"] = items
+        state["metrics"] = {**(state.get("metrics") or {}), "recurrence": {
+            "occurrences": len(items),
+            "saved_llm_calls": len(items) - 1,
+            "with_weather": sum(1 for item in items if item["weather"]),
+            "weather_lookups": lookups
+        }}
+        logger.info(
+            "Серия из %s повторений получена за один вызов модели, "
+            "прогноз погоды добавлен к %s",
+            len(items), state['metrics']['recurrence']['with_weather']
+        )
+        return state
+
+    def _process_request(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
         try:
             logger.info("Начало обработки запроса...")
-            result = self.workflow.invoke(input_data)
-            logger.info("Запрос успешно обработан")
+            input_data = {**input_data, "degraded": False, "degraded_reasons": None, "regeneration_failed": False}
+            if not input_data.get("deadline"):
+                input_data["deadline"] = make_deadline(self.config.get('REQUEST_BUDGET_SECONDS'))
+            if input_data["event_data"].get("recurrence"):
+                parse_rule(input_data["event_data"]["recurrence"])
+            with self.profiler.request("process_request"), self.profiler.phase("process_request"):
+                result = self.workflow.invoke(input_data)
+                if input_data.get("expand_occurrences", True):
+                    with self.profiler.phase("occurrences"):
+                        result = self._expand_occurrences(result)
+            logger.info("Запрос успешно обработан", extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)})
             return result
         except Exception as e:
-            logger.error(f"Ошибка обработки запроса: {str(e)}")
+            logger.error("Ошибка обработки запроса: %s", e)
             return {
                 "error": f"Ошибка обработки запроса: {str(e)}",
-                "input_data": input_data
+                "input_data": input_data,
+                **error_details(e)
             }
 
 
+def write_response(response: Dict[str, Any]):
+    sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def redirect_logging_to_stderr():
+    configure_logging(stream=sys.stderr)
+
+
+def run_stdio(config: Dict[str, str], data_dir: str) -> bool:
+    config.setdefault('WEATHER_CACHE_PATH', os.path.join(data_dir, 'weather_cache.json'))
+    config.setdefault('ADDRESS_ALIASES_PATH', os.path.join(data_dir, 'address_aliases.json'))
+    config.setdefault('EXAMPLES_PATH', os.path.join(data_dir, 'accepted_examples.jsonl'))
+    config.setdefault('IDEMPOTENCY_DIR', os.path.join(data_dir, 'idempotency'))
+    profiler = RequestProfiler.from_config(config, data_dir)
+    agent = EventAgent(config, profiler)
+    session: Dict[str, Any] = {}
+    logger.info("Режим stdio: ожидание запросов")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        with profiler.request("stdio"):
+            try:
+                with profiler.phase("json_read"):
+                    request = json.loads(line)
+            except json.JSONDecodeError as e:
+                write_response({"ok": False, "error": f"Ошибка формата JSON: {str(e)}"})
+                continue
+            request_id = request.pop("id", None)
+            op = request.pop("op", "generate")
+            if op == "shutdown":
+                break
+            if op == "reset":
+                session = {}
+                write_response({"id": request_id, "ok": True})
+                continue
+            if op == "ping":
+                write_response({"id": request_id, "ok": True})
+                continue
+            if op == "generate":
+                state = {"messages": [], "final_output": None, "user_feedback": "", **request}
+            elif op == "feedback" and session:
+                state = {
+                    **copy.deepcopy(session),
+                    "user_feedback": request.get("user_feedback", ""),
+                    "selected_candidate": request.get("selected_candidate"),
+                    "deadline": request.get("deadline"),
+                    "idempotency_key": request.get("idempotency_key")
+                }
+            elif op == "feedback":
+                write_response({"id": request_id, "ok": False, "error": "Нет активной сессии для доработки"})
+                continue
+            else:
+                write_response({"id": request_id, "ok": False, "error": f"Неизвестная операция: {op}"})
+                continue
+            result = agent.process_request(state)
+            if "error" in result:
+                write_response({"id": request_id, "ok": False, "error": result["error"]})
+                continue
+            session = result
+            with profiler.phase("json_write"):
+                write_response({
+                    "id": request_id,
+                    "ok": True,
+                    "final_output": result.get("final_output"),
+                    "candidates": result.get("candidates"),
+                    "messages": result.get("messages"),
+                    "metrics": result.get("metrics"),
+                    "degraded": result.get("degraded"),
+                    "degraded_reasons": result.get("degraded_reasons"),
+                    "regeneration_failed": result.get("regeneration_failed"),
+                    "occurrences": result.get("occurrences")
+                })
+    logger.info("Режим stdio: завершение")
+    return True
+
+
 def main(input_file: str, config: Dict[str, str]) -> bool:
-    logger.info(f"Обработка файла: {input_file}")
+    logger.info("Обработка файла: %s", input_file)
+    data_dir = os.path.dirname(os.path.abspath(input_file))
+    config.setdefault('WEATHER_CACHE_PATH', os.path.join(data_dir, 'weather_cache.json'))
+    config.setdefault('ADDRESS_ALIASES_PATH', os.path.join(data_dir, 'address_aliases.json'))
+    config.setdefault('EXAMPLES_PATH', os.path.join(data_dir, 'accepted_examples.jsonl'))
+    config.setdefault('IDEMPOTENCY_DIR', os.path.join(data_dir, 'idempotency'))
+    profiler = RequestProfiler.from_config(config, data_dir)
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            input_data = json.load(f)
-        agent = EventAgent(config)
-        result = agent.process_request(input_data)
-        with open(input_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        with profiler.request(os.path.basename(input_file)):
+            with profiler.phase("json_read"), open(input_file, 'r', encoding='utf-8') as f:
+                input_data = json.load(f)
+            with profiler.phase("agent_init"):
+                agent = EventAgent(config, profiler)
+            result = agent.process_request(input_data)
+            with profiler.phase("json_write"), open(input_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
         logger.info("Результат успешно сохранен")
         return True
     except FileNotFoundError:
-        logger.error(f"Файл не найден: {input_file}")
+        logger.error("Файл не найден: %s", input_file)
     except json.JSONDecodeError:
-        logger.error(f"Ошибка формата JSON в файле: {input_file}")
+        logger.error("Ошибка формата JSON в файле: %s", input_file)
     except Exception as e:
-        logger.error(f"Критическая ошибка: {str(e)}")
+        logger.error("Критическая ошибка: %s", e)
     return False
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        logger.error("Использование: python event_helper.py <input.json>")
+    profile = "--profile" in sys.argv
+    if profile:
+        sys.argv.remove("--profile")
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[1] != "--stdio"):
+        logger.error("Использование: python event_helper.py [--profile] <input.json> | --stdio [data_dir]")
         sys.exit(1)
+    if sys.argv[1] == "--stdio":
+        redirect_logging_to_stderr()
     config = ConfigLoader.load_config()
-    success = main(sys.argv[1], config)
+    configure_logging(config)
+    if profile:
+        config['PROFILE'] = True
+    if sys.argv[1] == "--stdio":
+        success = run_stdio(config, sys.argv[2] if len(sys.argv) == 3 else "data")
+    else:
+        success = main(sys.argv[1], config)
     sys.exit(0 if success else 1)
\ No newline at end of file
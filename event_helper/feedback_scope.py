@@ -0,0 +1,102 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from output_parser import DECORATED_TAG, DESCRIPTION_TAG, NAME_TAG, TITLE_PREFIX, parse_output
+
+FIELDS = ("title", "description")
+TOKEN_PATTERN = re.compile(r'\w{1,4}|[^\w\s]')
+WORD_PATTERN = re.compile(r'[\w@]+')
+CLAUSE_SPLIT = re.compile(r'[.!?;,\n]+|\s(?:а|но|зато|однако)\s', re.IGNORECASE)
+
+FIELD_STEMS = {
+    "title": ("назван", "заголов", "тема", "тему", "темы", "имя", "переимен", "title", "name"),
+    "description": ("описан", "текст", "абзац", "description")
+}
+DESCRIPTION_HINTS = ("добав", "допиш", "укаж", "упомян", "ссылк", "контакт", "телефон", "почт", "@", "http")
+KEEP_PATTERN = re.compile(r'(?<!не )(?:устраивает|нравится|хорош|отличн)|остав|не меняй|не трогай|не измен|без изменен')
+
+
+def estimate_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _mentioned(clause: str) -> List[str]:
+    words = WORD_PATTERN.findall(clause)
+    return [field for field in FIELDS if any(word.startswith(FIELD_STEMS[field]) for word in words)]
+
+
+def classify_feedback(feedback: str) -> List[str]:
+    text = feedback.lower()
+    targeted, kept = set(), set()
+    for clause in CLAUSE_SPLIT.split(text):
+        fields = _mentioned(clause)
+        if KEEP_PATTERN.search(clause):
+            kept.update(fields)
+        else:
+            targeted.update(fields)
+    if not targeted and not kept and any(hint in text for hint in DESCRIPTION_HINTS):
+        targeted.add("description")
+    fields = (targeted or set(FIELDS)) - kept
+    return [field for field in FIELDS if field in fields] or list(FIELDS)
+
+
+def partial_fields(feedback: str, current: Optional[Dict[str, str]], history_length: int) -> Optional[List[str]]:
+    fields = classify_feedback(feedback)
+    if current is None or len(fields) != 1 or history_length < 2:
+        return None
+    return fields
+
+
+def current_output(state: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    candidates = state.get("candidates") or []
+    selected = state.get("selected_candidate")
+    if selected is not None and 0 <= selected < len(candidates):
+        return candidates[selected]
+    output = state.get("final_output")
+    if output and output.get("title") and output.get("description"):
+        return output
+    for message in reversed(state.get("messages") or []):
+        if message["role"] == "assistant":
+            parsed, _ = parse_output(message["content"], False)
+            return parsed[0] if parsed else None
+    return None
+
+
+def partial_instruction(fields: Sequence[str], current: Dict[str, str], feedback: str, subject: str) -> str:
+    if list(fields) == ["title"]:
+        task = f"Измени только название {subject} с учетом фидбека, описание не меняй. Выведи только новое название строго в формате:\n[NAME] Название {subject}"
+    else:
+        task = f"Измени только описание {subject} с учетом фидбека, название не меняй. Выведи только новое описание строго в формате:\n[DESCRIPTION] Текст описания"
+    return (
+        f"Текущее название: {current['title']}\n"
+        f"Текущее описание:\n{current['description']}\n\n"
+        f"Пользовательский фидбек: {feedback}\n{task}"
+    )
+
+
+def parse_fields(content: str, fields: Sequence[str]) -> Optional[Dict[str, str]]:
+    text = DECORATED_TAG.sub(r'\1 ', content).strip()
+    name_parts = NAME_TAG.split(text, maxsplit=1)
+    description_parts = DESCRIPTION_TAG.split(text, maxsplit=1)
+    result = {}
+    if "title" in fields:
+        if len(name_parts) == 2:
+            title = DESCRIPTION_TAG.split(name_parts[1], maxsplit=1)[0].strip()
+        else:
+            lines = [line for line in text.splitlines() if line.strip()]
+            title = TITLE_PREFIX.sub("", lines[0].strip("*#_ ")).strip("*_ ") if len(lines) == 1 else ""
+        title = title.splitlines()[0].strip() if title else ""
+        if not title or len(title.split()) > 15:
+            return None
+        result["title"] = title
+    if "description" in fields:
+        if len(description_parts) == 2:
+            description = description_parts[1].strip()
+        elif len(name_parts) == 1:
+            description = text
+        else:
+            description = ""
+        if not description:
+            return None
+        result["description"] = description
+    return result
\ No newline at end of file
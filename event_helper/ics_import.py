@@ -0,0 +1,368 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone, tzinfo
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from batch_jobs import BatchRunner
+from profiling import RequestProfiler
+from recurrence import parse_rule
+
+DEDUP_ENTRIES = 256
+
+logger = logging.getLogger("IcsImport")
+
+Properties = Dict[str, Tuple[Dict[str, str], str]]
+
+
+def read_unfolded_lines(stream: TextIO) -> Iterator[str]:
+    current = None
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def read_items(stream: TextIO, component: str) -> Iterator[Tuple[str, List[str]]]:
+    lines: Optional[List[str]] = None
+    for line in read_unfolded_lines(stream):
+        if lines is None:
+            if line.upper() == f"BEGIN:{component}":
+                lines = [line]
+            else:
+                yield "raw", [line]
+        else:
+            lines.append(line)
+            if line.upper() == f"END:{component}":
+                yield "component", lines
+                lines = None
+    if lines is not None:
+        yield "raw", lines
+
+
+def parse_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    in_quotes = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ':' and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return line.upper(), {}, ""
+    parts = head.split(';')
+    params = {}
+    for part in parts[1:]:
+        if '=' in part:
+            key, val = part.split('=', 1)
+            params[key.upper()] = val.strip('"')
+    return parts[0].upper(), params, value
+
+
+def component_properties(lines: List[str]) -> Properties:
+    props: Properties = {}
+    depth = 0
+    for line in lines[1:-1]:
+        name, params, value = parse_property(line)
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            depth -= 1
+        elif depth == 0 and name not in props:
+            props[name] = (params, value)
+    return props
+
+
+def unescape_text(value: str) -> str:
+    return re.sub(r'\\([\\;,nN])', lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def escape_text(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold_line(line: str) -> str:
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    chunks = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def local_zone(config: Dict[str, Any]) -> Optional[tzinfo]:
+    name = config.get('ICS_TIMEZONE')
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Неизвестный часовой пояс ICS_TIMEZONE %s, используется часовой пояс системы", name)
+        return None
+
+
+def source_zone(value: str, params: Dict[str, str]) -> Optional[tzinfo]:
+    if value.upper().endswith("Z"):
+        return timezone.utc
+    tzid = params.get("TZID", "").lstrip("/")
+    if not tzid:
+        return None
+    try:
+        return ZoneInfo(tzid)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Неизвестный часовой пояс %s, время используется как указано", tzid)
+        return None
+
+
+def parse_ics_datetime(value: str, params: Dict[str, str], zone: Optional[tzinfo] = None) -> Tuple[str, Optional[str]]:
+    value = value.strip()
+    date = f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+    if params.get("VALUE", "").upper() == "DATE" or "T" not in value:
+        return date, None
+    time_part = value.split("T", 1)[1]
+    source = source_zone(value, params)
+    if source is None:
+        return date, f"{time_part[0:2]}:{time_part[2:4]}"
+    moment = datetime.strptime(f"{value[0:8]}{time_part[0:4]}", "%Y%m%d%H%M").replace(tzinfo=source).astimezone(zone)
+    return moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M")
+
+
+def with_recurrence(data: Dict[str, Any], props: Properties) -> Dict[str, Any]:
+    rule = props.get("RRULE", ({}, ""))[1].strip()
+    if not rule:
+        return data
+    try:
+        parse_rule(rule)
+    except ValueError as e:
+        logger.warning("Правило повторения не поддерживается, элемент генерируется как однократный: %s", e)
+        return data
+    return {**data, "recurrence": rule}
+
+
+def apply_output(lines: List[str], output: Dict[str, str]) -> List[str]:
+    result = [lines[0]]
+    depth = 1
+    replaced = set()
+    for line in lines[1:-1]:
+        name, _, _ = parse_property(line)
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            depth -= 1
+        elif depth == 1 and name in ("SUMMARY", "DESCRIPTION"):
+            if name in replaced:
+                continue
+            replaced.add(name)
+            key = "title" if name == "SUMMARY" else "description"
+            line = f"{name}:{escape_text(output[key])}"
+        result.append(line)
+    for name, key in (("DESCRIPTION", "description"), ("SUMMARY", "title")):
+        if name not in replaced:
+            result.insert(1, f"{name}:{escape_text(output[key])}")
+    result.append(lines[-1])
+    return result
+
+
+def request_key(data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, output_file: str):
+        self.path = output_file + ".checkpoint.json"
+
+    def load(self) -> Dict[str, int]:
+        if not os.path.exists(self.path):
+            return {"items_done": 0, "output_bytes": 0}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, items_done: int, output_bytes: int):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"items_done": items_done, "output_bytes": output_bytes}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class IcsBulkProcessor(ABC):
+    component = ""
+
+    def __init__(self, agent: Any, concurrency: int = 4, style: Optional[Dict[str, bool]] = None,
+                 profiler: Optional[RequestProfiler] = None, zone: Optional[tzinfo] = None):
+        self.agent = agent
+        self.zone = zone
+        self.profiler = profiler or RequestProfiler()
+        self.concurrency = max(1, concurrency)
+        self.style = style or {"brief": False, "formal": False}
+        self.dedup_entries = max(self.concurrency * 4, DEDUP_ENTRIES)
+        self.results: "OrderedDict[str, Future]" = OrderedDict()
+        self.stats = {"components": 0, "generated": 0, "deduplicated": 0, "failed": 0, "skipped": 0}
+
+    @abstractmethod
+    def to_data(self, lines: List[str]) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def _generate(self, data: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        pass
+
+    @abstractmethod
+    def _prepare_batch(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any], Dict[str, Any]]:
+        pass
+
+    def _submit(self, executor: ThreadPoolExecutor, lines: List[str]) -> Optional[Future]:
+        data = self.to_data(lines)
+        if data is None:
+            self.stats["skipped"] += 1
+            return None
+        key = request_key(data)
+        if key in self.results:
+            self.stats["deduplicated"] += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+        if len(self.results) >= self.dedup_entries:
+            self.results.popitem(last=False)
+        future = executor.submit(self._generate, data)
+        self.results[key] = future
+        self.stats["generated"] += 1
+        return future
+
+    def run(self, input_file: str, output_file: str, resume: bool = True) -> Dict[str, int]:
+        with self.profiler.request("ics_bulk"):
+            return self._run(input_file, output_file, resume)
+
+    def _run(self, input_file: str, output_file: str, resume: bool) -> Dict[str, int]:
+        checkpoint = Checkpoint(output_file)
+        state = checkpoint.load() if resume else {"items_done": 0, "output_bytes": 0}
+        if state["items_done"]:
+            logger.info("Продолжение обработки с элемента %s", state['items_done'])
+        mode = 'r+b' if state["items_done"] and os.path.exists(output_file) else 'wb'
+        items_done = state["items_done"] if mode == 'r+b' else 0
+
+        with open(input_file, 'r', encoding='utf-8', newline='') as src, open(output_file, mode) as out:
+            out.truncate(state["output_bytes"] if mode == 'r+b' else 0)
+            out.seek(0, os.SEEK_END)
+            window: deque = deque()
+
+            def flush_head():
+                nonlocal items_done
+                kind, lines, future = window.popleft()
+                if kind == "component" and future is not None:
+                    with self.profiler.phase("llm_wait"):
+                        output = future.result()
+                    if output:
+                        lines = apply_output(lines, output)
+                    else:
+                        self.stats["failed"] += 1
+                with self.profiler.phase("write"):
+                    out.write("".join(fold_line(line) for line in lines).encode("utf-8"))
+                items_done += 1
+                if kind == "component":
+                    self.stats["components"] += 1
+                    with self.profiler.phase("checkpoint"):
+                        out.flush()
+                        checkpoint.save(items_done, out.tell())
+                    if self.stats["components"] % 100 == 0:
+                        logger.info("Обработано элементов %s: %s", self.component, self.stats['components'])
+
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for index, (kind, lines) in enumerate(read_items(src, self.component)):
+                    if index < items_done:
+                        continue
+                    future = self._submit(executor, lines) if kind == "component" else None
+                    window.append((kind, lines, future))
+                    while len(window) > self.concurrency * 4 or (window and window[0][2] is None):
+                        flush_head()
+                while window:
+                    flush_head()
+
+        checkpoint.clear()
+        logger.info("Импорт завершен: %s", self.stats)
+        return self.stats
+
+    def _batch_output(self, item: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+        if item is None or item["status"] != "done":
+            if item is not None:
+                logger.warning("Запрос не выполнен в пакетном режиме: %s", item.get('error'))
+            return None
+        state = self.agent.apply_batch_result(item["context"], item["result"]["content"], item["result"].get("usage"))
+        if state["metrics"]["parse"]["status"] == "failed":
+            return None
+        return state["final_output"]
+
+    def run_batch(self, input_file: str, output_file: str, runner: BatchRunner) -> Dict[str, int]:
+        with self.profiler.request("ics_bulk_batch"):
+            return self._run_batch(input_file, output_file, runner)
+
+    def _run_batch(self, input_file: str, output_file: str, runner: BatchRunner) -> Dict[str, int]:
+        seen = set()
+        with self.profiler.phase("prepare"), open(input_file, 'r', encoding='utf-8', newline='') as src:
+            for kind, lines in read_items(src, self.component):
+                if kind != "component":
+                    continue
+                data = self.to_data(lines)
+                if data is None:
+                    continue
+                key = request_key(data)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if runner.has(key):
+                    continue
+                state, lc_messages, invoke_params = self._prepare_batch(data)
+                runner.add(key, lc_messages, state, **invoke_params)
+        logger.info("Подготовлено запросов для пакетной обработки: %s", len(seen))
+        with self.profiler.phase("batch_wait"):
+            runner.run()
+
+        results = runner.results()
+        tmp_path = output_file + ".tmp"
+        with self.profiler.phase("write"), \
+                open(input_file, 'r', encoding='utf-8', newline='') as src, open(tmp_path, 'wb') as out:
+            for kind, lines in read_items(src, self.component):
+                if kind == "component":
+                    data = self.to_data(lines)
+                    if data is None:
+                        self.stats["skipped"] += 1
+                    else:
+                        key = request_key(data)
+                        if key in seen:
+                            seen.discard(key)
+                            self.stats["generated"] += 1
+                        else:
+                            self.stats["deduplicated"] += 1
+                        output = self._batch_output(results.get(key))
+                        if output:
+                            lines = apply_output(lines, output)
+                        else:
+                            self.stats["failed"] += 1
+                    self.stats["components"] += 1
+                out.write("".join(fold_line(line) for line in lines).encode("utf-8"))
+        os.replace(tmp_path, output_file)
+        runner.clear()
+        logger.info("Импорт в пакетном режиме завершен: %s", self.stats)
+        return self.stats
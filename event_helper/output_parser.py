@@ -0,0 +1,162 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+NAME_TAG = re.compile(r'\[NAME\s*\d*\]', re.IGNORECASE)
+DESCRIPTION_TAG = re.compile(r'\[DESCRIPTION\s*\d*\]', re.IGNORECASE)
+DECORATED_TAG = re.compile(r'[*_#]*\s*(\[(?:NAME|DESCRIPTION)\s*\d*\])\s*[*_:]*', re.IGNORECASE)
+TITLE_PREFIX = re.compile(r'^\W*(?:название|заголовок|title)\W*\s*', re.IGNORECASE)
+CODE_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.IGNORECASE)
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "candidates": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "description": {"type": "string"}
+                },
+                "required": ["title", "description"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["candidates"],
+    "additionalProperties": False
+}
+
+REASK_INSTRUCTION = (
+    "Предыдущий ответ не удалось разобрать. Повтори тот же результат строго в виде JSON-объекта "
+    "{\"candidates\": [{\"title\": \"...\", \"description\": \"...\"}]} без пояснений и разметки."
+)
+
+
+def response_format() -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "calendar_item", "strict": True, "schema": OUTPUT_SCHEMA}
+    }
+
+
+def json_instruction(count: int, subject: str) -> str:
+    variants = "один вариант" if count == 1 else f"{count} заметно различающихся варианта(ов)"
+    return (
+        f"Верни {variants} названия и описания {subject} строго в виде JSON-объекта "
+        "{\"candidates\": [{\"title\": \"Название\", \"description\": \"Текст описания\"}]} "
+        "без пояснений, тегов и markdown-разметки."
+    )
+
+
+def _valid_candidates(data: Any) -> Optional[List[Dict[str, str]]]:
+    if isinstance(data, dict) and "candidates" in data:
+        data = data["candidates"]
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return None
+    candidates = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        title, description = item.get("title"), item.get("description")
+        if isinstance(title, str) and isinstance(description, str) and title.strip() and description.strip():
+            candidates.append({"title": title.strip(), "description": description.strip()})
+    return candidates or None
+
+
+def parse_json(content: str) -> Optional[List[Dict[str, str]]]:
+    try:
+        return _valid_candidates(json.loads(content))
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def _close_json(text: str) -> str:
+    stack = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return text.rstrip().rstrip(',') + "".join(reversed(stack))
+
+
+def repair_json(content: str) -> Optional[List[Dict[str, str]]]:
+    text = CODE_FENCE.sub("", content.strip())
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        return None
+    text = text[min(starts):].replace('“', '"').replace('”', '"').replace('„', '"')
+    for candidate in (text[:max(text.rfind('}'), text.rfind(']')) + 1], _close_json(text)):
+        parsed = parse_json(TRAILING_COMMA.sub(r'\1', candidate))
+        if parsed:
+            return parsed
+    return None
+
+
+def parse_tagged(content: str) -> List[Dict[str, str]]:
+    text = DECORATED_TAG.sub(r'\1 ', content)
+    candidates = []
+    for block in NAME_TAG.split(text)[1:]:
+        parts = DESCRIPTION_TAG.split(block, maxsplit=1)
+        if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+            continue
+        candidates.append({
+            "title": parts[0].strip().splitlines()[0].strip(),
+            "description": parts[1].strip()
+        })
+    return candidates
+
+
+def repair_tagged(content: str) -> Optional[List[Dict[str, str]]]:
+    lines = [line.strip() for line in content.strip().splitlines() if line.strip()]
+    if len(lines) < 2:
+        return None
+    title = TITLE_PREFIX.sub("", lines[0].strip("*#_ ")).strip("*_ ")
+    description = "\n".join(lines[1:]).strip()
+    description = re.sub(r'^\W*(?:описание|description)\W*\s*', "", description, flags=re.IGNORECASE)
+    if not title or not description or len(title.split()) > 15:
+        return None
+    return [{"title": title, "description": description}]
+
+
+def parse_output(content: str, structured: bool) -> Tuple[List[Dict[str, str]], str]:
+    if structured:
+        candidates = parse_json(content)
+        if candidates:
+            return candidates, "ok"
+        candidates = repair_json(content) or parse_tagged(content)
+        return (candidates, "repaired") if candidates else ([], "failed")
+    candidates = parse_tagged(content)
+    if candidates:
+        return candidates, "ok"
+    candidates = repair_json(content) or repair_tagged(content)
+    return (candidates, "repaired") if candidates else ([], "failed")
+
+
+def fallback_candidate(prompt: str, details: List[str], max_words: int = 10) -> Dict[str, str]:
+    text = " ".join(prompt.split())
+    text = text[:1].upper() + text[1:]
+    sentence = re.split(r'(?<=[.!?])\s', text, maxsplit=1)[0].rstrip(".!?,;: ")
+    title = " ".join(sentence.split()[:max_words])
+    description = "\n".join([text] + [detail for detail in details if detail]).strip()
+    return {
+        "title": title or "Без названия",
+        "description": description or "Описание не сгенерировано"
+    }
\ No newline at end of file
@@ -0,0 +1,130 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from structured_logging import log_context
+
+logger = logging.getLogger("Profiler")
+
+
+class RequestProfiler:
+    def __init__(self, output_dir: Optional[str] = None, enabled: bool = False, top: int = 15):
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.top = top
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], default_dir: str = "data") -> "RequestProfiler":
+        return cls(
+            config.get('PROFILE_DIR') or os.path.join(default_dir, 'profiles'),
+            enabled=bool(config.get('PROFILE')),
+            top=int(config.get('PROFILE_TOP', 15))
+        )
+
+    @contextmanager
+    def request(self, label: str) -> Iterator[None]:
+        if not self.enabled or getattr(self.local, "active", None) is not None:
+            yield
+            return
+        self.local.active = {"phases": {}, "stack": []}
+        profile = cProfile.Profile()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            phases = self.local.active["phases"]
+            self.local.active = None
+            self._report(label, profile, (time.perf_counter() - wall) * 1000, (time.thread_time() - cpu) * 1000, phases)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        active = getattr(self.local, "active", None)
+        if active is None:
+            yield
+            return
+        path = "/".join(active["stack"] + [name])
+        entry = active["phases"].setdefault(path, {"wall_ms": 0.0, "cpu_ms": 0.0, "calls": 0})
+        active["stack"].append(name)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            active["stack"].pop()
+            entry["wall_ms"] += (time.perf_counter() - wall) * 1000
+            entry["cpu_ms"] += (time.thread_time() - cpu) * 1000
+            entry["calls"] += 1
+
+    def wrap(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            with log_context(node=name), self.phase(name):
+                result = func(*args, **kwargs)
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                logger.debug("Узел %s выполнен за %s мс", name, duration_ms, extra={"duration_ms": duration_ms})
+            return result
+        return wrapped
+
+    def _top_functions(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [{
+            "function": f"{os.path.basename(filename)}:{line}({function})",
+            "self_ms": round(own * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2),
+            "calls": calls
+        } for (filename, line, function), (_, calls, own, cumulative, _) in rows]
+
+    def _report(self, label: str, profile: cProfile.Profile, wall_ms: float, cpu_ms: float,
+                phases: Dict[str, Dict[str, Any]]):
+        stats = pstats.Stats(profile)
+        for path, entry in phases.items():
+            children = sum(
+                other["wall_ms"] for other_path, other in phases.items()
+                if other_path.startswith(path + "/") and "/" not in other_path[len(path) + 1:]
+            )
+            entry["own_ms"] = entry["wall_ms"] - children
+        outside_ms = wall_ms - sum(entry["wall_ms"] for path, entry in phases.items() if "/" not in path)
+        top = self._top_functions(stats)
+        lines = [f"Профиль запроса {label}: {wall_ms:.1f} мс, CPU {cpu_ms:.1f} мс"]
+        lines += [
+            f"  {path}: {entry['wall_ms']:.1f} мс (собственное {entry['own_ms']:.1f} мс, CPU {entry['cpu_ms']:.1f} мс)"
+            for path, entry in phases.items()
+        ]
+        lines.append(f"  вне этапов: {outside_ms:.1f} мс")
+        lines.append("Функции с наибольшим собственным временем:")
+        lines += [f"  {item['self_ms']:9.2f} мс {item['calls']:7d}  {item['function']}" for item in top]
+        logger.info("\n".join(lines))
+        if not self.output_dir:
+            return
+        with self.lock:
+            self.counter += 1
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.counter}-{label}.prof"
+        summary = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "label": label,
+            "wall_ms": round(wall_ms, 2),
+            "cpu_ms": round(cpu_ms, 2),
+            "outside_phases_ms": round(outside_ms, 2),
+            "phases": {path: {key: round(value, 2) for key, value in entry.items()} for path, entry in phases.items()},
+            "top_self_time": top,
+            "pstats": name
+        }
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stats.dump_stats(os.path.join(self.output_dir, name))
+            with self.lock, open(os.path.join(self.output_dir, "profile_summary.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning("Не удалось сохранить профиль: %s", e)
\ No newline at end of file
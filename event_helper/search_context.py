@@ -0,0 +1,109 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r'\w{1,4}|[^\w\s]')
+WORD_PATTERN = re.compile(r'\w+')
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+|\s*\n+\s*|\s+[|•·]\s+')
+BOILERPLATE_MARKERS = (
+    "cookie", "javascript", "подпис", "реклам", "все права", "©", "войти", "регистрац",
+    "скачать приложение", "политик", "читать далее", "подробнее", "главная", "меню"
+)
+MONTHS_GENITIVE = (
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря"
+)
+WEEKDAYS = ("понедельник", "вторник", "сред", "четверг", "пятниц", "суббот", "воскресень")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def clip_tokens(text: str, limit: int) -> str:
+    for index, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        if index == limit:
+            return text[:match.start()].rstrip() + "…"
+    return text
+
+
+def date_keywords(date: str) -> List[str]:
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return [date]
+    return [
+        date,
+        f"{day.day} {MONTHS_GENITIVE[day.month - 1]}",
+        f"{day.day:02d}.{day.month:02d}",
+        f"{day.day}.{day.month:02d}",
+        WEEKDAYS[day.weekday()]
+    ]
+
+
+class SearchContextBuilder:
+    def __init__(self, token_budget: int = 250, max_sentence_tokens: int = 60, similarity: float = 0.6):
+        self.token_budget = token_budget
+        self.max_sentence_tokens = max_sentence_tokens
+        self.similarity = similarity
+
+    @staticmethod
+    def raw_context(results: Sequence[Dict[str, Any]], content_limit: Optional[int] = None) -> str:
+        return "\n".join(
+            f"Title: {res.get('title', '')}\nContent: {(res.get('content', '') or '')[:content_limit]}" for res in results
+        ).strip()
+
+    @staticmethod
+    def _words(text: str) -> set:
+        return set(WORD_PATTERN.findall(text.lower().replace('ё', 'е')))
+
+    def _sentences(self, results: Sequence[Dict[str, Any]]) -> List[Tuple[int, str]]:
+        sentences = []
+        for rank, res in enumerate(results):
+            for part in [res.get("title", "")] + SENTENCE_SPLIT.split(res.get("content", "") or ""):
+                part = part.strip(" -–—:;,")
+                lowered = part.lower()
+                if len(self._words(part)) < 3 or any(marker in lowered for marker in BOILERPLATE_MARKERS):
+                    continue
+                sentences.append((rank, part))
+        return sentences
+
+    def _is_duplicate(self, words: set, kept: List[set]) -> bool:
+        for other in kept:
+            overlap = len(words & other) / max(1, min(len(words), len(other)))
+            if overlap >= self.similarity:
+                return True
+        return False
+
+    def build(self, results: Sequence[Dict[str, Any]], keywords: Sequence[str],
+              content_limit: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+        raw_tokens = estimate_tokens(self.raw_context(results, content_limit))
+        keywords = [keyword.lower().replace('ё', 'е') for keyword in keywords if keyword]
+        candidates = []
+        for order, (rank, sentence) in enumerate(self._sentences(results)):
+            lowered = sentence.lower().replace('ё', 'е')
+            hits = sum(1 for keyword in keywords if keyword in lowered)
+            score = hits * 2 + (0.5 if any(char.isdigit() for char in sentence) else 0) - rank * 0.3
+            candidates.append((score, hits, order, clip_tokens(sentence, self.max_sentence_tokens)))
+        relevant = [candidate for candidate in candidates if candidate[1] > 0] or candidates
+        selected = []
+        kept_words: List[set] = []
+        used = 0
+        for score, hits, order, sentence in sorted(relevant, key=lambda item: (-item[0], item[2])):
+            words = self._words(sentence)
+            if self._is_duplicate(words, kept_words):
+                continue
+            cost = estimate_tokens(sentence) + 2
+            if used + cost > self.token_budget:
+                continue
+            selected.append((order, sentence))
+            kept_words.append(words)
+            used += cost
+        context = "\n".join(f"- {sentence}" for order, sentence in sorted(selected))
+        context_tokens = estimate_tokens(context)
+        return context, {
+            "raw_tokens": raw_tokens,
+            "context_tokens": context_tokens,
+            "saved_tokens": max(0, raw_tokens - context_tokens),
+            "sentences": len(selected)
+        }
\ No newline at end of file
@@ -0,0 +1,137 @@
+import datetime
+import hashlib
+import json
+import subprocess
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+KILL_TIMEOUT_SECONDS = 15
+
+
+def fingerprint(input_data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(input_data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class Speculation:
+    def __init__(self, key: str, input_file: Path, process: subprocess.Popen, container_name: str):
+        self.key = key
+        self.input_file = input_file
+        self.process = process
+        self.container_name = container_name
+        self.started = time.perf_counter()
+
+    def cancel(self):
+        if self.process.poll() is None:
+            try:
+                subprocess.run(
+                    ["docker", "rm", "-f", self.container_name],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=KILL_TIMEOUT_SECONDS
+                )
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self.process.terminate()
+            try:
+                self.process.communicate(timeout=KILL_TIMEOUT_SECONDS)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.communicate()
+        self.cleanup()
+
+    def cleanup(self):
+        self.input_file.unlink(missing_ok=True)
+
+
+class SpeculativeRunner:
+    def __init__(self, build_command: Callable[[str, Optional[str]], List[str]], data_dir: Path, debounce_seconds: float):
+        self.build_command = build_command
+        self.data_dir = data_dir
+        self.metrics_file = data_dir / "speculation_metrics.jsonl"
+        self.debounce_seconds = debounce_seconds
+        self.pending_key: Optional[str] = None
+        self.changed_at = time.monotonic()
+        self.current: Optional[Speculation] = None
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "wasted": 0}
+
+    def _record(self, event: str, **fields: Any):
+        self.stats[event] += 1
+        record = {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "event": event, **fields}
+        with open(self.metrics_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _start(self, key: str, input_data: Dict[str, Any]):
+        run_id = uuid.uuid4().hex
+        input_file = self.data_dir / f"speculative_{run_id}.json"
+        container_name = f"speculative-{run_id}"
+        with open(input_file, "w", encoding="utf-8") as f:
+            json.dump(input_data, f, ensure_ascii=False, indent=2)
+        process = subprocess.Popen(
+            self.build_command(input_file.name, container_name),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        self.current = Speculation(key, input_file, process, container_name)
+        self._record("started")
+
+    def cancel(self):
+        if self.current is not None:
+            self.current.cancel()
+            self._record("wasted")
+            self.current = None
+
+    def observe(self, input_data: Dict[str, Any], ready: bool):
+        key = fingerprint(input_data)
+        now = time.monotonic()
+        if key != self.pending_key:
+            self.pending_key = key
+            self.changed_at = now
+            if self.current is not None and self.current.key != key:
+                self.cancel()
+            return
+        if not ready or now - self.changed_at < self.debounce_seconds:
+            return
+        if self.current is None or self.current.key != key:
+            self._start(key, input_data)
+
+    def take(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = fingerprint(input_data)
+        speculation = self.current
+        self.current = None
+        self.pending_key = None
+        if speculation is None or speculation.key != key:
+            if speculation is not None:
+                self.current = speculation
+                self.cancel()
+            self._record("misses")
+            return None
+        head_start = time.perf_counter() - speculation.started
+        speculation.process.communicate()
+        try:
+            if speculation.process.returncode != 0:
+                return self._fail("process_error")
+            with open(speculation.input_file, "r", encoding="utf-8") as f:
+                result_data = json.load(f)
+            if "error" in result_data:
+                return self._fail("generation_error")
+            self._record("hits", head_start_seconds=round(head_start, 3))
+            return result_data
+        except (OSError, json.JSONDecodeError):
+            return self._fail("unreadable_result")
+        finally:
+            speculation.cleanup()
+
+    def _fail(self, reason: str) -> None:
+        self._record("wasted", reason=reason)
+        self._record("misses")
+        return None
+
+    def summary(self) -> str:
+        decided = self.stats["hits"] + self.stats["misses"]
+        hit_rate = 100 * self.stats["hits"] / decided if decided else 0.0
+        return (
+            f"Спекулятивная генерация: запусков {self.stats['started']}, попаданий {self.stats['hits']} "
+            f"({hit_rate:.0f}%), впустую {self.stats['wasted']}"
+        )
\ No newline at end of file
@@ -0,0 +1,60 @@
+import json
+
+from address_index import AddressIndex
+
+
+def test_gazetteer_lookup_normalizes_address_variants():
+    index = AddressIndex()
+    first = index.canonicalize("Москва, Ленинградский пр. 39")
+    second = index.canonicalize("г. Москва, Ленинградский проспект, д.39")
+    assert first == second
+    assert first.city == "москва" and first.venue == "ленинградский проспект 39"
+    assert first.weather_key == "москва"
+    assert index.canonicalize("СПб, Невский пр., 28").city == "санкт-петербург"
+    assert index.canonicalize("Парк Горького").city == "москва"
+    assert index.coordinates("москва") == (55.7558, 37.6173)
+    assert index.coordinates(None) is None
+
+
+def test_online_addresses():
+    index = AddressIndex()
+    for address in ("online", "", "https://zoom.us/j/123", "Онлайн, ссылка в приглашении", "https://example.com/room"):
+        canonical = index.canonicalize(address)
+        assert canonical.online and canonical.key == "online"
+    assert not index.is_online("Москва, https://example.com/map, Тверская 1")
+
+
+def test_learned_alias_resolves_venue_without_city(tmp_path):
+    path = tmp_path / "aliases.json"
+    index = AddressIndex(aliases_path=str(path), flush_seconds=3600)
+    assert index.canonicalize("Технопарк Сколково").city is None
+    index.canonicalize("Москва, Технопарк Сколково")
+    resolved = index.canonicalize("Технопарк Сколково")
+    assert resolved.city == "москва" and resolved.key == "москва|технопарк сколково"
+
+    index.learn("технопарк сколково", "санкт-петербург")
+    assert index.canonicalize("Технопарк Сколково").city is None
+
+
+def test_alias_writes_are_buffered_until_flush(tmp_path):
+    path = tmp_path / "aliases.json"
+    index = AddressIndex(aliases_path=str(path), flush_seconds=3600)
+    for number in range(20):
+        index.canonicalize(f"Москва, Бизнес-центр номер {number}")
+    assert not path.exists()
+    index.flush()
+    learned = json.loads(path.read_text(encoding="utf-8"))
+    assert len(learned) == 20 and learned["бизнес-центр номер 7"] == ["москва"]
+    saved_at = path.stat().st_mtime_ns
+    index.flush()
+    assert path.stat().st_mtime_ns == saved_at
+
+    reloaded = AddressIndex(aliases_path=str(path))
+    assert reloaded.canonicalize("Бизнес-центр номер 7").city == "москва"
+
+
+def test_alias_writes_flush_after_interval(tmp_path):
+    path = tmp_path / "aliases.json"
+    index = AddressIndex(aliases_path=str(path), flush_seconds=0)
+    index.canonicalize("Москва, Бизнес-центр Восход")
+    assert json.loads(path.read_text(encoding="utf-8")) == {"бизнес-центр восход": ["москва"]}
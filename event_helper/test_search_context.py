@@ -0,0 +1,78 @@
+from search_context import SearchContextBuilder, clip_tokens, date_keywords, estimate_tokens
+
+RESULTS = [
+    {
+        "title": "Прогноз погоды в Москве на 8 марта",
+        "content": "В субботу 8 марта в Москве ожидается облачная погода, около +3 градусов. "
+                   "Принять cookie и войти в личный кабинет. "
+                   "Ветер юго-западный, 5 м/с."
+    },
+    {
+        "title": "Погода Москва",
+        "content": "В субботу 8 марта в Москве ожидается облачная погода и около +3 градусов днем. "
+                   "Подпишитесь на рассылку, чтобы не пропустить новости."
+    },
+    {
+        "title": "Новости города",
+        "content": "Городские службы готовятся к праздничным мероприятиям на выходных."
+    }
+]
+KEYWORDS = ["погод", "8 марта", "москв"]
+
+
+def test_removes_boilerplate_and_near_duplicates():
+    context, stats = SearchContextBuilder().build(RESULTS, KEYWORDS)
+    lines = context.split("\n")
+    assert all(line.startswith("- ") for line in lines)
+    assert not any(marker in context.lower() for marker in ("cookie", "подпис"))
+    assert sum("облачная погода" in line for line in lines) == 1
+    assert stats["sentences"] == len(lines)
+    assert stats["context_tokens"] == estimate_tokens(context)
+    assert stats["saved_tokens"] == stats["raw_tokens"] - stats["context_tokens"] > 0
+
+
+def test_keeps_relevant_sentences_in_source_order():
+    context, _ = SearchContextBuilder().build(RESULTS, KEYWORDS)
+    assert "праздничным мероприятиям" not in context
+    lines = context.split("\n")
+    assert lines[0] == "- Прогноз погоды в Москве на 8 марта"
+    assert lines.index("- В субботу 8 марта в Москве ожидается облачная погода, около +3 градусов.") == 1
+
+
+def test_falls_back_to_all_sentences_without_keyword_hits():
+    context, stats = SearchContextBuilder().build(RESULTS[2:], ["снег"])
+    assert context == "- Городские службы готовятся к праздничным мероприятиям на выходных."
+    assert stats["sentences"] == 1
+
+
+def test_respects_token_budget():
+    results = [{"title": "", "content": " ".join(
+        f"Погода в Москве в день номер {n} будет солнечной и теплой." for n in range(40)
+    )}]
+    builder = SearchContextBuilder(token_budget=60, similarity=1.01)
+    context, stats = builder.build(results, ["погода"])
+    assert stats["context_tokens"] <= 60
+    assert 1 < stats["sentences"] < 40
+    unlimited, _ = SearchContextBuilder(token_budget=10_000, similarity=1.01).build(results, ["погода"])
+    assert unlimited.count("\n") + 1 == 40
+
+
+def test_long_sentence_is_clipped():
+    text = "Погода " + "очень " * 100 + "хорошая."
+    context, _ = SearchContextBuilder(max_sentence_tokens=20).build([{"content": text}], ["погода"])
+    assert context.endswith("…")
+    assert estimate_tokens(context) <= 25
+    assert clip_tokens("короткий текст", 20) == "короткий текст"
+
+
+def test_content_limit_only_affects_raw_estimate():
+    builder = SearchContextBuilder()
+    _, full = builder.build(RESULTS, KEYWORDS)
+    _, limited = builder.build(RESULTS, KEYWORDS, content_limit=20)
+    assert limited["raw_tokens"] < full["raw_tokens"]
+    assert limited["context_tokens"] == full["context_tokens"]
+
+
+def test_date_keywords():
+    assert date_keywords("2025-03-08") == ["2025-03-08", "8 марта", "08.03", "8.03", "суббот"]
+    assert date_keywords("завтра") == ["завтра"]
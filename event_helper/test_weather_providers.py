@@ -0,0 +1,153 @@
+import json
+import re
+from datetime import date, timedelta
+
+import pytest
+
+from fake_weather_server import FakeWeatherServer, synthetic_hourly
+from search_context import SearchContextBuilder
+from weather_providers import (
+    FixtureProvider, Forecast, OpenMeteoProvider, TavilyProvider, WeatherProviderChain, WeatherQuery,
+    create_weather_providers
+)
+
+MOSCOW = {"name": "Москва", "lat": 55.7558, "lon": 37.6173}
+FRAGMENT = re.compile(
+    r"^Москва, \d{2}\.\d{2} \d{2}:00: [+-]\d+ °C(, [а-я ]+)?, "
+    r"(осадки [\d.]+ мм|без осадков)( \(вероятность \d+%\))?, ветер \d+ м/с$"
+)
+
+
+def day_after(days):
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+def make_query(days=1, time="15:00", place=MOSCOW, city="Москва"):
+    return WeatherQuery("Москва, Тверская 1", city, place, day_after(days), time)
+
+
+def fixture_provider(day):
+    return FixtureProvider({"Москва": {"hourly": synthetic_hourly(MOSCOW["lat"], MOSCOW["lon"], day)}})
+
+
+class FakeSearch:
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return self.results
+
+
+def tavily_provider(search):
+    return TavilyProvider(search, SearchContextBuilder(), lambda address, day, time: ["погод", day, time])
+
+
+@pytest.fixture
+def server():
+    with FakeWeatherServer() as server:
+        yield server
+
+
+def test_forecast_render_format():
+    forecast = Forecast("Москва", "2026-03-08T15:00", 3.4, 1.2, 80, 4.6, 61)
+    assert forecast.render() == "Москва, 08.03 15:00: +3 °C, дождь, осадки 1.2 мм (вероятность 80%), ветер 5 м/с"
+    forecast = Forecast("Москва", "2026-01-10T09:00", -7.6, 0.0, None, 2.0, 999)
+    assert forecast.render() == "Москва, 10.01 09:00: -8 °C, без осадков, ветер 2 м/с"
+
+
+def test_open_meteo_renders_requested_hour(server):
+    query = make_query()
+    text, stats = OpenMeteoProvider(server.url).fetch(query)
+    assert FRAGMENT.match(text)
+    assert text.startswith(f"Москва, {date.fromisoformat(query.date):%d.%m} 15:00: ")
+    assert stats["context_tokens"] > 0
+    assert server.requests == 1
+
+
+def test_open_meteo_skips_place_without_coordinates(server):
+    assert OpenMeteoProvider(server.url).fetch(make_query(place={"name": "Москва"})) is None
+    assert server.requests == 0
+
+
+def test_forecast_window_cutoff_skips_request(server):
+    provider = OpenMeteoProvider(server.url, horizon_hours=48)
+    assert provider.fetch(make_query(days=5)) is None
+    assert server.requests == 0
+    assert provider.fetch(make_query(days=1)) is not None
+    assert server.requests == 1
+
+
+def test_chain_moves_past_window_to_search(server):
+    search = FakeSearch([{"title": "Погода в Москве", "content": "Ожидается погода без осадков, около +5 градусов."}])
+    chain = WeatherProviderChain([OpenMeteoProvider(server.url, horizon_hours=48), tavily_provider(search)])
+    text, stats = chain.fetch(make_query(days=5))
+    assert stats["provider"] == "tavily"
+    assert "+5 градусов" in text
+    assert server.requests == 0 and len(search.queries) == 1
+
+
+def test_open_meteo_failure_falls_back_to_fixture():
+    server = FakeWeatherServer().start()
+    url = server.url
+    server.stop()
+    query = make_query()
+    chain = WeatherProviderChain([OpenMeteoProvider(url, timeout=0.5), fixture_provider(query.date)])
+    text, stats = chain.fetch(query)
+    assert stats["provider"] == "fixture"
+    assert FRAGMENT.match(text)
+    assert "latency_ms" in stats
+
+
+def test_open_meteo_failure_falls_back_to_tavily():
+    server = FakeWeatherServer().start()
+    url = server.url
+    server.stop()
+    search = FakeSearch([{"title": "Прогноз погоды", "content": "Днем погода облачная, температура +2 градуса."}])
+    chain = WeatherProviderChain([OpenMeteoProvider(url, timeout=0.5), tavily_provider(search)])
+    text, stats = chain.fetch(make_query())
+    assert stats["provider"] == "tavily"
+    assert text.startswith("- ") and "+2 градуса" in text
+
+
+def test_fixture_matches_same_forecast_as_server(server):
+    query = make_query()
+    live, _ = OpenMeteoProvider(server.url).fetch(query)
+    offline, _ = fixture_provider(query.date).fetch(query)
+    assert live == offline
+
+
+def test_chain_raises_last_error_or_lookup_error():
+    server = FakeWeatherServer().start()
+    url = server.url
+    server.stop()
+    with pytest.raises(OSError):
+        WeatherProviderChain([OpenMeteoProvider(url, timeout=0.5), FixtureProvider({})]).fetch(make_query())
+    with pytest.raises(LookupError):
+        WeatherProviderChain([FixtureProvider({})]).fetch(make_query())
+    with pytest.raises(ValueError):
+        WeatherProviderChain([])
+
+
+def test_create_weather_providers_from_config(tmp_path, server):
+    query = make_query()
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps({"Москва": {"hourly": synthetic_hourly(MOSCOW["lat"], MOSCOW["lon"], query.date)}}),
+                    encoding="utf-8")
+    tavily = tavily_provider(FakeSearch([]))
+    chain = create_weather_providers({
+        "WEATHER_PROVIDERS": ["open-meteo", "fixture", "unknown", "tavily"],
+        "WEATHER_API_URL": server.url,
+        "WEATHER_TIMEOUT_SECONDS": 2,
+        "WEATHER_FIXTURE_PATH": str(path)
+    }, tavily, horizon_hours=72)
+    assert [provider.name for provider in chain.providers] == ["open-meteo", "fixture", "tavily"]
+    assert chain.providers[0].url == server.url and chain.providers[0].horizon_hours == 72
+    assert chain.providers[2] is tavily
+
+    missing = create_weather_providers({
+        "WEATHER_PROVIDERS": ["fixture"], "WEATHER_FIXTURE_PATH": str(tmp_path / "missing.json")
+    }, tavily)
+    assert missing.providers == [tavily]
+    assert [provider.name for provider in create_weather_providers({}, tavily).providers] == ["open-meteo", "tavily"]
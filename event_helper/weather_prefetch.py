@@ -0,0 +1,106 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from event_helper import ConfigLoader, EventAgent, WeatherCache, FORECAST_HORIZON_HOURS
+from profiling import RequestProfiler
+
+logger = logging.getLogger("WeatherPrefetcher")
+
+
+class WeatherPrefetcher:
+    def __init__(self, agent: EventAgent, feed_file: str, workers: int = 2):
+        self.agent = agent
+        self.feed_file = feed_file
+        self.workers = max(1, workers)
+
+    def load_feed(self) -> List[Dict[str, Any]]:
+        with open(self.feed_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        events = []
+        for item in data:
+            event = item.get("event_data", item)
+            if event.get("address") and event.get("date"):
+                events.append(event)
+        return events
+
+    def due_events(self, events: List[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        now = now or time.time()
+        cache = self.agent.weather_cache
+        due = {}
+        for event in events:
+            canonical = self.agent.address_index.canonicalize(event["address"])
+            if canonical.online:
+                continue
+            time_str = event.get("time") or "12:00"
+            hours = WeatherCache.hours_until(event["date"], time_str, now)
+            if hours is None or hours < 0 or hours > FORECAST_HORIZON_HOURS:
+                continue
+            key = WeatherCache.make_key(canonical.weather_key, event["date"], time_str)
+            if key not in due and cache.get(canonical.weather_key, event["date"], time_str) is None:
+                due[key] = (hours, {**event, "time": time_str})
+        return [event for _, event in sorted(due.values(), key=lambda item: item[0])]
+
+    def _refresh(self, event: Dict[str, Any]) -> bool:
+        try:
+            with self.agent.profiler.request("weather_refresh"), self.agent.profiler.phase("fetch_weather"):
+                self.agent.fetch_weather(event["address"], event["date"], event["time"])
+            return True
+        except Exception as e:
+            logger.error("Ошибка обновления прогноза для %s %s: %s", event['address'], event['date'], e)
+            return False
+
+    def run_once(self) -> int:
+        profiler = self.agent.profiler
+        with profiler.request("weather_prefetch"):
+            with profiler.phase("load_feed"):
+                events = self.load_feed()
+            with profiler.phase("due_events"):
+                due = self.due_events(events)
+        if not due:
+            return 0
+        logger.info("Обновление прогнозов погоды: %s", len(due))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            refreshed = sum(executor.map(self._refresh, due))
+        logger.info("Прогнозов обновлено: %s/%s", refreshed, len(due))
+        return refreshed
+
+    def run_forever(self, interval: float):
+        while True:
+            try:
+                self.run_once()
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error("Ошибка чтения ленты событий: %s", e)
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Фоновое обновление кэша погоды для очных событий")
+    parser.add_argument("feed", help="JSON-файл со списком предстоящих событий (address, date, time)")
+    parser.add_argument("--cache", default="data/weather_cache.json", help="Путь к кэшу погоды (записи хранятся в каталоге с тем же именем без расширения)")
+    parser.add_argument("--aliases", default="data/address_aliases.json", help="Файл выученных псевдонимов адресов")
+    parser.add_argument("--interval", type=float, default=300, help="Период проверки ленты, секунды")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--once", action="store_true", help="Выполнить один проход и завершиться")
+    parser.add_argument("--profile", action="store_true", help="Профилировать разбор ленты и обновление каждого прогноза")
+    args = parser.parse_args()
+    config = ConfigLoader.load_config()
+    config.setdefault('WEATHER_CACHE_PATH', args.cache)
+    config.setdefault('ADDRESS_ALIASES_PATH', args.aliases)
+    if args.profile:
+        config['PROFILE'] = True
+    profiler = RequestProfiler.from_config(config, os.path.dirname(os.path.abspath(args.cache)))
+    prefetcher = WeatherPrefetcher(EventAgent(config, profiler), args.feed, workers=args.workers)
+    if args.once:
+        try:
+            prefetcher.run_once()
+        except FileNotFoundError:
+            logger.error("Файл не найден: %s", args.feed)
+            sys.exit(1)
+    else:
+        prefetcher.run_forever(args.interval)
\ No newline at end of file
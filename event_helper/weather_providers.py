@@ -0,0 +1,221 @@
+import json
+import logging
+import time
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from search_context import SearchContextBuilder, estimate_tokens
+
+logger = logging.getLogger("WeatherProviders")
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+HOURLY_FIELDS = ("temperature_2m", "precipitation", "precipitation_probability", "weather_code", "wind_speed_10m")
+WEATHER_CODES = (
+    ((0,), "ясно"),
+    ((1, 2), "переменная облачность"),
+    ((3,), "пасмурно"),
+    ((45, 48), "туман"),
+    ((51, 53, 55, 56, 57), "морось"),
+    ((61, 63, 65, 66, 67), "дождь"),
+    ((71, 73, 75, 77), "снег"),
+    ((80, 81, 82), "ливень"),
+    ((85, 86), "снегопад"),
+    ((95, 96, 99), "гроза")
+)
+
+
+class WeatherQuery(NamedTuple):
+    address: str
+    city: Optional[str]
+    place: Dict[str, Any]
+    date: str
+    time: str
+
+    @property
+    def hour_key(self) -> str:
+        return f"{self.date}T{self.time.split(':')[0].zfill(2)}:00"
+
+
+class Forecast(NamedTuple):
+    place: str
+    moment: str
+    temperature: float
+    precipitation: float
+    precipitation_probability: Optional[float]
+    wind_speed: float
+    weather_code: Optional[int]
+
+    def render(self) -> str:
+        parts = [f"{self.temperature:+.0f} °C"]
+        condition = next((name for codes, name in WEATHER_CODES if self.weather_code in codes), None)
+        if condition:
+            parts.append(condition)
+        precipitation = f"осадки {self.precipitation:g} мм" if self.precipitation else "без осадков"
+        if self.precipitation_probability is not None:
+            precipitation += f" (вероятность {self.precipitation_probability:.0f}%)"
+        parts.append(precipitation)
+        parts.append(f"ветер {self.wind_speed:.0f} м/с")
+        moment = datetime.strptime(self.moment, "%Y-%m-%dT%H:%M").strftime("%d.%m %H:%M")
+        return f"{self.place}, {moment}: {', '.join(parts)}"
+
+
+def forecast_from_hourly(place: str, hourly: Dict[str, List[Any]], hour_key: str) -> Optional[Forecast]:
+    times = hourly.get("time") or []
+    if hour_key not in times:
+        return None
+    index = times.index(hour_key)
+    values = {field: (hourly.get(field) or [None] * len(times))[index] for field in HOURLY_FIELDS}
+    if values["temperature_2m"] is None:
+        return None
+    return Forecast(
+        place=place,
+        moment=hour_key,
+        temperature=values["temperature_2m"],
+        precipitation=values["precipitation"] or 0.0,
+        precipitation_probability=values["precipitation_probability"],
+        wind_speed=values["wind_speed_10m"] or 0.0,
+        weather_code=values["weather_code"]
+    )
+
+
+class WeatherProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    def fetch(self, query: WeatherQuery) -> Optional[Tuple[str, Dict[str, Any]]]:
+        pass
+
+
+class StructuredProvider(WeatherProvider):
+    @abstractmethod
+    def forecast(self, query: WeatherQuery) -> Optional[Forecast]:
+        pass
+
+    def fetch(self, query: WeatherQuery) -> Optional[Tuple[str, Dict[str, Any]]]:
+        forecast = self.forecast(query)
+        if forecast is None:
+            return None
+        text = forecast.render()
+        return text, {"context_tokens": estimate_tokens(text)}
+
+
+class OpenMeteoProvider(StructuredProvider):
+    name = "open-meteo"
+
+    def __init__(self, url: str = OPEN_METEO_URL, timeout: float = 3.0, horizon_hours: float = 16 * 24):
+        self.url = url
+        self.timeout = timeout
+        self.horizon_hours = horizon_hours
+
+    def _in_horizon(self, query: WeatherQuery) -> bool:
+        try:
+            event_dt = datetime.strptime(query.hour_key, "%Y-%m-%dT%H:%M")
+        except ValueError:
+            return False
+        return (event_dt.timestamp() - time.time()) / 3600 <= self.horizon_hours
+
+    def forecast(self, query: WeatherQuery) -> Optional[Forecast]:
+        if "lat" not in query.place or "lon" not in query.place or not self._in_horizon(query):
+            return None
+        params = urllib.parse.urlencode({
+            "latitude": query.place["lat"],
+            "longitude": query.place["lon"],
+            "hourly": ",".join(HOURLY_FIELDS),
+            "wind_speed_unit": "ms",
+            "timezone": "auto",
+            "start_date": query.date,
+            "end_date": query.date
+        })
+        with urllib.request.urlopen(f"{self.url}?{params}", timeout=self.timeout) as response:
+            data = json.load(response)
+        return forecast_from_hourly(query.place.get("name", query.city), data.get("hourly") or {}, query.hour_key)
+
+
+class FixtureProvider(StructuredProvider):
+    name = "fixture"
+
+    def __init__(self, data: Dict[str, Dict[str, Any]]):
+        self.data = data
+
+    @classmethod
+    def from_file(cls, path: str) -> "FixtureProvider":
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def forecast(self, query: WeatherQuery) -> Optional[Forecast]:
+        entry = self.data.get(query.city or "")
+        if entry is None:
+            return None
+        return forecast_from_hourly(query.place.get("name", query.city), entry.get("hourly") or {}, query.hour_key)
+
+
+class TavilyProvider(WeatherProvider):
+    name = "tavily"
+
+    def __init__(self, search: Callable[[str], Any], context_builder: SearchContextBuilder,
+                 keywords: Callable[[str, str, str], List[str]]):
+        self.search = search
+        self.context_builder = context_builder
+        self.keywords = keywords
+
+    def fetch(self, query: WeatherQuery) -> Optional[Tuple[str, Dict[str, Any]]]:
+        search_results = self.search(f"{query.date}, {query.time}, {query.address} прогноз погоды")
+        weather_info, stats = self.context_builder.build(
+            search_results, self.keywords(query.address, query.date, query.time)
+        )
+        logger.info(
+            "Контекст погоды сокращен с %s до %s токенов "
+            "(%s предложений)",
+            stats['raw_tokens'], stats['context_tokens'], stats['sentences']
+        )
+        return weather_info, stats
+
+
+class WeatherProviderChain:
+    def __init__(self, providers: List[WeatherProvider]):
+        if not providers:
+            raise ValueError("Не задано ни одного источника прогноза погоды")
+        self.providers = providers
+
+    def fetch(self, query: WeatherQuery) -> Tuple[str, Dict[str, Any]]:
+        error: Optional[Exception] = None
+        started = time.perf_counter()
+        for provider in self.providers:
+            try:
+                result = provider.fetch(query)
+            except Exception as e:
+                error = e
+                logger.warning("Источник прогноза %s недоступен: %s", provider.name, e)
+                continue
+            if result is None:
+                continue
+            text, stats = result
+            return text, {**stats, "provider": provider.name, "latency_ms": round((time.perf_counter() - started) * 1000)}
+        if error is not None:
+            raise error
+        raise LookupError(f"Нет прогноза погоды для {query.address} на {query.date} {query.time}")
+
+
+def create_weather_providers(config: Dict[str, Any], tavily: TavilyProvider,
+                             horizon_hours: float = 16 * 24) -> WeatherProviderChain:
+    providers: List[WeatherProvider] = []
+    for name in config.get('WEATHER_PROVIDERS') or ["open-meteo", "tavily"]:
+        if name == "open-meteo":
+            providers.append(OpenMeteoProvider(
+                config.get('WEATHER_API_URL') or OPEN_METEO_URL,
+                timeout=float(config.get('WEATHER_TIMEOUT_SECONDS', 3)),
+                horizon_hours=horizon_hours
+            ))
+        elif name == "fixture" and config.get('WEATHER_FIXTURE_PATH'):
+            try:
+                providers.append(FixtureProvider.from_file(config['WEATHER_FIXTURE_PATH']))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Не удалось загрузить файл с прогнозами: %s", e)
+        elif name == "tavily":
+            providers.append(tavily)
+        else:
+            logger.warning("Неизвестный или не настроенный источник прогноза %s, пропускается", name)
+    return WeatherProviderChain(providers or [tavily])
\ No newline at end of file
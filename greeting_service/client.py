@@ -1,22 +1,117 @@
 import streamlit as st
+import atexit
 import json
 import os
+import sys
 import subprocess
 import datetime
+import time
+import uuid
 from pathlib import Path
+from stdio_client import ContainerPool
 
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 INPUT_FILE = DATA_DIR / "input.json"
 CONFIG_FILE = "config.json"
 
+
+def load_client_config():
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+CLIENT_CONFIG = load_client_config()
+EXECUTION_BACKEND = CLIENT_CONFIG.get("EXECUTION_BACKEND", "docker")
+QUEUE_POLL_SECONDS = float(CLIENT_CONFIG.get("QUEUE_POLL_SECONDS", 0.5))
+REQUEST_BUDGET_SECONDS = float(CLIENT_CONFIG.get("REQUEST_BUDGET_SECONDS") or 0)
+POOL_SIZE = int(CLIENT_CONFIG.get("POOL_SIZE", 2))
+POOL_MAX_USES = int(CLIENT_CONFIG.get("POOL_MAX_USES", 1))
+POOL_IDLE_SECONDS = float(CLIENT_CONFIG.get("POOL_IDLE_SECONDS", 600))
+STDIO_TIMEOUT_SECONDS = float(CLIENT_CONFIG.get("STDIO_TIMEOUT_SECONDS", 120))
+
+
+@st.cache_resource
+def get_generator():
+    from greeting_service import GreetingGenerator
+    config = dict(CLIENT_CONFIG)
+    config.setdefault('IDEMPOTENCY_DIR', str(DATA_DIR.resolve() / 'idempotency'))
+    return GreetingGenerator(config)
+
+
+@st.cache_resource
+def get_job_queue():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "job_queue"))
+    from job_queue import DEFAULT_DB_PATH, JobQueue
+    return JobQueue(
+        CLIENT_CONFIG.get("JOB_QUEUE_PATH", DEFAULT_DB_PATH),
+        max_pending=int(CLIENT_CONFIG.get("JOB_QUEUE_MAX_PENDING", 100)),
+        default_timeout=float(CLIENT_CONFIG.get("JOB_TIMEOUT_SECONDS", 120))
+    )
+
+
+@st.cache_resource
+def get_container_pool():
+    pool = ContainerPool(CLIENT_CONFIG.get("STDIO_COMMAND") or [
+        "docker", "run", "-i", "--rm",
+        "-v", f"{os.getcwd()}/data:/data",
+        "-v", f"{os.getcwd()}/config.json:/app/config.json",
+        "greeting-service",
+        "--stdio", "/data"
+    ], size=POOL_SIZE, max_uses=POOL_MAX_USES, idle_seconds=POOL_IDLE_SECONDS, timeout=STDIO_TIMEOUT_SECONDS)
+    atexit.register(pool.close)
+    return pool
+
+
+def run_service(input_data):
+    if EXECUTION_BACKEND == "pool":
+        return get_container_pool().request({"op": "generate", **input_data})
+    if EXECUTION_BACKEND == "queue":
+        job_queue = get_job_queue()
+        job = job_queue.wait(job_queue.submit("greeting", input_data), QUEUE_POLL_SECONDS)
+        if job is None or job["status"] != "done":
+            raise RuntimeError(job["error"] if job else "Задача не найдена в очереди")
+        return job["result"]
+    if EXECUTION_BACKEND == "inprocess":
+        generator = get_generator()
+        result = generator.generate_greeting(
+            input_data["date"], input_data["time"], input_data.get("deadline"), input_data.get("idempotency_key")
+        )
+        return {**input_data, "greeting": generator.parse_greeting(result["greeting"]), **generator.degradation(result)}
+    with open(INPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(input_data, f, ensure_ascii=False, indent=2)
+    docker_cmd = [
+        "docker", "run", "--rm",
+        "-v", f"{os.getcwd()}/data:/data",
+        "-v", f"{os.getcwd()}/config.json:/app/config.json",
+        "greeting-service",
+        "/data/input.json"
+    ]
+    subprocess.run(
+        docker_cmd,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 def main():
+    if EXECUTION_BACKEND == "pool":
+        get_container_pool()
     if 'use_current' not in st.session_state:
         st.session_state.use_current = True
     if 'selected_date' not in st.session_state:
         st.session_state.selected_date = datetime.date.today()
     if 'selected_time' not in st.session_state:
         st.session_state.selected_time = datetime.datetime.now().time()
+    if 'request_session' not in st.session_state:
+        st.session_state.request_session = uuid.uuid4().hex
+        st.session_state.request_round = 0
 
     st.markdown(
         "<h1 style='text-align: center;'>Генератор приветствий для Календаря VK WorkSpace</h1>",
@@ -85,34 +180,26 @@ def main():
         input_data = {
             "date": str(date_to_use),
             "time": time_to_use.strftime("%H:%M"),
-            "greeting": ""
+            "greeting": "",
+            "idempotency_key": f"{st.session_state.request_session}-{st.session_state.request_round}"
         }
-
-        with open(INPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(input_data, f, ensure_ascii=False, indent=2)
+        if REQUEST_BUDGET_SECONDS:
+            input_data["deadline"] = time.time() + REQUEST_BUDGET_SECONDS
 
         with st.spinner("Создаю уникальное приветствие..."):
             try:
-                docker_cmd = [
-                    "docker", "run", "--rm",
-                    "-v", f"{os.getcwd()}/data:/data",
-                    "-v", f"{os.getcwd()}/config.json:/app/config.json",
-                    "greeting-service",
-                    "/data/input.json"
-                ]
-                result = subprocess.run(
-                    docker_cmd,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-
-                with open(INPUT_FILE, "r", encoding="utf-8") as f:
-                    result_data = json.load(f)
+                result_data = run_service(input_data)
+                st.session_state.request_round += 1
 
                 st.success("Приветствие успешно сгенерировано!")
                 st.subheader("Ваше приветствие:")
                 st.markdown(f"**{result_data['greeting']}**")
+                if "llm_timeout" in (result_data.get("degraded_reasons") or []):
+                    st.caption("Приветствие составлено по шаблону: модель не успела ответить вовремя")
+                elif result_data.get("degraded"):
+                    st.caption("Приветствие составлено без поиска праздников: не хватило времени")
+                if EXECUTION_BACKEND == "pool":
+                    st.caption(get_container_pool().summary())
                 st.markdown("---")
 
                 if st.button("Сгенерировать новое приветствие", use_container_width=True):
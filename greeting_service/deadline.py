@@ -0,0 +1,52 @@
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def make_deadline(budget_seconds: Any) -> Optional[float]:
+    return time.time() + float(budget_seconds) if budget_seconds else None
+
+
+def remaining_seconds(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.time()
+
+
+def has_time(deadline: Optional[float], seconds: float) -> bool:
+    remaining = remaining_seconds(deadline)
+    return remaining is None or remaining >= seconds
+
+
+def call_before(deadline: Optional[float], func: Callable[..., Any], *args: Any,
+                reserve_seconds: float = 0.0, timeout_param: Optional[str] = None, **kwargs: Any) -> Any:
+    remaining = remaining_seconds(deadline)
+    if remaining is None:
+        return func(*args, **kwargs)
+    remaining -= reserve_seconds
+    if remaining <= 0:
+        raise DeadlineExceeded("Не осталось времени до крайнего срока запроса")
+    if timeout_param:
+        kwargs[timeout_param] = remaining
+    outcome: Dict[str, Any] = {}
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            outcome["value"] = context.run(func, *args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    worker.join(remaining)
+    if worker.is_alive():
+        raise DeadlineExceeded(f"Вызов не завершился за {remaining:.1f} с")
+    if "error" in outcome:
+        if timeout_param and remaining_seconds(deadline) <= reserve_seconds:
+            raise DeadlineExceeded(f"Вызов прерван по таймауту {remaining:.1f} с") from outcome["error"]
+        raise outcome["error"]
+    return outcome["value"]
\ No newline at end of file
@@ -0,0 +1,84 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date as date_type, datetime, timedelta
+from typing import Any, Dict, List
+
+from batch_jobs import BatchRunner
+from greeting_service import ConfigLoader, GreetingGenerator
+from profiling import RequestProfiler
+
+logger = logging.getLogger("GreetingBatch")
+
+DEFAULT_TIMES = ["09:00", "14:00", "19:00", "23:00"]
+TTL_MARGIN_SECONDS = 6 * 3600
+
+
+def expires_in(date: str) -> float:
+    end_of_day = datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)
+    return end_of_day.timestamp() + TTL_MARGIN_SECONDS - time.time()
+
+
+def pregenerate(generator: GreetingGenerator, runner: BatchRunner, dates: List[str],
+                times: List[str]) -> Dict[str, Any]:
+    if generator.cache.name == "memory":
+        raise ValueError("Кэш в памяти процесса: приветствия не будут доступны сервису, укажите CACHE_BACKEND file или redis")
+    profiler = generator.profiler
+    with profiler.request("greeting_batch"):
+        with profiler.phase("prepare"):
+            for date in dates:
+                for time_str in times:
+                    custom_id = generator.pregenerated_key(date, generator.get_time_greeting(time_str))
+                    if runner.has(custom_id):
+                        continue
+                    runner.add(custom_id, generator.prepare_batch(date, time_str), {"date": date, "time": time_str})
+        logger.info("Подготовлено запросов для пакетной обработки: %s", len(runner.state['items']))
+        with profiler.phase("batch_wait"):
+            runner.run()
+
+        greetings: Dict[str, Any] = {}
+        with profiler.phase("store"):
+            for custom_id, item in runner.results().items():
+                if item["status"] != "done" or '[GREETINGS]' not in item["result"]["content"]:
+                    logger.warning(
+                        "Приветствие %s не сгенерировано: %s", custom_id, item.get('error', 'нет тега [GREETINGS]')
+                    )
+                    continue
+                content = item["result"]["content"]
+                ttl = expires_in(item["context"]["date"])
+                generator.cache.set("greeting_pregenerated", custom_id, {"content": content}, ttl)
+                greetings[custom_id] = {**item["context"], "greeting": generator.parse_greeting(content)}
+    return greetings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заблаговременная генерация приветствий через пакетный API провайдера")
+    parser.add_argument("--start", help="Первая дата в формате YYYY-MM-DD, по умолчанию завтра")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--state", default=os.path.join("data", "greeting_batch.json"), help="Файл состояния для продолжения")
+    parser.add_argument("--output", help="JSON-файл для сохранения сгенерированных приветствий")
+    parser.add_argument("--no-resume", action="store_true")
+    parser.add_argument("--profile", action="store_true", help="Профилировать подготовку, ожидание и сохранение пакета")
+    args = parser.parse_args()
+    config = ConfigLoader.load_config()
+    if args.profile:
+        config['PROFILE'] = True
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else date_type.today() + timedelta(days=1)
+    dates = [(start + timedelta(days=offset)).isoformat() for offset in range(args.days)]
+    generator = GreetingGenerator(config, RequestProfiler.from_config(config, os.path.dirname(os.path.abspath(args.state))))
+    if args.no_resume and os.path.exists(args.state):
+        os.remove(args.state)
+    runner = BatchRunner(config, args.state, temperature=0.7)
+    try:
+        greetings = pregenerate(generator, runner, dates, config.get('PREGENERATION_TIMES') or DEFAULT_TIMES)
+    except Exception as e:
+        logger.error("Ошибка пакетной генерации: %s", e)
+        sys.exit(1)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(greetings, f, ensure_ascii=False, indent=2)
+    runner.clear()
+    logger.info("Сгенерировано приветствий: %s на %s дней", len(greetings), len(dates))
\ No newline at end of file
@@ -3,21 +3,55 @@ import sys
 import re
 import os
 import logging
-from typing import Dict
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import HumanMessage, SystemMessage
+from llm_backends import BackendRegistry, error_details
+from holiday_index import HolidayIndex
+from search_context import SearchContextBuilder, date_keywords
+from deadline import DeadlineExceeded, call_before, has_time, make_deadline
+from profiling import RequestProfiler
+from cache_backend import create_backend, fingerprint
+from batch_jobs import usage_metrics
+from idempotency import IdempotencyStore
+from structured_logging import configure_logging, request_context
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+configure_logging(force=False)
 logger = logging.getLogger("GreetingService")
 
+SYSTEM_PROMPT = """
+Ты профессиональный ассистент календаря VK WorkSpace. Твоя задача - сгенерировать приветствие для пользователя по данным о текущем времени, дате и праздниках, которые будут переданы в сообщении пользователя.
+
+Требования:
+- Приветствие должно быть кратким (1-2 предложения)
+- Косвенно упомяни 1-2 наиболее интересных НЕрелигиозных/НЕполитических праздника
+- Плавно интегрируй рекламу календаря VK WorkSpace
+- Стиль: дружелюбный профессиональный (не слишком формальный, но и не развязный)
+- Заканчивай приветствие восклицательным знаком (!)
+- После размышлений в качестве финального ответа добавь тег [GREETINGS] и само приветствие
+
+О календаре VK WorkSpace:
+- Корпоративный инструмент для планирования встреч и мероприятий
+- Интеграция с почтой, видеозвонками и документами
+- Поддержка on-premise решений для безопасности данных
+- Умные напоминания и аналитика расписания
+
+Примеры удачных фраз:
+"А вы знали, что сегодня День программиста? Запрограммируйте свои планы с помощью Календаря VK WorkSpace!"
+"В такую прекрасную дату самое время запланировать встречи на следующую неделю. VK WorkSpace поможет!"
+""".strip()
+
+HOLIDAY_TOPIC_WORDS = ["праздн", "день", "отмеча", "международн", "всемирн", "профессиональн", "памят"]
+HOLIDAYS_UNAVAILABLE = "Информация о праздниках недоступна"
+
+
+def holiday_web_search(config: Dict[str, Any]) -> bool:
+    enabled = config.get('HOLIDAY_WEB_SEARCH')
+    return bool(config.get('TAVILY_API_KEY')) if enabled is None else bool(enabled)
+
+
 class ConfigLoader:
     @staticmethod
     def load_config() -> Dict[str, str]:
@@ -28,37 +62,63 @@ class ConfigLoader:
                 with open(config_path, 'r', encoding='utf-8') as f:
                     file_config = json.load(f)
                     config.update(file_config)
-                    logger.info(f"Конфигурация загружена из {config_path}")
+                    logger.info("Конфигурация загружена из %s", config_path)
         except Exception as e:
-            logger.error(f"Ошибка загрузки конфига: {str(e)}")
+            logger.error("Ошибка загрузки конфига: %s", e)
         env_keys = {
             'TAVILY_API_KEY': os.getenv('TAVILY_API_KEY'),
             'GEMINI_API_KEY': os.getenv('GEMINI_API_KEY')
         }
         config.update({k: v for k, v in env_keys.items() if v})
-        required_keys = ['TAVILY_API_KEY', 'GEMINI_API_KEY']
+        required_keys = ['TAVILY_API_KEY', 'GEMINI_API_KEY'] if config.get('HOLIDAY_WEB_SEARCH') is True else ['GEMINI_API_KEY']
         missing_keys = [key for key in required_keys if not config.get(key)]
         if missing_keys:
-            logger.error(f"Отсутствуют обязательные ключи: {', '.join(missing_keys)}")
+            logger.error("Отсутствуют обязательные ключи: %s", ', '.join(missing_keys))
             sys.exit(1)
         return config
 
 
 class GreetingGenerator:
-    def __init__(self, config: Dict[str, str]):
+    def __init__(self, config: Dict[str, str], profiler: Optional[RequestProfiler] = None):
         self.config = config
+        self.profiler = profiler or RequestProfiler.from_config(config)
+        holiday_paths = [os.path.join(os.path.dirname(__file__), 'holidays.json')]
+        if config.get('HOLIDAYS_PATH'):
+            holiday_paths.append(config['HOLIDAYS_PATH'])
+        self.holiday_index = HolidayIndex(holiday_paths)
+        self.cache = create_backend(config)
+        self.idempotency = IdempotencyStore.from_config(config)
+        self.holiday_ttl = float(config.get('HOLIDAY_CACHE_TTL', 7 * 24 * 3600))
+        self.generation_ttl = float(config.get('GENERATION_CACHE_TTL', 0))
+        self.llm_reserve = float(config.get('LLM_RESERVE_SECONDS', 8))
+        self.enrichment_min = float(config.get('ENRICHMENT_MIN_SECONDS', 1.5))
+        self.context_builder = SearchContextBuilder(int(config.get('SEARCH_CONTEXT_TOKENS', 250)))
+        self.web_search = holiday_web_search(config)
         self.search_tool = TavilySearchResults(
             tavily_api_key=config['TAVILY_API_KEY'],
             max_results=3,
             include_answer=True,
             include_raw_content=False
+        ) if self.web_search else None
+        self.agent = BackendRegistry.from_config(config, temperature=0.7)
+
+    @staticmethod
+    def _usage_metrics(response: Any, started: float) -> Dict[str, Any]:
+        usage = getattr(response, "usage_metadata", None) or {}
+        details = usage.get("input_token_details") or {}
+        metrics = {
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            "input_tokens": usage.get("input_tokens", 0),
+            "cached_tokens": details.get("cache_read", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "backend": (getattr(response, "response_metadata", None) or {}).get("llm_backend")
+        }
+        logger.info(
+            "Ответ модели %s за %s мс: входных токенов %s "
+            "(из кэша %s), выходных %s",
+            metrics['backend'], metrics['latency_ms'], metrics['input_tokens'], metrics['cached_tokens'], metrics['output_tokens']
         )
-        self.agent = ChatOpenAI(
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-            api_key=config['GEMINI_API_KEY'],
-            model="gemini-2.5-pro",
-            temperature=0.7
-        )
+        return metrics
 
     @staticmethod
     def get_time_greeting(time_str: str) -> str:
@@ -72,54 +132,169 @@ class GreetingGenerator:
                 return "Добрый вечер"
             return "Доброй ночи"
         except (ValueError, IndexError):
-            logger.warning(f"Некорректный формат времени: {time_str}. Агент определит время самостоятельно.")
+            logger.warning("Некорректный формат времени: %s. Агент определит время самостоятельно.", time_str)
             return "Необходимо выбрать корректную форму приветствия самостоятельно"
 
-    def generate_greeting(self, date: str, time_str: str) -> str:
+    @staticmethod
+    def _new_run() -> Dict[str, Any]:
+        return {"metrics": {}, "degraded_reasons": [], "cache_metrics": {}}
+
+    @staticmethod
+    def _degrade(run: Dict[str, Any], reason: str):
+        run["degraded_reasons"].append(reason)
+        logger.warning("Приветствие генерируется в упрощенном режиме: %s", reason)
+
+    @staticmethod
+    def _note_cache(run: Dict[str, Any], namespace: str, hit: bool):
+        run["cache_metrics"][namespace] = "hit" if hit else "miss"
+
+    @staticmethod
+    def degradation(result: Dict[str, Any]) -> Dict[str, Any]:
+        if not result.get("degraded_reasons"):
+            return {}
+        return {"degraded": True, "degraded_reasons": list(result["degraded_reasons"])}
+
+    def fallback_greeting(self, date: str, time_str: str) -> str:
+        time_greeting = self.get_time_greeting(time_str)
+        if time_greeting.startswith("Необходимо"):
+            time_greeting = "Здравствуйте"
+        holidays = [h for h in self.holiday_index.lookup(date) or [] if not h.get("religious") and not h.get("political")]
+        if holidays:
+            return f"{time_greeting}! Сегодня {holidays[0]['name']} - отличный повод спланировать день в Календаре VK WorkSpace!"
+        return f"{time_greeting}! Самое время спланировать встречи и задачи в Календаре VK WorkSpace!"
+
+    def _search_holidays(self, date: str, deadline: Optional[float],
+                         run: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, int]]]:
+        cached = self.cache.get("holidays", date)
+        self._note_cache(run, "holidays", cached is not None)
+        if cached is not None:
+            logger.info("Результаты поиска праздников получены из кэша")
+            return cached["summary"], None
+        if not has_time(deadline, self.llm_reserve + self.enrichment_min):
+            self._degrade(run, "holidays_skipped")
+            return HOLIDAYS_UNAVAILABLE, None
+        query = f"{date} международные и государственные праздники в России"
         try:
-            query = f"{date} международные и государственные праздники в России"
-            search_results = self.search_tool.invoke({"query": query})
-            search_summary = '\n'.join(
-                f"Title: {res.get('title', '')}\nContent: {res.get('content', '')[:300]}"
-                for res in search_results
+            search_results = call_before(deadline, self.search_tool.invoke, {"query": query}, reserve_seconds=self.llm_reserve)
+        except DeadlineExceeded:
+            self._degrade(run, "holidays_timeout")
+            return HOLIDAYS_UNAVAILABLE, None
+        search_summary, context_stats = self.context_builder.build(
+            search_results, HOLIDAY_TOPIC_WORDS + date_keywords(date), content_limit=300
+        )
+        logger.info(
+            "Контекст поиска сокращен с %s до "
+            "%s токенов (%s предложений)",
+            context_stats['raw_tokens'], context_stats['context_tokens'], context_stats['sentences']
+        )
+        self.cache.set("holidays", date, {"summary": search_summary}, self.holiday_ttl)
+        return search_summary, context_stats
+
+    def _holiday_summary(self, date: str, deadline: Optional[float],
+                         run: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, int]]]:
+        with self.profiler.phase("holiday_lookup"):
+            holidays = self.holiday_index.lookup(date)
+        if holidays is not None:
+            logger.info("Дата покрыта локальным календарем праздников")
+            return self.holiday_index.format_summary(holidays), None
+        if not self.web_search:
+            logger.info("Дата не покрыта локальным календарем, а поиск в интернете выключен")
+            return HOLIDAYS_UNAVAILABLE, None
+        with self.profiler.phase("search"):
+            return self._search_holidays(date, deadline, run)
+
+    @staticmethod
+    def pregenerated_key(date: str, time_greeting: str) -> str:
+        return f"{date}|{time_greeting}"
+
+    def prepare_batch(self, date: str, time_str: str) -> List[Any]:
+        search_summary, _ = self._holiday_summary(date, None, self._new_run())
+        prompt = self._build_prompt(self.get_time_greeting(time_str), time_str, date, search_summary)
+        return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]
+
+    def generate_greeting(self, date: str, time_str: str, deadline: Optional[float] = None,
+                          idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        with request_context(idempotency_key):
+            result, replayed = self.idempotency.run(
+                idempotency_key, lambda: self._generate_recorded(date, time_str, deadline), fingerprint(date, time_str)
             )
+        result = {**result, "metrics": dict(result["metrics"])}
+        if replayed:
+            result["metrics"]["idempotency"] = "replayed"
+        return result
+
+    def _generate_recorded(self, date: str, time_str: str, deadline: Optional[float]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with self.profiler.request("generate_greeting"), self.profiler.phase("generate_greeting"):
+            run = self._new_run()
+            greeting = self._generate_greeting(date, time_str, deadline, run)
+        logger.info("Запрос приветствия обработан", extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+        result = {"greeting": greeting, **run}
+        if greeting.startswith("Ошибка генерации приветствия"):
+            result["error"] = greeting
+        return result
+
+    def _generate_greeting(self, date: str, time_str: str, deadline: Optional[float], run: Dict[str, Any]) -> str:
+        if deadline is None:
+            deadline = make_deadline(self.config.get('REQUEST_BUDGET_SECONDS'))
+        try:
             time_greeting = self.get_time_greeting(time_str)
+            pregenerated = self.cache.get("greeting_pregenerated", self.pregenerated_key(date, time_greeting))
+            self._note_cache(run, "pregenerated", pregenerated is not None)
+            if pregenerated is not None:
+                logger.info("Использовано приветствие, заранее сгенерированное в пакетном режиме")
+                run["metrics"] = {
+                    "llm": usage_metrics(None),
+                    "cache": {"backend": self.cache.name, **run["cache_metrics"]}
+                }
+                return pregenerated["content"]
+            search_summary, context_stats = self._holiday_summary(date, deadline, run)
             prompt = self._build_prompt(time_greeting, time_str, date, search_summary)
-            response = self.agent.invoke([
-                SystemMessage(content="Ты профессиональный ассистент календаря VK WorkSpace"),
-                HumanMessage(content=prompt)
-            ])
-            return response.content
+            cache_key = fingerprint(SYSTEM_PROMPT, prompt) if self.generation_ttl > 0 else None
+            cached = self.cache.get("greeting_generation", cache_key) if cache_key else None
+            if cache_key:
+                self._note_cache(run, "generation", cached is not None)
+            if cached is not None:
+                logger.info("Приветствие получено из кэша генераций")
+                content = cached["content"]
+                run["metrics"] = {"llm": {
+                    "latency_ms": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+                    "backend": f"cache:{self.cache.name}"
+                }}
+            else:
+                started = time.perf_counter()
+                try:
+                    with self.profiler.phase("llm_wait"):
+                        response = call_before(deadline, self.agent.invoke, [
+                            SystemMessage(content=SYSTEM_PROMPT),
+                            HumanMessage(content=prompt)
+                        ], timeout_param="timeout")
+                except DeadlineExceeded as e:
+                    logger.warning("Модель не успела ответить до крайнего срока: %s", e)
+                    self._degrade(run, "llm_timeout")
+                    return self.fallback_greeting(date, time_str)
+                content = response.content
+                run["metrics"] = {"llm": self._usage_metrics(response, started)}
+                if cache_key and '[GREETINGS]' in content:
+                    self.cache.set("greeting_generation", cache_key, {"content": content}, self.generation_ttl)
+            if context_stats:
+                run["metrics"]["search_context"] = context_stats
+            if run["cache_metrics"]:
+                run["metrics"]["cache"] = {"backend": self.cache.name, **run["cache_metrics"]}
+            return content
         except Exception as e:
-            logger.error(f"Ошибка генерации приветствия: {str(e)}")
+            logger.error("Ошибка генерации приветствия: %s", e)
+            run.update(error_details(e))
             return f"Ошибка генерации приветствия: {str(e)}"
 
     @staticmethod
     def _build_prompt(time_greeting: str, time_str: str, date: str, search_summary: str) -> str:
         return f"""
-Ты ассистент календаря VK WorkSpace. Сгенерируй приветствие для пользователя с учетом:
+Сгенерируй приветствие для пользователя с учетом:
 1. Текущее время: {time_greeting} ({time_str})
 2. Сегодняшняя дата: {date}
 3. Найденная информация о праздниках: 
 {search_summary}
-
-Требования:
-- Приветствие должно быть кратким (1-2 предложения)
-- Косвенно упомяни 1-2 наиболее интересных НЕрелигиозных/НЕполитических праздника
-- Плавно интегрируй рекламу календаря VK WorkSpace
-- Стиль: дружелюбный профессиональный (не слишком формальный, но и не развязный)
-- Заканчивай приветствие восклицательным знаком (!)
-- После размышлений в качестве финального ответа добавь тег [GREETINGS] и само приветствие
-
-О календаре VK WorkSpace:
-- Корпоративный инструмент для планирования встреч и мероприятий
-- Интеграция с почтой, видеозвонками и документами
-- Поддержка on-premise решений для безопасности данных
-- Умные напоминания и аналитика расписания
-
-Примеры удачных фраз:
-"А вы знали, что сегодня День программиста? Запрограммируйте свои планы с помощью Календаря VK WorkSpace!"
-"В такую прекрасную дату самое время запланировать встречи на следующую неделю. VK WorkSpace поможет!"
         """.strip()
 
     @staticmethod
@@ -133,43 +308,120 @@ class GreetingGenerator:
             return result
         return response
 
+def write_response(response: Dict[str, Any]):
+    sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def redirect_logging_to_stderr():
+    configure_logging(stream=sys.stderr)
+
+
+def run_stdio(config: Dict[str, str], data_dir: str) -> bool:
+    config.setdefault('IDEMPOTENCY_DIR', os.path.join(data_dir, 'idempotency'))
+    profiler = RequestProfiler.from_config(config, data_dir)
+    generator = GreetingGenerator(config, profiler)
+    logger.info("Режим stdio: ожидание запросов")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        with profiler.request("stdio"):
+            try:
+                with profiler.phase("json_read"):
+                    request = json.loads(line)
+            except json.JSONDecodeError as e:
+                write_response({"ok": False, "error": f"Ошибка формата JSON: {str(e)}"})
+                continue
+            request_id = request.pop("id", None)
+            op = request.pop("op", "generate")
+            if op == "shutdown":
+                break
+            if op == "ping":
+                write_response({"id": request_id, "ok": True})
+                continue
+            if op != "generate":
+                write_response({"id": request_id, "ok": False, "error": f"Неизвестная операция: {op}"})
+                continue
+            missing_fields = [field for field in ('date', 'time') if field not in request]
+            if missing_fields:
+                write_response({
+                    "id": request_id, "ok": False,
+                    "error": f"Отсутствуют обязательные поля: {', '.join(missing_fields)}"
+                })
+                continue
+            result = generator.generate_greeting(
+                request['date'], request['time'], request.get('deadline'), request.get('idempotency_key')
+            )
+            with profiler.phase("parse"):
+                parsed_greeting = generator.parse_greeting(result["greeting"])
+            with profiler.phase("json_write"):
+                write_response({
+                    "id": request_id,
+                    "ok": True,
+                    **request,
+                    "greeting": parsed_greeting,
+                    "metrics": result["metrics"] or None,
+                    **generator.degradation(result)
+                })
+    logger.info("Режим stdio: завершение")
+    return True
+
+
 def main(input_file: str, config: Dict[str, str]):
-    logger.info(f"Обработка файла: {input_file}")
+    logger.info("Обработка файла: %s", input_file)
+    config.setdefault('IDEMPOTENCY_DIR', os.path.join(os.path.dirname(os.path.abspath(input_file)), 'idempotency'))
+    profiler = RequestProfiler.from_config(config, os.path.dirname(os.path.abspath(input_file)))
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        required_fields = ['date', 'time']
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            logger.error(f"Отсутствуют обязательные поля: {', '.join(missing_fields)}")
-            return False
-        generator = GreetingGenerator(config)
-        greeting = generator.generate_greeting(data['date'], data['time'])
-        parsed_greeting = generator.parse_greeting(greeting)
-
-        data['greeting'] = parsed_greeting
-        with open(input_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with profiler.request(os.path.basename(input_file)):
+            with profiler.phase("json_read"), open(input_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            required_fields = ['date', 'time']
+            missing_fields = [field for field in required_fields if field not in data]
+            if missing_fields:
+                logger.error("Отсутствуют обязательные поля: %s", ', '.join(missing_fields))
+                return False
+            with profiler.phase("agent_init"):
+                generator = GreetingGenerator(config, profiler)
+            result = generator.generate_greeting(data['date'], data['time'], data.get('deadline'), data.get('idempotency_key'))
+            with profiler.phase("parse"):
+                parsed_greeting = generator.parse_greeting(result["greeting"])
+
+            data['greeting'] = parsed_greeting
+            data.update(generator.degradation(result))
+            if result["metrics"]:
+                data['metrics'] = result["metrics"]
+            with profiler.phase("json_write"), open(input_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
 
         logger.info("Приветствие успешно сгенерировано:")
         logger.info(parsed_greeting)
         return True
 
     except FileNotFoundError:
-        logger.error(f"Файл не найден: {input_file}")
+        logger.error("Файл не найден: %s", input_file)
     except json.JSONDecodeError:
-        logger.error(f"Ошибка формата JSON в файле: {input_file}")
+        logger.error("Ошибка формата JSON в файле: %s", input_file)
     except Exception as e:
-        logger.error(f"Критическая ошибка: {str(e)}")
+        logger.error("Критическая ошибка: %s", e)
 
     return False
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        logger.error("Использование: python greeting_service.py <input.json>")
+    profile = "--profile" in sys.argv
+    if profile:
+        sys.argv.remove("--profile")
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[1] != "--stdio"):
+        logger.error("Использование: python greeting_service.py [--profile] <input.json> | --stdio [data_dir]")
         sys.exit(1)
-
+    if sys.argv[1] == "--stdio":
+        redirect_logging_to_stderr()
     config = ConfigLoader.load_config()
-    success = main(sys.argv[1], config)
+    configure_logging(config)
+    if profile:
+        config['PROFILE'] = True
+    if sys.argv[1] == "--stdio":
+        success = run_stdio(config, sys.argv[2] if len(sys.argv) == 3 else "data")
+    else:
+        success = main(sys.argv[1], config)
     sys.exit(0 if success else 1)
\ No newline at end of file
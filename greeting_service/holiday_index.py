@@ -0,0 +1,83 @@
+import json
+import logging
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger("HolidayIndex")
+
+
+class HolidayIndex:
+    KIND_LABELS = {
+        "state": "государственный праздник",
+        "international": "международный день",
+        "professional": "профессиональный праздник"
+    }
+
+    def __init__(self, paths: List[str]):
+        self.holidays: List[Dict] = []
+        self.covered_years: Set[int] = set()
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    calendar = json.load(f)
+                self.holidays.extend(calendar.get("holidays", []))
+                self.covered_years.update(calendar.get("covered_years", []))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Не удалось загрузить календарь праздников %s: %s", path, e)
+        self._by_year: Dict[int, Dict[str, List[Dict]]] = {}
+
+    @staticmethod
+    def _orthodox_easter(year: int) -> date_type:
+        a, b, c = year % 4, year % 7, year % 19
+        d = (19 * c + 15) % 30
+        e = (2 * a + 4 * b - d + 34) % 7
+        month, day = divmod(d + e + 114, 31)
+        return date_type(year, month, day + 1) + timedelta(days=13)
+
+    @classmethod
+    def _resolve(cls, holiday: Dict, year: int) -> Optional[date_type]:
+        if "date" in holiday:
+            month, day = map(int, holiday["date"].split('-'))
+            return date_type(year, month, day) if (month, day) != (2, 29) or year % 4 == 0 else None
+        rule = holiday.get("rule", {})
+        if "day_of_year" in rule:
+            return date_type(year, 1, 1) + timedelta(days=rule["day_of_year"] - 1)
+        if "easter_offset" in rule:
+            return cls._orthodox_easter(year) + timedelta(days=rule["easter_offset"])
+        if "month" in rule:
+            days = [
+                date_type(year, rule["month"], 1) + timedelta(days=i)
+                for i in range(31)
+                if (date_type(year, rule["month"], 1) + timedelta(days=i)).month == rule["month"]
+            ]
+            matching = [day for day in days if day.weekday() == rule["weekday"]]
+            nth = rule.get("nth", 1)
+            return matching[nth - 1 if nth > 0 else nth]
+        return None
+
+    def _year_index(self, year: int) -> Dict[str, List[Dict]]:
+        if year not in self._by_year:
+            index: Dict[str, List[Dict]] = {}
+            for holiday in self.holidays:
+                day = self._resolve(holiday, year)
+                if day:
+                    index.setdefault(day.strftime("%m-%d"), []).append(holiday)
+            self._by_year[year] = index
+        return self._by_year[year]
+
+    def lookup(self, date: str) -> Optional[List[Dict]]:
+        try:
+            day = datetime.strptime(date, "%Y-%m-%d").date()
+        except ValueError:
+            return None
+        holidays = self._year_index(day.year).get(day.strftime("%m-%d"))
+        if holidays is None and day.year in self.covered_years:
+            return []
+        return holidays
+
+    @classmethod
+    def format_summary(cls, holidays: List[Dict]) -> str:
+        allowed = [h for h in holidays if not h.get("religious") and not h.get("political")]
+        if not allowed:
+            return "На эту дату нет подходящих нерелигиозных и неполитических праздников"
+        return '\n'.join(f"- {h['name']} ({cls.KIND_LABELS.get(h['kind'], h['kind'])})" for h in allowed)
@@ -0,0 +1,257 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger("LLMBackends")
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+DEFAULT_MODEL = "gemini-2.5-pro"
+DEFAULT_LATENCY_MS = 5000.0
+PROBE_MAX_TOKENS = 16
+
+
+def backend_specs(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return config.get('LLM_BACKENDS') or [{
+        "name": "gemini",
+        "base_url": config.get('LLM_BASE_URL', DEFAULT_BASE_URL),
+        "model": DEFAULT_MODEL,
+        "api_key_env": "GEMINI_API_KEY"
+    }]
+
+
+def error_details(error: BaseException) -> Dict[str, Any]:
+    current = error
+    while True:
+        status = getattr(current, "status_code", None)
+        if status is None:
+            status = getattr(getattr(current, "response", None), "status_code", None)
+        if isinstance(status, int) or current.__cause__ is None:
+            return {"error_type": type(current).__name__, "error_status": status if isinstance(status, int) else None}
+        current = current.__cause__
+
+
+def resolve_api_key(spec: Dict[str, Any], config: Dict[str, Any]) -> Optional[str]:
+    api_key = spec.get("api_key")
+    if not api_key and spec.get("api_key_env"):
+        api_key = config.get(spec["api_key_env"]) or os.getenv(spec["api_key_env"])
+    return api_key
+
+
+class LLMBackend:
+    def __init__(self, name: str, client: Any, max_concurrency: int = 4, bounded_client: Any = None):
+        self.name = name
+        self.client = client
+        self.bounded_client = bounded_client or client
+        self.max_concurrency = max(1, max_concurrency)
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.ewma_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.tripped = False
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+
+    def healthy(self) -> bool:
+        return not self.tripped
+
+    def probe_due(self, now: float) -> bool:
+        return self.tripped and not self.probing and now >= self.unhealthy_until
+
+    def expected_latency(self) -> float:
+        latency = self.ewma_ms if self.ewma_ms is not None else DEFAULT_LATENCY_MS
+        return latency * (1 + self.in_flight / self.max_concurrency)
+
+
+class BackendRegistry:
+    def __init__(self, backends: List[LLMBackend], alpha: float = 0.3, failure_threshold: int = 2,
+                 cooldown_seconds: float = 30, wait_seconds: float = 60):
+        if not backends:
+            raise ValueError("Не задано ни одного LLM-бэкенда")
+        self.backends = backends
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.wait_seconds = wait_seconds
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], temperature: float) -> "BackendRegistry":
+        specs = backend_specs(config)
+        backends = []
+        for index, spec in enumerate(specs):
+            options = {
+                "base_url": spec.get("base_url", DEFAULT_BASE_URL),
+                "api_key": resolve_api_key(spec, config) or "not-needed",
+                "model": spec.get("model", DEFAULT_MODEL),
+                "temperature": spec.get("temperature", temperature),
+                "timeout": spec.get("timeout", 120)
+            }
+            max_retries = spec.get("max_retries", 0 if len(specs) > 1 else 2)
+            client = ChatOpenAI(**options, max_retries=max_retries)
+            bounded_client = ChatOpenAI(**options, max_retries=0) if max_retries else client
+            backends.append(LLMBackend(
+                spec.get("name", f"backend-{index}"), client, spec.get("max_concurrency", 4), bounded_client
+            ))
+        failover = config.get('LLM_FAILOVER', {})
+        return cls(
+            backends,
+            alpha=failover.get("alpha", 0.3),
+            failure_threshold=failover.get("failure_threshold", 2),
+            cooldown_seconds=failover.get("cooldown_seconds", 30),
+            wait_seconds=failover.get("wait_seconds", 60)
+        )
+
+    def ordered(self) -> List[LLMBackend]:
+        now = time.monotonic()
+        with self.lock:
+            due = [b for b in self.backends if b.probe_due(now)]
+            for backend in due:
+                backend.probing = True
+            healthy = sorted((b for b in self.backends if b.healthy()), key=LLMBackend.expected_latency)
+            degraded = sorted((b for b in self.backends if not b.healthy()), key=lambda b: b.unhealthy_until)
+        for backend in due:
+            threading.Thread(target=self._probe, args=(backend,), daemon=True).start()
+        return healthy + degraded
+
+    def _probe(self, backend: LLMBackend):
+        started = time.perf_counter()
+        try:
+            backend.client.invoke("ping", max_tokens=PROBE_MAX_TOKENS)
+        except Exception as e:
+            with self.lock:
+                backend.probing = False
+                backend.unhealthy_until = time.monotonic() + self.cooldown_seconds
+            logger.warning(
+                "Проверка LLM-бэкенда %s не прошла, следующая через %.0f с: %s", backend.name, self.cooldown_seconds, e
+            )
+            return
+        with self.lock:
+            backend.probing = False
+            backend.tripped = False
+            backend.consecutive_failures = 0
+            backend.unhealthy_until = 0.0
+        logger.info("LLM-бэкенд %s снова в ротации (проверка за %.0f мс)", backend.name, (time.perf_counter() - started) * 1000)
+
+    def _wait(self, remaining: Optional[float]) -> float:
+        return self.wait_seconds if remaining is None else max(0.0, min(self.wait_seconds, remaining))
+
+    def _acquire(self, candidates: List[LLMBackend], remaining: Optional[float] = None) -> List[LLMBackend]:
+        for backend in candidates:
+            if backend.semaphore.acquire(blocking=False):
+                return [backend] + [b for b in candidates if b is not backend]
+        if candidates[0].semaphore.acquire(timeout=self._wait(remaining)):
+            return candidates
+        raise TimeoutError("Превышено время ожидания свободного LLM-бэкенда")
+
+    def _record(self, backend: LLMBackend, latency_ms: Optional[float], failed: bool = True):
+        with self.lock:
+            backend.in_flight -= 1
+            backend.calls += 1
+            if latency_ms is None and not failed:
+                return
+            if latency_ms is not None:
+                backend.consecutive_failures = 0
+                backend.unhealthy_until = 0.0
+                backend.tripped = False
+                backend.ewma_ms = latency_ms if backend.ewma_ms is None else (
+                    self.alpha * latency_ms + (1 - self.alpha) * backend.ewma_ms
+                )
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures >= self.failure_threshold:
+                backend.tripped = True
+                backend.unhealthy_until = time.monotonic() + self.cooldown_seconds
+                logger.warning("LLM-бэкенд %s исключен из ротации на %.0f с", backend.name, self.cooldown_seconds)
+
+    def invoke(self, messages: List[Any], timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        expires = None if timeout is None else time.monotonic() + timeout
+        candidates = self._acquire(self.ordered(), timeout)
+        errors = []
+        last_error: Optional[Exception] = None
+        for position, backend in enumerate(candidates):
+            remaining = None if expires is None else expires - time.monotonic()
+            if position > 0:
+                if remaining is not None and remaining <= 0:
+                    errors.append(f"{backend.name}: истекло время запроса")
+                    break
+                if not backend.semaphore.acquire(timeout=self._wait(remaining)):
+                    errors.append(f"{backend.name}: нет свободных слотов")
+                    continue
+                remaining = None if expires is None else expires - time.monotonic()
+            with self.lock:
+                backend.in_flight += 1
+            started = time.perf_counter()
+            try:
+                if remaining is None:
+                    response = backend.client.invoke(messages, **kwargs)
+                else:
+                    response = backend.bounded_client.invoke(messages, timeout=max(remaining, 0.001), **kwargs)
+            except Exception as e:
+                expired = expires is not None and time.monotonic() >= expires
+                self._record(backend, None, failed=not expired)
+                last_error = e
+                errors.append(f"{backend.name}: {str(e)}")
+                if expired:
+                    logger.warning("LLM-бэкенд %s не ответил до истечения времени запроса: %s", backend.name, e)
+                    break
+                logger.warning("Ошибка LLM-бэкенда %s, переключение на следующий: %s", backend.name, e)
+                continue
+            finally:
+                backend.semaphore.release()
+            self._record(backend, (time.perf_counter() - started) * 1000)
+            response.response_metadata["llm_backend"] = backend.name
+            return response
+        raise RuntimeError(f"Все LLM-бэкенды недоступны: {'; '.join(errors)}") from last_error
+
+    def stream(self, messages: List[Any], **kwargs: Any) -> Iterator[Any]:
+        candidates = self._acquire(self.ordered())
+        errors = []
+        last_error: Optional[Exception] = None
+        for position, backend in enumerate(candidates):
+            if position > 0 and not backend.semaphore.acquire(timeout=self.wait_seconds):
+                errors.append(f"{backend.name}: нет свободных слотов")
+                continue
+            with self.lock:
+                backend.in_flight += 1
+            started = time.perf_counter()
+            emitted = False
+            try:
+                for chunk in backend.client.stream(messages, **kwargs):
+                    if not emitted:
+                        chunk.response_metadata["llm_backend"] = backend.name
+                        emitted = True
+                    yield chunk
+            except GeneratorExit:
+                self._record(backend, (time.perf_counter() - started) * 1000)
+                raise
+            except Exception as e:
+                self._record(backend, None)
+                if emitted:
+                    raise
+                last_error = e
+                errors.append(f"{backend.name}: {str(e)}")
+                logger.warning("Ошибка LLM-бэкенда %s, переключение на следующий: %s", backend.name, e)
+                continue
+            finally:
+                backend.semaphore.release()
+            self._record(backend, (time.perf_counter() - started) * 1000)
+            return
+        raise RuntimeError(f"Все LLM-бэкенды недоступны: {'; '.join(errors)}") from last_error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [{
+                "name": b.name,
+                "healthy": b.healthy(),
+                "ewma_ms": round(b.ewma_ms) if b.ewma_ms is not None else None,
+                "in_flight": b.in_flight,
+                "calls": b.calls,
+                "failures": b.failures
+            } for b in self.backends]
\ No newline at end of file
@@ -0,0 +1,222 @@
+import json
+import logging
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("ContainerPool")
+
+
+class StdioSession:
+    def __init__(self, command: List[str], timeout: float = 120.0):
+        self.command = command
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.stderr_tail: deque = deque(maxlen=20)
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _drain_stderr(self, process: subprocess.Popen):
+        for line in process.stderr:
+            self.stderr_tail.append(line.rstrip())
+
+    @staticmethod
+    def _read_stdout(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1
+        )
+        self.lines = queue.Queue()
+        threading.Thread(target=self._drain_stderr, args=(self.process,), daemon=True).start()
+        threading.Thread(target=self._read_stdout, args=(self.process, self.lines), daemon=True).start()
+
+    def _read_response(self, on_event: Optional[Callable[[Dict[str, Any]], None]], timeout: float) -> Dict[str, Any]:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.kill()
+                raise TimeoutError(f"Процесс сервиса не ответил за {timeout:g} с и был остановлен")
+            if line is None:
+                self.close()
+                raise RuntimeError("Процесс сервиса завершился: " + "\n".join(self.stderr_tail))
+            response = json.loads(line)
+            if response.get("id") != self.next_id:
+                self.kill()
+                raise RuntimeError(
+                    f"Ответ на запрос {response.get('id')} вместо {self.next_id}, процесс сервиса остановлен"
+                )
+            if "event" not in response:
+                return response
+            if on_event is not None:
+                on_event(response)
+
+    def request(self, payload: Dict[str, Any], on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                timeout: Optional[float] = None) -> Dict[str, Any]:
+        with self.lock:
+            if not self.alive():
+                self.start()
+            self.next_id += 1
+            try:
+                self.process.stdin.write(json.dumps({"id": self.next_id, **payload}, ensure_ascii=False) + "\n")
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError):
+                self.close()
+                raise RuntimeError("Процесс сервиса завершился: " + "\n".join(self.stderr_tail))
+            response = self._read_response(on_event, self.timeout if timeout is None else timeout)
+            if not response.get("ok"):
+                raise RuntimeError(response.get("error", "Неизвестная ошибка сервиса"))
+            return response
+
+    def close(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                self.process.stdin.close()
+                self.process.wait(5)
+            except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+        self.process = None
+
+    def kill(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                logger.warning("Процесс сервиса %s не завершился после остановки", self.process.pid)
+        self.process = None
+
+
+class PooledContainer:
+    def __init__(self, session: StdioSession):
+        self.session = session
+        self.uses = 0
+        self.idle_since = time.time()
+
+
+class ContainerPool:
+    def __init__(self, command: List[str], size: int = 2, max_uses: int = 1, idle_seconds: float = 600.0,
+                 retry_seconds: float = 10.0, timeout: float = 120.0):
+        self.command = command
+        self.timeout = timeout
+        self.size = max(0, size)
+        self.max_uses = max(1, max_uses)
+        self.idle_seconds = idle_seconds
+        self.retry_seconds = retry_seconds
+        self.idle: deque = deque()
+        self.starting = 0
+        self.retry_at = 0.0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.stats = {"warm": 0, "cold": 0, "recycled_uses": 0, "recycled_idle": 0, "failed_starts": 0}
+        threading.Thread(target=self._maintain, daemon=True).start()
+
+    def _start_container(self) -> Optional[PooledContainer]:
+        session = StdioSession(self.command, self.timeout)
+        try:
+            session.request({"op": "ping"})
+            return PooledContainer(session)
+        except (RuntimeError, OSError, ValueError) as e:
+            logger.warning("Не удалось запустить контейнер для пула: %s", e)
+            session.close()
+            return None
+
+    def _prewarm(self):
+        container = self._start_container()
+        with self.condition:
+            self.starting -= 1
+            if container is None:
+                self.stats["failed_starts"] += 1
+                self.retry_at = time.time() + self.retry_seconds
+            elif self.closed:
+                self._discard(container)
+            else:
+                self.idle.append(container)
+            self.condition.notify_all()
+
+    def _maintain(self):
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                now = time.time()
+                expired = [container for container in self.idle if now - container.idle_since > self.idle_seconds]
+                for container in expired:
+                    self.idle.remove(container)
+                    self.stats["recycled_idle"] += 1
+                    self._discard(container)
+                missing = 0 if now < self.retry_at else self.size - len(self.idle) - self.starting
+                self.starting += max(0, missing)
+            for _ in range(missing):
+                threading.Thread(target=self._prewarm, daemon=True).start()
+            with self.condition:
+                self.condition.wait(min(self.idle_seconds, self.retry_seconds))
+
+    @staticmethod
+    def _discard(container: PooledContainer):
+        threading.Thread(target=container.session.close, daemon=True).start()
+
+    def request(self, payload: Dict[str, Any],
+                on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        with self.condition:
+            container = self.idle.pop() if self.idle else None
+            self.stats["warm" if container else "cold"] += 1
+            self.condition.notify_all()
+        if container is None:
+            logger.info("Свободного прогретого контейнера нет, запускается новый")
+            container = PooledContainer(StdioSession(self.command, self.timeout))
+        try:
+            response = container.session.request(payload, on_event)
+        except Exception:
+            self._discard(container)
+            raise
+        container.uses += 1
+        with self.condition:
+            if self.closed or container.uses >= self.max_uses or not container.session.alive():
+                if container.uses >= self.max_uses:
+                    self.stats["recycled_uses"] += 1
+                self._discard(container)
+            else:
+                container.idle_since = time.time()
+                self.idle.append(container)
+            self.condition.notify_all()
+        return response
+
+    def summary(self) -> str:
+        with self.condition:
+            return (
+                f"Пул контейнеров: свободно {len(self.idle)} из {self.size}, запускается {self.starting}; "
+                f"запросов в прогретый контейнер {self.stats['warm']}, с холодным стартом {self.stats['cold']}"
+            )
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            containers = list(self.idle)
+            self.idle.clear()
+            self.condition.notify_all()
+        for container in containers:
+            container.session.close()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Mapping, Optional, TextIO
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+PLAIN_ARGS = (str, int, float, bool, type(None))
+MAX_SAMPLED_TEMPLATES = 10000
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("log_request_id", default=None)
+node_var: contextvars.ContextVar = contextvars.ContextVar("log_node", default=None)
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"handler": None, "listener": None, "stream": sys.stdout}
+
+
+@contextmanager
+def log_context(request_id: Optional[str] = None, node: Optional[str] = None) -> Iterator[None]:
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if node is not None:
+        tokens.append((node_var, node_var.set(node)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[None]:
+    if request_id is None and request_id_var.get() is not None:
+        yield
+        return
+    with log_context(request_id=request_id or uuid.uuid4().hex[:12]):
+        yield
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        if getattr(record, "node", None) is None:
+            record.node = node_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self.counts: Dict[Any, int] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        key = (record.name, record.msg)
+        with self.lock:
+            if len(self.counts) >= MAX_SAMPLED_TEMPLATES:
+                self.counts.clear()
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sample_every = self.every
+        return True
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        args = record.args.values() if isinstance(record.args, Mapping) else record.args
+        if args and not all(isinstance(arg, PLAIN_ARGS) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        elif isinstance(record.args, Mapping):
+            record.args = dict(record.args)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for name in ("request_id", "node", "duration_ms", "sample_every"):
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def shutdown_logging():
+    with _lock:
+        _stop()
+
+
+def _stop():
+    listener, handler = _state["listener"], _state["handler"]
+    _state["listener"] = _state["handler"] = None
+    if listener is not None:
+        listener.stop()
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+
+
+def configure_logging(config: Optional[Dict[str, Any]] = None, stream: Optional[TextIO] = None,
+                      force: bool = True):
+    config = config or {}
+    root = logging.getLogger()
+    with _lock:
+        if not force and root.handlers:
+            return
+        _stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        _state["stream"] = stream or _state["stream"]
+        output = logging.StreamHandler(_state["stream"])
+        output.setFormatter(JsonFormatter() if config.get('LOG_FORMAT') == "json" else logging.Formatter(TEXT_FORMAT))
+        if config.get('LOG_ASYNC', True):
+            handler = ContextQueueHandler(queue.SimpleQueue())
+            listener = logging.handlers.QueueListener(handler.queue, output)
+            listener.start()
+            _state["listener"] = listener
+        else:
+            handler = output
+        handler.addFilter(ContextFilter())
+        handler.addFilter(DebugSampler(int(config.get('LOG_DEBUG_SAMPLE_EVERY', 100))))
+        _state["handler"] = handler
+        root.addHandler(handler)
+        root.setLevel(str(config.get('LOG_LEVEL', 'INFO')).upper())
+
+
+atexit.register(shutdown_logging)
\ No newline at end of file
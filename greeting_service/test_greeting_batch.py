@@ -0,0 +1,54 @@
+import pytest
+
+from batch_jobs import BatchRunner
+from fake_openai_server import FakeOpenAIServer
+from greeting_batch import expires_in, pregenerate
+from greeting_service import GreetingGenerator
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(base_latency=0, batch_delay=0.02) as server:
+        yield server
+
+
+def make_config(server, tmp_path, **extra):
+    return {
+        "LLM_BACKENDS": [{"name": "fake", "base_url": server.base_url, "model": "fake-model", "api_key": "test"}],
+        "BATCH_POLL_SECONDS": 0.02,
+        "CACHE_BACKEND": "file",
+        "CACHE_PATH": str(tmp_path / "cache.json"),
+        **extra
+    }
+
+
+def test_pregenerated_greetings_are_stored_in_shared_cache(server, tmp_path):
+    config = make_config(server, tmp_path)
+    generator = GreetingGenerator(config)
+    runner = BatchRunner(config, str(tmp_path / "state.json"), temperature=0.7)
+    dates = ["2099-01-01", "2099-01-02"]
+    greetings = pregenerate(generator, runner, dates, ["09:00", "19:00"])
+    assert len(greetings) == 4
+    assert server.batch_requests == 4 and server.requests == 0
+    key = generator.pregenerated_key("2099-01-01", "Доброе утро")
+    assert greetings[key]["date"] == "2099-01-01" and greetings[key]["time"] == "09:00"
+    assert greetings[key]["greeting"].startswith("Добрый день!")
+
+    replica = GreetingGenerator(config)
+    result = replica.generate_greeting("2099-01-02", "19:30")
+    assert "[GREETINGS]" in result["greeting"]
+    assert result["metrics"]["llm"]["backend"] == "batch"
+    assert server.requests == 0
+
+
+def test_pregeneration_refuses_process_local_cache(server, tmp_path):
+    config = make_config(server, tmp_path, CACHE_BACKEND="memory")
+    runner = BatchRunner(config, str(tmp_path / "state.json"), temperature=0.7)
+    with pytest.raises(ValueError):
+        pregenerate(GreetingGenerator(config), runner, ["2099-01-01"], ["09:00"])
+    assert server.batches == {}
+
+
+def test_expires_at_end_of_day_with_margin():
+    assert expires_in("2000-01-01") < 0
+    assert expires_in("2099-01-01") > 0
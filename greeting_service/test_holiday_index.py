@@ -0,0 +1,116 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+from holiday_index import HolidayIndex
+
+BUNDLED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "holidays.json")
+
+
+def make_index(tmp_path, *holidays):
+    path = tmp_path / "holidays.json"
+    path.write_text(json.dumps({"version": 1, "holidays": list(holidays)}), encoding="utf-8")
+    return HolidayIndex([str(path)])
+
+
+def names(index, day):
+    return [holiday["name"] for holiday in index.lookup(day) or []]
+
+
+def test_fixed_dates_repeat_every_year(tmp_path):
+    index = make_index(tmp_path, {"name": "Новый год", "kind": "state", "date": "01-01"},
+                       {"name": "Второй", "kind": "state", "date": "01-01"})
+    assert names(index, "2025-01-01") == ["Новый год", "Второй"]
+    assert names(index, "2031-01-01") == ["Новый год", "Второй"]
+
+
+def test_february_29_only_in_leap_years(tmp_path):
+    index = make_index(tmp_path, {"name": "Високосный", "kind": "international", "date": "02-29"})
+    assert names(index, "2024-02-29") == ["Високосный"]
+    assert index.lookup("2025-02-28") is None
+
+
+@pytest.mark.parametrize("year, easter", [
+    (2021, date(2021, 5, 2)),
+    (2023, date(2023, 4, 16)),
+    (2024, date(2024, 5, 5)),
+    (2025, date(2025, 4, 20)),
+    (2026, date(2026, 4, 12)),
+])
+def test_orthodox_easter_uses_julian_rule(year, easter):
+    assert HolidayIndex._orthodox_easter(year) == easter
+
+
+def test_easter_offsets(tmp_path):
+    index = make_index(tmp_path, {"name": "Троица", "kind": "international", "rule": {"easter_offset": 49}})
+    assert names(index, "2025-06-08") == ["Троица"]
+    assert names(index, "2024-06-23") == ["Троица"]
+
+
+@pytest.mark.parametrize("rule, year, expected", [
+    ({"month": 11, "weekday": 6, "nth": -1}, 2025, "2025-11-30"),
+    ({"month": 11, "weekday": 6, "nth": -1}, 2024, "2024-11-24"),
+    ({"month": 10, "weekday": 6, "nth": 3}, 2025, "2025-10-19"),
+    ({"month": 9, "weekday": 6, "nth": 1}, 2024, "2024-09-01"),
+    ({"month": 7, "weekday": 5, "nth": 4}, 2025, "2025-07-26"),
+    ({"month": 5, "weekday": 0}, 2025, "2025-05-05"),
+])
+def test_nth_weekday_rules(tmp_path, rule, year, expected):
+    index = make_index(tmp_path, {"name": "Праздник", "kind": "professional", "rule": rule})
+    assert names(index, expected) == ["Праздник"]
+    assert HolidayIndex._resolve({"rule": rule}, year) == date.fromisoformat(expected)
+
+
+def test_day_of_year_rule_follows_leap_years(tmp_path):
+    index = make_index(tmp_path, {"name": "День программиста", "kind": "professional", "rule": {"day_of_year": 256}})
+    assert names(index, "2024-09-12") == ["День программиста"]
+    assert names(index, "2025-09-13") == ["День программиста"]
+
+
+def test_miss_returns_none(tmp_path):
+    index = make_index(tmp_path, {"name": "Новый год", "kind": "state", "date": "01-01"})
+    assert index.lookup("2025-03-03") is None
+    assert index.lookup("не дата") is None
+
+
+def test_covered_years_answer_without_search(tmp_path):
+    extra = tmp_path / "extra.json"
+    extra.write_text(json.dumps({"covered_years": [2031], "holidays": []}), encoding="utf-8")
+    index = HolidayIndex([BUNDLED, str(extra)])
+    assert index.lookup("2026-10-19") == []
+    assert index.lookup("2031-10-20") == []
+    assert index.lookup("2040-10-20") is None
+    assert "Новый год" in names(index, "2040-01-01")
+    bundled = HolidayIndex([BUNDLED])
+    for year in sorted(bundled.covered_years):
+        day = date(year, 1, 1)
+        while day.year == year:
+            assert bundled.lookup(str(day)) is not None
+            day = day.fromordinal(day.toordinal() + 1)
+
+
+def test_missing_or_broken_files_are_skipped(tmp_path):
+    broken = tmp_path / "broken.json"
+    broken.write_text("{", encoding="utf-8")
+    index = HolidayIndex([str(tmp_path / "missing.json"), str(broken), BUNDLED])
+    assert "Новый год" in names(index, "2025-01-01")
+
+
+def test_extra_file_extends_bundled_calendar(tmp_path):
+    extra = tmp_path / "extra.json"
+    extra.write_text(json.dumps({"holidays": [{"name": "День компании", "kind": "professional", "date": "01-01"}]}),
+                     encoding="utf-8")
+    index = HolidayIndex([BUNDLED, str(extra)])
+    assert names(index, "2025-01-01")[-1] == "День компании"
+
+
+def test_format_summary_filters_religious_and_political():
+    holidays = [
+        {"name": "Пасха", "kind": "international", "religious": True},
+        {"name": "День флота", "kind": "professional", "political": True},
+        {"name": "День химика", "kind": "professional"}
+    ]
+    assert HolidayIndex.format_summary(holidays) == "- День химика (профессиональный праздник)"
+    assert HolidayIndex.format_summary(holidays[:2]).startswith("На эту дату нет подходящих")
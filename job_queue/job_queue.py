@@ -0,0 +1,484 @@
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from profiling import RequestProfiler
+from structured_logging import configure_logging, log_context
+
+logger = logging.getLogger("JobQueue")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(ROOT_DIR, "job_queue", "data", "jobs.sqlite3")
+SERVICE_DIRS = {"event": "event_helper", "task": "task_master", "greeting": "greeting_service"}
+TRANSIENT_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504, 529})
+TRANSIENT_ERROR_TYPES = frozenset({
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError", "ConnectError",
+    "ConnectTimeout", "ReadTimeout", "RemoteProtocolError", "ConnectionError", "ConnectionResetError",
+    "TimeoutError", "WorkerLost", "JobTimeout"
+})
+PENDING_STATUSES = ("queued", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    service TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    error_type TEXT,
+    error_status INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    timeout REAL NOT NULL,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    first_started_at REAL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, available_at, created_at);
+"""
+MIGRATIONS = {"error_type": "TEXT", "error_status": "INTEGER"}
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def error_details(error: BaseException) -> Dict[str, Any]:
+    current = error
+    while True:
+        status = getattr(current, "status_code", None)
+        if status is None:
+            status = getattr(getattr(current, "response", None), "status_code", None)
+        if isinstance(status, int) or current.__cause__ is None:
+            return {"error_type": type(current).__name__, "error_status": status if isinstance(status, int) else None}
+        current = current.__cause__
+
+
+def is_transient(error_type: Optional[str], error_status: Optional[int]) -> bool:
+    if error_status is not None:
+        return error_status in TRANSIENT_STATUSES
+    return error_type in TRANSIENT_ERROR_TYPES
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class JobQueue:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_pending: int = 100, default_timeout: float = 120,
+                 max_attempts: int = 3, retry_delay: float = 2.0):
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, service: str, payload: Dict[str, Any], timeout: Optional[float] = None,
+               max_attempts: Optional[int] = None) -> str:
+        if service not in SERVICE_DIRS:
+            raise ValueError(f"Неизвестный сервис: {service}")
+        key = payload.get("idempotency_key")
+        job_id = hashlib.sha256(f"{service}|{key}".encode("utf-8")).hexdigest()[:32] if key else uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if key:
+                existing = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if existing is not None and existing["status"] != "failed":
+                    conn.execute("COMMIT")
+                    logger.info("Задача с ключом идемпотентности %s уже поставлена: %s", key, job_id)
+                    return job_id
+                if existing is not None:
+                    conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", PENDING_STATUSES
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                conn.execute("ROLLBACK")
+                raise QueueFullError(f"Очередь заполнена: {pending} задач ожидают обработки")
+            conn.execute(
+                "INSERT INTO jobs (id, service, status, payload, max_attempts, timeout, created_at, available_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, service, json.dumps(payload, ensure_ascii=False), max_attempts or self.max_attempts,
+                 timeout or self.default_timeout, now, now)
+            )
+            conn.execute("COMMIT")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def position(self, job_id: str) -> int:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+                "AND created_at < (SELECT created_at FROM jobs WHERE id = ?)", (job_id,)
+            ).fetchone()
+        return row[0]
+
+    def wait(self, job_id: str, poll_interval: float = 0.2, timeout: Optional[float] = None) -> Dict[str, Any]:
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] not in PENDING_STATUSES:
+                return job
+            if deadline and time.monotonic() > deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def claim(self, services: Sequence[str], worker: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        placeholders = ", ".join("?" for _ in services)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ? AND service IN ({placeholders}) "
+                "ORDER BY created_at LIMIT 1", (now, *services)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, started_at = ?, "
+                "first_started_at = COALESCE(first_started_at, ?) WHERE id = ?",
+                (worker, now, now, row["id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        return self._to_job(job)
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, error_type = NULL, error_status = NULL, "
+                "finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str, retry: bool, error_type: Optional[str] = None,
+             error_status: Optional[int] = None) -> str:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status, attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] != "running":
+                conn.execute("COMMIT")
+                return row["status"] if row else "missing"
+            if retry and row["attempts"] < row["max_attempts"]:
+                status = "queued"
+                delay = self.retry_delay * 2 ** (row["attempts"] - 1)
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, error_type = ?, error_status = ?, worker = NULL, "
+                    "available_at = ? WHERE id = ?",
+                    (error, error_type, error_status, now + delay, job_id)
+                )
+            else:
+                status = "failed"
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, error_type = ?, error_status = ?, finished_at = ? "
+                    "WHERE id = ?",
+                    (error, error_type, error_status, now, job_id)
+                )
+            conn.execute("COMMIT")
+        return status
+
+    def running_jobs(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def purge(self, older_than: float) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - older_than,)
+            )
+        return cursor.rowcount
+
+    def stats(self, window: float = 3600) -> Dict[str, Any]:
+        since = time.time() - window
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            rows = conn.execute(
+                "SELECT status, attempts, created_at, first_started_at, started_at, finished_at FROM jobs "
+                "WHERE finished_at >= ?", (since,)
+            ).fetchall()
+        waits = [(row["first_started_at"] - row["created_at"]) * 1000 for row in rows if row["first_started_at"]]
+        runs = [(row["finished_at"] - row["started_at"]) * 1000 for row in rows if row["started_at"]]
+        totals = [(row["finished_at"] - row["created_at"]) * 1000 for row in rows]
+        return {
+            "counts": {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")},
+            "finished": len(rows),
+            "retried": sum(1 for row in rows if row["attempts"] > 1),
+            "queue_wait_ms": {"p50": percentile(waits, 0.5), "p95": percentile(waits, 0.95)},
+            "run_ms": {"p50": percentile(runs, 0.5), "p95": percentile(runs, 0.95)},
+            "total_ms": {"p50": percentile(totals, 0.5), "p95": percentile(totals, 0.95)}
+        }
+
+
+class ServiceRunners:
+    def __init__(self, config_path: Optional[str] = None, profiler: Optional[RequestProfiler] = None):
+        self.config_path = config_path
+        self.profiler = profiler if profiler is not None and profiler.enabled else None
+        self.agents: Dict[str, Any] = {}
+
+    def _load_config(self, directory: str) -> Dict[str, str]:
+        with open(self.config_path or os.path.join(directory, "config.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _agent(self, service: str) -> Any:
+        if service in self.agents:
+            return self.agents[service]
+        directory = os.path.join(ROOT_DIR, SERVICE_DIRS[service])
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+        config = self._load_config(directory)
+        if service == "event":
+            from event_helper import EventAgent
+            config.setdefault('WEATHER_CACHE_PATH', os.path.join(directory, 'data', 'weather_cache.json'))
+            config.setdefault('ADDRESS_ALIASES_PATH', os.path.join(directory, 'data', 'address_aliases.json'))
+            config.setdefault('EXAMPLES_PATH', os.path.join(directory, 'data', 'accepted_examples.jsonl'))
+            config.setdefault('IDEMPOTENCY_DIR', os.path.join(directory, 'data', 'idempotency'))
+            agent = EventAgent(config, self.profiler)
+        elif service == "task":
+            from task_master import TaskAgent
+            config.setdefault('EXAMPLES_PATH', os.path.join(directory, 'data', 'accepted_examples.jsonl'))
+            config.setdefault('IDEMPOTENCY_DIR', os.path.join(directory, 'data', 'idempotency'))
+            agent = TaskAgent(config, self.profiler)
+        else:
+            from greeting_service import GreetingGenerator
+            config.setdefault('IDEMPOTENCY_DIR', os.path.join(directory, 'data', 'idempotency'))
+            agent = GreetingGenerator(config, self.profiler)
+        self.agents[service] = agent
+        return agent
+
+    def warm(self, services: Sequence[str]):
+        for service in services:
+            try:
+                self._agent(service)
+            except Exception as e:
+                logger.error("Не удалось подготовить сервис %s: %s", service, e)
+
+    def run(self, service: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        agent = self._agent(service)
+        if service == "greeting":
+            result = agent.generate_greeting(
+                payload["date"], payload["time"], payload.get("deadline"), payload.get("idempotency_key")
+            )
+            if "error" in result:
+                return {
+                    **payload, "error": result["error"],
+                    "error_type": result.get("error_type"), "error_status": result.get("error_status")
+                }
+            return {**payload, "greeting": agent.parse_greeting(result["greeting"]), **agent.degradation(result)}
+        return agent.process_request(payload)
+
+
+def worker_loop(db_path: str, services: Sequence[str], config_path: Optional[str], poll_interval: float,
+                queue_options: Dict[str, Any], log_config: Optional[Dict[str, Any]] = None,
+                profile_config: Optional[Dict[str, Any]] = None):
+    configure_logging(log_config)
+    queue = JobQueue(db_path, **queue_options)
+    profiler = RequestProfiler.from_config(profile_config or {}, os.path.dirname(os.path.abspath(db_path)))
+    runners = ServiceRunners(config_path, profiler)
+    runners.warm(services)
+    worker = str(os.getpid())
+    logger.info("Обработчик %s готов: %s", worker, ', '.join(services))
+    while True:
+        job = queue.claim(services, worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        with log_context(request_id=job["payload"].get("idempotency_key") or job["id"]), \
+                profiler.request(f"job-{job['service']}"), profiler.phase("run_job"):
+            run_job(queue, runners, job)
+
+
+def run_job(queue: JobQueue, runners: ServiceRunners, job: Dict[str, Any]):
+    try:
+        result = runners.run(job["service"], job["payload"])
+        error = result.get("error")
+        details = {"error_type": result.get("error_type"), "error_status": result.get("error_status")}
+    except Exception as e:
+        result, error, details = None, str(e), error_details(e)
+    if error:
+        status = queue.fail(job["id"], error, is_transient(details["error_type"], details["error_status"]), **details)
+        logger.warning("Задача %s (%s) завершилась ошибкой, статус %s: %s", job['id'], job['service'], status, error)
+        return
+    queue.complete(job["id"], result)
+    duration_ms = (time.time() - job['started_at']) * 1000
+    logger.info(
+        "Задача %s (%s) выполнена: ожидание в очереди %.0f мс, выполнение %.0f мс, попытка %s",
+        job['id'], job['service'], (job['first_started_at'] - job['created_at']) * 1000, duration_ms, job['attempts'],
+        extra={"duration_ms": round(duration_ms, 1)}
+    )
+
+
+class WorkerPool:
+    def __init__(self, queue: JobQueue, workers: int = 2, services: Sequence[str] = tuple(SERVICE_DIRS),
+                 config_path: Optional[str] = None, poll_interval: float = 0.2, retention: float = 24 * 3600,
+                 log_config: Optional[Dict[str, Any]] = None, profile_config: Optional[Dict[str, Any]] = None):
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.services = list(services)
+        self.config_path = config_path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.log_config = log_config
+        self.profile_config = profile_config
+        self.processes: List[multiprocessing.Process] = []
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = multiprocessing.Process(
+            target=worker_loop,
+            args=(self.queue.db_path, self.services, self.config_path, self.poll_interval, {
+                "max_pending": self.queue.max_pending,
+                "default_timeout": self.queue.default_timeout,
+                "max_attempts": self.queue.max_attempts,
+                "retry_delay": self.queue.retry_delay
+            }, self.log_config, self.profile_config),
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def _supervise(self):
+        alive = {}
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                logger.warning("Обработчик %s завершился с кодом %s, перезапуск", process.pid, process.exitcode)
+                process = self.processes[index] = self._spawn()
+            alive[str(process.pid)] = process
+        now = time.time()
+        for job in self.queue.running_jobs():
+            process = alive.get(job["worker"])
+            if process is None:
+                status = self.queue.fail(
+                    job["id"], "Обработчик завершился во время выполнения задачи", retry=True, error_type="WorkerLost"
+                )
+                logger.warning("Задача %s потеряла обработчик, статус %s", job['id'], status)
+            elif now - job["started_at"] > job["timeout"]:
+                process.terminate()
+                process.join(5)
+                status = self.queue.fail(
+                    job["id"], f"Превышено время выполнения ({job['timeout']:.0f} с)", retry=True, error_type="JobTimeout"
+                )
+                logger.warning("Задача %s прервана по таймауту, статус %s", job['id'], status)
+
+    def run_forever(self, interval: float = 1.0):
+        self.processes = [self._spawn() for _ in range(self.workers)]
+        logger.info("Запущено обработчиков: %s, база очереди %s", self.workers, self.queue.db_path)
+        last_purge = 0.0
+        try:
+            while True:
+                self._supervise()
+                if time.time() - last_purge > 3600:
+                    purged = self.queue.purge(self.retention)
+                    if purged:
+                        logger.info("Удалено завершенных задач: %s", purged)
+                    last_purge = time.time()
+                time.sleep(interval)
+        finally:
+            for process in self.processes:
+                process.terminate()
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    counts = stats["counts"]
+    return (
+        f"В очереди {counts['queued']}, выполняется {counts['running']}, готово {counts['done']}, "
+        f"с ошибкой {counts['failed']}; за окно завершено {stats['finished']} (с повторами {stats['retried']}); "
+        f"ожидание p50/p95 {stats['queue_wait_ms']['p50']:.0f}/{stats['queue_wait_ms']['p95']:.0f} мс, "
+        f"выполнение p50/p95 {stats['run_ms']['p50']:.0f}/{stats['run_ms']['p95']:.0f} мс"
+    )
+
+
+def load_shared_config(config_path: Optional[str]) -> Dict[str, Any]:
+    if not config_path:
+        return {}
+    with open(config_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_log_config(config_path: Optional[str], log_format: Optional[str]) -> Dict[str, Any]:
+    log_config = {key: value for key, value in load_shared_config(config_path).items() if key.startswith("LOG_")}
+    if log_format:
+        log_config["LOG_FORMAT"] = log_format
+    return log_config
+
+
+def load_profile_config(config_path: Optional[str], profile: bool) -> Dict[str, Any]:
+    profile_config = {key: value for key, value in load_shared_config(config_path).items() if key.startswith("PROFILE")}
+    if profile:
+        profile_config["PROFILE"] = True
+    return profile_config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пул обработчиков очереди запросов на генерацию")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Файл базы SQLite с очередью")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICE_DIRS), default=list(SERVICE_DIRS))
+    parser.add_argument("--config", help="Общий config.json для всех сервисов (по умолчанию config.json каждого сервиса)")
+    parser.add_argument("--timeout", type=float, default=120, help="Таймаут задачи по умолчанию, секунды")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--retry-delay", type=float, default=2.0, help="Начальная задержка повтора, секунды")
+    parser.add_argument("--max-pending", type=int, default=100)
+    parser.add_argument("--retention-hours", type=float, default=24)
+    parser.add_argument("--stats", action="store_true", help="Вывести метрики очереди за последний час и завершиться")
+    parser.add_argument("--log-format", choices=("text", "json"), help="Формат логов (по умолчанию LOG_FORMAT из --config или text)")
+    parser.add_argument("--profile", action="store_true", help="Профилировать каждую задачу в обработчиках (как PROFILE в --config)")
+    args = parser.parse_args()
+    log_config = load_log_config(args.config, args.log_format)
+    configure_logging(log_config)
+    job_queue = JobQueue(args.db, args.max_pending, args.timeout, args.max_attempts, args.retry_delay)
+    if args.stats:
+        print(format_stats(job_queue.stats()))
+        sys.exit(0)
+    WorkerPool(
+        job_queue, args.workers, args.services, args.config, retention=args.retention_hours * 3600, log_config=log_config,
+        profile_config=load_profile_config(args.config, args.profile)
+    ).run_forever()
\ No newline at end of file
@@ -0,0 +1,235 @@
+import sqlite3
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue, QueueFullError, WorkerPool, error_details, is_transient, run_job
+
+
+class StatusError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeProcess:
+    def __init__(self, pid, alive=True):
+        self.pid = pid
+        self.alive = alive
+        self.terminated = False
+        self.exitcode = None if alive else 1
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+        self.alive = False
+
+    def join(self, timeout=None):
+        pass
+
+
+class FakeRunners:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+
+    def run(self, service, payload):
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), **kwargs)
+
+
+def test_submit_claim_complete(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("task", {"task_data": {"title": "a"}})
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue.position(job_id) == 0
+    job = queue.claim(["task"], "worker-1")
+    assert job["id"] == job_id and job["status"] == "running"
+    assert job["attempts"] == 1 and job["worker"] == "worker-1"
+    assert job["payload"] == {"task_data": {"title": "a"}}
+    assert queue.claim(["task"], "worker-1") is None
+    queue.complete(job_id, {"final_output": {"title": "b"}})
+    done = queue.get(job_id)
+    assert done["status"] == "done" and done["result"] == {"final_output": {"title": "b"}}
+
+
+def test_claim_respects_service_and_order(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.submit("task", {"n": 1})
+    queue.submit("event", {"n": 2})
+    second = queue.submit("task", {"n": 3})
+    assert queue.position(second) == 2
+    assert queue.claim(["greeting"], "w") is None
+    assert queue.claim(["task"], "w")["id"] == first
+    assert queue.claim(["task"], "w")["id"] == second
+
+
+def test_submit_rejects_unknown_service(tmp_path):
+    with pytest.raises(ValueError):
+        make_queue(tmp_path).submit("weather", {})
+
+
+def test_fail_with_retry_backs_off_exponentially(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=3, retry_delay=10)
+    job_id = queue.submit("task", {})
+    queue.claim(["task"], "w")
+    before = time.time()
+    assert queue.fail(job_id, "rate limited", retry=True, error_type="RateLimitError", error_status=429) == "queued"
+    job = queue.get(job_id)
+    assert job["error_type"] == "RateLimitError" and job["error_status"] == 429
+    assert before + 10 <= job["available_at"] <= time.time() + 10
+    assert queue.claim(["task"], "w") is None
+
+    queue = make_queue(tmp_path / "second", max_attempts=3, retry_delay=0.05)
+    job_id = queue.submit("task", {})
+    queue.claim(["task"], "w")
+    queue.fail(job_id, "boom", retry=True)
+    time.sleep(0.06)
+    assert queue.claim(["task"], "w")["attempts"] == 2
+    before = time.time()
+    queue.fail(job_id, "boom", retry=True)
+    assert queue.get(job_id)["available_at"] >= before + 0.1
+    time.sleep(0.11)
+    assert queue.claim(["task"], "w")["attempts"] == 3
+    assert queue.fail(job_id, "boom", retry=True) == "failed"
+    assert queue.get(job_id)["status"] == "failed"
+
+
+def test_fail_without_retry_is_final(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("task", {})
+    queue.claim(["task"], "w")
+    assert queue.fail(job_id, "bad request", retry=False, error_type="BadRequestError", error_status=400) == "failed"
+    assert queue.fail(job_id, "again", retry=True) == "failed"
+    assert queue.fail("missing", "again", retry=True) == "missing"
+
+
+def test_queue_full_applies_backpressure(tmp_path):
+    queue = make_queue(tmp_path, max_pending=2)
+    queue.submit("task", {})
+    queue.submit("task", {})
+    running = queue.claim(["task"], "w")["id"]
+    with pytest.raises(QueueFullError):
+        queue.submit("task", {})
+    queue.complete(running, {})
+    queue.submit("task", {})
+
+
+def test_submit_with_idempotency_key_is_idempotent(tmp_path):
+    queue = make_queue(tmp_path, max_pending=1)
+    job_id = queue.submit("task", {"idempotency_key": "click-1"})
+    assert queue.submit("task", {"idempotency_key": "click-1"}) == job_id
+    with pytest.raises(QueueFullError):
+        queue.submit("event", {"idempotency_key": "click-1"})
+
+
+def test_submit_after_failure_requeues_same_key(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("task", {"idempotency_key": "click-1"})
+    queue.claim(["task"], "w")
+    queue.fail(job_id, "boom", retry=False)
+    assert queue.submit("task", {"idempotency_key": "click-1"}) == job_id
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["attempts"] == 0 and job["error"] is None
+
+
+def test_supervisor_requeues_job_of_dead_worker(tmp_path):
+    queue = make_queue(tmp_path, retry_delay=0)
+    job_id = queue.submit("task", {})
+    queue.claim(["task"], "4242")
+    pool = WorkerPool(queue, workers=1)
+    pool._spawn = lambda: FakeProcess(1001)
+    pool.processes = [FakeProcess(4242, alive=False)]
+    pool._supervise()
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["worker"] is None and job["error_type"] == "WorkerLost"
+    assert pool.processes[0].pid == 1001
+    assert queue.claim(["task"], "1001")["attempts"] == 2
+
+
+def test_supervisor_terminates_timed_out_job(tmp_path):
+    queue = make_queue(tmp_path, retry_delay=0)
+    job_id = queue.submit("task", {}, timeout=0.01)
+    queue.claim(["task"], "4242")
+    process = FakeProcess(4242)
+    pool = WorkerPool(queue, workers=1)
+    pool.processes = [process]
+    time.sleep(0.02)
+    pool._supervise()
+    assert process.terminated
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["error_type"] == "JobTimeout"
+
+
+@pytest.mark.parametrize("error_type, status, expected", [
+    ("RateLimitError", 429, True),
+    ("InternalServerError", 503, True),
+    ("BadRequestError", 400, False),
+    ("AuthenticationError", 401, False),
+    ("APITimeoutError", None, True),
+    ("APIConnectionError", None, True),
+    ("ValueError", None, False),
+    ("KeyError", None, False),
+    (None, None, False),
+])
+def test_is_transient_uses_type_and_status(error_type, status, expected):
+    assert is_transient(error_type, status) is expected
+
+
+def test_error_details_follows_explicit_cause():
+    try:
+        try:
+            raise StatusError("upstream said 500 on port 8080", 503)
+        except StatusError as e:
+            raise RuntimeError("all backends failed") from e
+    except RuntimeError as e:
+        assert error_details(e) == {"error_type": "StatusError", "error_status": 503}
+    assert error_details(ValueError("timeout must be positive")) == {"error_type": "ValueError", "error_status": None}
+
+
+def test_run_job_classifies_by_type_not_message(tmp_path):
+    queue = make_queue(tmp_path, retry_delay=0)
+    job_id = queue.submit("task", {})
+    job = queue.claim(["task"], "w")
+    run_job(queue, FakeRunners(error=ValueError("timeout 500 is not allowed")), job)
+    assert queue.get(job_id)["status"] == "failed"
+
+    job_id = queue.submit("task", {})
+    job = queue.claim(["task"], "w")
+    run_job(queue, FakeRunners({"error": "Ошибка", "error_type": "RateLimitError", "error_status": 429}), job)
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["error_status"] == 429
+
+
+def test_existing_database_gets_error_columns(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(job_queue.SCHEMA.replace("    error_type TEXT,\n    error_status INTEGER,\n", ""))
+    conn.close()
+    queue = JobQueue(path)
+    job_id = queue.submit("task", {})
+    queue.claim(["task"], "w")
+    queue.fail(job_id, "boom", retry=False, error_type="ValueError")
+    assert queue.get(job_id)["error_type"] == "ValueError"
+
+
+def test_profile_config_from_shared_config_and_flag(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"PROFILE_DIR": "profiles", "PROFILE_TOP": 5, "LOG_FORMAT": "json"}', encoding="utf-8")
+    assert job_queue.load_profile_config(str(path), False) == {"PROFILE_DIR": "profiles", "PROFILE_TOP": 5}
+    assert job_queue.load_profile_config(None, True) == {"PROFILE": True}
+    assert job_queue.load_log_config(str(path), None) == {"LOG_FORMAT": "json"}
+
+
+def test_service_runners_share_enabled_profiler_only():
+    profiler = job_queue.RequestProfiler(enabled=True)
+    assert job_queue.ServiceRunners(profiler=profiler).profiler is profiler
+    assert job_queue.ServiceRunners(profiler=job_queue.RequestProfiler()).profiler is None
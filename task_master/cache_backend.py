@@ -0,0 +1,346 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("CacheBackend")
+
+COMPRESS_THRESHOLD = 512
+MAX_KEY_LENGTH = 96
+EXPIRY_HEADER = struct.Struct(">d")
+
+
+def encode_value(value: Any) -> bytes:
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(raw, 6)
+        if len(compressed) < len(raw):
+            return b"z" + compressed
+    return b"j" + raw
+
+
+def decode_value(data: bytes) -> Any:
+    marker, payload = data[:1], data[1:]
+    if marker == b"z":
+        payload = zlib.decompress(payload)
+    elif marker != b"j":
+        raise ValueError(f"Неизвестный формат значения в кэше: {marker!r}")
+    return json.loads(payload.decode("utf-8"))
+
+
+def fingerprint(*parts: Any) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(ABC):
+    name = "base"
+
+    def __init__(self, prefix: str = "vkws", report_every: int = 100):
+        self.prefix = prefix
+        self.report_every = report_every
+        self.stats_lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, float]] = {}
+        self.operations = 0
+
+    def full_key(self, namespace: str, key: str) -> str:
+        if len(key) > MAX_KEY_LENGTH:
+            key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{namespace}:{key}"
+
+    @abstractmethod
+    def _get(self, full_key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def _set(self, full_key: str, data: bytes, ttl: float):
+        pass
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        started = time.perf_counter()
+        try:
+            data = self._get(self.full_key(namespace, key))
+            value = None if data is None else decode_value(data)
+        except Exception as e:
+            logger.warning("Ошибка чтения из кэша %s: %s", self.name, e)
+            self._count(namespace, "errors", "get", started)
+            return None
+        self._count(namespace, "hits" if value is not None else "misses", "get", started)
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        started = time.perf_counter()
+        try:
+            self._set(self.full_key(namespace, key), encode_value(value), ttl)
+        except Exception as e:
+            logger.warning("Ошибка записи в кэш %s: %s", self.name, e)
+            self._count(namespace, "errors", "set", started)
+            return
+        self._count(namespace, "sets", "set", started)
+
+    def _count(self, namespace: str, outcome: str, operation: str, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.stats_lock:
+            entry = self.counters.setdefault(namespace, {
+                "hits": 0, "misses": 0, "sets": 0, "errors": 0,
+                "get_ms": 0.0, "set_ms": 0.0, "gets_timed": 0, "sets_timed": 0, "max_get_ms": 0.0
+            })
+            entry[outcome] += 1
+            entry[f"{operation}_ms"] += elapsed_ms
+            entry[f"{operation}s_timed"] += 1
+            if operation == "get":
+                entry["max_get_ms"] = max(entry["max_get_ms"], elapsed_ms)
+            self.operations += 1
+            report = self.report_every and self.operations % self.report_every == 0
+        if report:
+            logger.info("Статистика кэша %s: %s", self.name, json.dumps(self.stats()['namespaces'], ensure_ascii=False))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            namespaces = {}
+            for namespace, entry in self.counters.items():
+                lookups = entry["hits"] + entry["misses"]
+                namespaces[namespace] = {
+                    "hits": entry["hits"],
+                    "misses": entry["misses"],
+                    "sets": entry["sets"],
+                    "errors": entry["errors"],
+                    "hit_rate": round(entry["hits"] / lookups, 3) if lookups else 0.0,
+                    "avg_get_ms": round(entry["get_ms"] / max(1, entry["gets_timed"]), 3),
+                    "max_get_ms": round(entry["max_get_ms"], 3),
+                    "avg_set_ms": round(entry["set_ms"] / max(1, entry["sets_timed"]), 3)
+                }
+        return {"backend": self.name, "namespaces": namespaces}
+
+
+class MemoryLRUBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, prefix: str = "vkws"):
+        super().__init__(prefix)
+        self.max_entries = max(1, max_entries)
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def _get(self, full_key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(full_key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.entries[full_key]
+                return None
+            self.entries.move_to_end(full_key)
+            return entry[1]
+
+    def _set(self, full_key: str, data: bytes, ttl: float):
+        with self.lock:
+            self.entries[full_key] = (time.time() + ttl, data)
+            self.entries.move_to_end(full_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class FileBackend(CacheBackend):
+    name = "file"
+
+    def __init__(self, path: str, max_entries: int = 5000, prefix: str = "vkws", sweep_every: int = 200):
+        super().__init__(prefix)
+        self.directory = os.path.splitext(path)[0]
+        self.max_entries = max(1, max_entries)
+        self.sweep_every = max(1, sweep_every)
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def _entry_path(self, full_key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(full_key.encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def _read(path: str, header_only: bool = False) -> Optional[Tuple[float, bytes]]:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(EXPIRY_HEADER.size) if header_only else f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < EXPIRY_HEADER.size:
+            return None
+        return EXPIRY_HEADER.unpack_from(data)[0], data[EXPIRY_HEADER.size:]
+
+    def _get(self, full_key: str) -> Optional[bytes]:
+        path = self._entry_path(full_key)
+        entry = self._read(path)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            self._remove(path)
+            return None
+        return entry[1]
+
+    def _set(self, full_key: str, data: bytes, ttl: float):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(full_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(EXPIRY_HEADER.pack(time.time() + ttl) + data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.writes += 1
+            sweep = self.writes % self.sweep_every == 0
+        if sweep:
+            self.sweep()
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def sweep(self) -> int:
+        now = time.time()
+        live = []
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            entry = self._read(path, header_only=True)
+            if entry is None or entry[0] <= now:
+                self._remove(path)
+                removed += 1
+            else:
+                live.append((entry[0], path))
+        if len(live) > self.max_entries:
+            live.sort()
+            for _, path in live[:len(live) - self.max_entries]:
+                self._remove(path)
+                removed += 1
+        return removed
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", timeout: float = 0.2, prefix: str = "vkws",
+                 retry_seconds: float = 5.0):
+        super().__init__(prefix)
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip("/") or 0)
+        self.password = urllib.parse.unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.sock: Optional[socket.socket] = None
+        self.reader: Any = None
+
+    @staticmethod
+    def _encode_command(*parts: bytes) -> bytes:
+        chunks = [b"*%d\r\n" % len(parts)]
+        for part in parts:
+            chunks.append(b"$%d\r\n%s\r\n" % (len(part), part))
+        return b"".join(chunks)
+
+    def _read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Соединение с Redis закрыто")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8", errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Соединение с Redis закрыто")
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Неизвестный ответ Redis: {line!r}")
+
+    def _roundtrip(self, *parts: bytes) -> Any:
+        self.sock.sendall(self._encode_command(*parts))
+        return self._read_reply()
+
+    def _connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if self.password:
+            self._roundtrip(b"AUTH", self.password.encode("utf-8"))
+        if self.db:
+            self._roundtrip(b"SELECT", str(self.db).encode("ascii"))
+
+    def _close(self):
+        for resource in (self.reader, self.sock):
+            try:
+                if resource is not None:
+                    resource.close()
+            except OSError:
+                pass
+        self.sock, self.reader = None, None
+
+    def execute(self, *parts: Any) -> Any:
+        encoded = [part if isinstance(part, bytes) else str(part).encode("utf-8") for part in parts]
+        with self.lock:
+            if self.sock is None and time.time() < self.retry_at:
+                raise ConnectionError("Redis недоступен, повторное подключение отложено")
+            for attempt in range(2):
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    return self._roundtrip(*encoded)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        self.retry_at = time.time() + self.retry_seconds
+                        raise
+
+    def _get(self, full_key: str) -> Optional[bytes]:
+        return self.execute(b"GET", full_key)
+
+    def _set(self, full_key: str, data: bytes, ttl: float):
+        self.execute(b"SET", full_key, data, b"PX", max(1, int(ttl * 1000)))
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+def create_backend(config: Dict[str, Any], default_path: Optional[str] = None) -> CacheBackend:
+    kind = (config.get('CACHE_BACKEND') or ("file" if default_path else "memory")).lower()
+    prefix = config.get('CACHE_NAMESPACE') or "vkws"
+    if kind == "redis":
+        url = config.get('CACHE_URL') or "redis://127.0.0.1:6379/0"
+        logger.info("Кэш: Redis %s", urllib.parse.urlparse(url).hostname)
+        return RedisBackend(url, timeout=float(config.get('CACHE_TIMEOUT_SECONDS', 0.2)), prefix=prefix)
+    path = config.get('CACHE_PATH') or default_path
+    if kind == "file" and path:
+        return FileBackend(path, int(config.get('CACHE_MAX_ENTRIES', 5000)), prefix=prefix)
+    if kind not in ("memory", "file"):
+        logger.warning("Неизвестный тип кэша %s, используется память процесса", kind)
+    return MemoryLRUBackend(int(config.get('CACHE_MAX_ENTRIES', 1024)), prefix=prefix)
\ No newline at end of file
@@ -1,13 +1,48 @@
 import streamlit as st
+import atexit
 import json
 import os
 import subprocess
 import datetime
+import time
+import uuid
+import copy
+import sys
 from pathlib import Path
+from speculation import SpeculativeRunner
+from stdio_client import ContainerPool, StdioSession
+from example_store import ExampleStore
+from recurrence import describe, parse_rule
 
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 INPUT_FILE = DATA_DIR / "input.json"
+METRICS_FILE = DATA_DIR / "acceptance_metrics.jsonl"
+EXAMPLES_FILE = DATA_DIR / "accepted_examples.jsonl"
+CONFIG_FILE = Path("config.json")
+
+
+def load_client_config():
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+CLIENT_CONFIG = load_client_config()
+NUM_CANDIDATES = int(CLIENT_CONFIG.get("NUM_CANDIDATES", 1))
+EXECUTION_BACKEND = CLIENT_CONFIG.get("EXECUTION_BACKEND", "docker")
+SPECULATIVE_MODE = EXECUTION_BACKEND == "docker" and bool(CLIENT_CONFIG.get("SPECULATIVE_MODE", False))
+SPECULATION_DEBOUNCE_SECONDS = float(CLIENT_CONFIG.get("SPECULATION_DEBOUNCE_SECONDS", 2.0))
+QUEUE_POLL_SECONDS = float(CLIENT_CONFIG.get("QUEUE_POLL_SECONDS", 0.5))
+REQUEST_BUDGET_SECONDS = float(CLIENT_CONFIG.get("REQUEST_BUDGET_SECONDS") or 0)
+RECURRENCE_OPTIONS = {"": "Не повторяется", "FREQ=DAILY": "Каждый день", "FREQ=WEEKLY": "Каждую неделю", "FREQ=MONTHLY": "Каждый месяц"}
+POOL_SIZE = int(CLIENT_CONFIG.get("POOL_SIZE", 2))
+POOL_MAX_USES = int(CLIENT_CONFIG.get("POOL_MAX_USES", 1))
+POOL_IDLE_SECONDS = float(CLIENT_CONFIG.get("POOL_IDLE_SECONDS", 600))
+STDIO_TIMEOUT_SECONDS = float(CLIENT_CONFIG.get("STDIO_TIMEOUT_SECONDS", 120))
+MODES = {"task": "Одна задача", "project": "Проект целиком"}
 
 def init_session_state():
     if 'step' not in st.session_state:
@@ -27,6 +62,31 @@ def init_session_state():
         st.session_state.generation_history = []
         st.session_state.final_output = None
         st.session_state.feedback = ""
+        st.session_state.candidates = []
+        st.session_state.selected_candidate = 0
+        st.session_state.total_latency = 0.0
+        st.session_state.job_id = None
+        st.session_state.job_started = 0.0
+        st.session_state.degraded_reasons = []
+        st.session_state.few_shot_examples = 0
+        st.session_state.request_session = uuid.uuid4().hex
+        st.session_state.saved_output_tokens = 0
+        st.session_state.saved_latency_ms = 0
+        st.session_state.occurrences = []
+        st.session_state.project_data = default_project_data()
+        st.session_state.project_pending = False
+        st.session_state.project_tasks = []
+        st.session_state.project_metrics = None
+
+def default_project_data():
+    return {
+        "prompt": "",
+        "additional_info": "",
+        "start_date": str(datetime.date.today()),
+        "end_date": str(datetime.date.today() + datetime.timedelta(days=14)),
+        "style": {"brief": True, "formal": False},
+        "max_tasks": 10
+    }
 
 def format_task_data(task_data):
     style_map = {
@@ -51,6 +111,8 @@ def format_task_data(task_data):
         time_info,
         f"**Стиль описания:** {style_text}"
     ]
+    if task_data.get("recurrence"):
+        parts.insert(1, f"**Повторение:** {describe(parse_rule(task_data['recurrence']))}")
 
     if task_data["additional_info"]:
         parts.append(f"**Дополнительная информация:**  \n{task_data['additional_info']}")
@@ -61,6 +123,8 @@ def format_task_data(task_data):
 
 def main():
     init_session_state()
+    if EXECUTION_BACKEND == "pool":
+        get_container_pool()
     st.markdown(
         "<h1 style='text-align: center;'>ИИ-ассистент для генерации задач в Календаре VK WorkSpace</h1>",
         unsafe_allow_html=True
@@ -70,7 +134,10 @@ def main():
         "<p style='text-align: center;'>Создайте название и описание задачи с помощью ИИ-ассистента</p>",
         unsafe_allow_html=True
     )
-    if st.session_state.step == "input":
+    mode = st.radio("Режим", options=list(MODES), format_func=MODES.get, horizontal=True, key="mode")
+    if mode == "project":
+        render_project_step()
+    elif st.session_state.step == "input":
         render_input_step()
     elif st.session_state.step == "generation":
         render_generation_step()
@@ -78,7 +145,8 @@ def main():
         render_final_step()
 
 def render_input_step():
-    with st.form("task_form"):
+    container = st.container() if SPECULATIVE_MODE else st.form("task_form")
+    with container:
         st.subheader("Временные параметры")
         all_day = st.checkbox("Весь день", key="all_day")
         st.session_state.task_data["all_day"] = all_day
@@ -115,6 +183,20 @@ def render_input_step():
                     key="end_time"
                 )
                 st.session_state.task_data["end_time"] = end_time.strftime("%H:%M")
+        col_repeat1, col_repeat2 = st.columns(2)
+        with col_repeat1:
+            frequency = st.selectbox(
+                "Повторение",
+                options=list(RECURRENCE_OPTIONS),
+                format_func=RECURRENCE_OPTIONS.get,
+                key="recurrence_frequency"
+            )
+        with col_repeat2:
+            count = st.number_input("Число повторений", min_value=2, max_value=52, value=10, key="recurrence_count")
+        if frequency:
+            st.session_state.task_data["recurrence"] = f"{frequency};COUNT={int(count)}"
+        else:
+            st.session_state.task_data.pop("recurrence", None)
         st.session_state.task_data["additional_info"] = st.text_area(
             "Дополнительная информация (ссылки, ресурсы, контакты и т.д.)",
             value=st.session_state.task_data["additional_info"],
@@ -143,12 +225,152 @@ def render_input_step():
         st.session_state.task_data["style"]["brief"] = brief
         st.session_state.task_data["style"]["formal"] = formal
 
-        if st.form_submit_button("Сгенерировать название и описание", type="primary"):
+        if SPECULATIVE_MODE:
+            watch_speculation()
+        submit_button = st.button if SPECULATIVE_MODE else st.form_submit_button
+        if submit_button("Сгенерировать название и описание", type="primary"):
             st.session_state.step = "generation"
             st.session_state.attempts = 0
+            st.session_state.request_session = uuid.uuid4().hex
             st.rerun()
 
 
+def build_input_data():
+    return {
+        "task_data": st.session_state.task_data,
+        "messages": st.session_state.generation_history,
+        "final_output": None,
+        "user_feedback": st.session_state.feedback,
+        "num_candidates": NUM_CANDIDATES,
+        "candidates": st.session_state.candidates,
+        "selected_candidate": st.session_state.selected_candidate if st.session_state.candidates else None
+    }
+
+
+def docker_command(input_name, container_name=None):
+    command = ["docker", "run", "--rm"]
+    if container_name:
+        command += ["--name", container_name, "--init"]
+    return command + [
+        "-v", f"{os.getcwd()}/data:/data",
+        "-v", f"{os.getcwd()}/config.json:/app/config.json",
+        "task-master",
+        f"/data/{input_name}"
+    ]
+
+
+@st.cache_resource
+def get_agent():
+    from task_master import TaskAgent
+    config = dict(CLIENT_CONFIG)
+    config.setdefault('EXAMPLES_PATH', str(EXAMPLES_FILE.resolve()))
+    config.setdefault('IDEMPOTENCY_DIR', str(DATA_DIR.resolve() / 'idempotency'))
+    return TaskAgent(config)
+
+
+def stdio_command():
+    return CLIENT_CONFIG.get("STDIO_COMMAND") or [
+        "docker", "run", "-i", "--rm",
+        "-v", f"{os.getcwd()}/data:/data",
+        "-v", f"{os.getcwd()}/config.json:/app/config.json",
+        "task-master",
+        "--stdio", "/data"
+    ]
+
+
+def get_stdio_session():
+    if 'stdio_session' not in st.session_state:
+        st.session_state.stdio_session = StdioSession(stdio_command(), STDIO_TIMEOUT_SECONDS)
+    return st.session_state.stdio_session
+
+
+@st.cache_resource
+def get_container_pool():
+    pool = ContainerPool(stdio_command(), size=POOL_SIZE, max_uses=POOL_MAX_USES, idle_seconds=POOL_IDLE_SECONDS,
+                         timeout=STDIO_TIMEOUT_SECONDS)
+    atexit.register(pool.close)
+    return pool
+
+
+def run_stdio(input_data):
+    session = get_stdio_session()
+    if input_data["user_feedback"] and session.alive():
+        return session.request({
+            "op": "feedback",
+            "user_feedback": input_data["user_feedback"],
+            "selected_candidate": input_data["selected_candidate"],
+            "deadline": input_data.get("deadline"),
+            "idempotency_key": input_data.get("idempotency_key")
+        })
+    return session.request({"op": "generate", **input_data})
+
+
+def run_service(input_data):
+    if EXECUTION_BACKEND == "stdio":
+        return run_stdio(input_data)
+    if EXECUTION_BACKEND == "pool":
+        return get_container_pool().request({"op": "generate", **input_data})
+    if EXECUTION_BACKEND == "inprocess":
+        return get_agent().process_request(copy.deepcopy(input_data))
+    with open(INPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(input_data, f, ensure_ascii=False, indent=2)
+    process = subprocess.Popen(
+        docker_command(INPUT_FILE.name),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode('utf-8', errors='replace'))
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@st.cache_resource
+def get_job_queue():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "job_queue"))
+    from job_queue import DEFAULT_DB_PATH, JobQueue
+    return JobQueue(
+        CLIENT_CONFIG.get("JOB_QUEUE_PATH", DEFAULT_DB_PATH),
+        max_pending=int(CLIENT_CONFIG.get("JOB_QUEUE_MAX_PENDING", 100)),
+        default_timeout=float(CLIENT_CONFIG.get("JOB_TIMEOUT_SECONDS", 120))
+    )
+
+
+def poll_job(input_data):
+    job_queue = get_job_queue()
+    from job_queue import QueueFullError
+    if st.session_state.job_id is None:
+        try:
+            st.session_state.job_id = job_queue.submit("task", input_data)
+        except QueueFullError as e:
+            raise RuntimeError(f"Сервис перегружен, попробуйте позже. {str(e)}")
+        st.session_state.job_started = time.perf_counter()
+    job = job_queue.get(st.session_state.job_id)
+    if job is not None and job["status"] in ("queued", "running"):
+        if job["status"] == "queued":
+            st.info(f"Запрос ожидает в очереди, перед ним задач: {job_queue.position(job['id'])}")
+        time.sleep(QUEUE_POLL_SECONDS)
+        st.rerun()
+    st.session_state.job_id = None
+    if job is None or job["status"] == "failed":
+        raise RuntimeError(job["error"] if job else "Задача не найдена в очереди")
+    return job["result"]
+
+
+def get_speculator():
+    if 'speculator' not in st.session_state:
+        st.session_state.speculator = SpeculativeRunner(docker_command, DATA_DIR, SPECULATION_DEBOUNCE_SECONDS)
+    return st.session_state.speculator
+
+
+@st.fragment(run_every=max(0.5, SPECULATION_DEBOUNCE_SECONDS / 2))
+def watch_speculation():
+    speculator = get_speculator()
+    speculator.observe(build_input_data(), ready=bool(st.session_state.task_data["prompt"].strip()))
+    st.caption(speculator.summary())
+
+
 def render_generation_step():
     st.subheader("Данные задачи")
     with st.expander("Просмотр введенных данных", expanded=True):
@@ -156,39 +378,21 @@ def render_generation_step():
 
     if st.session_state.attempts == 0 or st.session_state.feedback:
         with st.spinner("Генерирую название и описание задачи..."):
-            input_data = {
-                "task_data": st.session_state.task_data,
-                "messages": st.session_state.generation_history,
-                "final_output": None,
-                "user_feedback": st.session_state.feedback
-            }
-
-            with open(INPUT_FILE, "w", encoding="utf-8") as f:
-                json.dump(input_data, f, ensure_ascii=False, indent=2)
-
+            input_data = build_input_data()
             try:
-                docker_cmd = [
-                    "docker", "run", "--rm",
-                    "-v", f"{os.getcwd()}/data:/data",
-                    "-v", f"{os.getcwd()}/config.json:/app/config.json",
-                    "task-master",
-                    "/data/input.json"
-                ]
-                process = subprocess.Popen(
-                    docker_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                stdout, stderr = process.communicate()
-
-                if process.returncode != 0:
-                    error_msg = stderr.decode('utf-8', errors='replace')
-                    st.error(f"Ошибка при выполнении микросервиса: {error_msg}")
-                    st.session_state.step = "input"
-                    st.rerun()
-
-                with open(INPUT_FILE, "r", encoding="utf-8") as f:
-                    result_data = json.load(f)
+                started = time.perf_counter()
+                result_data = None
+                if SPECULATIVE_MODE and st.session_state.attempts == 0:
+                    result_data = get_speculator().take(input_data)
+                if result_data is None:
+                    input_data["idempotency_key"] = f"{st.session_state.request_session}-{st.session_state.attempts}"
+                if result_data is None and REQUEST_BUDGET_SECONDS:
+                    input_data["deadline"] = time.time() + REQUEST_BUDGET_SECONDS
+                if result_data is None and EXECUTION_BACKEND == "queue":
+                    result_data = poll_job(input_data)
+                    started = st.session_state.job_started
+                elif result_data is None:
+                    result_data = run_service(input_data)
 
                 if "error" in result_data:
                     st.error(f"Ошибка генерации: {result_data['error']}")
@@ -197,9 +401,26 @@ def render_generation_step():
 
                 st.session_state.final_output = result_data["final_output"]
                 st.session_state.generation_history = result_data.get("messages", [])
+                st.session_state.candidates = result_data.get("candidates") or []
+                st.session_state.selected_candidate = 0
+                st.session_state.degraded_reasons = result_data.get("degraded_reasons") or []
+                st.session_state.occurrences = result_data.get("occurrences") or []
+                if st.session_state.attempts == 0:
+                    few_shot = (result_data.get("metrics") or {}).get("few_shot") or {}
+                    st.session_state.few_shot_examples = few_shot.get("examples", 0)
+                partial = (result_data.get("metrics") or {}).get("partial") or {}
+                st.session_state.saved_output_tokens += partial.get("saved_output_tokens", 0)
+                st.session_state.saved_latency_ms += partial.get("saved_latency_ms", 0)
                 st.session_state.feedback = ""
                 st.session_state.attempts += 1
+                st.session_state.total_latency += time.perf_counter() - started
+                if EXECUTION_BACKEND == "pool":
+                    st.caption(get_container_pool().summary())
 
+            except RuntimeError as e:
+                st.error(f"Ошибка при выполнении микросервиса: {str(e)}")
+                st.session_state.step = "input"
+                st.rerun()
             except Exception as e:
                 st.error(f"Неизвестная ошибка: {str(e)}")
                 st.session_state.step = "input"
@@ -207,16 +428,32 @@ def render_generation_step():
 
     if st.session_state.final_output:
         st.success("Название и описание задачи успешно сгенерированы!")
+        if "llm_timeout" in st.session_state.degraded_reasons:
+            st.warning("Модель не успела ответить вовремя: название и описание составлены по шаблону из введенных данных")
+        elif "regeneration_timeout" in st.session_state.degraded_reasons:
+            st.warning("Модель не успела доработать результат вовремя: показана предыдущая версия, фидбек можно отправить еще раз")
+        if len(st.session_state.candidates) > 1:
+            selected = st.radio(
+                "Выберите вариант:",
+                options=list(range(len(st.session_state.candidates))),
+                format_func=lambda i: f"Вариант {i + 1}: {st.session_state.candidates[i]['title']}",
+                index=st.session_state.selected_candidate,
+                key=f"candidate_choice_{st.session_state.attempts}"
+            )
+            st.session_state.selected_candidate = selected
+            st.session_state.final_output = st.session_state.candidates[selected]
         st.subheader("Название задачи:")
         st.write(st.session_state.final_output["title"])
         st.subheader("Описание задачи:")
         st.write(st.session_state.final_output["description"])
+        render_occurrences()
         st.markdown("---")
         st.write(f"Попытка: {st.session_state.attempts}/{st.session_state.max_attempts}")
 
         col1, col2 = st.columns([1, 2])
         with col1:
             if st.button("Принять результат", type="primary"):
+                record_acceptance()
                 st.session_state.step = "final"
                 st.rerun()
 
@@ -234,16 +471,179 @@ def render_generation_step():
             else:
                 st.warning("Достигнуто максимальное количество попыток")
                 if st.button("Принять текущий результат"):
+                    record_acceptance()
                     st.session_state.step = "final"
                     st.rerun()
 
 
+def record_acceptance():
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "num_candidates": NUM_CANDIDATES,
+        "attempts": st.session_state.attempts,
+        "latency_seconds": round(st.session_state.total_latency, 3),
+        "few_shot_examples": st.session_state.few_shot_examples,
+        "partial_saved_output_tokens": st.session_state.saved_output_tokens,
+        "partial_saved_latency_ms": st.session_state.saved_latency_ms
+    }
+    with open(METRICS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if "llm_timeout" not in st.session_state.degraded_reasons:
+        data = st.session_state.task_data
+        ExampleStore(str(EXAMPLES_FILE)).add(
+            data["prompt"], data["style"],
+            st.session_state.final_output["title"], st.session_state.final_output["description"],
+            attempts=st.session_state.attempts
+        )
+
+
+def render_occurrences():
+    if not st.session_state.occurrences:
+        return
+    with st.expander(f"Повторения серии: {len(st.session_state.occurrences)}"):
+        for item in st.session_state.occurrences:
+            if st.session_state.task_data["all_day"]:
+                st.markdown(f"**{item['start_date']}**")
+            else:
+                st.markdown(f"**{item['start_date']} {item['start_time']} - {item['end_date']} {item['end_time']}**")
+
+
+def format_task_period(task):
+    if not task["all_day"]:
+        return f"{task['start_date']} {task['start_time']} - {task['end_date']} {task['end_time']}"
+    if task["start_date"] == task["end_date"]:
+        return task["start_date"]
+    return f"{task['start_date']} - {task['end_date']}"
+
+
+def run_decomposition(input_data, on_task):
+    if EXECUTION_BACKEND in ("stdio", "pool"):
+        service = get_stdio_session() if EXECUTION_BACKEND == "stdio" else get_container_pool()
+        return service.request({"op": "decompose", **input_data}, lambda event: on_task(event["task"]))
+    if EXECUTION_BACKEND == "inprocess":
+        return get_agent().decompose(copy.deepcopy(input_data), on_task)
+    if EXECUTION_BACKEND == "queue":
+        return poll_job(input_data)
+    return run_service(input_data)
+
+
+def render_project_form():
+    project = st.session_state.project_data
+    with st.form("project_form"):
+        st.subheader("Период проекта")
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input(
+                "Дата начала",
+                value=datetime.datetime.strptime(project["start_date"], "%Y-%m-%d").date(),
+                key="project_start_date"
+            )
+        with col2:
+            end_date = st.date_input(
+                "Дата окончания",
+                value=datetime.datetime.strptime(project["end_date"], "%Y-%m-%d").date(),
+                key="project_end_date"
+            )
+        max_tasks = st.number_input("Максимум задач", min_value=1, max_value=20, value=project["max_tasks"], key="project_max_tasks")
+        additional_info = st.text_area(
+            "Общий контекст проекта (команда, ссылки, ресурсы и т.д.)",
+            value=project["additional_info"],
+            key="project_additional_info"
+        )
+        prompt = st.text_area(
+            "Опишите проект своими словами (цель, этапы, ожидаемый результат)",
+            value=project["prompt"],
+            key="project_prompt",
+            height=150
+        )
+        col_style1, col_style2 = st.columns(2)
+        with col_style1:
+            brief = st.checkbox("Краткий формат", value=project["style"]["brief"], key="project_brief_style")
+        with col_style2:
+            formal = st.checkbox("Официальный стиль", value=project["style"]["formal"], key="project_formal_style")
+        if st.form_submit_button("Разбить проект на задачи", type="primary"):
+            if end_date < start_date:
+                st.error("Дата окончания проекта раньше даты начала")
+                return
+            st.session_state.project_data = {
+                "prompt": prompt,
+                "additional_info": additional_info,
+                "start_date": str(start_date),
+                "end_date": str(end_date),
+                "style": {"brief": brief, "formal": formal},
+                "max_tasks": int(max_tasks)
+            }
+            st.session_state.project_pending = True
+            st.session_state.request_session = uuid.uuid4().hex
+            st.rerun()
+
+
+def render_project_step():
+    if st.session_state.project_pending:
+        input_data = {
+            "project_data": st.session_state.project_data,
+            "idempotency_key": f"{st.session_state.request_session}-project"
+        }
+        if REQUEST_BUDGET_SECONDS:
+            input_data["deadline"] = time.time() + REQUEST_BUDGET_SECONDS
+        placeholder = st.empty()
+        streamed = []
+
+        def on_task(task):
+            streamed.append(task)
+            with placeholder.container():
+                for index, item in enumerate(streamed, 1):
+                    st.markdown(f"**{index}. {item['title']}** ({format_task_period(item)})")
+
+        with st.spinner("Разбиваю проект на задачи..."):
+            try:
+                started = time.perf_counter()
+                result_data = run_decomposition(input_data, on_task)
+                if EXECUTION_BACKEND == "queue":
+                    started = st.session_state.job_started
+            except Exception as e:
+                st.session_state.project_pending = False
+                st.error(f"Ошибка при выполнении микросервиса: {str(e)}")
+                return
+        st.session_state.project_pending = False
+        if "error" in result_data:
+            st.error(f"Ошибка декомпозиции: {result_data['error']}")
+            return
+        st.session_state.project_tasks = result_data["tasks"]
+        st.session_state.project_metrics = {
+            **((result_data.get("metrics") or {}).get("decomposition") or {}),
+            "total_seconds": time.perf_counter() - started
+        }
+        st.rerun()
+
+    if not st.session_state.project_tasks:
+        render_project_form()
+        return
+    metrics = st.session_state.project_metrics or {}
+    st.success(f"Проект разбит на задачи: {len(st.session_state.project_tasks)}")
+    if metrics.get("first_task_ms") is not None:
+        st.caption(
+            f"Один вызов модели вместо {len(st.session_state.project_tasks)}: первая задача через "
+            f"{metrics['first_task_ms'] / 1000:.1f} с, весь список за {metrics['total_seconds']:.1f} с"
+        )
+    for index, task in enumerate(st.session_state.project_tasks, 1):
+        with st.expander(f"{index}. {task['title']} ({format_task_period(task)})"):
+            st.write(task["description"])
+    if st.button("Разбить новый проект", type="primary"):
+        st.session_state.project_data = default_project_data()
+        st.session_state.project_tasks = []
+        st.session_state.project_metrics = None
+        st.session_state.job_id = None
+        st.rerun()
+
+
 def render_final_step():
     st.success("Финальный результат принят!")
     st.subheader("Название задачи:")
     st.write(st.session_state.final_output["title"])
     st.subheader("Описание задачи:")
     st.write(st.session_state.final_output["description"])
+    render_occurrences()
     st.markdown("---")
 
     if st.button("Создать новую задачу", type="primary"):
@@ -262,6 +662,14 @@ def render_final_step():
         st.session_state.generation_history = []
         st.session_state.final_output = None
         st.session_state.feedback = ""
+        st.session_state.candidates = []
+        st.session_state.selected_candidate = 0
+        st.session_state.occurrences = []
+        st.session_state.total_latency = 0.0
+        st.session_state.saved_output_tokens = 0
+        st.session_state.saved_latency_ms = 0
+        st.session_state.job_id = None
+        st.session_state.job_started = 0.0
         st.rerun()
 
 
@@ -0,0 +1,100 @@
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+TASK_OPEN = re.compile(r'\[TASK\]', re.IGNORECASE)
+TASK_BOUNDARY = re.compile(r'\[(/?)TASK\]', re.IGNORECASE)
+FIELD_TAG = re.compile(r'[*_#]*\s*\[(NAME|START|END|DESCRIPTION)\]\s*[*_:]*', re.IGNORECASE)
+PARTIAL_TAG = re.compile(r'\[[/A-Z]*$', re.IGNORECASE)
+MOMENT = re.compile(r'(\d{4}-\d{2}-\d{2})(?:[ T](\d{1,2}:\d{2}))?')
+
+
+def _parse_moment(text: Optional[str]) -> Optional[Tuple[date, Optional[str]]]:
+    match = MOMENT.search(text or "")
+    if match is None:
+        return None
+    try:
+        day = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+        moment = datetime.strptime(match.group(2), "%H:%M").strftime("%H:%M") if match.group(2) else None
+    except ValueError:
+        return None
+    return day, moment
+
+
+def parse_task_block(block: str, start: date, end: date) -> Tuple[Optional[Dict[str, Any]], bool]:
+    parts = FIELD_TAG.split(PARTIAL_TAG.sub("", block.strip()))
+    fields: Dict[str, str] = {}
+    for tag, value in zip(parts[1::2], parts[2::2]):
+        fields.setdefault(tag.upper(), value.strip())
+    title = fields.get("NAME", "").strip('*"«» ')
+    description = fields.get("DESCRIPTION", "").strip()
+    if not title or not description:
+        return None, False
+    first = _parse_moment(fields.get("START")) or (start, None)
+    last = _parse_moment(fields.get("END")) or first
+    start_day = min(max(first[0], start), end)
+    end_day = min(max(last[0], start_day), end)
+    clamped = (start_day, end_day) != (first[0], last[0])
+    all_day = first[1] is None or last[1] is None
+    end_time = last[1]
+    if not all_day and end_day == start_day and end_time < first[1]:
+        end_time = first[1]
+    return {
+        "title": title,
+        "description": description,
+        "start_date": str(start_day),
+        "start_time": "" if all_day else first[1],
+        "end_date": str(end_day),
+        "end_time": "" if all_day else end_time,
+        "all_day": all_day
+    }, clamped
+
+
+class TaskStreamParser:
+    def __init__(self, start: date, end: date, limit: int):
+        self.start = start
+        self.end = end
+        self.limit = limit
+        self.buffer = ""
+        self.count = 0
+        self.stats = {"dropped": 0, "clamped": 0, "unterminated": 0}
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.limit
+
+    @property
+    def overflowing(self) -> bool:
+        return self.full and TASK_OPEN.search(self.buffer) is not None
+
+    def _emit(self, block: str) -> List[Dict[str, Any]]:
+        task, clamped = parse_task_block(block, self.start, self.end)
+        if task is None or self.full:
+            self.stats["dropped"] += 1
+            return []
+        self.count += 1
+        self.stats["clamped"] += int(clamped)
+        return [task]
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        self.buffer += text
+        tasks = []
+        while True:
+            opening = TASK_OPEN.search(self.buffer)
+            if opening is None:
+                break
+            boundary = TASK_BOUNDARY.search(self.buffer, opening.end())
+            if boundary is None:
+                break
+            block = self.buffer[opening.end():boundary.start()]
+            self.buffer = self.buffer[boundary.end() if boundary.group(1) else boundary.start():]
+            tasks.extend(self._emit(block))
+        return tasks
+
+    def close(self) -> List[Dict[str, Any]]:
+        rest, self.buffer = self.buffer, ""
+        opening = TASK_OPEN.search(rest)
+        if opening is None or self.full:
+            return []
+        self.stats["unterminated"] += 1
+        return self._emit(rest[opening.end():])
\ No newline at end of file
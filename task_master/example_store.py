@@ -0,0 +1,147 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("ExampleStore")
+
+WORD_PATTERN = re.compile(r'[a-zа-я0-9]+')
+STOP_WORDS = {
+    "для", "что", "как", "это", "все", "при", "над", "под", "без", "или", "так", "его", "она", "они",
+    "нас", "вас", "нам", "вам", "наш", "ваш", "уже", "еще", "надо", "нужно", "будет", "есть", "the", "and"
+}
+
+
+def index_terms(text: str, stem: int = 6) -> List[str]:
+    words = WORD_PATTERN.findall(text.lower().replace('ё', 'е'))
+    return [word[:stem] for word in words if len(word) > 2 and word not in STOP_WORDS]
+
+
+def style_key(style: Dict[str, Any]) -> str:
+    return f"{'brief' if style.get('brief') else 'detailed'}-{'formal' if style.get('formal') else 'informal'}"
+
+
+class ExampleStore:
+    def __init__(self, path: Optional[str] = None, max_examples: int = 2000, min_similarity: float = 0.2):
+        self.path = path
+        self.max_examples = max_examples
+        self.min_similarity = min_similarity
+        self.lock = threading.Lock()
+        self.examples: List[Dict[str, Any]] = []
+        self.vectors: List[Dict[str, float]] = []
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.document_frequency: Counter = Counter()
+        self.offset = 0
+        self.size = 0
+
+    def _load_new(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size == self.size:
+            return
+        if size < self.size:
+            self.examples, self.vectors, self.postings, self.offset = [], [], {}, 0
+            self.document_frequency = Counter()
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                chunk = f.read()
+        except OSError as e:
+            logger.warning("Не удалось прочитать принятые примеры: %s", e)
+            return
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        self.offset += len(complete)
+        self.size = self.offset
+        for line in complete.decode('utf-8', errors='replace').splitlines():
+            try:
+                self._index(json.loads(line))
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+        if len(self.examples) > self.max_examples:
+            kept = self.examples[-self.max_examples:]
+            self.examples, self.vectors, self.postings = [], [], {}
+            self.document_frequency = Counter()
+            for example in kept:
+                self._index(example)
+
+    def _index(self, example: Dict[str, Any]):
+        terms = Counter(index_terms(example["prompt"]))
+        if not terms or not example.get("title") or not example.get("description"):
+            return
+        position = len(self.examples)
+        self.examples.append(example)
+        norm = math.sqrt(sum(count * count for count in terms.values()))
+        self.vectors.append({term: count / norm for term, count in terms.items()})
+        style_postings = self.postings.setdefault(example["style"], {})
+        for term in terms:
+            style_postings.setdefault(term, []).append(position)
+            self.document_frequency[term] += 1
+
+    def add(self, prompt: str, style: Dict[str, Any], title: str, description: str, **fields: Any):
+        if not self.path:
+            return
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "style": style_key(style),
+            "prompt": prompt.strip(),
+            "title": title.strip(),
+            "description": description.strip(),
+            **fields
+        }
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def similar(self, prompt: str, style: Dict[str, Any], limit: int = 2) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._load_new()
+            postings = self.postings.get(style_key(style), {})
+            total = max(1, len(self.examples))
+            query = Counter(index_terms(prompt))
+            weights = {term: count * math.log(1 + total / self.document_frequency[term])
+                       for term, count in query.items() if term in postings}
+            if not weights:
+                return []
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            scores: Dict[int, float] = {}
+            for term, weight in weights.items():
+                for position in postings[term]:
+                    scores[position] = scores.get(position, 0.0) + weight / norm * self.vectors[position][term]
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+            selected = []
+            seen_titles = set()
+            for position, score in ranked:
+                example = self.examples[position]
+                if score < self.min_similarity or len(selected) >= limit:
+                    break
+                if example["title"].lower() in seen_titles:
+                    continue
+                seen_titles.add(example["title"].lower())
+                selected.append({**example, "similarity": round(score, 3)})
+            return selected
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._load_new()
+            return len(self.examples)
+
+
+def format_examples(examples: Sequence[Dict[str, Any]]) -> str:
+    blocks = [
+        f"Запрос: {example['prompt']}\nНазвание: {example['title']}\nОписание: {example['description']}"
+        for example in examples
+    ]
+    return (
+        "Примеры результатов, которые пользователи уже приняли для похожих запросов в этом же стиле. "
+        "Используй их как ориентир по формулировкам, структуре и длине, но не копируй детали, "
+        "которых нет в текущем запросе:\n\n" + "\n\n".join(blocks)
+    )
\ No newline at end of file
@@ -0,0 +1,104 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+from batch_jobs import BatchRunner
+from ics_import import (
+    IcsBulkProcessor, component_properties, local_zone, parse_ics_datetime, unescape_text, with_recurrence
+)
+from profiling import RequestProfiler
+from task_master import ConfigLoader, TaskAgent
+
+logger = logging.getLogger("TaskIcsBulk")
+
+
+def component_to_task_data(lines: List[str], style: Dict[str, bool],
+                           zone: Optional[tzinfo] = None) -> Optional[Dict[str, Any]]:
+    props = component_properties(lines)
+    start = props.get("DTSTART") or props.get("DUE")
+    if start is None:
+        return None
+    end = props.get("DUE") or start
+    start_date, start_time = parse_ics_datetime(start[1], start[0], zone)
+    end_date, end_time = parse_ics_datetime(end[1], end[0], zone)
+    summary = unescape_text(props.get("SUMMARY", ({}, ""))[1]).strip()
+    description = unescape_text(props.get("DESCRIPTION", ({}, ""))[1]).strip()
+    url = props.get("URL", ({}, ""))[1].strip()
+    additional_info = "\n".join(part for part in (description, url) if part)
+    task_data = {
+        "start_date": start_date,
+        "start_time": start_time or "",
+        "end_date": end_date,
+        "end_time": end_time or "",
+        "all_day": start_time is None,
+        "additional_info": additional_info,
+        "prompt": summary or description,
+        "style": dict(style)
+    }
+    return with_recurrence(task_data, props)
+
+
+class TaskIcsBulkProcessor(IcsBulkProcessor):
+    component = "VTODO"
+
+    def to_data(self, lines: List[str]) -> Optional[Dict[str, Any]]:
+        return component_to_task_data(lines, self.style, self.zone)
+
+    def _generate(self, task_data: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        result = self.agent.process_request({
+            "task_data": task_data,
+            "messages": [],
+            "final_output": None,
+            "user_feedback": None,
+            "expand_occurrences": False
+        })
+        if "error" in result:
+            logger.warning("Ошибка генерации для задачи %s: %s", task_data['start_date'], result['error'])
+            return None
+        return result["final_output"]
+
+    def _prepare_batch(self, task_data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any], Dict[str, Any]]:
+        return self.agent.prepare_batch({
+            "task_data": task_data,
+            "messages": [],
+            "final_output": None,
+            "user_feedback": None
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетная генерация названий и описаний задач из ICS")
+    parser.add_argument("input", help="Исходный ICS-файл")
+    parser.add_argument("output", help="ICS-файл с результатами")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--brief", action="store_true")
+    parser.add_argument("--formal", action="store_true")
+    parser.add_argument("--no-resume", action="store_true")
+    parser.add_argument("--batch", action="store_true", help="Отправить запросы через пакетный API провайдера")
+    parser.add_argument("--profile", action="store_true", help="Профилировать импорт и генерацию каждой задачи")
+    args = parser.parse_args()
+    config = ConfigLoader.load_config()
+    if args.profile:
+        config['PROFILE'] = True
+    profiler = RequestProfiler.from_config(config, os.path.dirname(os.path.abspath(args.output)))
+    processor = TaskIcsBulkProcessor(
+        TaskAgent(config, profiler),
+        concurrency=args.concurrency,
+        style={"brief": args.brief, "formal": args.formal},
+        profiler=profiler,
+        zone=local_zone(config)
+    )
+    try:
+        if args.batch:
+            state_path = args.output + ".batch.json"
+            if args.no_resume and os.path.exists(state_path):
+                os.remove(state_path)
+            processor.run_batch(args.input, args.output, BatchRunner(config, state_path, temperature=0.2))
+        else:
+            processor.run(args.input, args.output, resume=not args.no_resume)
+    except FileNotFoundError:
+        logger.error("Файл не найден: %s", args.input)
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,213 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("Idempotency")
+
+
+class IdempotencyStore:
+    def __init__(self, directory: Optional[str] = None, retention_seconds: float = 3600, lease_seconds: float = 300,
+                 poll_interval: float = 0.2):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, Dict[str, Any]] = {}
+        self.memory: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"executed": 0, "replayed": 0, "joined": 0}
+        self.saves = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.prune()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "IdempotencyStore":
+        return cls(
+            config.get('IDEMPOTENCY_DIR'),
+            retention_seconds=float(config.get('IDEMPOTENCY_RETENTION_SECONDS', 3600)),
+            lease_seconds=float(config.get('IDEMPOTENCY_LEASE_SECONDS', 300))
+        )
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + suffix)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self.memory.get(key)
+        if record is None and self.directory:
+            try:
+                with open(self._path(key, ".json"), 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return None
+        if record is None or record["created_at"] + self.retention_seconds <= time.time():
+            return None
+        return record
+
+    def _save(self, key: str, fingerprint: Optional[str], result: Dict[str, Any]):
+        record = {"created_at": time.time(), "fingerprint": fingerprint, "result": result}
+        if not self.directory:
+            record["result"] = copy.deepcopy(result)
+            with self.lock:
+                self.memory[key] = record
+                self.memory = {
+                    name: entry for name, entry in self.memory.items()
+                    if entry["created_at"] + self.retention_seconds > time.time()
+                }
+            return
+        path = self._path(key, ".json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Не удалось сохранить результат запроса: %s", e)
+        with self.lock:
+            self.saves += 1
+            due = self.saves % 50 == 0
+        if due:
+            self.prune()
+
+    def _claim(self, key: str) -> bool:
+        if not self.directory:
+            return True
+        path = self._path(key, ".lock")
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if os.path.getmtime(path) + self.lease_seconds > time.time():
+                        return False
+                    os.remove(path)
+                    logger.warning("Блокировка запроса устарела, выполнение начинается заново")
+                except OSError:
+                    pass
+        return False
+
+    def _release(self, key: str):
+        if self.directory:
+            try:
+                os.remove(self._path(key, ".lock"))
+            except OSError:
+                pass
+
+    def _wait_foreign(self, key: str) -> Optional[Dict[str, Any]]:
+        lock_path = self._path(key, ".lock")
+        while True:
+            record = self._load(key)
+            if record is not None:
+                return record
+            try:
+                if os.path.getmtime(lock_path) + self.lease_seconds <= time.time():
+                    return None
+            except OSError:
+                return self._load(key)
+            time.sleep(self.poll_interval)
+
+    def _count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def _matches(key: str, record: Dict[str, Any], fingerprint: Optional[str]) -> bool:
+        if fingerprint and record.get("fingerprint") and record["fingerprint"] != fingerprint:
+            logger.warning("Ключ идемпотентности %s повторно использован для другого запроса, результат не переиспользуется", key)
+            return False
+        return True
+
+    def _replay(self, key: str, record: Dict[str, Any], fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not self._matches(key, record, fingerprint):
+            return None
+        return copy.deepcopy(record["result"])
+
+    @staticmethod
+    def _persistable(result: Dict[str, Any]) -> bool:
+        return "error" not in result and not result.get("degraded") and not result.get("degraded_reasons")
+
+    def run(self, key: Optional[str], func: Callable[[], Dict[str, Any]],
+            fingerprint: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        if not key:
+            return func(), False
+        while True:
+            with self.lock:
+                record = self._load(key)
+                flight = self.in_flight.get(key)
+                owner = record is None and flight is None
+                if owner:
+                    flight = self.in_flight[key] = {"event": threading.Event(), "fingerprint": fingerprint, "result": None}
+            if record is not None:
+                result = self._replay(key, record, fingerprint)
+                if result is not None:
+                    self._count("replayed")
+                    logger.info("Запрос %s уже выполнен, возвращается сохраненный результат", key)
+                    return result, True
+                return func(), False
+            if not owner:
+                if not self._matches(key, flight, fingerprint):
+                    return func(), False
+                logger.info("Запрос %s уже выполняется, ожидание результата", key)
+                flight["event"].wait()
+                if flight["result"] is not None:
+                    self._count("joined")
+                    return copy.deepcopy(flight["result"]), True
+                continue
+            break
+
+        claimed = False
+        try:
+            claimed = self._claim(key)
+            record = self._load(key) if claimed and self.directory else None
+            if record is not None:
+                result = self._replay(key, record, fingerprint)
+                if result is not None:
+                    flight["result"] = result
+                    self._count("replayed")
+                    return copy.deepcopy(result), True
+            if not claimed:
+                logger.info("Запрос %s выполняется другим процессом, ожидание результата", key)
+                record = self._wait_foreign(key)
+                if record is not None:
+                    result = self._replay(key, record, fingerprint)
+                    if result is not None:
+                        flight["result"] = result
+                        self._count("joined")
+                        return copy.deepcopy(result), True
+                claimed = self._claim(key)
+            result = func()
+            self._count("executed")
+            if self._persistable(result):
+                self._save(key, fingerprint, result)
+                flight["result"] = copy.deepcopy(result)
+            return result, False
+        finally:
+            if claimed:
+                self._release(key)
+            with self.lock:
+                self.in_flight.pop(key, None)
+            flight["event"].set()
+
+    def prune(self) -> int:
+        if not self.directory:
+            return 0
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            limit = self.retention_seconds if name.endswith(".json") else self.lease_seconds
+            try:
+                if os.path.getmtime(path) + limit <= now:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info("Удалено устаревших записей идемпотентности: %s", removed)
+        return removed
\ No newline at end of file
@@ -0,0 +1,169 @@
+import calendar
+import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+MAX_PERIODS = 5000
+
+WEEKDAY_DATIVE = ("понедельникам", "вторникам", "средам", "четвергам", "пятницам", "субботам", "воскресеньям")
+WEEKDAY_ACCUSATIVE = ("понедельник", "вторник", "среду", "четверг", "пятницу", "субботу", "воскресенье")
+WEEKDAY_GENDER = (0, 0, 1, 0, 1, 1, 2)
+ORDINALS = {
+    1: ("первый", "первую", "первое"),
+    2: ("второй", "вторую", "второе"),
+    3: ("третий", "третью", "третье"),
+    4: ("четвертый", "четвертую", "четвертое"),
+    5: ("пятый", "пятую", "пятое"),
+    -1: ("последний", "последнюю", "последнее"),
+    -2: ("предпоследний", "предпоследнюю", "предпоследнее")
+}
+EVERY = ("каждый", "каждую", "каждое")
+UNITS = {
+    "DAILY": ("каждый день", ("день", "дня", "дней")),
+    "WEEKLY": ("каждую неделю", ("неделю", "недели", "недель")),
+    "MONTHLY": ("каждый месяц", ("месяц", "месяца", "месяцев")),
+    "YEARLY": ("каждый год", ("год", "года", "лет"))
+}
+
+
+class RecurrenceRule(NamedTuple):
+    freq: str
+    interval: int
+    count: Optional[int]
+    until: Optional[datetime.date]
+    by_day: Tuple[Tuple[int, int], ...]
+    by_month_day: Tuple[int, ...]
+
+
+def plural(number: int, forms: Sequence[str]) -> str:
+    if number % 10 == 1 and number % 100 != 11:
+        return forms[0]
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+def _parse_date(value: str) -> datetime.date:
+    digits = value.replace("-", "").split("T", 1)[0]
+    return datetime.date(int(digits[0:4]), int(digits[4:6]), int(digits[6:8]))
+
+
+def _parse_by_day(value: str) -> Tuple[Tuple[int, int], ...]:
+    days = []
+    for item in value.split(","):
+        item = item.strip().upper()
+        ordinal = int(item[:-2]) if item[:-2] else 0
+        if item[-2:] not in WEEKDAYS or abs(ordinal) > 5:
+            raise ValueError(f"Некорректный день недели в правиле повторения: {item}")
+        days.append((ordinal, WEEKDAYS.index(item[-2:])))
+    return tuple(days)
+
+
+def parse_rule(text: str) -> RecurrenceRule:
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.split(";")):
+        name, _, value = part.partition("=")
+        parts[name.strip().upper()] = value.strip()
+    unsupported = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "WKST"}
+    if unsupported:
+        raise ValueError(f"Неподдерживаемые параметры правила повторения: {', '.join(sorted(unsupported))}")
+    freq = parts.get("FREQ", "").upper()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Неподдерживаемая частота повторения: {freq or 'не указана'}")
+    try:
+        rule = RecurrenceRule(
+            freq=freq,
+            interval=max(1, int(parts.get("INTERVAL", 1))),
+            count=int(parts["COUNT"]) if "COUNT" in parts else None,
+            until=_parse_date(parts["UNTIL"]) if "UNTIL" in parts else None,
+            by_day=_parse_by_day(parts["BYDAY"]) if "BYDAY" in parts else (),
+            by_month_day=tuple(int(day) for day in parts["BYMONTHDAY"].split(",")) if "BYMONTHDAY" in parts else ()
+        )
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Некорректное правило повторения {text}: {str(e)}")
+    if any(ordinal for ordinal, _ in rule.by_day) and freq != "MONTHLY":
+        raise ValueError("Номер дня недели в BYDAY поддерживается только для ежемесячных повторений")
+    if rule.by_month_day and freq != "MONTHLY":
+        raise ValueError("BYMONTHDAY поддерживается только для ежемесячных повторений")
+    return rule
+
+
+def _add_months(start: datetime.date, months: int) -> Tuple[int, int]:
+    index = start.year * 12 + start.month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _month_days(rule: RecurrenceRule, start: datetime.date, year: int, month: int) -> List[datetime.date]:
+    last = calendar.monthrange(year, month)[1]
+    if rule.by_month_day:
+        days = [day if day > 0 else last + day + 1 for day in rule.by_month_day]
+        return sorted(datetime.date(year, month, day) for day in set(days) if 1 <= day <= last)
+    if rule.by_day:
+        result = set()
+        for ordinal, weekday in rule.by_day:
+            matches = [
+                datetime.date(year, month, day) for day in range(1, last + 1)
+                if datetime.date(year, month, day).weekday() == weekday
+            ]
+            if not ordinal:
+                result.update(matches)
+            elif -len(matches) <= ordinal <= len(matches):
+                result.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+        return sorted(result)
+    return [datetime.date(year, month, start.day)] if start.day <= last else []
+
+
+def _period_days(rule: RecurrenceRule, start: datetime.date, period: int) -> List[datetime.date]:
+    step = period * rule.interval
+    if rule.freq == "DAILY":
+        day = start + datetime.timedelta(days=step)
+        return [day] if not rule.by_day or day.weekday() in {weekday for _, weekday in rule.by_day} else []
+    if rule.freq == "WEEKLY":
+        monday = start - datetime.timedelta(days=start.weekday()) + datetime.timedelta(weeks=step)
+        weekdays = sorted({weekday for _, weekday in rule.by_day}) or [start.weekday()]
+        return [monday + datetime.timedelta(days=weekday) for weekday in weekdays]
+    if rule.freq == "MONTHLY":
+        return _month_days(rule, start, *_add_months(start, step))
+    year = start.year + step
+    return [datetime.date(year, start.month, start.day)] if calendar.monthrange(year, start.month)[1] >= start.day else []
+
+
+def occurrences(rule: RecurrenceRule, start: datetime.date, limit: int = 52) -> List[datetime.date]:
+    limit = min(limit, rule.count) if rule.count else limit
+    result = [start]
+    for period in range(MAX_PERIODS):
+        for day in _period_days(rule, start, period):
+            if len(result) >= limit or (rule.until and day > rule.until):
+                return result
+            if day > start:
+                result.append(day)
+    return result
+
+
+def describe(rule: RecurrenceRule) -> str:
+    every, forms = UNITS[rule.freq]
+    text = every if rule.interval == 1 else f"раз в {rule.interval} {plural(rule.interval, forms)}"
+    if rule.by_month_day:
+        days = ", ".join(f"{day}-го" if day > 0 else "последнего" if day == -1 else f"{-day}-го с конца" for day in rule.by_month_day)
+        text += f" {days} числа"
+    elif any(ordinal for ordinal, _ in rule.by_day):
+        days = [
+            f"{ORDINALS[ordinal][WEEKDAY_GENDER[weekday]] if ordinal in ORDINALS else f'{-ordinal}-й с конца'} "
+            f"{WEEKDAY_ACCUSATIVE[weekday]}" if ordinal
+            else f"{EVERY[WEEKDAY_GENDER[weekday]]} {WEEKDAY_ACCUSATIVE[weekday]}"
+            for ordinal, weekday in rule.by_day
+        ]
+        text += (" во " if days[0].startswith("втор") else " в ") + ", ".join(days)
+    elif rule.by_day:
+        names = [WEEKDAY_DATIVE[weekday] for weekday in sorted({weekday for _, weekday in rule.by_day})]
+        days = " и ".join(names) if len(names) <= 2 else ", ".join(names[:-1]) + " и " + names[-1]
+        text = f"по {days}" if rule.freq == "DAILY" and rule.interval == 1 else f"{text} по {days}"
+    if rule.count:
+        text += f", всего {rule.count} {plural(rule.count, ('раз', 'раза', 'раз'))}"
+    if rule.until:
+        text += f", до {rule.until.strftime('%d.%m.%Y')}"
+    return text
\ No newline at end of file
@@ -1,23 +1,84 @@
+import copy
 import json
 import os
-import re
 import sys
 import logging
-from typing import Dict, List, TypedDict, Any, Optional
-from langchain_openai import ChatOpenAI
+import time
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, TypedDict, Any, Optional, Sequence, Tuple
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
+from llm_backends import BackendRegistry, error_details
+from example_store import ExampleStore, format_examples
+from profiling import RequestProfiler
+from cache_backend import create_backend, fingerprint
+from batch_jobs import usage_metrics
+from idempotency import IdempotencyStore
+from feedback_scope import current_output, estimate_tokens, parse_fields, partial_fields, partial_instruction
+from output_parser import REASK_INSTRUCTION, fallback_candidate, json_instruction, parse_output, response_format
+from deadline import DeadlineExceeded, call_before, has_time, make_deadline
+from recurrence import describe, occurrences, parse_rule
+from decomposition import TaskStreamParser
+from structured_logging import configure_logging, log_context, request_context
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+configure_logging(force=False)
 logger = logging.getLogger("TaskAgent")
 
+SYSTEM_PROMPT_PREFIX = """
+Ты профессиональный ассистент для сервиса Календарь VK WorkSpace, который помогает придумать 
+название и описание задачи для добавления ее в календарь. Твоя задача - создать четкое, 
+понятное и информативное описание задачи, которое поможет участникам точно понять, 
+что нужно сделать и какие результаты ожидаются.
+
+Требования к генерации:
+1. Название задачи:
+   - Максимально точно отражает суть задачи
+   - Содержит глагол действия (сделать, подготовить, проверить и т.д.)
+   - Лаконичное (не длиннее 7-8 слов)
+   - Позволяет сразу понять суть задачи
+
+2. Описание задачи:
+   - Начинается с краткого введения/контекста
+   - Четко описывает ожидаемый результат
+   - Перечисляет ключевые шаги для выполнения (если применимо)
+   - Указывает ответственных и участников (если есть в additional_info)
+   - Включает все необходимые ссылки и ресурсы
+   - Заканчивается четкими критериями успешного выполнения
+   - Соответствует выбранному стилю
+
+ВАЖНО! Всегда выводи полный ответ в строго заданном формате:
+[NAME] Название задачи
+[DESCRIPTION] Текст описания
+
+Данные о задаче и стиль приведены ниже.
+""".strip()
+
+DECOMPOSITION_PROMPT_PREFIX = """
+Ты профессиональный ассистент для сервиса Календарь VK WorkSpace, который помогает разбить 
+проект на задачи для добавления их в календарь. Твоя задача - по описанию проекта составить 
+список конкретных задач со сроками, названиями и описаниями.
+
+Требования к задачам:
+1. Каждая задача - отдельный шаг проекта с понятным результатом
+2. Название содержит глагол действия и не длиннее 7-8 слов
+3. Описание кратко объясняет, что нужно сделать, и заканчивается критериями выполнения
+4. Общий контекст проекта не повторяется в каждой задаче
+5. Сроки задач лежат внутри периода проекта, задачи перечислены в порядке выполнения
+6. Ответственные, ссылки и ресурсы из дополнительной информации указываются в тех задачах, к которым относятся
+
+ВАЖНО! Выводи каждую задачу отдельным блоком строго в формате:
+[TASK]
+[NAME] Название задачи
+[START] ГГГГ-ММ-ДД ЧЧ:ММ
+[END] ГГГГ-ММ-ДД ЧЧ:ММ
+[DESCRIPTION] Текст описания
+[/TASK]
+
+Данные о проекте и стиль приведены ниже.
+""".strip()
+
 class ConfigLoader:
     @staticmethod
     def load_config() -> Dict[str, str]:
@@ -34,80 +95,78 @@ class ConfigLoader:
             logger.error("Ошибка формата в файле конфигурации")
             sys.exit(1)
         except Exception as e:
-            logger.error(f"Ошибка загрузки конфигурации: {str(e)}")
+            logger.error("Ошибка загрузки конфигурации: %s", e)
             sys.exit(1)
 
 class TaskAgent:
-    def __init__(self, config: Dict[str, str]):
+    def __init__(self, config: Dict[str, str], profiler: Optional[RequestProfiler] = None):
         self.config = config
+        self.profiler = profiler or RequestProfiler.from_config(config)
+        self.example_store = ExampleStore(config.get('EXAMPLES_PATH'))
+        self.few_shot_limit = int(config.get('FEW_SHOT_EXAMPLES', 2))
+        self.cache = create_backend(config)
+        self.generation_ttl = float(config.get('GENERATION_CACHE_TTL', 0))
         self.agent = self._init_agent()
+        self.parse_stats: Dict[str, int] = {}
+        self.parse_lock = threading.Lock()
+        self.partial_enabled = bool(config.get('PARTIAL_REGENERATION', True))
+        self.decode_ms_per_token = float(config.get('DECODE_MS_PER_TOKEN', 20))
+        self.idempotency = IdempotencyStore.from_config(config)
+        self.max_occurrences = int(config.get('RECURRENCE_MAX_OCCURRENCES', 52))
+        self.max_project_tasks = int(config.get('DECOMPOSITION_MAX_TASKS', 20))
         self.workflow = self._build_workflow()
 
-    def _init_agent(self) -> ChatOpenAI:
-        return ChatOpenAI(
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-            api_key=self.config['GEMINI_API_KEY'],
-            model="gemini-2.5-pro",
-            temperature=0.2
-        )
+    def _init_agent(self) -> BackendRegistry:
+        return BackendRegistry.from_config(self.config, temperature=0.2)
+
+    @staticmethod
+    def _style_description(style: Dict[str, bool]) -> str:
+        if style["brief"] and style["formal"]:
+            return "Краткое и официальное описание"
+        if style["brief"] and not style["formal"]:
+            return "Краткое и неформальное (но профессиональное) описание"
+        if not style["brief"] and style["formal"]:
+            return "Подробное и официальное описание"
+        return "Подробное и неформальное (но профессиональное) описание"
 
-    def _build_system_prompt(self, state: Dict[str, Any]) -> str:
+    def _build_system_prompt(self, state: Dict[str, Any], examples: Sequence[Dict[str, Any]] = ()) -> str:
         task = state["task_data"]
-        style_description = ""
-        if task["style"]["brief"] and task["style"]["formal"]:
-            style_description = "Краткое и официальное описание"
-        elif task["style"]["brief"] and not task["style"]["formal"]:
-            style_description = "Краткое и неформальное (но профессиональное) описание"
-        elif not task["style"]["brief"] and task["style"]["formal"]:
-            style_description = "Подробное и официальное описание"
-        else:
-            style_description = "Подробное и неформальное (но профессиональное) описание"
+        style_description = self._style_description(task["style"])
 
         time_info = ""
         if task["all_day"]:
             time_info = f"Весь день: {task['start_date']}"
         else:
             time_info = f"Начало: {task['start_date']} {task['start_time']}\nОкончание: {task['end_date']} {task['end_time']}"
+        if task.get("recurrence"):
+            time_info = f"регулярная задача, {describe(parse_rule(task['recurrence']))}, первое повторение:\n{time_info}"
 
         prompt = f"""
-Ты профессиональный ассистент для сервиса Календарь VK WorkSpace, который помогает придумать 
-название и описание задачи для добавления ее в календарь. Твоя задача - создать четкое, 
-понятное и информативное описание задачи, которое поможет участникам точно понять, 
-что нужно сделать и какие результаты ожидаются.
-
 Данные о задаче:
 - Временные параметры: {time_info}
 - Стиль: {style_description}
 - Дополнительная информация: 
 {task['additional_info']}
-
-Требования к генерации:
-1. Название задачи:
-   - Максимально точно отражает суть задачи
-   - Содержит глагол действия (сделать, подготовить, проверить и т.д.)
-   - Лаконичное (не длиннее 7-8 слов)
-   - Позволяет сразу понять суть задачи
-
-2. Описание задачи:
-   - Начинается с краткого введения/контекста
-   - Четко описывает ожидаемый результат
-   - Перечисляет ключевые шаги для выполнения (если применимо)
-   - Указывает ответственных и участников (если есть в additional_info)
-   - Включает все необходимые ссылки и ресурсы
-   - Заканчивается четкими критериями успешного выполнения
-   - Соответствует выбранному стилю
-
-ВАЖНО! Всегда выводи полный ответ в строго заданном формате:
-[NAME] Название задачи
-[DESCRIPTION] Текст описания
 """
-        return prompt.strip()
+        if task.get("recurrence"):
+            prompt += "\nНазвание и описание будут использоваться для каждого повторения задачи, поэтому не упоминай в них конкретные даты."
+        if examples:
+            prompt += f"\n{format_examples(examples)}\n"
+        return f"{SYSTEM_PROMPT_PREFIX}\n\n{prompt.strip()}"
 
     def _initialize_conversation(self, state: Dict[str, Any]) -> Dict[str, Any]:
         if state.get("messages"):
             return state
         logger.info("Инициализация диалога...")
-        system_prompt = self._build_system_prompt(state)
+        data = state["task_data"]
+        examples = self.example_store.similar(data["prompt"], data["style"], self.few_shot_limit) if self.few_shot_limit else []
+        if examples:
+            logger.info("Найдено похожих принятых примеров: %s", len(examples))
+        state["metrics"] = {
+            **(state.get("metrics") or {}),
+            "few_shot": {"examples": len(examples), "similarity": [example["similarity"] for example in examples]}
+        }
+        system_prompt = self._build_system_prompt(state, examples)
         user_prompt = state["task_data"]["prompt"]
         state["messages"] = [
             {"role": "system", "content": system_prompt},
@@ -115,46 +174,267 @@ class TaskAgent:
         ]
         return state
 
+    def _note_cache(self, state: Dict[str, Any], namespace: str, hit: bool):
+        metrics = state.get("metrics") or {}
+        state["metrics"] = {
+            **metrics,
+            "cache": {**(metrics.get("cache") or {}), "backend": self.cache.name, namespace: "hit" if hit else "miss"}
+        }
+
+    @staticmethod
+    def _degrade(state: Dict[str, Any], reason: str):
+        state["degraded"] = True
+        state["degraded_reasons"] = (state.get("degraded_reasons") or []) + [reason]
+        logger.warning("Запрос выполняется в упрощенном режиме: %s", reason)
+
+    def _fallback_output(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        task = state["task_data"]
+        if task["all_day"]:
+            time_info = f"Весь день: {task['start_date']}"
+        else:
+            time_info = f"Срок: {task['start_date']} {task['start_time']} - {task['end_date']} {task['end_time']}"
+        state["final_output"] = fallback_candidate(task["prompt"], [time_info, task["additional_info"].strip()])
+        state["candidates"] = None
+        state["metrics"] = {**(state.get("metrics") or {}), "llm": None, "parse": None}
+        self._degrade(state, "llm_timeout")
+        return state
+
+    @staticmethod
+    def _usage_metrics(response: Any, started: float) -> Dict[str, Any]:
+        usage = getattr(response, "usage_metadata", None) or {}
+        details = usage.get("input_token_details") or {}
+        metrics = {
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            "input_tokens": usage.get("input_tokens", 0),
+            "cached_tokens": details.get("cache_read", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "backend": (getattr(response, "response_metadata", None) or {}).get("llm_backend")
+        }
+        logger.info(
+            "Ответ модели %s за %s мс: входных токенов %s "
+            "(из кэша %s), выходных %s",
+            metrics['backend'], metrics['latency_ms'], metrics['input_tokens'], metrics['cached_tokens'], metrics['output_tokens']
+        )
+        return metrics
+
+    @staticmethod
+    def _candidates_instruction(count: int) -> str:
+        return (
+            f"Предложи несколько заметно различающихся вариантов названия и описания задачи "
+            f"(количество вариантов: {count}). Выведи их строго в формате:\n"
+            + "\n".join(f"[NAME {i}] Название задачи\n[DESCRIPTION {i}] Текст описания" for i in range(1, count + 1))
+        )
+
+    def _prepare_call(self, state: Dict[str, Any]) -> Tuple[List[Any], Dict[str, Any]]:
+        lc_messages = []
+        with self.profiler.phase("convert_messages"):
+            for msg in state["messages"]:
+                if msg["role"] == "system":
+                    lc_messages.append(SystemMessage(content=msg["content"]))
+                elif msg["role"] == "user":
+                    lc_messages.append(HumanMessage(content=msg["content"]))
+                elif msg["role"] == "assistant":
+                    lc_messages.append(AIMessage(content=msg["content"]))
+        num_candidates = max(1, int(state.get("num_candidates") or 1))
+        structured = bool(self.config.get('STRUCTURED_OUTPUT'))
+        invoke_params = {"response_format": response_format()} if structured else {}
+        if structured:
+            lc_messages.append(HumanMessage(content=json_instruction(num_candidates, "задачи")))
+        elif num_candidates > 1:
+            lc_messages.append(HumanMessage(content=self._candidates_instruction(num_candidates)))
+        return lc_messages, invoke_params
+
+    def _call_partial(self, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = state["regenerate_fields"]
+        current = state["final_output"]
+        logger.info("Частичная перегенерация: %s", ', '.join(fields))
+        lc_messages = [
+            SystemMessage(content=state["messages"][0]["content"]),
+            HumanMessage(content=state["messages"][1]["content"]),
+            HumanMessage(content=partial_instruction(fields, current, state["partial_feedback"], "задачи"))
+        ]
+        started = time.perf_counter()
+        try:
+            with self.profiler.phase("llm_wait"):
+                response = call_before(state.get("deadline"), self.agent.invoke, lc_messages, timeout_param="timeout")
+        except DeadlineExceeded as e:
+            logger.warning("Модель не успела доработать результат до крайнего срока, история диалога не изменена: %s", e)
+            state["messages"].pop()
+            state["regeneration_failed"] = True
+            self._degrade(state, "regeneration_timeout")
+            state["metrics"] = {**(state.get("metrics") or {}), "llm": None, "parse": None}
+            return state
+        llm_metrics = self._usage_metrics(response, started)
+        with self.profiler.phase("parse"):
+            updated = parse_fields(response.content, fields)
+        if updated is None:
+            logger.warning("Не удалось разобрать ответ частичной перегенерации, выполняется полная")
+            return None
+        output = {**current, **updated}
+        kept_tokens = sum(estimate_tokens(current[field]) for field in current if field not in fields)
+        full_input_tokens = sum(estimate_tokens(message["content"]) for message in state["messages"])
+        previous = (state.get("metrics") or {}).get("llm") or {}
+        ms_per_token = self.decode_ms_per_token
+        if (previous.get("output_tokens") or 0) >= 50:
+            ms_per_token = previous["latency_ms"] / previous["output_tokens"]
+        partial = {
+            "fields": fields,
+            "saved_output_tokens": kept_tokens,
+            "saved_input_tokens": max(0, full_input_tokens - sum(estimate_tokens(msg.content) for msg in lc_messages)),
+            "saved_latency_ms": round(kept_tokens * ms_per_token)
+        }
+        logger.info(
+            "Частичная перегенерация сэкономила около %s выходных и "
+            "%s входных токенов (~%s мс)",
+            partial['saved_output_tokens'], partial['saved_input_tokens'], partial['saved_latency_ms']
+        )
+        self._record_parse("ok")
+        state["metrics"] = {
+            **(state.get("metrics") or {}),
+            "llm": llm_metrics,
+            "parse": {"mode": "tags", "status": "ok", "reasks": 0, "saved_calls": 0},
+            "partial": partial
+        }
+        state["messages"].append({
+            "role": "assistant",
+            "content": f"[NAME] {output['title']}\n[DESCRIPTION] {output['description']}"
+        })
+        state["final_output"] = output
+        state["candidates"] = None
+        return state
+
     def _call_agent(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if state.get("regenerate_fields"):
+            result = self._call_partial(state)
+            state["regenerate_fields"] = None
+            if result is not None:
+                return result
         logger.info("Вызов агента для генерации...")
-        lc_messages = []
-        for msg in state["messages"]:
-            if msg["role"] == "system":
-                lc_messages.append(SystemMessage(content=msg["content"]))
-            elif msg["role"] == "user":
-                lc_messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                lc_messages.append(AIMessage(content=msg["content"]))
-        response = self.agent.invoke(lc_messages)
-        state["messages"].append({"role": "assistant", "content": response.content})
-
-        title_match = re.search(r'\[NAME\](.+?)\n', response.content, re.DOTALL)
-        desc_match = re.search(r'\[DESCRIPTION\](.+)', response.content, re.DOTALL)
-
-        if title_match and desc_match:
-            state["final_output"] = {
-                "title": title_match.group(1).strip(),
-                "description": desc_match.group(1).strip()
+        lc_messages, invoke_params = self._prepare_call(state)
+        structured = bool(self.config.get('STRUCTURED_OUTPUT'))
+        deadline = state.get("deadline")
+        cache_key = fingerprint([(msg.type, msg.content) for msg in lc_messages], invoke_params) if self.generation_ttl > 0 else None
+        cached = self.cache.get("task_generation", cache_key) if cache_key else None
+        if cache_key:
+            self._note_cache(state, "generation", cached is not None)
+        try:
+            if cached is not None:
+                content = cached["content"]
+                llm_metrics = {
+                    "latency_ms": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+                    "backend": f"cache:{self.cache.name}"
+                }
+                logger.info("Ответ модели получен из кэша генераций")
+            else:
+                started = time.perf_counter()
+                with self.profiler.phase("llm_wait"):
+                    response = call_before(
+                        deadline, self.agent.invoke, lc_messages, timeout_param="timeout", **invoke_params
+                    )
+                content = response.content
+                llm_metrics = self._usage_metrics(response, started)
+            with self.profiler.phase("parse"):
+                candidates, status = parse_output(content, structured)
+            reasks = 0
+            while not candidates and reasks < int(self.config.get('STRUCTURED_MAX_REASKS', 1 if structured else 0)):
+                reasks += 1
+                logger.warning("Не удалось разобрать ответ агента, повторный запрос формата")
+                started = time.perf_counter()
+                with self.profiler.phase("llm_wait"):
+                    response = call_before(
+                        deadline, self.agent.invoke,
+                        lc_messages + [AIMessage(content=content), HumanMessage(content=REASK_INSTRUCTION)],
+                        timeout_param="timeout", **invoke_params
+                    )
+                content = response.content
+                llm_metrics = self._usage_metrics(response, started)
+                with self.profiler.phase("parse"):
+                    candidates, status = parse_output(content, structured)
+                status = "reasked" if candidates else "failed"
+        except DeadlineExceeded as e:
+            logger.warning("Модель не успела ответить до крайнего срока: %s", e)
+            return self._fallback_output(state)
+        if cache_key and cached is None and candidates:
+            self.cache.set("task_generation", cache_key, {"content": content}, self.generation_ttl)
+        return self._apply_output(state, content, llm_metrics, candidates, status, reasks)
+
+    def _apply_output(self, state: Dict[str, Any], content: str, llm_metrics: Dict[str, Any],
+                      candidates: List[Dict[str, str]], status: str, reasks: int) -> Dict[str, Any]:
+        num_candidates = max(1, int(state.get("num_candidates") or 1))
+        structured = bool(self.config.get('STRUCTURED_OUTPUT'))
+        self._record_parse(status)
+        state["metrics"] = {
+            **(state.get("metrics") or {}),
+            "llm": llm_metrics,
+            "parse": {
+                "mode": "json" if structured else "tags",
+                "status": status,
+                "reasks": reasks,
+                "saved_calls": 1 if status == "repaired" else 0
             }
-            logger.info("Название и описание задачи успешно сгенерированы")
+        }
+        state["messages"].append({"role": "assistant", "content": content})
+
+        if candidates:
+            if num_candidates > 1:
+                state["candidates"] = candidates[:num_candidates]
+                logger.info("Сгенерировано вариантов: %s", len(state['candidates']))
+            state["final_output"] = candidates[0]
+            logger.info("Название и описание успешно сгенерированы")
         else:
             state["final_output"] = {
-                "title": "Не удалось сгенерировать название задачи",
-                "description": response.content
+                "title": "Не удалось сгенерировать название",
+                "description": content
             }
             logger.warning("Не удалось распарсить ответ агента")
 
         return state
 
+    def prepare_batch(self, input_data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any], Dict[str, Any]]:
+        state = {**input_data, "degraded": False, "degraded_reasons": None, "deadline": None}
+        for step in (self._initialize_conversation, self._process_feedback):
+            state = step(state)
+        lc_messages, invoke_params = self._prepare_call(state)
+        return state, lc_messages, invoke_params
+
+    def apply_batch_result(self, state: Dict[str, Any], content: str, usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        candidates, status = parse_output(content, bool(self.config.get('STRUCTURED_OUTPUT')))
+        return self._apply_output(copy.deepcopy(state), content, usage_metrics(usage), candidates, status, 0)
+
+    def _record_parse(self, status: str):
+        with self.parse_lock:
+            self.parse_stats[status] = self.parse_stats.get(status, 0) + 1
+            total = sum(self.parse_stats.values())
+            first_failures = total - self.parse_stats.get("ok", 0)
+        logger.info(
+            "Разбор ответа: %s; с первой попытки не разобрано %s из %s "
+            "(%.0f%%), исправлено локально %s",
+            status, first_failures, total, 100 * first_failures / total, self.parse_stats.get('repaired', 0)
+        )
+
     def _process_feedback(self, state: Dict[str, Any]) -> Dict[str, Any]:
         if not state.get("user_feedback"):
             return state
         logger.info("Обработка пользовательского фидбека...")
+        selection = ""
+        selected = state.get("selected_candidate")
+        candidates = state.get("candidates") or []
+        if selected is not None and 0 <= selected < len(candidates):
+            selection = f"Пользователь выбрал вариант {selected + 1}: {candidates[selected]['title']}\n"
+        current = current_output(state)
+        fields = partial_fields(state["user_feedback"], current, len(state["messages"])) if self.partial_enabled else None
+        partial = fields is not None
+        state["regenerate_fields"] = fields
+        state["partial_feedback"] = state["user_feedback"] if partial else None
+        state["candidates"] = None
+        state["selected_candidate"] = None
         state["messages"].append({
             "role": "user",
-            "content": f"Пользовательский фидбек: {state['user_feedback']}\nПожалуйста, учти эти замечания при обновлении названия и описания. Далее твоя задача: заново сгенерировать название и описание задачи в нужном формате с учетом всех своих предыдущих ответов и фидбека от пользователя"
+            "content": f"{selection}Пользовательский фидбек: {state['user_feedback']}\nПожалуйста, учти эти замечания при обновлении названия и описания. Далее твоя задача: заново сгенерировать название и описание задачи в нужном формате с учетом всех своих предыдущих ответов и фидбека от пользователя"
         })
-        if "final_output" in state:
+        if partial:
+            state["final_output"] = current
+        elif "final_output" in state:
             del state["final_output"]
         if "user_feedback" in state:
             del state["user_feedback"]
@@ -168,11 +448,21 @@ class TaskAgent:
             messages: List[Dict[str, str]]
             final_output: Optional[Dict[str, str]]
             user_feedback: Optional[str]
+            metrics: Optional[Dict[str, Any]]
+            num_candidates: Optional[int]
+            candidates: Optional[List[Dict[str, str]]]
+            selected_candidate: Optional[int]
+            deadline: Optional[float]
+            degraded: Optional[bool]
+            degraded_reasons: Optional[List[str]]
+            regenerate_fields: Optional[List[str]]
+            partial_feedback: Optional[str]
+            regeneration_failed: Optional[bool]
 
         workflow = StateGraph(AgentState)
-        workflow.add_node("init_conversation", RunnableLambda(self._initialize_conversation))
-        workflow.add_node("process_feedback", RunnableLambda(self._process_feedback))
-        workflow.add_node("call_agent", RunnableLambda(self._call_agent))
+        workflow.add_node("init_conversation", RunnableLambda(self.profiler.wrap("init_conversation", self._initialize_conversation)))
+        workflow.add_node("process_feedback", RunnableLambda(self.profiler.wrap("process_feedback", self._process_feedback)))
+        workflow.add_node("call_agent", RunnableLambda(self.profiler.wrap("call_agent", self._call_agent)))
         workflow.set_entry_point("init_conversation")
         workflow.add_edge("init_conversation", "process_feedback")
         workflow.add_edge("process_feedback", "call_agent")
@@ -180,43 +470,283 @@ class TaskAgent:
         return workflow.compile()
 
     def process_request(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        if input_data.get("project_data"):
+            return self.decompose(input_data)
+        key = input_data.get("idempotency_key")
+        request = {name: input_data.get(name) for name in ("task_data", "user_feedback", "selected_candidate", "num_candidates")}
+        with request_context(key):
+            result, replayed = self.idempotency.run(key, lambda: self._process_request(input_data), fingerprint(request))
+        if replayed:
+            result["metrics"] = {**(result.get("metrics") or {}), "idempotency": "replayed"}
+        return result
+
+    def _expand_occurrences(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        task = state["task_data"]
+        output = state.get("final_output")
+        if not task.get("recurrence") or not output:
+            return state
+        start = datetime.strptime(task["start_date"], "%Y-%m-%d").date()
+        duration = datetime.strptime(task["end_date"], "%Y-%m-%d").date() - start
+        state["occurrences"] = [{
+            "start_date": str(day), "start_time": task["start_time"],
+            "end_date": str(day + duration), "end_time": task["end_time"],
+            "title": output["title"], "description": output["description"]
+        } for day in occurrences(parse_rule(task["recurrence"]), start, self.max_occurrences)]
+        count = len(state["occurrences"])
+        state["metrics"] = {**(state.get("metrics") or {}), "recurrence": {"occurrences": count, "saved_llm_calls": count - 1}}
+        logger.info("Серия из %s повторений задачи получена за один вызов модели", count)
+        return state
+
+    def _process_request(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
         try:
             logger.info("Начало обработки запроса задачи...")
-            result = self.workflow.invoke(input_data)
-            logger.info("Запрос задачи успешно обработан")
+            input_data = {**input_data, "degraded": False, "degraded_reasons": None, "regeneration_failed": False}
+            if not input_data.get("deadline"):
+                input_data["deadline"] = make_deadline(self.config.get('REQUEST_BUDGET_SECONDS'))
+            if input_data["task_data"].get("recurrence"):
+                parse_rule(input_data["task_data"]["recurrence"])
+            with self.profiler.request("process_request"), self.profiler.phase("process_request"):
+                result = self.workflow.invoke(input_data)
+                if input_data.get("expand_occurrences", True):
+                    with self.profiler.phase("occurrences"):
+                        result = self._expand_occurrences(result)
+            logger.info("Запрос задачи успешно обработан", extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)})
             return result
         except Exception as e:
-            logger.error(f"Ошибка обработки запроса задачи: {str(e)}")
+            logger.error("Ошибка обработки запроса задачи: %s", e)
             return {
                 "error": f"Ошибка обработки запроса задачи: {str(e)}",
-                "input_data": input_data
+                "input_data": input_data,
+                **error_details(e)
+            }
+
+    def _build_decomposition_prompt(self, project: Dict[str, Any], max_tasks: int) -> str:
+        prompt = f"""
+Данные о проекте:
+- Период проекта: {project['start_date']} - {project['end_date']}
+- Количество задач: не более {max_tasks}
+- Стиль: {self._style_description(project['style'])}
+- Дополнительная информация: 
+{project.get('additional_info', '')}
+"""
+        return f"{DECOMPOSITION_PROMPT_PREFIX}\n\n{prompt.strip()}"
+
+    def decompose(self, input_data: Dict[str, Any],
+                  on_task: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        key = input_data.get("idempotency_key")
+        request = {"project_data": input_data.get("project_data")}
+        with request_context(key):
+            result, replayed = self.idempotency.run(key, lambda: self._decompose(input_data, on_task), fingerprint(request))
+        if replayed:
+            result["metrics"] = {**(result.get("metrics") or {}), "idempotency": "replayed"}
+        return result
+
+    def _decompose(self, input_data: Dict[str, Any],
+                   on_task: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        try:
+            logger.info("Начало декомпозиции проекта на задачи...")
+            project = input_data["project_data"]
+            start = datetime.strptime(project["start_date"], "%Y-%m-%d").date()
+            end = datetime.strptime(project["end_date"], "%Y-%m-%d").date()
+            if end < start:
+                raise ValueError("Дата окончания проекта раньше даты начала")
+            max_tasks = max(1, min(int(project.get("max_tasks") or self.max_project_tasks), self.max_project_tasks))
+            deadline = input_data.get("deadline") or make_deadline(self.config.get('REQUEST_BUDGET_SECONDS'))
+            result = {**input_data, "tasks": [], "degraded": False, "degraded_reasons": None}
+            lc_messages = [
+                SystemMessage(content=self._build_decomposition_prompt(project, max_tasks)),
+                HumanMessage(content=project["prompt"])
+            ]
+            parser = TaskStreamParser(start, end, max_tasks)
+            response = None
+            first_task_ms = None
+            started = time.perf_counter()
+
+            def emit(tasks: List[Dict[str, Any]]):
+                nonlocal first_task_ms
+                for task in tasks:
+                    if first_task_ms is None:
+                        first_task_ms = round((time.perf_counter() - started) * 1000)
+                    result["tasks"].append(task)
+                    logger.info("Задача %s готова: %s", len(result['tasks']), task['title'])
+                    if on_task is not None:
+                        on_task(task)
+
+            with self.profiler.request("decompose"), self.profiler.phase("decompose"), log_context(node="decompose"):
+                stream = self.agent.stream(lc_messages, stream_usage=True)
+                try:
+                    for chunk in stream:
+                        response = chunk if response is None else response + chunk
+                        emit(parser.feed(chunk.content))
+                        if parser.overflowing:
+                            logger.info("Получено максимальное число задач (%s), генерация остановлена", max_tasks)
+                            break
+                        if not has_time(deadline, 0):
+                            self._degrade(result, "llm_timeout")
+                            break
+                finally:
+                    stream.close()
+                emit(parser.close())
+            if not result["tasks"]:
+                raise ValueError("Модель не вернула ни одной задачи в ожидаемом формате")
+            count = len(result["tasks"])
+            result["metrics"] = {
+                "llm": self._usage_metrics(response, started),
+                "decomposition": {
+                    "tasks": count,
+                    "first_task_ms": first_task_ms,
+                    **parser.stats,
+                    "saved_llm_calls": count - 1
+                }
             }
+            logger.info(
+                "Проект разбит на %s задач за один вызов модели, первая задача через %s мс", count, first_task_ms,
+                extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+            )
+            return result
+        except Exception as e:
+            logger.error("Ошибка декомпозиции проекта: %s", e)
+            return {
+                "error": f"Ошибка декомпозиции проекта: {str(e)}",
+                "input_data": input_data,
+                **error_details(e)
+            }
+
+
+def write_response(response: Dict[str, Any]):
+    sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def redirect_logging_to_stderr():
+    configure_logging(stream=sys.stderr)
+
+
+def run_stdio(config: Dict[str, str], data_dir: str) -> bool:
+    config.setdefault('EXAMPLES_PATH', os.path.join(data_dir, 'accepted_examples.jsonl'))
+    config.setdefault('IDEMPOTENCY_DIR', os.path.join(data_dir, 'idempotency'))
+    profiler = RequestProfiler.from_config(config, data_dir)
+    agent = TaskAgent(config, profiler)
+    session: Dict[str, Any] = {}
+    logger.info("Режим stdio: ожидание запросов")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        with profiler.request("stdio"):
+            try:
+                with profiler.phase("json_read"):
+                    request = json.loads(line)
+            except json.JSONDecodeError as e:
+                write_response({"ok": False, "error": f"Ошибка формата JSON: {str(e)}"})
+                continue
+            request_id = request.pop("id", None)
+            op = request.pop("op", "generate")
+            if op == "shutdown":
+                break
+            if op == "reset":
+                session = {}
+                write_response({"id": request_id, "ok": True})
+                continue
+            if op == "ping":
+                write_response({"id": request_id, "ok": True})
+                continue
+            if op == "decompose":
+                result = agent.decompose(
+                    request, lambda task: write_response({"id": request_id, "event": "task", "task": task})
+                )
+                if "error" in result:
+                    write_response({"id": request_id, "ok": False, "error": result["error"]})
+                    continue
+                with profiler.phase("json_write"):
+                    write_response({
+                        "id": request_id,
+                        "ok": True,
+                        "tasks": result["tasks"],
+                        "metrics": result.get("metrics"),
+                        "degraded": result.get("degraded"),
+                        "degraded_reasons": result.get("degraded_reasons")
+                    })
+                continue
+            if op == "generate":
+                state = {"messages": [], "final_output": None, "user_feedback": "", **request}
+            elif op == "feedback" and session:
+                state = {
+                    **copy.deepcopy(session),
+                    "user_feedback": request.get("user_feedback", ""),
+                    "selected_candidate": request.get("selected_candidate"),
+                    "deadline": request.get("deadline"),
+                    "idempotency_key": request.get("idempotency_key")
+                }
+            elif op == "feedback":
+                write_response({"id": request_id, "ok": False, "error": "Нет активной сессии для доработки"})
+                continue
+            else:
+                write_response({"id": request_id, "ok": False, "error": f"Неизвестная операция: {op}"})
+                continue
+            result = agent.process_request(state)
+            if "error" in result:
+                write_response({"id": request_id, "ok": False, "error": result["error"]})
+                continue
+            session = result
+            with profiler.phase("json_write"):
+                write_response({
+                    "id": request_id,
+                    "ok": True,
+                    "final_output": result.get("final_output"),
+                    "candidates": result.get("candidates"),
+                    "messages": result.get("messages"),
+                    "metrics": result.get("metrics"),
+                    "degraded": result.get("degraded"),
+                    "degraded_reasons": result.get("degraded_reasons"),
+                    "regeneration_failed": result.get("regeneration_failed"),
+                    "occurrences": result.get("occurrences")
+                })
+    logger.info("Режим stdio: завершение")
+    return True
 
 
 def main(input_file: str, config: Dict[str, str]) -> bool:
-    logger.info(f"Обработка файла задачи: {input_file}")
+    logger.info("Обработка файла задачи: %s", input_file)
+    data_dir = os.path.dirname(os.path.abspath(input_file))
+    config.setdefault('EXAMPLES_PATH', os.path.join(data_dir, 'accepted_examples.jsonl'))
+    config.setdefault('IDEMPOTENCY_DIR', os.path.join(data_dir, 'idempotency'))
+    profiler = RequestProfiler.from_config(config, data_dir)
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            input_data = json.load(f)
-        agent = TaskAgent(config)
-        result = agent.process_request(input_data)
-        with open(input_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        with profiler.request(os.path.basename(input_file)):
+            with profiler.phase("json_read"), open(input_file, 'r', encoding='utf-8') as f:
+                input_data = json.load(f)
+            with profiler.phase("agent_init"):
+                agent = TaskAgent(config, profiler)
+            result = agent.process_request(input_data)
+            with profiler.phase("json_write"), open(input_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
         logger.info("Результат задачи успешно сохранен")
         return True
     except FileNotFoundError:
-        logger.error(f"Файл не найден: {input_file}")
+        logger.error("Файл не найден: %s", input_file)
     except json.JSONDecodeError:
-        logger.error(f"Ошибка формата JSON в файле: {input_file}")
+        logger.error("Ошибка формата JSON в файле: %s", input_file)
     except Exception as e:
-        logger.error(f"Критическая ошибка: {str(e)}")
+        logger.error("Критическая ошибка: %s", e)
     return False
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        logger.error("Использование: python task_master.py <input.json>")
+    profile = "--profile" in sys.argv
+    if profile:
+        sys.argv.remove("--profile")
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[1] != "--stdio"):
+        logger.error("Использование: python task_master.py [--profile] <input.json> | --stdio [data_dir]")
         sys.exit(1)
+    if sys.argv[1] == "--stdio":
+        redirect_logging_to_stderr()
     config = ConfigLoader.load_config()
-    success = main(sys.argv[1], config)
+    configure_logging(config)
+    if profile:
+        config['PROFILE'] = True
+    if sys.argv[1] == "--stdio":
+        success = run_stdio(config, sys.argv[2] if len(sys.argv) == 3 else "data")
+    else:
+        success = main(sys.argv[1], config)
     sys.exit(0 if success else 1)
\ No newline at end of file
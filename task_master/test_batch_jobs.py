@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from batch_jobs import BatchRunner, chat_messages, usage_metrics
+from fake_openai_server import FakeOpenAIServer
+
+
+def echo(messages, index):
+    return f"[NAME] {messages[-1]['content']}\n[DESCRIPTION] Ответ"
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(base_latency=0, batch_delay=0.02, responder=echo) as server:
+        yield server
+
+
+def make_runner(server, tmp_path, **config):
+    return BatchRunner({
+        "LLM_BACKENDS": [{"name": "fake", "base_url": server.base_url, "model": "fake-model", "api_key": "test"}],
+        "BATCH_POLL_SECONDS": 0.02,
+        **config
+    }, str(tmp_path / "state.json"), temperature=0.2)
+
+
+def add_requests(runner, count):
+    for index in range(count):
+        runner.add(f"item-{index}", [SystemMessage(content="system"), HumanMessage(content=f"запрос {index}")],
+                   {"index": index})
+
+
+def test_chat_messages_and_usage_metrics():
+    assert chat_messages([SystemMessage(content="s"), HumanMessage(content="u")]) == [
+        {"role": "system", "content": "s"}, {"role": "user", "content": "u"}
+    ]
+    usage = {"prompt_tokens": 10, "completion_tokens": 3, "prompt_tokens_details": {"cached_tokens": 4}}
+    assert usage_metrics(usage) == {
+        "latency_ms": 0, "input_tokens": 10, "cached_tokens": 4, "output_tokens": 3, "backend": "batch"
+    }
+    assert usage_metrics(None)["input_tokens"] == 0
+
+
+def test_submit_poll_and_map_results_by_custom_id(server, tmp_path):
+    runner = make_runner(server, tmp_path, BATCH_MAX_REQUESTS=2)
+    add_requests(runner, 5)
+    runner.add("item-0", [HumanMessage(content="дубликат")], {"index": 99})
+    assert runner.submit() == 5
+    assert len(server.batches) == 3
+    assert runner.counts()["submitted"] == 5
+    runner.wait()
+    assert runner.counts() == {"pending": 0, "submitted": 0, "done": 5, "failed": 0}
+    results = runner.results()
+    for index in range(5):
+        item = results[f"item-{index}"]
+        assert item["context"] == {"index": index}
+        assert item["result"]["content"].startswith(f"[NAME] запрос {index}")
+        assert item["result"]["usage"]["prompt_tokens"] > 0
+    assert server.batch_requests == 5 and server.requests == 0
+
+
+def test_expired_batch_is_resubmitted(server, tmp_path):
+    server.expire_batches = 1
+    runner = make_runner(server, tmp_path)
+    add_requests(runner, 2)
+    assert runner.run() == {"pending": 0, "submitted": 0, "done": 2, "failed": 0}
+    assert len(server.batches) == 2
+    assert [batch["status"] for batch in server.batches.values()] == ["expired", "completed"]
+    assert all(item["attempts"] == 2 for item in runner.state["items"].values())
+
+
+def test_requests_fail_after_max_attempts(server, tmp_path):
+    server.expire_batches = 2
+    runner = make_runner(server, tmp_path, BATCH_MAX_ATTEMPTS=2)
+    add_requests(runner, 1)
+    assert runner.run()["failed"] == 1
+    assert runner.results()["item-0"]["error"] == "Пакет завершился со статусом expired"
+
+
+def test_resume_waits_for_existing_batches(server, tmp_path):
+    runner = make_runner(server, tmp_path)
+    add_requests(runner, 3)
+    runner.submit()
+    with open(tmp_path / "state.json", encoding="utf-8") as f:
+        assert len(json.load(f)["batches"]) == 1
+
+    resumed = make_runner(server, tmp_path)
+    add_requests(resumed, 3)
+    assert resumed.submit() == 0
+    resumed.wait()
+    assert resumed.counts()["done"] == 3
+    assert len(server.batches) == 1
+    resumed.clear()
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_upload_without_batch_is_recovered(server, tmp_path):
+    runner = make_runner(server, tmp_path)
+    add_requests(runner, 1)
+    runner._create_batch = lambda file_id, record: None
+    runner.submit()
+    assert len(server.batches) == 0
+
+    resumed = make_runner(server, tmp_path)
+    resumed.run()
+    assert resumed.counts()["done"] == 1
+    assert len(server.batches) == 1
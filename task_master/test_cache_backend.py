@@ -0,0 +1,157 @@
+import os
+import time
+
+import pytest
+
+from cache_backend import FileBackend, MemoryLRUBackend, RedisBackend, RedisError, create_backend, decode_value, encode_value
+from fake_redis_server import FakeRedisServer
+
+
+@pytest.fixture
+def redis_server():
+    with FakeRedisServer() as server:
+        yield server
+
+
+@pytest.fixture(params=["memory", "file", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryLRUBackend()
+    elif request.param == "file":
+        yield FileBackend(str(tmp_path / "cache.json"))
+    else:
+        with FakeRedisServer() as server:
+            redis = RedisBackend(server.url)
+            yield redis
+            redis.close()
+
+
+def test_value_encoding_round_trips_and_compresses():
+    small = {"content": "короткий"}
+    large = {"content": "прогноз " * 200}
+    assert encode_value(small)[:1] == b"j"
+    assert encode_value(large)[:1] == b"z"
+    assert decode_value(encode_value(small)) == small
+    assert decode_value(encode_value(large)) == large
+    with pytest.raises(ValueError):
+        decode_value(b"x{}")
+
+
+def test_get_set_and_namespaces(backend):
+    assert backend.get("weather", "moscow") is None
+    backend.set("weather", "moscow", {"summary": "+18"}, 60)
+    assert backend.get("weather", "moscow") == {"summary": "+18"}
+    assert backend.get("holidays", "moscow") is None
+    backend.set("weather", "moscow", {"summary": "+20"}, 60)
+    assert backend.get("weather", "moscow") == {"summary": "+20"}
+    stats = backend.stats()["namespaces"]
+    assert stats["weather"]["hits"] == 2 and stats["weather"]["misses"] == 1 and stats["weather"]["sets"] == 2
+
+
+def test_long_keys_are_hashed(backend):
+    key = "k" * 500
+    assert len(backend.full_key("ns", key)) < 200
+    backend.set("ns", key, 1, 60)
+    assert backend.get("ns", key) == 1
+
+
+def test_ttl_expiry(backend):
+    backend.set("weather", "short", "value", 0.05)
+    backend.set("weather", "long", "value", 60)
+    backend.set("weather", "never", "value", 0)
+    time.sleep(0.1)
+    assert backend.get("weather", "short") is None
+    assert backend.get("weather", "long") == "value"
+    assert backend.get("weather", "never") is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = MemoryLRUBackend(max_entries=2)
+    cache.set("ns", "a", 1, 60)
+    cache.set("ns", "b", 2, 60)
+    assert cache.get("ns", "a") == 1
+    cache.set("ns", "c", 3, 60)
+    assert cache.get("ns", "b") is None
+    assert cache.get("ns", "a") == 1 and cache.get("ns", "c") == 3
+
+
+def test_file_backend_writes_one_file_per_key(tmp_path):
+    cache = FileBackend(str(tmp_path / "cache.json"))
+    cache.set("ns", "a", 1, 60)
+    cache.set("ns", "b", 2, 60)
+    assert cache.directory == str(tmp_path / "cache")
+    assert len(os.listdir(cache.directory)) == 2
+    assert FileBackend(str(tmp_path / "cache.json")).get("ns", "a") == 1
+
+
+def test_file_backend_sweep_drops_expired_and_excess_entries(tmp_path):
+    cache = FileBackend(str(tmp_path / "cache"), max_entries=2, sweep_every=4)
+    cache.set("ns", "expired", 0, 0.01)
+    time.sleep(0.02)
+    cache.set("ns", "a", 1, 10)
+    cache.set("ns", "b", 2, 20)
+    cache.set("ns", "c", 3, 30)
+    assert len(os.listdir(cache.directory)) == 2
+    assert cache.get("ns", "a") is None
+    assert cache.get("ns", "b") == 2 and cache.get("ns", "c") == 3
+
+
+def test_file_backend_ignores_truncated_entry(tmp_path):
+    cache = FileBackend(str(tmp_path / "cache"))
+    cache.set("ns", "a", 1, 60)
+    with open(cache._entry_path(cache.full_key("ns", "a")), "wb") as f:
+        f.write(b"\x00")
+    assert cache.get("ns", "a") is None
+
+
+def test_redis_backend_speaks_resp(redis_server):
+    cache = RedisBackend(redis_server.url)
+    assert cache.execute("PING") == b"PONG"
+    cache.set("ns", "key", {"value": [1, 2]}, 60)
+    assert cache.execute("GET", cache.full_key("ns", "key")) == encode_value({"value": [1, 2]})
+    assert cache.execute("DBSIZE") == 1
+    assert cache.execute("DEL", cache.full_key("ns", "key"), "missing") == 1
+    with pytest.raises(RedisError):
+        cache.execute("NOSUCHCOMMAND")
+    cache.close()
+
+
+def test_redis_backend_authenticates_and_selects_database():
+    with FakeRedisServer(password="secret") as server:
+        url = server.url.replace("/0", "/2")
+        cache = RedisBackend(url)
+        cache.set("ns", "key", 1, 60)
+        assert cache.get("ns", "key") == 1
+        assert RedisBackend(server.url).get("ns", "key") is None
+        assert cache.get("ns", "key") == 1
+        cache.close()
+        wrong = RedisBackend(url.replace("secret", "wrong"))
+        assert wrong.get("ns", "key") is None
+        assert wrong.stats()["namespaces"]["ns"]["errors"] == 1
+
+
+def test_redis_backend_reconnects_after_server_drops_connection(redis_server):
+    cache = RedisBackend(redis_server.url)
+    cache.set("ns", "key", 1, 60)
+    cache.sock.close()
+    assert cache.get("ns", "key") == 1
+    cache.close()
+
+
+def test_redis_backend_unavailable_counts_as_miss_and_backs_off():
+    with FakeRedisServer() as server:
+        url = server.url
+    cache = RedisBackend(url, timeout=0.1, retry_seconds=60)
+    assert cache.get("ns", "key") is None
+    assert cache.retry_at > time.time()
+    cache.set("ns", "key", 1, 60)
+    assert cache.stats()["namespaces"]["ns"]["errors"] == 2
+
+
+def test_create_backend_selects_kind(tmp_path):
+    assert isinstance(create_backend({}), MemoryLRUBackend)
+    assert isinstance(create_backend({}, str(tmp_path / "cache.json")), FileBackend)
+    assert isinstance(create_backend({"CACHE_BACKEND": "memory"}, str(tmp_path / "cache.json")), MemoryLRUBackend)
+    redis = create_backend({"CACHE_BACKEND": "redis", "CACHE_URL": "redis://cache:6380/1", "CACHE_NAMESPACE": "test"})
+    assert isinstance(redis, RedisBackend)
+    assert (redis.host, redis.port, redis.db, redis.prefix) == ("cache", 6380, 1, "test")
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded, call_before, make_deadline
+from fake_openai_server import FakeOpenAIServer
+from llm_backends import BackendRegistry
+
+
+def slow_registry(server, **failover):
+    return BackendRegistry.from_config({
+        "LLM_BACKENDS": [{"name": "slow", "base_url": server.base_url, "model": "fake-model", "api_key": "test",
+                          "max_concurrency": 1}],
+        "LLM_FAILOVER": failover
+    }, temperature=0.2)
+
+
+def test_call_before_passes_remaining_budget():
+    seen = {}
+
+    def func(value, timeout=None):
+        seen["timeout"] = timeout
+        return value
+
+    assert call_before(None, func, 1, timeout_param="timeout") == 1
+    assert seen["timeout"] is None
+    assert call_before(make_deadline(10), func, 2, reserve_seconds=4, timeout_param="timeout") == 2
+    assert 5.5 < seen["timeout"] <= 6
+    with pytest.raises(DeadlineExceeded):
+        call_before(make_deadline(1), func, 3, reserve_seconds=2, timeout_param="timeout")
+
+
+def test_call_before_reports_client_timeout_as_deadline():
+    def func(timeout=None):
+        if timeout is not None:
+            time.sleep(timeout)
+        raise TimeoutError("client gave up")
+
+    with pytest.raises(DeadlineExceeded):
+        call_before(make_deadline(0.2), func, reserve_seconds=0.1, timeout_param="timeout")
+    with pytest.raises(TimeoutError) as error:
+        call_before(make_deadline(5), func)
+    assert not isinstance(error.value, DeadlineExceeded)
+
+
+def test_deadline_cancels_llm_call_and_frees_backend_slot():
+    with FakeOpenAIServer(base_latency=2) as server:
+        registry = slow_registry(server)
+        backend = registry.backends[0]
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            call_before(make_deadline(0.3), registry.invoke, ["ping"], timeout_param="timeout")
+        assert time.monotonic() - started < 1
+        assert backend.semaphore.acquire(timeout=1)
+        backend.semaphore.release()
+        assert time.monotonic() - started < 1.5
+        assert backend.in_flight == 0 and backend.failures == 0 and not backend.tripped
+
+
+def test_invoke_within_budget_returns_response():
+    with FakeOpenAIServer(base_latency=0) as server:
+        registry = slow_registry(server)
+        response = call_before(make_deadline(5), registry.invoke, ["ping"], timeout_param="timeout")
+        assert response.response_metadata["llm_backend"] == "slow"
+        assert registry.backends[0].calls == 1
@@ -0,0 +1,107 @@
+from datetime import date
+
+from decomposition import TaskStreamParser, parse_task_block
+
+START = date(2025, 9, 1)
+END = date(2025, 9, 30)
+
+RESPONSE = """Вот план:
+[TASK]
+**[NAME]:** Собрать требования
+[START] 2025-09-02 10:00
+[END] 2025-09-02 12:00
+[DESCRIPTION] Встреча с заказчиком.
+[/TASK]
+[TASK]
+[NAME] «Сверстать страницу»
+[START] 2025-08-20
+[END] 2025-10-05
+[DESCRIPTION] Адаптивная верстка.
+[TASK]
+[NAME] Без описания
+[START] 2025-09-03
+[/TASK]
+[TASK][NAME] Релиз [START] 2025-09-10 18:00 [END] 2025-09-10 09:00 [DESCRIPTION] Выпуск.[/TASK]
+[TASK]
+[NAME] Ретро
+[START] 2025-13-40 10:00
+[DESCRIPTION] Итоги проекта
+[/TA"""
+
+
+def parse(chunks, limit=10):
+    parser = TaskStreamParser(START, END, limit)
+    tasks = []
+    for chunk in chunks:
+        tasks.extend(parser.feed(chunk))
+    return tasks, parser.close(), parser
+
+
+def test_parse_task_block_with_times():
+    task, clamped = parse_task_block("[NAME] Созвон [START] 2025-09-05 9:30 [END] 2025-09-05 10:00 [DESCRIPTION] Статус", START, END)
+    assert not clamped
+    assert task == {
+        "title": "Созвон", "description": "Статус",
+        "start_date": "2025-09-05", "start_time": "09:30", "end_date": "2025-09-05", "end_time": "10:00", "all_day": False
+    }
+
+
+def test_parse_task_block_requires_title_and_description():
+    assert parse_task_block("[NAME] Только название", START, END) == (None, False)
+    assert parse_task_block("[DESCRIPTION] Только описание", START, END) == (None, False)
+
+
+def test_parse_task_block_clamps_to_project_period():
+    task, clamped = parse_task_block("[NAME] A [START] 2025-08-20 [END] 2025-10-05 [DESCRIPTION] B", START, END)
+    assert clamped
+    assert (task["start_date"], task["end_date"], task["all_day"]) == ("2025-09-01", "2025-09-30", True)
+
+
+def test_parse_task_block_fixes_inverted_times_and_missing_dates():
+    task, _ = parse_task_block("[NAME] A [START] 2025-09-10 18:00 [END] 2025-09-10 09:00 [DESCRIPTION] B", START, END)
+    assert (task["start_time"], task["end_time"]) == ("18:00", "18:00")
+    task, clamped = parse_task_block("[NAME] A [START] 2025-13-40 10:00 [DESCRIPTION] B", START, END)
+    assert not clamped
+    assert (task["start_date"], task["end_date"], task["all_day"]) == ("2025-09-01", "2025-09-01", True)
+
+
+def test_stream_yields_tasks_as_blocks_close():
+    parser = TaskStreamParser(START, END, 10)
+    assert parser.feed("[TASK] [NAME] A [DESCRIPTION] B") == []
+    assert [task["title"] for task in parser.feed(" [/TASK] [TASK] [NAME] C")] == ["A"]
+
+
+def test_stream_is_independent_of_chunking():
+    whole, whole_tail, whole_parser = parse([RESPONSE])
+    by_char, char_tail, char_parser = parse(RESPONSE)
+    assert whole + whole_tail == by_char + char_tail
+    assert [task["title"] for task in by_char] == ["Собрать требования", "Сверстать страницу", "Релиз"]
+    assert [task["title"] for task in char_tail] == ["Ретро"]
+    assert whole_parser.stats == char_parser.stats == {"dropped": 1, "clamped": 1, "unterminated": 1}
+
+
+def test_partial_tag_split_across_chunks():
+    tasks, tail, _ = parse(["[TA", "SK][NA", "ME] A [DESCRI", "PTION] B [/TA", "SK]"])
+    assert [task["title"] for task in tasks] == ["A"]
+    assert tail == []
+
+
+def test_limit_drops_extra_tasks_and_reports_overflow():
+    parser = TaskStreamParser(START, END, 1)
+    tasks = parser.feed(RESPONSE[:RESPONSE.index("[NAME] Без")])
+    assert [task["title"] for task in tasks] == ["Собрать требования"]
+    assert parser.full and parser.overflowing
+    assert parser.stats["dropped"] == 1
+    assert parser.close() == []
+
+
+def test_full_parser_without_new_block_is_not_overflowing():
+    parser = TaskStreamParser(START, END, 1)
+    parser.feed("[TASK] [NAME] A [DESCRIPTION] B [/TASK] готово")
+    assert parser.full and not parser.overflowing
+
+
+def test_close_without_open_block_returns_nothing():
+    _, tail, parser = parse(["Текст без задач"])
+    assert tail == []
+    assert parser.stats["unterminated"] == 0
\ No newline at end of file
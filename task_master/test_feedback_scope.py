@@ -0,0 +1,72 @@
+import pytest
+
+from feedback_scope import classify_feedback, current_output, estimate_tokens, parse_fields, partial_fields, partial_instruction
+
+CURRENT = {"title": "Подготовить отчет", "description": "Собрать данные и оформить отчет."}
+HISTORY = 3
+
+
+@pytest.mark.parametrize("feedback, fields", [
+    ("Сделай название короче", ["title"]),
+    ("Переименуй задачу", ["title"]),
+    ("Добавь в описание контакты", ["description"]),
+    ("Укажи ссылку на документ", ["description"]),
+    ("Название устраивает, а описание сделай подробнее", ["description"]),
+    ("Описание не меняй, поменяй заголовок", ["title"]),
+    ("Измени название и описание", ["title", "description"]),
+    ("Сделай поформальнее", ["title", "description"]),
+    ("Оставь название и описание", ["title", "description"]),
+])
+def test_classify_feedback(feedback, fields):
+    assert classify_feedback(feedback) == fields
+
+
+def test_partial_fields_chooses_partial_for_single_field():
+    assert partial_fields("Сделай название короче", CURRENT, HISTORY) == ["title"]
+    assert partial_fields("Добавь в описание телефон", CURRENT, HISTORY) == ["description"]
+
+
+@pytest.mark.parametrize("feedback, current, history", [
+    ("Измени название и описание", CURRENT, HISTORY),
+    ("Сделай поформальнее", CURRENT, HISTORY),
+    ("Сделай название короче", None, HISTORY),
+    ("Сделай название короче", CURRENT, 1),
+])
+def test_partial_fields_falls_back_to_full_regeneration(feedback, current, history):
+    assert partial_fields(feedback, current, history) is None
+
+
+def test_current_output_prefers_selected_candidate():
+    candidates = [CURRENT, {"title": "Второй", "description": "Другой текст"}]
+    assert current_output({"candidates": candidates, "selected_candidate": 1}) == candidates[1]
+    assert current_output({"candidates": candidates, "selected_candidate": 5, "final_output": CURRENT}) == CURRENT
+
+
+def test_current_output_parses_last_assistant_message():
+    state = {"final_output": None, "messages": [
+        {"role": "assistant", "content": "[NAME] Старое\n[DESCRIPTION] Старый текст"},
+        {"role": "user", "content": "фидбек"},
+        {"role": "assistant", "content": "[NAME] Новое\n[DESCRIPTION] Новый текст"}
+    ]}
+    assert current_output(state) == {"title": "Новое", "description": "Новый текст"}
+    assert current_output({"messages": [{"role": "user", "content": "x"}]}) is None
+
+
+def test_partial_instruction_targets_one_field():
+    title = partial_instruction(["title"], CURRENT, "короче", "задачи")
+    description = partial_instruction(["description"], CURRENT, "подробнее", "задачи")
+    assert "Текущее название: Подготовить отчет" in title and title.endswith("[NAME] Название задачи")
+    assert description.endswith("[DESCRIPTION] Текст описания")
+
+
+def test_parse_fields():
+    assert parse_fields("[NAME] Короткое название", ["title"]) == {"title": "Короткое название"}
+    assert parse_fields("Короткое название", ["title"]) == {"title": "Короткое название"}
+    assert parse_fields("[DESCRIPTION] Новый текст", ["description"]) == {"description": "Новый текст"}
+    assert parse_fields("слово " * 20, ["title"]) is None
+    assert parse_fields("[NAME] Только название", ["description"]) is None
+
+
+def test_estimate_tokens_counts_word_pieces():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh, ok") == 4
@@ -0,0 +1,127 @@
+import io
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from ics_bulk import TaskIcsBulkProcessor, component_to_task_data
+from ics_import import (
+    apply_output, component_properties, escape_text, fold_line, parse_ics_datetime, read_items, read_unfolded_lines,
+    unescape_text
+)
+
+MOSCOW = ZoneInfo("Europe/Moscow")
+STYLE = {"brief": False, "formal": False}
+
+
+def todo(summary, due="20250310T090000", extra=()):
+    return ["BEGIN:VTODO", f"SUMMARY:{summary}", f"DUE:{due}", *extra, "END:VTODO"]
+
+
+def calendar(*components):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for component in components:
+        lines += component
+    lines.append("END:VCALENDAR")
+    return "".join(fold_line(line) for line in lines)
+
+
+class FakeAgent:
+    def __init__(self, fail_on=None):
+        self.prompts = []
+        self.fail_on = fail_on
+
+    def process_request(self, request):
+        prompt = request["task_data"]["prompt"]
+        self.prompts.append(prompt)
+        if prompt == self.fail_on:
+            raise KeyboardInterrupt
+        return {"final_output": {"title": f"Задача: {prompt}", "description": f"Описание; {prompt}, подробно"}}
+
+
+def test_fold_and_unfold_round_trip():
+    line = "DESCRIPTION:" + "Подготовить отчет по проекту, " * 6
+    folded = fold_line(line)
+    physical = folded.split("\r\n")[:-1]
+    assert len(physical) > 1
+    assert all(len(part.encode("utf-8")) <= 75 for part in physical)
+    assert all(part.startswith(" ") for part in physical[1:])
+    assert list(read_unfolded_lines(io.StringIO(folded + "END:VTODO\r\n"))) == [line, "END:VTODO"]
+    assert list(read_unfolded_lines(io.StringIO("SUMMARY:a\r\n\tb\r\n"))) == ["SUMMARY:ab"]
+
+
+def test_escape_round_trip():
+    text = "Встреча; зал 3, корпус\\Б\nвзять ноутбук"
+    escaped = escape_text(text)
+    assert escaped == "Встреча\\; зал 3\\, корпус\\\\Б\\nвзять ноутбук"
+    assert unescape_text(escaped) == text
+    assert unescape_text("строка\\Nвторая") == "строка\nвторая"
+
+
+@pytest.mark.parametrize("value, params, expected", [
+    ("20250310", {"VALUE": "DATE"}, ("2025-03-10", None)),
+    ("20250310T090000", {}, ("2025-03-10", "09:00")),
+    ("20250310T220000Z", {}, ("2025-03-11", "01:00")),
+    ("20250310T090000", {"TZID": "Europe/Berlin"}, ("2025-03-10", "11:00")),
+    ("20250310T090000", {"TZID": "/Asia/Yekaterinburg"}, ("2025-03-10", "07:00")),
+    ("20250310T090000", {"TZID": "Russian Standard Time"}, ("2025-03-10", "09:00")),
+])
+def test_parse_ics_datetime_converts_to_local_zone(value, params, expected):
+    assert parse_ics_datetime(value, params, MOSCOW) == expected
+
+
+def test_component_conversion_uses_zone_and_keeps_rrule():
+    lines = todo("Отчет", due="20250310T060000Z", extra=("DTSTART:20250310T050000Z", "RRULE:FREQ=WEEKLY;BYDAY=MO"))
+    data = component_to_task_data(lines, STYLE, MOSCOW)
+    assert (data["start_date"], data["start_time"]) == ("2025-03-10", "08:00")
+    assert (data["end_date"], data["end_time"]) == ("2025-03-10", "09:00")
+    assert data["recurrence"] == "FREQ=WEEKLY;BYDAY=MO"
+    unsupported = component_to_task_data(todo("Отчет", extra=("RRULE:FREQ=SECONDLY",)), STYLE)
+    assert "recurrence" not in unsupported
+    assert component_to_task_data(["BEGIN:VTODO", "SUMMARY:без срока", "END:VTODO"], STYLE) is None
+
+
+def test_component_properties_skip_nested_components():
+    lines = todo("Отчет", extra=("BEGIN:VALARM", "DESCRIPTION:Напоминание", "END:VALARM", "SUMMARY:Повтор"))
+    props = component_properties(lines)
+    assert props["SUMMARY"] == ({}, "Отчет")
+    assert "DESCRIPTION" not in props
+
+
+def test_apply_output_replaces_only_top_level_fields():
+    lines = todo("Старое", extra=("BEGIN:VALARM", "DESCRIPTION:Напоминание", "END:VALARM"))
+    result = apply_output(lines, {"title": "Новое, важное", "description": "Текст"})
+    assert "SUMMARY:Новое\\, важное" in result
+    assert "DESCRIPTION:Напоминание" in result
+    assert result[1] == "DESCRIPTION:Текст"
+
+
+def test_run_deduplicates_and_passes_raw_lines(tmp_path):
+    source = tmp_path / "in.ics"
+    source.write_text(calendar(todo("Отчет"), todo("Звонок"), todo("Отчет"), todo("Отчет", due="20250311T090000")),
+                      encoding="utf-8", newline="")
+    agent = FakeAgent()
+    stats = TaskIcsBulkProcessor(agent, concurrency=2).run(str(source), str(tmp_path / "out.ics"))
+    assert sorted(agent.prompts) == ["Звонок", "Отчет", "Отчет"]
+    assert stats["components"] == 4 and stats["generated"] == 3 and stats["deduplicated"] == 1
+    with open(tmp_path / "out.ics", encoding="utf-8", newline="") as f:
+        items = list(read_items(f, "VTODO"))
+    assert items[0] == ("raw", ["BEGIN:VCALENDAR"]) and items[-1] == ("raw", ["END:VCALENDAR"])
+    summaries = [line for kind, lines in items if kind == "component" for line in lines if line.startswith("SUMMARY")]
+    assert summaries == ["SUMMARY:Задача: Отчет", "SUMMARY:Задача: Звонок", "SUMMARY:Задача: Отчет", "SUMMARY:Задача: Отчет"]
+    assert not (tmp_path / "out.ics.checkpoint.json").exists()
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    source = tmp_path / "in.ics"
+    source.write_text(calendar(*(todo(f"Задача {n}") for n in range(6))), encoding="utf-8", newline="")
+    output = tmp_path / "out.ics"
+    with pytest.raises(KeyboardInterrupt):
+        TaskIcsBulkProcessor(FakeAgent(fail_on="Задача 3"), concurrency=1).run(str(source), str(output))
+    assert (tmp_path / "out.ics.checkpoint.json").exists()
+
+    agent = FakeAgent()
+    TaskIcsBulkProcessor(agent, concurrency=1).run(str(source), str(output))
+    assert agent.prompts == ["Задача 3", "Задача 4", "Задача 5"]
+    reference = tmp_path / "reference.ics"
+    TaskIcsBulkProcessor(FakeAgent(), concurrency=1).run(str(source), str(reference))
+    assert output.read_bytes() == reference.read_bytes()
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+
+import idempotency
+from idempotency import IdempotencyStore
+
+
+class Counter:
+    def __init__(self, result=None, delay=0.0):
+        self.calls = 0
+        self.result = result if result is not None else {"value": 1}
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return dict(self.result)
+
+
+def test_without_key_always_executes():
+    store = IdempotencyStore()
+    func = Counter()
+    assert store.run(None, func) == ({"value": 1}, False)
+    assert store.run("", func) == ({"value": 1}, False)
+    assert func.calls == 2
+
+
+def test_memory_store_replays_independent_copy():
+    store = IdempotencyStore()
+    func = Counter({"value": {"nested": 1}})
+    first, replayed = store.run("key", func)
+    assert not replayed
+    first["value"]["nested"] = 2
+    second, replayed = store.run("key", func)
+    assert replayed
+    assert second == {"value": {"nested": 1}}
+    assert func.calls == 1
+
+
+def test_file_store_replays_across_instances(tmp_path):
+    func = Counter()
+    IdempotencyStore(str(tmp_path)).run("key", func)
+    result, replayed = IdempotencyStore(str(tmp_path)).run("key", func)
+    assert replayed and result == {"value": 1}
+    assert func.calls == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".lock")]
+
+
+def test_reused_key_with_other_fingerprint_executes_again(tmp_path):
+    store = IdempotencyStore(str(tmp_path))
+    func = Counter()
+    store.run("key", func, fingerprint="a")
+    assert store.run("key", func, fingerprint="b") == ({"value": 1}, False)
+    assert store.run("key", func, fingerprint="a")[1]
+    assert func.calls == 2
+
+
+def test_error_results_are_not_saved(tmp_path):
+    store = IdempotencyStore(str(tmp_path))
+    func = Counter({"error": "timeout"})
+    store.run("key", func)
+    assert store.run("key", func) == ({"error": "timeout"}, False)
+    assert func.calls == 2
+
+
+def test_degraded_results_are_not_saved(tmp_path):
+    store = IdempotencyStore(str(tmp_path))
+    for result in ({"value": 1, "degraded": True}, {"greeting": "Привет", "degraded_reasons": ["llm_timeout"]}):
+        func = Counter(result)
+        store.run(repr(result), func)
+        assert store.run(repr(result), func) == (result, False)
+        assert func.calls == 2
+    func = Counter({"value": 1, "degraded": False, "degraded_reasons": []})
+    store.run("full", func)
+    assert store.run("full", func)[1]
+
+
+def test_concurrent_reuse_with_other_fingerprint_does_not_join(tmp_path):
+    store = IdempotencyStore(str(tmp_path), poll_interval=0.01)
+    first = Counter({"title": "A"}, delay=0.3)
+    second = Counter({"title": "B"})
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(first=store.run("key", first, fingerprint="f1")))
+    thread.start()
+    time.sleep(0.1)
+    results["second"] = store.run("key", second, fingerprint="f2")
+    thread.join()
+    assert results == {"first": ({"title": "A"}, False), "second": ({"title": "B"}, False)}
+    assert first.calls == 1 and second.calls == 1
+    assert store.stats == {"executed": 1, "replayed": 0, "joined": 0}
+
+
+def test_expired_record_is_executed_again(tmp_path, monkeypatch):
+    store = IdempotencyStore(str(tmp_path), retention_seconds=10)
+    func = Counter()
+    store.run("key", func)
+    now = time.time()
+    monkeypatch.setattr(idempotency.time, "time", lambda: now + 11)
+    assert store.run("key", func) == ({"value": 1}, False)
+    assert func.calls == 2
+
+
+def test_concurrent_duplicates_in_process_execute_once(tmp_path):
+    store = IdempotencyStore(str(tmp_path), poll_interval=0.01)
+    func = Counter(delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.run("key", func))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert func.calls == 1
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 7
+    assert all(result == {"value": 1} for result, _ in results)
+
+
+def test_waits_for_result_of_other_process(tmp_path):
+    owner = IdempotencyStore(str(tmp_path))
+    waiter = IdempotencyStore(str(tmp_path), poll_interval=0.01)
+    assert owner._claim("key")
+    func = Counter()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(waiter.run("key", func)))
+    thread.start()
+    time.sleep(0.1)
+    owner._save("key", None, {"value": 2})
+    owner._release("key")
+    thread.join(2)
+    assert results == [({"value": 2}, True)]
+    assert func.calls == 0
+
+
+def test_foreign_lease_expiry_executes_locally(tmp_path):
+    owner = IdempotencyStore(str(tmp_path), lease_seconds=0.2)
+    waiter = IdempotencyStore(str(tmp_path), lease_seconds=0.2, poll_interval=0.01)
+    assert owner._claim("key")
+    func = Counter()
+    started = time.monotonic()
+    assert waiter.run("key", func) == ({"value": 1}, False)
+    assert time.monotonic() - started >= 0.1
+    assert func.calls == 1
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    store = IdempotencyStore(str(tmp_path), lease_seconds=60)
+    lock_path = store._path("key", ".lock")
+    open(lock_path, "w").close()
+    os.utime(lock_path, (time.time() - 120, time.time() - 120))
+    assert store._claim("key")
+    assert not store._claim("key")
+
+
+def test_prune_removes_expired_records_and_locks(tmp_path):
+    store = IdempotencyStore(str(tmp_path), retention_seconds=100, lease_seconds=10)
+    store.run("old", Counter())
+    store.run("fresh", Counter())
+    old_record = store._path("old", ".json")
+    old_lock = store._path("lock", ".lock")
+    open(old_lock, "w").close()
+    past = time.time() - 200
+    os.utime(old_record, (past, past))
+    os.utime(old_lock, (past, past))
+    assert store.prune() == 2
+    assert os.path.exists(store._path("fresh", ".json"))
\ No newline at end of file
@@ -0,0 +1,47 @@
+import pytest
+
+from fake_openai_server import FakeOpenAIServer
+from llm_backends import BackendRegistry, LLMBackend
+
+
+class FailingClient:
+    def invoke(self, messages, **kwargs):
+        raise ConnectionError("connection refused")
+
+
+SPECS = [{"name": "a", "base_url": "http://127.0.0.1:9/v1", "model": "m", "api_key": "k"}]
+
+
+def test_from_config_reads_failover_settings():
+    registry = BackendRegistry.from_config({
+        "LLM_BACKENDS": SPECS,
+        "LLM_FAILOVER": {"alpha": 0.5, "failure_threshold": 3, "cooldown_seconds": 10, "wait_seconds": 0.2}
+    }, temperature=0.2)
+    assert (registry.alpha, registry.failure_threshold, registry.cooldown_seconds, registry.wait_seconds) == (
+        0.5, 3, 10, 0.2
+    )
+    assert BackendRegistry.from_config({"LLM_BACKENDS": SPECS}, temperature=0.2).wait_seconds == 60
+
+
+def test_busy_backends_wait_at_most_wait_seconds():
+    backend = LLMBackend("busy", FailingClient(), max_concurrency=1)
+    registry = BackendRegistry([backend], wait_seconds=0.1)
+    backend.semaphore.acquire()
+    with pytest.raises(TimeoutError):
+        registry.invoke(["ping"])
+
+
+def test_failures_trip_backend_and_fail_over():
+    with FakeOpenAIServer(base_latency=0) as server:
+        registry = BackendRegistry.from_config({"LLM_BACKENDS": [
+            {**SPECS[0], "name": "broken"},
+            {"name": "fake", "base_url": server.base_url, "model": "fake-model", "api_key": "k"}
+        ]}, temperature=0.2)
+        registry.backends[0].client = FailingClient()
+        registry.backends[0].ewma_ms = 1.0
+        for _ in range(2):
+            assert registry.invoke(["ping"]).response_metadata["llm_backend"] == "fake"
+        stats = {item["name"]: item for item in registry.stats()}
+        assert not stats["broken"]["healthy"] and stats["broken"]["failures"] == 2
+        assert stats["fake"]["healthy"] and stats["fake"]["calls"] == 2
+        assert [backend.name for backend in registry.ordered()][0] == "fake"
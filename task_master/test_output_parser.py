@@ -0,0 +1,77 @@
+import pytest
+
+from output_parser import fallback_candidate, json_instruction, parse_output, response_format
+
+CANDIDATE = [{"title": "A", "description": "a"}]
+
+
+def test_valid_json_is_ok():
+    assert parse_output('{"candidates": [{"title": "A", "description": "a"}]}', True) == (CANDIDATE, "ok")
+
+
+def test_single_object_without_candidates_is_ok():
+    assert parse_output('{"title": "A", "description": "a"}', True) == (CANDIDATE, "ok")
+
+
+@pytest.mark.parametrize("content", [
+    '```json\n{"candidates": [{"title": "A", "description": "a"},]}\n```',
+    '{“candidates”: [{“title”: “A”, “description”: “a”}]}'
+])
+def test_fences_trailing_commas_and_smart_quotes_are_repaired(content):
+    assert parse_output(content, True) == (CANDIDATE, "repaired")
+
+
+def test_truncated_json_is_closed():
+    assert parse_output('{"candidates": [{"title": "A", "description": "обрез', True) == (
+        [{"title": "A", "description": "обрез"}], "repaired"
+    )
+
+
+def test_empty_candidates_fail():
+    assert parse_output('{"candidates": [{"title": "", "description": "a"}]}', True) == ([], "failed")
+
+
+def test_structured_mode_falls_back_to_tags():
+    assert parse_output("[NAME] A [DESCRIPTION] a", True) == (CANDIDATE, "repaired")
+
+
+def test_tagged_mode_falls_back_to_json():
+    assert parse_output('{"candidates": [{"title": "A", "description": "a"}]}', False) == (CANDIDATE, "repaired")
+
+
+@pytest.mark.parametrize("content", [
+    "[NAME] Встреча [DESCRIPTION] Обсудим план",
+    "**[NAME]:** Встреча\n**[DESCRIPTION]:** Обсудим план"
+])
+def test_tags_with_and_without_markdown(content):
+    assert parse_output(content, False) == ([{"title": "Встреча", "description": "Обсудим план"}], "ok")
+
+
+def test_numbered_tags_give_several_candidates():
+    assert parse_output("[NAME1] A\n[DESCRIPTION1] a\n[NAME2] B\n[DESCRIPTION2] b", False) == (
+        [{"title": "A", "description": "a"}, {"title": "B", "description": "b"}], "ok"
+    )
+
+
+def test_untagged_title_line_is_repaired():
+    assert parse_output("Название: Встреча команды\nОбсудим план спринта", False) == (
+        [{"title": "Встреча команды", "description": "Обсудим план спринта"}], "repaired"
+    )
+
+
+@pytest.mark.parametrize("content", ["Просто текст", "Название: " + "слово " * 20 + "\nописание"])
+def test_unparseable_output_fails(content):
+    assert parse_output(content, False) == ([], "failed")
+
+
+def test_fallback_candidate_uses_prompt_and_details():
+    assert fallback_candidate("встреча с командой. обсудим план", ["Ссылка: x", ""]) == {
+        "title": "Встреча с командой", "description": "Встреча с командой. обсудим план\nСсылка: x"
+    }
+    assert fallback_candidate("", []) == {"title": "Без названия", "description": "Описание не сгенерировано"}
+
+
+def test_schema_and_instruction():
+    assert response_format()["json_schema"]["strict"]
+    assert json_instruction(1, "события").startswith("Верни один вариант")
+    assert json_instruction(3, "события").startswith("Верни 3 ")
\ No newline at end of file
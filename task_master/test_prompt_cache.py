@@ -0,0 +1,59 @@
+import pytest
+
+from fake_openai_server import FakeOpenAIServer, default_responder
+from task_master import SYSTEM_PROMPT_PREFIX, TaskAgent
+
+
+class RecordingResponder:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, messages, index):
+        if index == 0:
+            self.prompts.append(messages)
+        return default_responder(messages, index)
+
+
+def task_request(prompt, additional_info, start_date):
+    return {
+        "task_data": {
+            "start_date": start_date, "start_time": "10:00", "end_date": start_date, "end_time": "12:00",
+            "all_day": False, "style": {"brief": False, "formal": True},
+            "prompt": prompt, "additional_info": additional_info
+        },
+        "messages": [],
+        "final_output": None,
+        "user_feedback": None
+    }
+
+
+@pytest.fixture
+def agent_and_recorder(tmp_path):
+    recorder = RecordingResponder()
+    with FakeOpenAIServer(base_latency=0, responder=recorder) as server:
+        agent = TaskAgent({
+            "LLM_BACKENDS": [{"name": "fake", "base_url": server.base_url, "model": "fake-model", "api_key": "test"}],
+            "CACHE_BACKEND": "memory",
+            "EXAMPLES_PATH": str(tmp_path / "examples.jsonl"),
+            "IDEMPOTENCY_DIR": str(tmp_path / "idempotency")
+        })
+        yield agent, recorder
+
+
+def test_system_prompt_prefix_is_stable_and_cached(agent_and_recorder):
+    agent, recorder = agent_and_recorder
+    first = agent.process_request(task_request("подготовить отчет по продажам", "квартальные данные", "2025-09-01"))
+    second = agent.process_request(task_request("созвон с подрядчиком по верстке", "ссылка в чате", "2025-10-15"))
+    assert "error" not in first and "error" not in second
+    assert len(recorder.prompts) == 2
+
+    systems = [messages[0]["content"].encode("utf-8") for messages in recorder.prompts]
+    prefix = SYSTEM_PROMPT_PREFIX.encode("utf-8")
+    assert all(system.startswith(prefix) for system in systems)
+    assert systems[0] != systems[1]
+    assert recorder.prompts[0][1]["content"] != recorder.prompts[1][1]["content"]
+    assert [messages[0]["role"] for messages in recorder.prompts] == ["system", "system"]
+
+    first_llm, second_llm = first["metrics"]["llm"], second["metrics"]["llm"]
+    assert first_llm["cached_tokens"] == 0 and first_llm["input_tokens"] > 0
+    assert 0 < second_llm["cached_tokens"] < second_llm["input_tokens"]
@@ -0,0 +1,107 @@
+from datetime import date
+
+import pytest
+
+from recurrence import describe, occurrences, parse_rule, plural
+
+
+def dates(rule, start, **kwargs):
+    return [str(day) for day in occurrences(parse_rule(rule), start, **kwargs)]
+
+
+def test_parse_rule_accepts_prefix_and_defaults():
+    rule = parse_rule("RRULE:FREQ=weekly;BYDAY=mo,we;WKST=MO")
+    assert rule.freq == "WEEKLY"
+    assert rule.interval == 1
+    assert rule.count is None and rule.until is None
+    assert rule.by_day == ((0, 0), (0, 2))
+
+
+def test_parse_rule_reads_until_with_time():
+    assert parse_rule("FREQ=DAILY;UNTIL=20250905T235959Z").until == date(2025, 9, 5)
+    assert parse_rule("FREQ=DAILY;UNTIL=2025-09-05").until == date(2025, 9, 5)
+
+
+@pytest.mark.parametrize("text", [
+    "FREQ=HOURLY",
+    "INTERVAL=2",
+    "FREQ=WEEKLY;BYSETPOS=1",
+    "FREQ=WEEKLY;BYDAY=XX",
+    "FREQ=MONTHLY;BYDAY=6MO",
+    "FREQ=WEEKLY;BYDAY=1MO",
+    "FREQ=WEEKLY;BYMONTHDAY=1",
+    "FREQ=DAILY;COUNT=many",
+    "FREQ=DAILY;UNTIL=2025"
+])
+def test_parse_rule_rejects_unsupported_rules(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+def test_weekly_by_day_with_count():
+    assert dates("FREQ=WEEKLY;BYDAY=MO,WE;COUNT=5", date(2025, 9, 1)) == [
+        "2025-09-01", "2025-09-03", "2025-09-08", "2025-09-10", "2025-09-15"
+    ]
+
+
+def test_start_off_pattern_is_first_occurrence():
+    assert dates("FREQ=WEEKLY;BYDAY=MO", date(2025, 9, 2), limit=3) == ["2025-09-02", "2025-09-08", "2025-09-15"]
+
+
+def test_weekly_interval():
+    assert dates("FREQ=WEEKLY;INTERVAL=2;COUNT=3", date(2025, 9, 1)) == ["2025-09-01", "2025-09-15", "2025-09-29"]
+
+
+def test_daily_workdays():
+    assert dates("FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR;COUNT=6", date(2025, 9, 4)) == [
+        "2025-09-04", "2025-09-05", "2025-09-08", "2025-09-09", "2025-09-10", "2025-09-11"
+    ]
+
+
+def test_until_is_inclusive():
+    assert dates("FREQ=DAILY;UNTIL=20250905T235959Z", date(2025, 9, 1)) == [
+        "2025-09-01", "2025-09-02", "2025-09-03", "2025-09-04", "2025-09-05"
+    ]
+
+
+def test_monthly_skips_months_without_the_day():
+    assert dates("FREQ=MONTHLY;COUNT=4", date(2025, 1, 31)) == ["2025-01-31", "2025-03-31", "2025-05-31", "2025-07-31"]
+
+
+def test_monthly_last_day_of_month():
+    assert dates("FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=3", date(2025, 1, 31)) == ["2025-01-31", "2025-02-28", "2025-03-31"]
+
+
+def test_monthly_weekday_ordinals():
+    assert dates("FREQ=MONTHLY;BYDAY=2TU;COUNT=3", date(2025, 9, 9)) == ["2025-09-09", "2025-10-14", "2025-11-11"]
+    assert dates("FREQ=MONTHLY;BYDAY=-1FR;COUNT=3", date(2025, 9, 26)) == ["2025-09-26", "2025-10-31", "2025-11-28"]
+
+
+def test_monthly_fifth_weekday_skips_short_months():
+    assert dates("FREQ=MONTHLY;BYDAY=5MO;COUNT=3", date(2025, 9, 29)) == ["2025-09-29", "2025-12-29", "2026-03-30"]
+
+
+def test_yearly_leap_day_skips_common_years():
+    assert dates("FREQ=YEARLY;COUNT=2", date(2024, 2, 29)) == ["2024-02-29", "2028-02-29"]
+
+
+def test_open_ended_rule_is_limited():
+    assert len(occurrences(parse_rule("FREQ=DAILY"), date(2025, 1, 1))) == 52
+    assert len(occurrences(parse_rule("FREQ=DAILY;COUNT=3"), date(2025, 1, 1), limit=10)) == 3
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("FREQ=WEEKLY;BYDAY=MO,WE", "каждую неделю по понедельникам и средам"),
+    ("FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR", "по понедельникам, вторникам, средам, четвергам и пятницам"),
+    ("FREQ=MONTHLY;INTERVAL=2;BYDAY=-1FR;COUNT=5", "раз в 2 месяца в последнюю пятницу, всего 5 раз"),
+    ("FREQ=MONTHLY;BYDAY=2TU", "каждый месяц во второй вторник"),
+    ("FREQ=MONTHLY;BYMONTHDAY=15;UNTIL=20251231", "каждый месяц 15-го числа, до 31.12.2025"),
+    ("FREQ=DAILY;INTERVAL=3;COUNT=21", "раз в 3 дня, всего 21 раз")
+])
+def test_describe(text, expected):
+    assert describe(parse_rule(text)) == expected
+
+
+@pytest.mark.parametrize("number, form", [(1, "день"), (3, "дня"), (5, "дней"), (11, "дней"), (12, "дней"), (21, "день"), (24, "дня")])
+def test_plural(number, form):
+    assert plural(number, ("день", "дня", "дней")) == form
\ No newline at end of file
@@ -0,0 +1,68 @@
+import sys
+import textwrap
+import time
+
+import pytest
+
+from stdio_client import ContainerPool, StdioSession
+
+SERVICE = textwrap.dedent("""
+    import json, sys, time
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("op") == "shutdown":
+            break
+        if request.get("op") == "hang":
+            time.sleep(60)
+        if request.get("op") == "events":
+            for n in range(2):
+                print(json.dumps({"id": request["id"], "event": "task", "n": n}), flush=True)
+        request_id = request["id"] + 1 if request.get("op") == "wrong_id" else request["id"]
+        print(json.dumps({"id": request_id, "ok": True, "echo": request.get("value")}), flush=True)
+""")
+COMMAND = [sys.executable, "-c", SERVICE]
+
+
+@pytest.fixture
+def session():
+    session = StdioSession(COMMAND, timeout=5)
+    yield session
+    session.close()
+
+
+def test_request_returns_matching_response(session):
+    assert session.request({"op": "ping", "value": 1})["echo"] == 1
+    events = []
+    response = session.request({"op": "events", "value": 2}, events.append)
+    assert response["id"] == 2 and response["echo"] == 2
+    assert [event["n"] for event in events] == [0, 1]
+
+
+def test_timeout_kills_process_and_next_request_restarts(session):
+    session.request({"op": "ping"})
+    process = session.process
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        session.request({"op": "hang"}, timeout=0.3)
+    assert time.monotonic() - started < 5
+    assert session.process is None and process.poll() is not None
+    assert session.request({"op": "ping", "value": 3})["echo"] == 3
+    assert session.process.pid != process.pid
+
+
+def test_response_with_other_id_recycles_process(session):
+    with pytest.raises(RuntimeError):
+        session.request({"op": "wrong_id"})
+    assert not session.alive()
+    assert session.request({"op": "ping", "value": 4})["echo"] == 4
+
+
+def test_pool_discards_timed_out_container():
+    pool = ContainerPool(COMMAND, size=0, timeout=0.3)
+    try:
+        with pytest.raises(TimeoutError):
+            pool.request({"op": "hang"})
+        assert pool.request({"op": "ping", "value": 5})["echo"] == 5
+        assert pool.stats["cold"] == 2
+    finally:
+        pool.close()
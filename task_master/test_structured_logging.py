@@ -0,0 +1,166 @@
+import io
+import json
+import logging
+import os
+
+import pytest
+
+from structured_logging import (
+    ContextFilter, ContextQueueHandler, DebugSampler, JsonFormatter, configure_logging, log_context,
+    request_context, shutdown_logging
+)
+
+logger = logging.getLogger("StructuredLoggingTest")
+
+
+@pytest.fixture(autouse=True)
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def make_record(msg, *args, level=logging.INFO, name="test", exc_info=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+
+def json_lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_formatter_includes_context_and_exception():
+    stream = io.StringIO()
+    configure_logging({"LOG_FORMAT": "json", "LOG_ASYNC": False}, stream=stream)
+    with log_context(request_id="req-1", node="call_agent"):
+        logger.info("Ответ за %s мс", 120, extra={"duration_ms": 120.5})
+    try:
+        raise ValueError("сбой")
+    except ValueError:
+        logger.exception("Ошибка обработки")
+    logger.info("Без контекста")
+    first, second, third = json_lines(stream)
+    assert first["message"] == "Ответ за 120 мс" and first["level"] == "INFO"
+    assert first["logger"] == "StructuredLoggingTest"
+    assert (first["request_id"], first["node"], first["duration_ms"]) == ("req-1", "call_agent", 120.5)
+    assert "ValueError: сбой" in second["exception"]
+    assert "request_id" not in third and "node" not in third and "exception" not in third
+
+
+def test_json_formatter_formats_record_directly():
+    record = make_record("Кэш %s", "hit", level=logging.DEBUG, name="Cache")
+    record.sample_every = 100
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Кэш hit" and entry["level"] == "DEBUG" and entry["logger"] == "Cache"
+    assert entry["sample_every"] == 100 and entry["ts"]
+    assert "request_id" not in entry and "duration_ms" not in entry
+
+
+def test_request_context_keeps_outer_id():
+    record = make_record("x")
+    with request_context("outer"), request_context():
+        ContextFilter().filter(record)
+    assert record.request_id == "outer"
+    with request_context():
+        generated = make_record("y")
+        ContextFilter().filter(generated)
+    assert generated.request_id and generated.request_id != "outer"
+
+
+def test_debug_sampler_keeps_every_nth_per_template():
+    sampler = DebugSampler(3)
+    kept = [sampler.filter(make_record("Кэш %s", n, level=logging.DEBUG)) for n in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampler.filter(make_record("Другой шаблон", level=logging.DEBUG))
+    assert all(sampler.filter(make_record("Кэш %s", n, level=logging.INFO)) for n in range(3))
+    record = make_record("Кэш %s", 9, level=logging.DEBUG)
+    sampler.filter(record)
+    sampler.filter(record)
+    assert sampler.filter(record) and record.sample_every == 3
+    assert all(DebugSampler(1).filter(make_record("a", level=logging.DEBUG)) for _ in range(3))
+
+
+def test_queue_handler_keeps_plain_args_lazy():
+    handler = ContextQueueHandler(None)
+    record = make_record("Ответ за %s мс: %s", 120, "ok")
+    prepared = handler.prepare(record)
+    assert prepared is not record
+    assert prepared.msg == "Ответ за %s мс: %s" and prepared.args == (120, "ok")
+    assert prepared.getMessage() == "Ответ за 120 мс: ok"
+
+
+def test_queue_handler_snapshots_mutable_args():
+    handler = ContextQueueHandler(None)
+    stats = {"done": [1]}
+    prepared = handler.prepare(make_record("Статистика %s", stats))
+    stats["done"].append(2)
+    assert prepared.msg == "Статистика {'done': [1]}" and prepared.args is None
+    prepared = handler.prepare(make_record("Готово %(done)s", stats))
+    stats["done"].append(3)
+    assert prepared.msg == "Готово [1, 2]" and prepared.args is None
+    counts = {"done": 4}
+    prepared = handler.prepare(make_record("Готово %(done)s", counts))
+    counts["done"] = 5
+    assert prepared.msg == "Готово %(done)s" and prepared.getMessage() == "Готово 4"
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError as e:
+        prepared = handler.prepare(make_record("Ошибка", exc_info=(type(e), e, e.__traceback__)))
+    assert prepared.exc_info is None and "RuntimeError: boom" in prepared.exc_text
+
+
+def test_async_logging_is_flushed_on_shutdown():
+    stream = io.StringIO()
+    configure_logging({"LOG_FORMAT": "json"}, stream=stream)
+    with log_context(request_id="req-2"):
+        for n in range(50):
+            logger.info("Запись %s", n)
+    shutdown_logging()
+    lines = json_lines(stream)
+    assert [line["message"] for line in lines] == [f"Запись {n}" for n in range(50)]
+    assert all(line["request_id"] == "req-2" for line in lines)
+
+
+def test_force_false_keeps_existing_configuration():
+    first, second = io.StringIO(), io.StringIO()
+    configure_logging({"LOG_ASYNC": False}, stream=first)
+    configure_logging({"LOG_ASYNC": False, "LOG_FORMAT": "json"}, stream=second, force=False)
+    logger.info("Первая конфигурация")
+    assert "Первая конфигурация" in first.getvalue() and second.getvalue() == ""
+    configure_logging({"LOG_ASYNC": False, "LOG_LEVEL": "warning"}, stream=second)
+    logger.info("Скрыто")
+    logger.warning("Видно")
+    assert "Скрыто" not in second.getvalue() and "Видно" in second.getvalue()
+    assert len(logging.getLogger().handlers) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="нужен fork")
+def test_reconfigure_in_forked_child():
+    configure_logging({"LOG_FORMAT": "json"}, stream=io.StringIO())
+    logger.info("Родитель")
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            with os.fdopen(write_fd, "w", encoding="utf-8") as out:
+                configure_logging({"LOG_FORMAT": "json"}, stream=out, force=True)
+                with log_context(request_id="child"):
+                    logger.info("Дочерний процесс")
+                shutdown_logging()
+            status = 0
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    with os.fdopen(read_fd, encoding="utf-8") as src:
+        output = src.read()
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    entries = [json.loads(line) for line in output.splitlines()]
+    assert [(entry["message"], entry["request_id"]) for entry in entries] == [("Дочерний процесс", "child")]
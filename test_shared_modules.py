@@ -0,0 +1,5 @@
+from check_shared_modules import find_mismatches
+
+
+def test_shared_module_copies_are_identical():
+    assert find_mismatches() == []
\ No newline at end of file